@@ -1,17 +1,21 @@
 from abc import ABC, abstractmethod
-import boto3
 import os
-from typing import Any, AsyncGenerator, Union
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_aws import ChatBedrock
+from typing import TYPE_CHECKING, Any, AsyncGenerator, Union
 
-region = "us-east-1"
-bedrock_client = boto3.client("bedrock-runtime", region_name=region)
+from loguru import logger
+
+from app.common.lazy import lazy_import
+
+if TYPE_CHECKING:
+    from app.chatbot.components.prompt_assembler import AssembledPrompt
+
+langchain_google_genai = lazy_import("langchain_google_genai")
+langchain_aws = lazy_import("langchain_aws")
 
 
 class BaseChatbot(ABC):
     def __init__(self, model_name: str, temperature: float = 0):
-        self.llm = ChatGoogleGenerativeAI(model=model_name, temperature=temperature)
+        self.llm = langchain_google_genai.ChatGoogleGenerativeAI(model=model_name, temperature=temperature)
 
     def get_text_response(self, prompt: str) -> str:
         response = self.llm.invoke(prompt)
@@ -27,10 +31,15 @@ class BaseChatbot(ABC):
             yield  # This is to ensure the method is abstract and must be implemented in subclasses.
         pass
 
+    async def stream_prompt(self, prompt: "AssembledPrompt") -> AsyncGenerator[Union[str, list[Union[str, dict[Any, Any]]]], None]:
+        """Stream a response to an assembled prompt. Providers without prompt caching get the flat text."""
+        async for chunk in self.stream_response(prompt.text):
+            yield chunk
+
 
 class GeminiChatbot(BaseChatbot):
     def __init__(self, model_name: str = "gemini-2.0-flash", temperature: float = 0):
-        self.llm = ChatGoogleGenerativeAI(model=model_name, temperature=temperature)
+        self.llm = langchain_google_genai.ChatGoogleGenerativeAI(model=model_name, temperature=temperature)
 
     async def get_text_response_async(self, prompt: str) -> Union[str, list[Union[str, dict[Any, Any]]]]:
         response = await self.llm.ainvoke(prompt)
@@ -60,7 +69,7 @@ class ClaudeSonnetChatbot(BaseChatbot):
         if stage == "local" and os.getenv("AWS_PROFILE"):
             bedrock_kwargs["credentials_profile_name"] = os.getenv("AWS_PROFILE")
 
-        self.llm = ChatBedrock(**bedrock_kwargs)
+        self.llm = langchain_aws.ChatBedrock(**bedrock_kwargs)
 
     def get_text_response(self, prompt: str) -> str:
         response = self.llm.invoke(prompt)
@@ -73,3 +82,17 @@ class ClaudeSonnetChatbot(BaseChatbot):
     async def stream_response(self, prompt: str) -> AsyncGenerator[Union[str, list[Union[str, dict[Any, Any]]]], None]:
         async for chunk in self.llm.astream(prompt):
             yield chunk.content
+
+    async def stream_prompt(self, prompt: "AssembledPrompt") -> AsyncGenerator[Union[str, list[Union[str, dict[Any, Any]]]], None]:
+        """Stream with a cache checkpoint on the static prefix and record the cache usage on `prompt`."""
+        usage_metadata = None
+        async for chunk in self.llm.astream([{"role": "user", "content": prompt.to_content_blocks()}]):
+            if chunk.usage_metadata:
+                usage_metadata = chunk.usage_metadata
+            yield chunk.content
+
+        usage = prompt.record_usage(usage_metadata)
+        logger.info(
+            f"Prompt cache: hit={usage.cache_hit} hit_bytes={usage.cache_hit_bytes} prefix_bytes={usage.prefix_bytes} suffix_bytes={usage.suffix_bytes} "
+            f"cache_read_tokens={usage.cache_read_tokens} cache_write_tokens={usage.cache_write_tokens} input_tokens={usage.input_tokens}"
+        )
@@ -1,19 +1,20 @@
 import json
 from typing import Annotated, cast
 from uuid import UUID
-from fastapi import APIRouter, Depends, Header, Request
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
 from fastapi.responses import StreamingResponse
 
 from app.chatbot.chatbot_models import AgentRequest, AgentStreamResponse, StreamStep, ChatbotRequest, MessageResponse, ChatbotStreamFinalResponse
 from app.chatbot.chatbot_services import ChatbotService
 from app.chatbot.conversation import Conversation
-from app.chatbot.conversation.conversation_models import ConversationResponse
-from app.chatbot.conversation.conversation_services import ConversationService
+from app.chatbot.conversation.conversation_models import ConversationImportResponse, ConversationResponse
+from app.chatbot.conversation.conversation_services import ConversationArchiveService, ConversationImportService, ConversationService, ndjson_lines
 from app.chatbot.messages.message_services import MessageService
 from app.chatbot.messages import Message
 from app.common.config import ServiceFactory
 from app.common.controller import BaseController
 from app.common.models import RequestHeaders, Role
+from app.common.unit_of_work import current_unit_of_work
 from app.user import User
 import logging
 import sys
@@ -55,6 +56,33 @@ class ChatbotController(BaseController):
             conversation: Conversation = await conversation_service.start_new_conversation(user=user)
             return ConversationResponse(**conversation.model_dump())
 
+        @self.api_router.post(
+            "/conversations/import",
+            response_model=ConversationImportResponse,
+            responses={
+                200: {"description": "Conversations imported successfully"},
+                422: {"description": "A line is not a valid conversation, nothing was imported"},
+            },
+        )
+        async def import_conversations(
+            request: Request,
+            headers: Annotated[RequestHeaders, Header()],
+            import_service: ConversationImportService = Depends(ServiceFactory.get_conversation_import_service),
+        ) -> ConversationImportResponse:
+            """
+            Endpoint to import conversations from other systems.
+            The body is NDJSON (application/x-ndjson), one conversation with its messages per line,
+            read as it is uploaded.
+            """
+            user: User = request.state.user
+            try:
+                return await import_service.import_ndjson(user=user, lines=ndjson_lines(request.stream()))
+            except ValueError as e:
+                # the batches already written belong to the request's unit of work
+                if (unit_of_work := current_unit_of_work()) is not None:
+                    unit_of_work.rollback_only = True
+                raise HTTPException(status_code=422, detail=str(e)) from e
+
         @self.api_router.post("/conversations/{conversation_id}/messages")
         async def send_message(
             request: Request,
@@ -64,6 +92,7 @@ class ChatbotController(BaseController):
             message_service: MessageService = Depends(ServiceFactory.get_message_service),
             chatbot_service: ChatbotService = Depends(ServiceFactory.get_chatbot_service),
             conversation_service: ConversationService = Depends(ServiceFactory.get_conversation_service),
+            archive_service: ConversationArchiveService = Depends(ServiceFactory.get_conversation_archive_service),
         ) -> StreamingResponse:
             """
             Endpoint to send a message to the chatbot.
@@ -71,6 +100,8 @@ class ChatbotController(BaseController):
             """
             user: User = request.state.user
             logger.info(f"conversation_id: {conversation_id},\nuser: {user.model_dump_json},\nuser request: {message.model_dump_json()}")
+            # an archived conversation gets its history back before the agent reads it
+            await archive_service.open(conversation_id)
 
             async def _handle_streaming_response():
                 try:
@@ -134,7 +165,12 @@ class ChatbotController(BaseController):
                 }
             },
         )
-        async def get_all_messages(conversation_id: UUID, message_service: MessageService = Depends(ServiceFactory.get_message_service)):
+        async def get_all_messages(
+            conversation_id: UUID,
+            message_service: MessageService = Depends(ServiceFactory.get_message_service),
+            archive_service: ConversationArchiveService = Depends(ServiceFactory.get_conversation_archive_service),
+        ):
+            await archive_service.open(conversation_id)
             messages = await message_service.get_all_messages(conversation_id=conversation_id)
             return [
                 MessageResponse(
@@ -180,9 +216,14 @@ class ChatbotController(BaseController):
             status_code=204,
         )
         async def delete_conversation(
+            request: Request,
             conversation_id: UUID,
             conversation_service: ConversationService = Depends(ServiceFactory.get_conversation_service),
+            archive_service: ConversationArchiveService = Depends(ServiceFactory.get_conversation_archive_service),
         ) -> None:
+            user: User = request.state.user
             await conversation_service.delete_conversation(conversation_id=conversation_id)
+            if user.id is not None:
+                await archive_service.delete_archive(user.id, conversation_id)
 
         return self.api_router
@@ -10,6 +10,8 @@ from pydantic import BaseModel, ConfigDict, Field
 
 from app.chatbot.messages import Message
 from app.common.models import MemoryManagementConfig, MemoryType, Role, StreamStep
+from app.common.tokens import token_estimator
+from app.common.vector_types import Embedding, empty_embedding
 from app.user import User
 
 
@@ -35,9 +37,11 @@ class MemoryEntry(BaseModel):
     memory_type: MemoryType
     content: str
     metadata: dict[str, Any] = Field(default={})
-    embedding: list[float] = Field(default=[])
+    embedding: Embedding = Field(default_factory=empty_embedding)
     is_active: bool = Field(default=True)
     evicted_at: datetime | None = Field(default=None)
+    last_accessed_at: datetime | None = Field(default=None)
+    access_count: int = Field(default=0)
 
     def model_post_init(self, context: Any) -> None:
         self.metadata["size"] = len(self.content)
@@ -58,9 +62,9 @@ class MemoryEntry(BaseModel):
         """Serialize the memory block with usage statistics and alerts"""
         content = self.content
         token_limit = self.memory_type.token_limit
-        char_limit = token_limit * MemoryManagementConfig.AVERAGE_TOKEN_SIZE
+        char_limit = token_estimator.chars_for(token_limit)
         current_chars = len(content)
-        current_tokens = current_chars / MemoryManagementConfig.AVERAGE_TOKEN_SIZE
+        current_tokens = token_estimator.count(content)
 
         usage_pct = (current_tokens / token_limit * 100) if token_limit > 0 else 0
 
@@ -86,6 +90,7 @@ class PaginatedResult(BaseModel, Generic[T]):
     total_pages: int
     total_count: int
     page_size: int
+    next_cursor: Optional[str] = None
 
 
 class ActionResult(BaseModel):
@@ -164,6 +169,7 @@ class AgentState(BaseModel):
     user_message: str
     agent_message: str = Field(default="")
     prompt: str = Field(default="")
+    assembled_prompt: Any = Field(default=None)  # app.chatbot.components.prompt_assembler.AssembledPrompt
     filepaths: list[str] = Field(default=[])
 
     # Memory Segments
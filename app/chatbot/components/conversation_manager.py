@@ -7,6 +7,7 @@ from app.chatbot.conversation.conversation_repositories import ConversationRepos
 from app.chatbot.messages import Message
 from app.chatbot.messages.message_repositories import MessageRepository
 from app.common.models import MemoryManagementConfig, Role
+from app.common.unit_of_work import detached
 from app.common.vector_embedders import BaseVectorEmbedder
 from app.user import User
 from uuid import UUID
@@ -100,7 +101,7 @@ class SlidingWindowConversationManager(ConversationManager):
         self.session_messages.append(Message(content=message.message, role=message.role, conversation_id=conversation_id))
 
     async def _update_conversation_title_and_summary(self, conversation_id: UUID) -> None:
-        conversation = self.conversation_repository.find_conversation_by_id(conversation_id=conversation_id)
+        conversation = await self.conversation_repository.find_conversation_by_id(conversation_id=conversation_id)
         if not conversation.summary or conversation.title == "New Conversation":
             logger.info("Updating conversation title and summary")
             agent_response = self.chatbot.get_text_response(
@@ -125,7 +126,7 @@ class SlidingWindowConversationManager(ConversationManager):
             conversation.title = title
             conversation.summary = summary
             conversation.summary_embeddings = self.embedder.embed_single_text(summary)
-            self.conversation_repository.update_conversation(domain=conversation)
+            await self.conversation_repository.update_conversation(domain=conversation)
 
     async def handle_final_response(self, user: User, conversation_id: UUID, current_user_message: str) -> None:
         """
@@ -134,7 +135,7 @@ class SlidingWindowConversationManager(ConversationManager):
 
         final_response = self.session_messages[-1].content
 
-        self.message_repository.batch_add_messages(
+        await self.message_repository.batch_add_messages(
             user_id=user.id,
             messages=[
                 Message(content=current_user_message, role=Role.USER, conversation_id=conversation_id, embedding=self.embedder.embed_single_text(current_user_message)),
@@ -142,4 +143,5 @@ class SlidingWindowConversationManager(ConversationManager):
             ],
         )
 
-        asyncio.create_task(self._update_conversation_title_and_summary(conversation_id=conversation_id))
+        # Outlives the request, so it commits in its own unit of work
+        asyncio.create_task(detached(self._update_conversation_title_and_summary, conversation_id=conversation_id))
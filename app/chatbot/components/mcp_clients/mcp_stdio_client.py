@@ -2,10 +2,15 @@ import asyncio
 import os
 from contextlib import AsyncExitStack
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
+from app.common.lazy import lazy_import
+
+if TYPE_CHECKING:
+    from mcp import ClientSession
+
+mcp = lazy_import("mcp")
+mcp_client_stdio = lazy_import("mcp.client.stdio")
 
 
 @dataclass(frozen=True)
@@ -23,7 +28,7 @@ class MCPStdioClient:
     def __init__(self, cfg: MCPServerConfig):
         self.cfg = cfg
         self._stack: Optional[AsyncExitStack] = None
-        self._session: Optional[ClientSession] = None
+        self._session: Optional["ClientSession"] = None
         self._tool_cache: Optional[List[Dict[str, Any]]] = None
 
     async def start(self) -> None:
@@ -35,9 +40,9 @@ class MCPStdioClient:
         self._stack = AsyncExitStack()
         await self._stack.__aenter__()
         env = {**os.environ, **(self.cfg.env or {})}
-        transport = await self._stack.enter_async_context(stdio_client(StdioServerParameters(command=self.cfg.command, args=self.cfg.args, env=env)))
+        transport = await self._stack.enter_async_context(mcp_client_stdio.stdio_client(mcp.StdioServerParameters(command=self.cfg.command, args=self.cfg.args, env=env)))
         r, w = transport
-        self._session = await self._stack.enter_async_context(ClientSession(r, w))
+        self._session = await self._stack.enter_async_context(mcp.ClientSession(r, w))
         await self._session.initialize()
         self._tool_cache = None
 
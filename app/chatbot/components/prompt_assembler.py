@@ -0,0 +1,143 @@
+"""
+Prompt assembly with a byte-stable static prefix.
+
+The system prompt (identity, guidelines, tool schema, output format rules and examples) only changes
+when the tool registry or the output format changes, so it is rendered once per process and sent as
+the first content block with a provider cache checkpoint. Everything that changes per epoch (memory,
+recall, history, observations and the user query) goes in the dynamic suffix after the checkpoint.
+Both parts are rendered by the configured `PromptEncoder`, and the dynamic sections are trimmed to
+their token budgets by `PromptBudget` first.
+"""
+
+from dataclasses import dataclass, field
+import hashlib
+import threading
+from typing import Any, Mapping, Optional
+
+from app.chatbot.components.prompt_budget import BudgetReport, PromptBudget
+from app.chatbot.components.prompt_encoders import EncodedPrompt, PromptEncoder, SegmentStats
+from app.chatbot.components.tools_manager import ToolsManager
+from app.chatbot.workflows.prompts.system.intuitive_knowledge import get_intuitive_knowledge
+from app.common.models import MemoryType
+from app.common.tokens import token_estimator
+
+# Anthropic prompt caching marker, understood by Bedrock (InvokeModel) and the Anthropic API
+CACHE_CHECKPOINT: Mapping[str, str] = {"type": "ephemeral"}
+
+
+@dataclass(frozen=True)
+class StaticPrefix:
+    text: str
+    version: str
+    segments: tuple[SegmentStats, ...] = ()
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self.text.encode())
+
+
+@dataclass
+class PromptCacheUsage:
+    """Provider-reported cache usage for one LLM call."""
+
+    prefix_bytes: int
+    suffix_bytes: int
+    input_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+
+    @property
+    def cache_hit(self) -> bool:
+        return self.cache_read_tokens > 0
+
+    @property
+    def cache_hit_bytes(self) -> int:
+        return self.prefix_bytes if self.cache_hit else 0
+
+
+@dataclass
+class AssembledPrompt:
+    prefix: StaticPrefix
+    dynamic_suffix: str
+    dynamic_segments: tuple[SegmentStats, ...] = ()
+    budget_report: Optional[BudgetReport] = None
+    usage: Optional[PromptCacheUsage] = field(default=None)
+
+    @property
+    def segments(self) -> tuple[SegmentStats, ...]:
+        """Byte and token size of every prompt section, static ones first."""
+        return self.prefix.segments + self.dynamic_segments
+
+    @property
+    def text(self) -> str:
+        """Flat prompt for providers without prompt caching, logs and traces."""
+        return f"{self.prefix.text}\n{self.dynamic_suffix}"
+
+    def to_content_blocks(self) -> list[dict[str, Any]]:
+        """Message content with a cache checkpoint after the static prefix."""
+        return [
+            {"type": "text", "text": self.prefix.text, "cache_control": dict(CACHE_CHECKPOINT)},
+            {"type": "text", "text": self.dynamic_suffix},
+        ]
+
+    def record_usage(self, usage_metadata: Optional[Mapping[str, Any]]) -> PromptCacheUsage:
+        """Store the LangChain `usage_metadata` of the response as cache usage for this call."""
+        usage_metadata = usage_metadata or {}
+        details = usage_metadata.get("input_token_details") or {}
+        self.usage = PromptCacheUsage(
+            prefix_bytes=self.prefix.size_bytes,
+            suffix_bytes=len(self.dynamic_suffix.encode()),
+            input_tokens=usage_metadata.get("input_tokens", 0),
+            cache_read_tokens=details.get("cache_read", 0) or 0,
+            cache_write_tokens=details.get("cache_creation", 0) or 0,
+        )
+        # Cached prefix tokens are reported separately from the uncached input
+        token_estimator.calibrate(self.text, self.usage.input_tokens + self.usage.cache_read_tokens + self.usage.cache_write_tokens)
+        return self.usage
+
+
+_static_prefixes: dict[tuple[str, str, str], StaticPrefix] = {}
+_static_prefixes_lock = threading.Lock()
+
+
+def get_static_prefix(tools_manager: ToolsManager, encoder: PromptEncoder) -> StaticPrefix:
+    """
+    Static system prompt for the given tools manager and encoder, rendered once per tool registry
+    version. The text is byte-identical across calls so the provider cache keeps hitting.
+    """
+    key = (type(tools_manager).__qualname__, tools_manager.registry.version, encoder.name)
+    prefix = _static_prefixes.get(key)
+    if prefix is None:
+        with _static_prefixes_lock:
+            prefix = _static_prefixes.get(key)
+            if prefix is None:
+                prefix = _render_static_prefix(tools_manager, encoder)
+                _static_prefixes[key] = prefix
+    return prefix
+
+
+def _render_static_prefix(tools_manager: ToolsManager, encoder: PromptEncoder) -> StaticPrefix:
+    encoded: EncodedPrompt = encoder.encode(
+        {
+            "intuitive_knowledge": get_intuitive_knowledge(),
+            "available_memory_types": [label.value for label in MemoryType],
+            "available_actions": {category: [action.model_dump() for action in actions] for category, actions in tools_manager.get_tools_schema().items()},
+            "output": {
+                "critical_format_rules": tools_manager.format_rules,
+                "format_name": tools_manager.format_name,
+                "output_format": tools_manager.output_format_instructions,
+                "output_examples": tools_manager.output_examples,
+            },
+        }
+    )
+    return StaticPrefix(text=encoded.text, version=hashlib.sha256(encoded.text.encode()).hexdigest()[:12], segments=encoded.segments)
+
+
+def assemble_prompt(tools_manager: ToolsManager, dynamic: Mapping[str, Any], encoder: PromptEncoder, budget: Optional[PromptBudget] = None) -> AssembledPrompt:
+    """Pair the cached static prefix with this epoch's dynamic context, trimmed to `budget` if given."""
+    prefix = get_static_prefix(tools_manager, encoder)
+    report = None
+    if budget is not None:
+        dynamic, report = budget.allocate(dynamic, encoder, static_segments=prefix.segments)
+    encoded = encoder.encode(dynamic)
+    return AssembledPrompt(prefix=prefix, dynamic_suffix=encoded.text, dynamic_segments=encoded.segments, budget_report=report)
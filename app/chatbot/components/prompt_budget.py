@@ -0,0 +1,192 @@
+"""
+Token budget enforcement for the per-epoch prompt sections.
+
+Quotas come from MemoryManagementConfig: each *_TOKENS budget is applied to PROMPT_CONTEXT_LENGTH as
+its share of CONTEXT_LENGTH. Sections in a pool are filled in order and trimmed to what is left of
+the pool's quota. Sections outside any pool (user query, time, heartbeats) are never trimmed and are
+covered by BUFFER_TOKENS. The static prefix is only reported, it has to stay byte-stable for the
+prompt cache.
+"""
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Mapping, Optional
+
+from loguru import logger
+
+from app.common.models import MemoryManagementConfig
+from app.common.tokens import token_estimator
+
+if TYPE_CHECKING:
+    from app.chatbot.components.prompt_encoders import PromptEncoder, SegmentStats
+
+# (value, max_tokens, encoder) -> value that encodes to at most max_tokens (best effort)
+Trimmer = Callable[[Any, int, "PromptEncoder"], Any]
+
+
+def _cost(value: Any, encoder: "PromptEncoder") -> int:
+    return token_estimator.count(encoder.encode_segment(value))
+
+
+def keep_newest(items: list[Any], max_tokens: int, encoder: "PromptEncoder") -> list[Any]:
+    """Drop the oldest items (front of the list) until the rest fits."""
+    kept, used = 0, 0
+    for item in reversed(items):
+        used += _cost(item, encoder) + 1
+        if used > max_tokens:
+            break
+        kept += 1
+    return items[len(items) - kept :]
+
+
+def keep_top_ranked(context: Any, max_tokens: int, encoder: "PromptEncoder") -> Any:
+    """Drop the lowest ranked search results (back of the list) until the rest fits."""
+    if not context:
+        return context
+    memory = context.get("memory", []) if isinstance(context, dict) else context
+    budget = max_tokens - (_cost({**context, "memory": []}, encoder) if isinstance(context, dict) else 0)
+
+    kept, used = [], 0
+    for entry in memory:
+        used += _cost(entry, encoder) + 1
+        if used > budget:
+            break
+        kept.append(entry)
+    return {**context, "memory": kept} if isinstance(context, dict) else kept
+
+
+def truncate_contents(entries: list[dict[str, Any]], max_tokens: int, encoder: "PromptEncoder") -> list[dict[str, Any]]:
+    """Share the budget between memory blocks, keeping the most recent end of oversized blocks."""
+    if not all(isinstance(entry, dict) and isinstance(entry.get("content"), str) for entry in entries):
+        return keep_newest(entries, max_tokens, encoder)
+    overhead = sum(_cost({**entry, "content": ""}, encoder) for entry in entries)
+    available = max_tokens - overhead
+    needed = {i: _cost(entry.get("content", ""), encoder) for i, entry in enumerate(entries)}
+
+    limits: dict[int, int] = {}
+    remaining = sorted(needed, key=lambda i: needed[i])  # smallest first, they hand unused share to bigger ones
+    while remaining:
+        share = max(available, 0) // len(remaining)
+        i = remaining.pop(0)
+        limits[i] = min(needed[i], share)
+        available -= limits[i]
+
+    trimmed = []
+    for i, entry in enumerate(entries):
+        if limits[i] < needed[i]:
+            chars = token_estimator.chars_for(limits[i])
+            entry = {**entry, "content": entry["content"][-chars:] if chars else ""}
+        trimmed.append(entry)
+    return trimmed
+
+
+@dataclass(frozen=True)
+class PooledSection:
+    name: str
+    trim: Trimmer
+    max_share: float = 1.0  # of the pool quota
+
+
+@dataclass(frozen=True)
+class BudgetPool:
+    name: str
+    quota: int
+    sections: tuple[PooledSection, ...]
+
+
+@dataclass(frozen=True)
+class SegmentUsage:
+    name: str
+    pool: Optional[str]
+    tokens_before: int
+    tokens: int
+    quota: Optional[int] = None
+
+    @property
+    def trimmed(self) -> bool:
+        return self.tokens < self.tokens_before
+
+
+@dataclass(frozen=True)
+class BudgetReport:
+    context_length: int
+    segments: tuple[SegmentUsage, ...]
+    pools: Mapping[str, tuple[int, int]]  # pool name -> (used tokens, quota)
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(segment.tokens for segment in self.segments)
+
+    def summary(self) -> str:
+        pools = ", ".join(f"{name}={used}/{quota}" for name, (used, quota) in self.pools.items())
+        trimmed = ", ".join(f"{s.name} {s.tokens_before}->{s.tokens}" for s in self.segments if s.trimmed) or "none"
+        return f"~{self.total_tokens}/{self.context_length} tokens, pools: {pools}, trimmed: {trimmed}"
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "context_length": self.context_length,
+            "total_tokens": self.total_tokens,
+            "pools": {name: {"used": used, "quota": quota} for name, (used, quota) in self.pools.items()},
+            "segments": [{"name": s.name, "pool": s.pool, "tokens_before": s.tokens_before, "tokens": s.tokens, "quota": s.quota, "trimmed": s.trimmed} for s in self.segments],
+        }
+
+
+class PromptBudget:
+    def __init__(self, pools: Iterable[BudgetPool], context_length: int, system_quota: int):
+        self.pools = tuple(pools)
+        self.context_length = context_length
+        self.system_quota = system_quota
+
+    @classmethod
+    def from_config(cls, context_length: int = MemoryManagementConfig.PROMPT_CONTEXT_LENGTH) -> "PromptBudget":
+        def share(tokens: int) -> int:
+            return context_length * tokens // MemoryManagementConfig.CONTEXT_LENGTH
+
+        return cls(
+            pools=[
+                BudgetPool("archival", share(MemoryManagementConfig.ARCHIVAL_MEMORY_TOKENS), (PooledSection("archival_memory", truncate_contents),)),
+                BudgetPool(
+                    "recall",
+                    share(MemoryManagementConfig.RECALL_MEMORY_TOKENS),
+                    (PooledSection("recalled_memory", keep_top_ranked, max_share=0.5), PooledSection("conversation_history", keep_newest)),
+                ),
+            ],
+            context_length=context_length,
+            system_quota=share(MemoryManagementConfig.BASE_PROMPT_TOKENS + MemoryManagementConfig.INTUITIVE_KNOWLEDGE_TOKENS),
+        )
+
+    def allocate(self, sections: Mapping[str, Any], encoder: "PromptEncoder", static_segments: Iterable["SegmentStats"] = ()) -> tuple[dict[str, Any], BudgetReport]:
+        """Trim the pooled sections to their quotas. Returns the trimmed sections and the usage report."""
+        allocated = dict(sections)
+        usage: dict[str, SegmentUsage] = {}
+        pools: dict[str, tuple[int, int]] = {}
+
+        static_tokens = 0
+        for segment in static_segments:
+            usage[segment.name] = SegmentUsage(name=segment.name, pool="system", tokens_before=segment.tokens, tokens=segment.tokens)
+            static_tokens += segment.tokens
+        pools["system"] = (static_tokens, self.system_quota)
+        if static_tokens > self.system_quota:
+            logger.warning(f"Static prompt uses ~{static_tokens} tokens, over its {self.system_quota} token budget")
+
+        for pool in self.pools:
+            remaining = pool.quota
+            for section in pool.sections:
+                if section.name not in allocated:
+                    continue
+                quota = min(remaining, int(pool.quota * section.max_share))
+                value = allocated[section.name]
+                tokens_before = tokens = _cost(value, encoder)
+                if tokens > quota:
+                    value = section.trim(value, quota, encoder)
+                    tokens = _cost(value, encoder)
+                    allocated[section.name] = value
+                usage[section.name] = SegmentUsage(name=section.name, pool=pool.name, tokens_before=tokens_before, tokens=tokens, quota=quota)
+                remaining = max(remaining - tokens, 0)
+            pools[pool.name] = (pool.quota - remaining, pool.quota)
+
+        for name, value in allocated.items():
+            if name not in usage:
+                tokens = _cost(value, encoder)
+                usage[name] = SegmentUsage(name=name, pool=None, tokens_before=tokens, tokens=tokens)
+
+        return allocated, BudgetReport(context_length=self.context_length, segments=tuple(usage.values()), pools=pools)
@@ -0,0 +1,118 @@
+"""
+Prompt encoders turn named prompt sections into the text sent to the LLM.
+
+- json: the original `json.dumps(indent=2, default=str)` layout. Conversation messages are embedded
+  as JSON strings (JSON-in-JSON), kept for comparison and as a fallback.
+- compact: one `## section` header per section, no indentation, structured values as minified JSON
+  and conversation messages as single `[Role - (timestamp)] message` lines.
+
+Every encoder reports the byte and estimated token size (see app.common.tokens) of each section it encodes.
+"""
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+import json
+from typing import Any, ClassVar, Mapping
+
+from pydantic import BaseModel
+
+from app.chatbot.chatbot_models import SingleMessage
+from app.common.tokens import token_estimator
+
+
+@dataclass(frozen=True)
+class SegmentStats:
+    name: str
+    bytes: int
+    tokens: int
+
+    @classmethod
+    def of(cls, name: str, text: str) -> "SegmentStats":
+        return cls(name=name, bytes=len(text.encode()), tokens=token_estimator.count(text))
+
+
+@dataclass(frozen=True)
+class EncodedPrompt:
+    text: str
+    segments: tuple[SegmentStats, ...]
+
+    @property
+    def bytes(self) -> int:
+        return len(self.text.encode())
+
+    @property
+    def tokens(self) -> int:
+        return token_estimator.count(self.text)
+
+
+class PromptEncoder(ABC):
+    name: ClassVar[str]
+
+    @abstractmethod
+    def encode_segment(self, value: Any) -> str:
+        """Encode the value of one prompt section."""
+        pass
+
+    @abstractmethod
+    def join(self, segments: Mapping[str, str]) -> str:
+        """Combine encoded sections into the final prompt text."""
+        pass
+
+    def encode(self, sections: Mapping[str, Any]) -> EncodedPrompt:
+        segments = {name: self.encode_segment(value) for name, value in sections.items()}
+        return EncodedPrompt(text=self.join(segments), segments=tuple(SegmentStats.of(name, text) for name, text in segments.items()))
+
+
+class JsonPromptEncoder(PromptEncoder):
+    name = "json"
+
+    def encode_segment(self, value: Any) -> str:
+        # SingleMessage.__str__ is its JSON dump, so messages stay double encoded as before
+        return json.dumps(value, indent=2, default=str)
+
+    def join(self, segments: Mapping[str, str]) -> str:
+        if not segments:
+            return "{}"
+        # Same output as json.dumps(sections, indent=2): nested lines are indented one more level
+        members = [f"  {json.dumps(name)}: " + text.replace("\n", "\n  ") for name, text in segments.items()]
+        return "{\n" + ",\n".join(members) + "\n}"
+
+
+class CompactPromptEncoder(PromptEncoder):
+    name = "compact"
+
+    def encode_segment(self, value: Any) -> str:
+        if isinstance(value, str):
+            return value
+        if isinstance(value, SingleMessage):
+            return value.get_formatted_prompt()
+        if isinstance(value, (list, tuple)) and value and all(isinstance(item, (str, SingleMessage)) for item in value):
+            return "\n".join(self.encode_segment(item) for item in value)
+        return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=_compact_default)
+
+    def join(self, segments: Mapping[str, str]) -> str:
+        return "\n\n".join(f"## {name}\n{text}" for name, text in segments.items())
+
+
+def _compact_default(value: Any) -> Any:
+    if isinstance(value, SingleMessage):
+        return value.get_formatted_prompt()
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+PROMPT_ENCODERS: dict[str, PromptEncoder] = {encoder.name: encoder for encoder in (JsonPromptEncoder(), CompactPromptEncoder())}
+
+
+def get_prompt_encoder(name: str) -> PromptEncoder:
+    try:
+        return PROMPT_ENCODERS[name.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown prompt encoding: {name}. Available: {list(PROMPT_ENCODERS)}") from None
@@ -4,49 +4,39 @@ import json
 import os
 import tempfile
 from typing import Optional
-import aiohttp
-from bs4 import BeautifulSoup
 from loguru import logger
 from pydantic import BaseModel, Field
-import wikipedia
 from contextlib import redirect_stdout
-from pdfminer.high_level import extract_text
+from app.common.lazy import lazy_import
 from app.common.utils import tool
 
 from app.chatbot.chatbot_models import ActionResult, AgentState, MemoryEntry, PaginatedResult, StreamChunk
 from app.common.models import StreamStep
 
+aiohttp = lazy_import("aiohttp")
+bs4 = lazy_import("bs4")
+wikipedia = lazy_import("wikipedia")
+pdfminer_high_level = lazy_import("pdfminer.high_level")
+
 _shared_ns: dict = {}
-_message_repository = None
-_memory_manager = None
-_embedder = None
 
 
 def get_memory_manager():
-    global _memory_manager
-    if _memory_manager is None:
-        from app.common.config import RepositoryFactory
+    from app.common.config import RepositoryFactory
 
-        _memory_manager = RepositoryFactory.get_memory_manager_repository()
-    return _memory_manager
+    return RepositoryFactory.get_memory_manager_repository()
 
 
 def get_embedder():
-    global _embedder
-    if _embedder is None:
-        from app.common.config import ChatbotFactory
+    from app.common.config import ChatbotFactory
 
-        _embedder = ChatbotFactory.get_embedding_model("titan")
-    return _embedder
+    return ChatbotFactory.get_embedding_model("titan")
 
 
 def get_message_repository():
-    global _message_repository
-    if _message_repository is None:
-        from app.common.config import RepositoryFactory
+    from app.common.config import RepositoryFactory
 
-        _message_repository = RepositoryFactory.get_message_repository()
-    return _message_repository
+    return RepositoryFactory.get_message_repository()
 
 
 class SendMessageParams(BaseModel):
@@ -160,7 +150,7 @@ async def download_webpage_by_url(state: AgentState, input: DownloadWebPageByUrl
                 await state.stream_queue.put(StreamChunk(content="Saved PDF to temp file, extracting text…", step=StreamStep.SYNTHESIS, step_title=StreamStep.SYNTHESIS.value))
 
                 # 3) Extract text with pdfminer
-                text = extract_text(pdf_path)
+                text = pdfminer_high_level.extract_text(pdf_path)
 
                 # 4) Write extracted text to a temp .txt file
                 txt_fd, txt_path = tempfile.mkstemp(suffix=".txt", prefix="page_", dir=None)
@@ -184,7 +174,7 @@ async def download_webpage_by_url(state: AgentState, input: DownloadWebPageByUrl
             else:
                 # HTML path (unchanged)
                 html = await resp.text()
-                soup = BeautifulSoup(html, "html.parser")
+                soup = bs4.BeautifulSoup(html, "html.parser")
                 text = soup.get_text(separator=" ", strip=True)
 
                 html_fd, html_path = tempfile.mkstemp(suffix=".html", prefix="page_", dir=None)
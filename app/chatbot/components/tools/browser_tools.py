@@ -1,7 +1,6 @@
 from pydantic import BaseModel
 from app.chatbot.chatbot_models import ActionResult, AgentState
-from playwright.async_api import async_playwright
-from bs4 import BeautifulSoup
+from app.common.lazy import lazy_import
 from app.common.utils import tool
 import re
 import os
@@ -9,6 +8,9 @@ import os
 WEBPAGE_DIR = "/tmp/innomightlabs/webpages"
 os.makedirs(WEBPAGE_DIR, exist_ok=True)
 
+playwright_async_api = lazy_import("playwright.async_api")
+bs4 = lazy_import("bs4")
+
 
 class BrowserParams(BaseModel):
     url: str
@@ -25,14 +27,14 @@ class BrowserParams(BaseModel):
     return_direct=True,
 )
 async def download_webpage(state: AgentState, input: BrowserParams) -> ActionResult:
-    async with async_playwright() as p:
+    async with playwright_async_api.async_playwright() as p:
         browser = await p.chromium.launch(headless=True)
         page = await browser.new_page()
         await page.goto(input.url)
         html = await page.content()
         await browser.close()
 
-        soup = BeautifulSoup(html, "html.parser")
+        soup = bs4.BeautifulSoup(html, "html.parser")
         html_body = soup.find("body")
         title = soup.find("title")
 
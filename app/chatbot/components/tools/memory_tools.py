@@ -4,37 +4,25 @@ from app.common.utils import tool, SimpleTool as BaseTool
 from app.chatbot.chatbot_models import ActionResult, AgentState
 from app.common.models import MemoryType
 
-# Initialize lazily to avoid circular imports
-_memory_manager_v2 = None
-_message_repository = None
-_embedder = None
+# Resolved through the dependency container on use (imported lazily to avoid circular imports)
 
 
 def get_memory_manager_v2():
-    global _memory_manager_v2
-    if _memory_manager_v2 is None:
-        from app.common.config import RepositoryFactory
+    from app.common.config import RepositoryFactory
 
-        _memory_manager_v2 = RepositoryFactory.get_memory_manager_v2_repository()
-    return _memory_manager_v2
+    return RepositoryFactory.get_memory_manager_v2_repository()
 
 
 def get_message_repository():
-    global _message_repository
-    if _message_repository is None:
-        from app.common.config import RepositoryFactory
+    from app.common.config import RepositoryFactory
 
-        _message_repository = RepositoryFactory.get_message_repository()
-    return _message_repository
+    return RepositoryFactory.get_message_repository()
 
 
 def get_embedder():
-    global _embedder
-    if _embedder is None:
-        from app.common.config import ChatbotFactory
+    from app.common.config import ChatbotFactory
 
-        _embedder = ChatbotFactory.get_embedding_model("titan")
-    return _embedder
+    return ChatbotFactory.get_embedding_model("titan")
 
 
 class BaseParamsModel(BaseModel):
@@ -55,8 +43,8 @@ class MemoryBlockUpsertParams(BaseParamsModel):
 async def memory_block_upsert(state: AgentState, input: MemoryBlockUpsertParams) -> ActionResult:
     memory_type = MemoryType(input.memory_type.lower())
     embedding = get_embedder().embed_single_text(input.content)
-    get_memory_manager_v2().upsert_memory_block(user_id=state.user.id, memory_type=memory_type, content=input.content, embedding=embedding)
-    state.memory_blocks = get_memory_manager_v2().get_all_memory_blocks(state.user.id)
+    await get_memory_manager_v2().upsert_memory_block(user_id=state.user.id, memory_type=memory_type, content=input.content, embedding=embedding)
+    state.memory_blocks = await get_memory_manager_v2().get_all_memory_blocks(state.user.id)
     return ActionResult(thought="Upserted memory block", action="memory_block_upsert", result=f"Memory block '{memory_type.value}' updated. Check your memory segment.")
 
 
@@ -75,11 +63,11 @@ class MemoryBlockReplaceParams(BaseParamsModel):
 async def memory_block_replace(state: AgentState, input: MemoryBlockReplaceParams) -> ActionResult:
     memory_type = MemoryType(input.memory_type.lower())
 
-    updated_entry = get_memory_manager_v2().replace_in_memory_block(user_id=state.user.id, memory_type=memory_type, old_text=input.old_text, new_text=input.new_text)
+    updated_entry = await get_memory_manager_v2().replace_in_memory_block(user_id=state.user.id, memory_type=memory_type, old_text=input.old_text, new_text=input.new_text)
 
     if not updated_entry:
         return ActionResult(thought="Memory block not found", action="memory_block_replace", result=f"No memory block found for type '{memory_type.value}'")
-    state.memory_blocks = get_memory_manager_v2().get_all_memory_blocks(state.user.id)
+    state.memory_blocks = await get_memory_manager_v2().get_all_memory_blocks(state.user.id)
 
     return ActionResult(
         thought="Replaced text in memory block", action="memory_block_replace", result=f"Replaced '{input.old_text}' with '{input.new_text}' in {memory_type.value} block"
@@ -98,7 +86,7 @@ class MemoryBlockReadParams(BaseParamsModel):
 )
 async def memory_block_read(state: AgentState, input: MemoryBlockReadParams) -> ActionResult:
     memory_type = MemoryType(input.memory_type.lower())
-    memory_entry = get_memory_manager_v2().read_memory_block(user_id=state.user.id, memory_type=memory_type)
+    memory_entry = await get_memory_manager_v2().read_memory_block(user_id=state.user.id, memory_type=memory_type)
     if not memory_entry:
         return ActionResult(thought="Memory block not found", action="memory_block_read", result=f"No memory block found for type '{memory_type.value}'")
     state.memory_blocks[memory_type.value] = memory_entry
@@ -120,10 +108,10 @@ class MemoryBlockAppendParams(BaseParamsModel):
 async def memory_block_append(state: AgentState, input: MemoryBlockAppendParams) -> ActionResult:
     memory_type = MemoryType(input.memory_type.lower())
 
-    memory_entry = get_memory_manager_v2().append_to_memory_block(user_id=state.user.id, memory_type=memory_type, text=input.text, separator=input.separator)
+    memory_entry = await get_memory_manager_v2().append_to_memory_block(user_id=state.user.id, memory_type=memory_type, text=input.text, separator=input.separator)
 
     # Update state memory blocks
-    state.memory_blocks = get_memory_manager_v2().get_all_memory_blocks(state.user.id)
+    state.memory_blocks = await get_memory_manager_v2().get_all_memory_blocks(state.user.id)
     return ActionResult(
         thought="Appended to memory block", action="memory_block_append", result=f"Appended text to {memory_type.value} block. New size: {len(memory_entry.content)} chars"
     )
@@ -142,13 +130,13 @@ class MemoryBlockDeleteParams(BaseParamsModel):
 async def memory_block_delete(state: AgentState, input: MemoryBlockDeleteParams) -> ActionResult:
     memory_type = MemoryType(input.memory_type.lower())
 
-    deleted = get_memory_manager_v2().delete_memory_block(user_id=state.user.id, memory_type=memory_type)
+    deleted = await get_memory_manager_v2().delete_memory_block(user_id=state.user.id, memory_type=memory_type)
 
     if not deleted:
         return ActionResult(thought="Memory block not found", action="memory_block_delete", result=f"No memory block found for type '{memory_type.value}' to delete")
 
     # Update state memory blocks
-    state.memory_blocks = get_memory_manager_v2().get_all_memory_blocks(state.user.id)
+    state.memory_blocks = await get_memory_manager_v2().get_all_memory_blocks(state.user.id)
     return ActionResult(thought="Deleted memory block", action="memory_block_delete", result=f"Deleted memory block for type '{memory_type.value}'")
 
 
@@ -159,7 +147,7 @@ async def memory_block_delete(state: AgentState, input: MemoryBlockDeleteParams)
     return_direct=True,
 )
 async def memory_blocks_list_all(state: AgentState, input: BaseParamsModel) -> ActionResult:
-    all_blocks = get_memory_manager_v2().get_all_memory_blocks(state.user.id)
+    all_blocks = await get_memory_manager_v2().get_all_memory_blocks(state.user.id)
 
     # Update state memory blocks
     state.memory_blocks = all_blocks
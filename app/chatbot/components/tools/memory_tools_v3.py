@@ -4,27 +4,19 @@ from app.common.utils import tool, SimpleTool as BaseTool
 from app.chatbot.chatbot_models import ActionResult, AgentState, MemoryEntry
 from app.common.models import MemoryType
 
-# Initialize lazily to avoid circular imports
-_memory_manager_v3 = None
-_embedder = None
+# Resolved through the dependency container on use (imported lazily to avoid circular imports)
 
 
 def get_memory_manager_v3():
-    global _memory_manager_v3
-    if _memory_manager_v3 is None:
-        from app.common.config import RepositoryFactory
+    from app.common.config import RepositoryFactory
 
-        _memory_manager_v3 = RepositoryFactory.get_memory_manager_v3_repository()
-    return _memory_manager_v3
+    return RepositoryFactory.get_memory_manager_v3_repository()
 
 
 def get_embedder():
-    global _embedder
-    if _embedder is None:
-        from app.common.config import ChatbotFactory
+    from app.common.config import ChatbotFactory
 
-        _embedder = ChatbotFactory.get_embedding_model("titan")
-    return _embedder
+    return ChatbotFactory.get_embedding_model("titan")
 
 
 class MemoryAppendParams(BaseModel):
@@ -44,7 +36,7 @@ async def memory_append(state: AgentState, input: MemoryAppendParams) -> ActionR
 
     memory_entry = MemoryEntry(user_id=state.user.id, memory_type=memory_type, content=input.content, embedding=embedding, metadata={})
 
-    result = get_memory_manager_v3().append(memory_entry)
+    result = await get_memory_manager_v3().append(memory_entry)
 
     return ActionResult(
         thought="Appended to memory block",
@@ -70,7 +62,7 @@ async def memory_replace(state: AgentState, input: MemoryReplaceParams) -> Actio
     memory_type = MemoryType(input.memory_type.lower())
 
     try:
-        result = get_memory_manager_v3().replace(user_id=state.user.id, memory_type=memory_type, page=input.page, old_txt=input.old_text, new_txt=input.new_text)
+        result = await get_memory_manager_v3().replace(user_id=state.user.id, memory_type=memory_type, page=input.page, old_txt=input.old_text, new_txt=input.new_text)
 
         return ActionResult(
             thought="Replaced text in memory page",
@@ -103,7 +95,7 @@ async def memory_evict(state: AgentState, input: MemoryEvictParams) -> ActionRes
     memory_type = MemoryType(input.memory_type.lower())
 
     try:
-        result = get_memory_manager_v3().evict(user_id=state.user.id, memory_type=memory_type, page=input.page, text=input.text)
+        result = await get_memory_manager_v3().evict(user_id=state.user.id, memory_type=memory_type, page=input.page, text=input.text)
 
         return ActionResult(
             thought="Evicted text from memory page",
@@ -126,7 +118,7 @@ async def memory_read(state: AgentState, input: MemoryReadParams) -> ActionResul
     memory_type = MemoryType(input.memory_type.lower())
 
     try:
-        result = get_memory_manager_v3().read(user_id=state.user.id, memory_type=memory_type, query=input.query, page=input.page)
+        result = await get_memory_manager_v3().read(user_id=state.user.id, memory_type=memory_type, query=input.query, page=input.page)
 
         if not result.results:
             return ActionResult(thought="No memory found", action="memory_read", result=f"No memory blocks found for type '{memory_type.value}'")
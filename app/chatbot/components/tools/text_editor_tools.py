@@ -2,17 +2,18 @@ from enum import Enum
 import json
 from typing import Optional, Union
 from pydantic import BaseModel
-from strands_tools import editor as strands_text_editor
 from io import StringIO
 import sys
 
 from app.chatbot.chatbot_models import ActionResult, AgentState
+from app.common.lazy import lazy_import
 from app.common.utils import tool
 
 import os
 
 
 os.environ["BYPASS_TOOL_CONSENT"] = "true"
+strands_text_editor = lazy_import("strands_tools.editor")
 DIR_PREFIX = "/tmp/innomightlabs"
 if not os.path.exists(DIR_PREFIX):
     os.makedirs(DIR_PREFIX, exist_ok=True)
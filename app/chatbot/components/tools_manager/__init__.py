@@ -8,7 +8,11 @@ parsing LLM responses to extract tool calls, and executing those tools.
 from abc import ABC, abstractmethod
 from collections import defaultdict
 from enum import Enum
-from typing import Dict, List, Optional, Any
+from functools import cached_property
+import hashlib
+import json
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional, Any
 
 
 from app.common.utils import SimpleTool as BaseTool
@@ -23,6 +27,83 @@ class ToolCategory(Enum):
     MISC = "misc"
 
 
+class ToolRegistry:
+    """
+    Immutable set of tools grouped by category.
+
+    A registry is built once per process and shared by every workflow. The tool schema and its
+    JSON/YAML renderings are computed on first use and cached, and `version` is a content hash of
+    the schema so callers can tell when the rendered prompt section changes.
+    """
+
+    def __init__(self, tools: Iterable[tuple[ToolCategory, BaseTool]] = ()):
+        by_category: dict[str, list[BaseTool]] = defaultdict(list)
+        by_name: dict[str, BaseTool] = {}
+        category_by_name: dict[str, str] = {}
+        for category, tool in tools:
+            if tool.name in by_name:
+                raise ValueError(f"Tool '{tool.name}' is registered more than once")
+            by_category[category.name].append(tool)
+            by_name[tool.name] = tool
+            category_by_name[tool.name] = category.name
+
+        self._tools = tuple((ToolCategory[category_by_name[name]], tool) for name, tool in by_name.items())
+        self.tools_by_name: Mapping[str, BaseTool] = MappingProxyType(by_name)
+        self.tools_by_category: Mapping[str, tuple[BaseTool, ...]] = MappingProxyType({k: tuple(v) for k, v in by_category.items()})
+
+    def __len__(self) -> int:
+        return len(self.tools_by_name)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.tools_by_name
+
+    @cached_property
+    def schema(self) -> Mapping[str, tuple[Action, ...]]:
+        """Tool schema grouped by category, as included in the LLM prompt."""
+        return MappingProxyType(
+            {
+                category: tuple(Action(name=tool.name, description=tool.description, params=tool.args_schema.model_json_schema()) for tool in tools)
+                for category, tools in self.tools_by_category.items()
+            }
+        )
+
+    @cached_property
+    def rendered_json(self) -> str:
+        return json.dumps({category: [action.model_dump() for action in actions] for category, actions in self.schema.items()}, sort_keys=True)
+
+    @cached_property
+    def rendered_yaml(self) -> str:
+        import yaml
+
+        return yaml.safe_dump({category: [action.model_dump() for action in actions] for category, actions in self.schema.items()}, sort_keys=True)
+
+    @cached_property
+    def version(self) -> str:
+        return hashlib.sha256(self.rendered_json.encode()).hexdigest()[:12]
+
+    def render(self, format_name: str) -> str:
+        return self.rendered_yaml if format_name == "yaml" else self.rendered_json
+
+    def subset(self, names: Optional[Iterable[str]] = None, categories: Optional[Iterable[ToolCategory]] = None) -> "ToolRegistry":
+        """Read-only registry restricted to the given tool names and/or categories."""
+        wanted_names = set(names) if names is not None else None
+        wanted_categories = {c.name for c in categories} if categories is not None else None
+        return ToolRegistry(
+            (category, tool)
+            for category, tool in self._tools
+            if (wanted_names is None or tool.name in wanted_names) and (wanted_categories is None or category.name in wanted_categories)
+        )
+
+    def with_tool(self, tool_category: ToolCategory, tool: BaseTool) -> "ToolRegistry":
+        return ToolRegistry((*[(c, t) for c, t in self._tools if t.name != tool.name], (tool_category, tool)))
+
+    def without_tool(self, tool: BaseTool) -> "ToolRegistry":
+        return ToolRegistry((c, t) for c, t in self._tools if t.name != tool.name)
+
+
+EMPTY_TOOL_REGISTRY = ToolRegistry()
+
+
 class ToolsManager(ABC):
     """
     Abstract base class for managing tool interactions between LLM and system.
@@ -30,47 +111,44 @@ class ToolsManager(ABC):
     parsing LLM responses to extract tool calls, and executing those tools.
     """
 
-    tools_by_name = {}
-    tools_by_category = defaultdict(list[BaseTool])
+    def __init__(self, registry: ToolRegistry = EMPTY_TOOL_REGISTRY):
+        self.registry = registry
+
+    @property
+    def tools_by_name(self) -> Mapping[str, BaseTool]:
+        return self.registry.tools_by_name
+
+    @property
+    def tools_by_category(self) -> Mapping[str, tuple[BaseTool, ...]]:
+        return self.registry.tools_by_category
+
+    def use_registry(self, registry: ToolRegistry) -> None:
+        """Point this manager at a shared, prebuilt registry."""
+        self.registry = registry
 
     def register_tool(self, tool_category: ToolCategory, tool: BaseTool):
         """
         Register a tool with the manager.
+        Only this manager sees the tool; shared registries are never mutated.
         """
-        self.tools_by_category[tool_category.name].append(tool)
-        self.tools_by_name[tool.name] = tool
+        self.registry = self.registry.with_tool(tool_category, tool)
 
     def remove_tool(self, tool_category: ToolCategory, tool: BaseTool):
         """
         Remove a tool from the manager.
         """
-        given_category = self.tools_by_category[tool_category.name]
-
-        for idx, t in enumerate(given_category):
-            if t.name == tool.name:
-                del given_category[idx]
-                del self.tools_by_name[tool.name]
-                break
+        self.registry = self.registry.without_tool(tool)
 
-    def get_tools_schema(self) -> dict[str, list[Action]]:
+    def get_tools_schema(self) -> Mapping[str, tuple[Action, ...]]:
         """
-        Convert tools to the appropriate schema format (YAML or JSON)
-        for inclusion in the LLM prompt.
+        Tool schema grouped by category for inclusion in the LLM prompt.
+        Precomputed once per registry.
         """
-        action_by_category = defaultdict(list[Action])
-        for _, tool in self.tools_by_name.items():
-            # Get category from tool or use 'misc' as default
-            category = getattr(tool, "category", ToolCategory.MISC.name)
-
-            action_by_category[category].append(
-                Action(
-                    name=tool.name,
-                    description=tool.description,
-                    params=tool.args_schema.model_json_schema(),
-                )
-            )
-
-        return action_by_category
+        return self.registry.schema
+
+    def render_tools_schema(self) -> str:
+        """Tool schema rendered in this manager's format, cached per registry."""
+        return self.registry.render(self.format_name)
 
     @abstractmethod
     async def parse_tool_calls(self, response_text: str) -> List[Optional[Action]]:
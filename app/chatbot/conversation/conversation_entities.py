@@ -1,11 +1,12 @@
 from datetime import datetime, timezone
 import uuid
-from sqlalchemy import DateTime
+from sqlalchemy import ColumnElement, DateTime
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
-from pgvector.sqlalchemy import Vector
 
 from app.common.entities import BaseEntity
+from app.common.vector_index import vector_distance
+from app.common.vector_types import Embedding, EmbeddingVector
 
 
 class ConversationEntity(BaseEntity):
@@ -19,18 +20,25 @@ class ConversationEntity(BaseEntity):
     user_id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), nullable=False, doc="ID of the User who owns the Conversation")
     title: Mapped[str] = mapped_column(nullable=True, doc="Title of the Conversation")
     summary: Mapped[str] = mapped_column(nullable=True, doc="Summary of the Conversation")
-    summary_embedding: Mapped[list[float]] = mapped_column(Vector(1536), nullable=True, doc="Embeddings of the Conversation summary for search and retrieval")
-    status: Mapped[str] = mapped_column(nullable=False, default="active", doc="Status of the Conversation (e.g., active, archived)")
+    summary_embedding: Mapped[Embedding] = mapped_column(
+        EmbeddingVector(1536), nullable=True, deferred=True, deferred_raiseload=True, doc="Embeddings of the Conversation summary for search and retrieval"
+    )
+    status: Mapped[str] = mapped_column(nullable=False, default="active", doc="Status of the Conversation: active, or archived when its messages are in the conversation archive")
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         nullable=False,
-        default=datetime.now(timezone.utc),
+        default=lambda: datetime.now(timezone.utc),
         doc="Timestamp when the Conversation was created",
     )
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         nullable=False,
-        default=datetime.now(timezone.utc),
-        onupdate=datetime.now(timezone.utc),
-        doc="Timestamp when the Conversation was last updated",
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+        doc="Timestamp when the Conversation was last updated, archived after CONVERSATION_ARCHIVE_AFTER_DAYS days without an update",
     )
+
+    @classmethod
+    def embedding_distance(cls, embedding: Embedding, storage: str = "vector") -> ColumnElement[float]:
+        """Cosine, the canonical distance for conversation summaries (HNSW index with vector_cosine_ops)"""
+        return vector_distance(cls.summary_embedding, embedding, "cosine", storage)
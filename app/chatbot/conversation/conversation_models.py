@@ -1,9 +1,13 @@
+import gzip
 from datetime import datetime, timezone
-from typing import Self
-from uuid import UUID
-from pydantic import BaseModel
+from typing import Optional, Self
+from uuid import UUID, uuid4
+from pydantic import BaseModel, Field
 
 from app.chatbot.conversation import Conversation
+from app.chatbot.messages import Message
+from app.common.models import Role
+from app.common.vector_types import Embedding
 
 
 class ConversationRequest(BaseModel):
@@ -45,7 +49,103 @@ class ConversationRepositoryDTO(BaseModel):
     id: UUID
     title: str
     summary: str
-    summary_embedding: list[float]
+    summary_embedding: Embedding
     status: str
     created_at: datetime = datetime.now(timezone.utc)
     updated_at: datetime = datetime.now(timezone.utc)
+
+
+class ImportedMessage(BaseModel):
+    """A message of an imported conversation. The embedding is computed on import when missing."""
+
+    id: UUID = Field(default_factory=uuid4)
+    role: Role
+    content: str
+    model_id: str = "imported"
+    parent_message_id: Optional[UUID] = None
+    embedding: Optional[Embedding] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: Optional[datetime] = None
+
+    def to_message(self, conversation_id: UUID) -> Message:
+        return Message(
+            id=self.id,
+            content=self.content,
+            embedding=self.embedding,
+            conversation_id=conversation_id,
+            role=self.role,
+            parent_message_id=self.parent_message_id,
+            model_id=self.model_id,
+            created_at=self.created_at,
+            updated_at=self.updated_at or self.created_at,
+        )
+
+
+class ImportedConversation(BaseModel):
+    """One line of an NDJSON conversation import: a conversation with its messages, oldest first."""
+
+    id: UUID = Field(default_factory=uuid4)
+    title: str = "Imported Conversation"
+    summary: str = ""
+    status: str = "active"
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    messages: list[ImportedMessage] = Field(default_factory=list)
+
+    def to_conversation(self) -> Conversation:
+        created_at = self.created_at or (self.messages[0].created_at if self.messages else datetime.now(timezone.utc))
+        updated_at = self.updated_at or (self.messages[-1].created_at if self.messages else created_at)
+        return Conversation(id=self.id, title=self.title, summary=self.summary, status=self.status, created_at=created_at, updated_at=updated_at)
+
+
+class ConversationImportResponse(BaseModel):
+    conversations: int = 0
+    messages: int = 0
+    embedded_messages: int = Field(default=0, description="Messages whose embedding was computed on import")
+
+
+class ArchivedConversation(ImportedConversation):
+    """
+    The archive of a conversation moved to cold storage, one line of gzipped NDJSON: an imported
+    conversation with the owner of its messages, so archives can also be fed to the import.
+    """
+
+    user_id: UUID
+
+    @classmethod
+    def from_conversation(cls, user_id: UUID, conversation: Conversation, messages: list[Message]) -> Self:
+        return cls(
+            id=conversation.id,
+            user_id=user_id,
+            title=conversation.title,
+            summary=conversation.summary,
+            status=conversation.status,
+            created_at=conversation.created_at,
+            updated_at=conversation.updated_at,
+            messages=[
+                ImportedMessage(
+                    id=m.id,
+                    role=m.role,
+                    content=m.content,
+                    model_id=m.model_id,
+                    parent_message_id=m.parent_message_id,
+                    embedding=m.embedding,
+                    created_at=m.created_at,
+                    updated_at=m.updated_at,
+                )
+                for m in messages
+            ],
+        )
+
+    def to_bytes(self) -> bytes:
+        return gzip.compress(self.model_dump_json().encode() + b"\n")
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Self:
+        return cls.model_validate_json(gzip.decompress(data))
+
+
+class ConversationArchiveResponse(BaseModel):
+    conversations: int = 0
+    messages: int = 0
+    failed: int = Field(default=0, description="Conversations left in the hot tables after an error, retried on the next run")
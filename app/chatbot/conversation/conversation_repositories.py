@@ -1,6 +1,12 @@
+from datetime import datetime, timezone
+from typing import Optional
 from uuid import UUID
+
+from sqlalchemy import Update, delete, insert, select, update
+
 from app.common.exceptions import NotFoundException
-from app.common.repositories import BaseRepository
+from app.common.read_replica import read_only
+from app.common.repositories import AsyncBaseRepository, BaseRepository
 
 from app.chatbot.conversation import Conversation
 from app.chatbot.conversation.conversation_entities import ConversationEntity
@@ -26,10 +32,11 @@ class ConversationRepository(BaseRepository):
         entity = ConversationEntity(user_id=user.id, status="active", title="New Conversation")
 
         self.session.add(entity)
-        self.session.commit()
+        self.commit()
         self.session.refresh(entity)
         return Conversation(id=entity.id, title=entity.title, status=entity.status, created_at=entity.created_at, updated_at=entity.updated_at)
 
+    @read_only
     def fetch_all_conversations_by_user(self, user: User) -> list[Conversation]:
         """Retreives all conversations from the database by user id"""
         conversations = self.session.query(ConversationEntity).filter_by(user_id=user.id).order_by(ConversationEntity.updated_at.asc()).all()
@@ -44,15 +51,122 @@ class ConversationRepository(BaseRepository):
     def update_conversation(self, domain: Conversation) -> Conversation:
         entity = self.session.query(ConversationEntity).filter_by(id=domain.id).first()
         assert entity
-        assert domain.summary_embeddings
+        assert domain.summary_embeddings is not None
         entity.id = domain.id
         entity.title = domain.title
         entity.summary = domain.summary
         entity.status = domain.status
         entity.summary_embedding = domain.summary_embeddings
 
-        self.session.commit()
+        self.commit()
         return Conversation(**domain.model_dump())
 
+    def add_conversations(self, user_id: UUID, conversations: list[Conversation]) -> None:
+        """Insert imported conversations of the user in one multi-row INSERT, their messages are copied separately."""
+        if conversations:
+            self.session.execute(insert(ConversationEntity), [_conversation_row(user_id, c) for c in conversations])
+            self.commit()
+
+    @read_only
+    def find_inactive_conversations(self, updated_before: datetime, limit: int) -> list[Conversation]:
+        """Active conversations not updated since `updated_before`, the least recently updated first."""
+        return [_to_conversation(e) for e in self.session.scalars(_inactive_conversations(updated_before, limit))]
+
+    def change_status(self, conversation_id: UUID, from_status: str, to_status: str, updated_before: Optional[datetime] = None, touch: bool = False) -> Optional[UUID]:
+        """
+        Move the conversation from `from_status` to `to_status`, unless it is in another status or was
+        updated since `updated_before`. The conversation stays locked until the transaction ends: a
+        concurrent change waits for it, then finds the conversation moved.
+
+        :param touch: Set updated_at to now, otherwise it is kept.
+        :return: The ID of the user owning the conversation, None if it was not moved.
+        """
+        return self.session.scalar(_change_status(conversation_id, from_status, to_status, updated_before, touch))
+
     async def delete_conversation(self, conversation_id: UUID) -> None:
         self.session.query(ConversationEntity).filter_by(id=conversation_id).delete()
+
+
+def _conversation_row(user_id: UUID, c: Conversation) -> dict:
+    return {
+        "id": c.id,
+        "user_id": user_id,
+        "title": c.title,
+        "summary": c.summary,
+        "summary_embedding": c.summary_embeddings,
+        "status": c.status,
+        "created_at": c.created_at,
+        "updated_at": c.updated_at,
+    }
+
+
+def _inactive_conversations(updated_before: datetime, limit: int):
+    return (
+        select(ConversationEntity)
+        .where(ConversationEntity.status == "active", ConversationEntity.updated_at < updated_before)
+        .order_by(ConversationEntity.updated_at.asc())
+        .limit(limit)
+    )
+
+
+def _change_status(conversation_id: UUID, from_status: str, to_status: str, updated_before: Optional[datetime], touch: bool) -> Update:
+    stmt = update(ConversationEntity).where(ConversationEntity.id == conversation_id, ConversationEntity.status == from_status)
+    if updated_before is not None:
+        stmt = stmt.where(ConversationEntity.updated_at < updated_before)
+    # an explicit value, or the onupdate of updated_at would apply
+    updated_at = datetime.now(timezone.utc) if touch else ConversationEntity.updated_at
+    return stmt.values(status=to_status, updated_at=updated_at).returning(ConversationEntity.user_id)
+
+
+def _to_conversation(e: ConversationEntity) -> Conversation:
+    return Conversation(id=e.id, title=e.title, status=e.status, summary=e.summary or "", created_at=e.created_at, updated_at=e.updated_at)
+
+
+class AsyncConversationRepository(AsyncBaseRepository):
+    """`ConversationRepository` on the async backend, same domain API with every method awaitable."""
+
+    async def create_conversation(self, user: User) -> Conversation:
+        entity = ConversationEntity(user_id=user.id, status="active", title="New Conversation")
+
+        self.session.add(entity)
+        await self.commit()
+        await self.session.refresh(entity)
+        return Conversation(id=entity.id, title=entity.title, status=entity.status, created_at=entity.created_at, updated_at=entity.updated_at)
+
+    @read_only
+    async def fetch_all_conversations_by_user(self, user: User) -> list[Conversation]:
+        stmt = select(ConversationEntity).where(ConversationEntity.user_id == user.id).order_by(ConversationEntity.updated_at.asc())
+        return [_to_conversation(e) for e in await self.session.scalars(stmt)]
+
+    async def find_conversation_by_id(self, conversation_id: UUID) -> Conversation:
+        entity = await self.session.get(ConversationEntity, conversation_id)
+        if not entity:
+            raise NotFoundException(f"Conversation with ID: {conversation_id} was not found!")
+        return _to_conversation(entity)
+
+    async def update_conversation(self, domain: Conversation) -> Conversation:
+        entity = await self.session.get(ConversationEntity, domain.id)
+        assert entity
+        assert domain.summary_embeddings is not None
+        entity.title = domain.title
+        entity.summary = domain.summary
+        entity.status = domain.status
+        entity.summary_embedding = domain.summary_embeddings
+
+        await self.commit()
+        return Conversation(**domain.model_dump())
+
+    async def add_conversations(self, user_id: UUID, conversations: list[Conversation]) -> None:
+        if conversations:
+            await self.session.execute(insert(ConversationEntity), [_conversation_row(user_id, c) for c in conversations])
+            await self.commit()
+
+    async def delete_conversation(self, conversation_id: UUID) -> None:
+        await self.session.execute(delete(ConversationEntity).where(ConversationEntity.id == conversation_id))
+
+    @read_only
+    async def find_inactive_conversations(self, updated_before: datetime, limit: int) -> list[Conversation]:
+        return [_to_conversation(e) for e in await self.session.scalars(_inactive_conversations(updated_before, limit))]
+
+    async def change_status(self, conversation_id: UUID, from_status: str, to_status: str, updated_before: Optional[datetime] = None, touch: bool = False) -> Optional[UUID]:
+        return await self.session.scalar(_change_status(conversation_id, from_status, to_status, updated_before, touch))
@@ -1,9 +1,29 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+import os
+from typing import AsyncIterable, AsyncIterator, Optional
 from uuid import UUID
+
+from loguru import logger
+
 from app.chatbot.conversation import Conversation
+from app.chatbot.conversation.conversation_models import ArchivedConversation, ConversationArchiveResponse, ConversationImportResponse, ImportedConversation
 from app.chatbot.conversation.conversation_repositories import ConversationRepository
+from app.chatbot.messages import Message
+from app.chatbot.messages.message_repositories import MessageRepository
+from app.common.object_store import ObjectStore
 from app.common.vector_embedders import BaseVectorEmbedder
 from app.user import User
 
+# Messages copied per batch of an import, the conversations of a line are never split
+IMPORT_BATCH_MESSAGES = int(os.getenv("IMPORT_BATCH_MESSAGES", "5000"))
+# Texts per embedder call for the messages imported without an embedding
+IMPORT_EMBEDDING_BATCH_SIZE = int(os.getenv("IMPORT_EMBEDDING_BATCH_SIZE", "64"))
+# Conversations without an update for this many days are archived by the archival job
+CONVERSATION_ARCHIVE_AFTER_DAYS = int(os.getenv("CONVERSATION_ARCHIVE_AFTER_DAYS", "90"))
+# Conversations archived per run of the archival job, the least recently updated first
+CONVERSATION_ARCHIVE_BATCH_SIZE = int(os.getenv("CONVERSATION_ARCHIVE_BATCH_SIZE", "500"))
+
 
 class ConversationService:
     """
@@ -19,19 +39,197 @@ class ConversationService:
         """
         Finds a conversation by its ID.
         """
-        conversation = self.repository.find_conversation_by_id(id)
+        conversation = await self.repository.find_conversation_by_id(id)
         return conversation
 
     async def start_new_conversation(self, user: User) -> Conversation:
         """
         Starts a new conversation for the given user.
         """
-        conversation = self.repository.create_conversation(user)
+        conversation = await self.repository.create_conversation(user)
         return conversation
 
     async def get_all_conversations(self, user: User) -> list[Conversation]:
-        conversations = self.repository.fetch_all_conversations_by_user(user=user)
+        conversations = await self.repository.fetch_all_conversations_by_user(user=user)
         return conversations
 
     async def delete_conversation(self, conversation_id: UUID) -> None:
         await self.repository.delete_conversation(conversation_id)
+
+
+class ConversationImportService:
+    """
+    Imports chat histories from other systems as NDJSON, one `ImportedConversation` per line.
+
+    Lines are parsed as they arrive and written in batches of about IMPORT_BATCH_MESSAGES messages:
+    the conversations in one multi-row INSERT, the messages through a binary COPY
+    (`MessageRepository.copy_messages`). Embeddings missing from the input are computed
+    IMPORT_EMBEDDING_BATCH_SIZE texts per embedder call.
+    """
+
+    def __init__(
+        self,
+        conversation_repository: ConversationRepository,
+        message_repository: MessageRepository,
+        embedding_model: BaseVectorEmbedder,
+        batch_messages: int = IMPORT_BATCH_MESSAGES,
+        embedding_batch_size: int = IMPORT_EMBEDDING_BATCH_SIZE,
+    ):
+        self.conversation_repository = conversation_repository
+        self.message_repository = message_repository
+        self.embedder = embedding_model
+        self.batch_messages = batch_messages
+        self.embedding_batch_size = embedding_batch_size
+
+    async def import_ndjson(self, user: User, lines: AsyncIterable[bytes | str]) -> ConversationImportResponse:
+        """
+        Import the conversations of `lines` for `user`. Blank lines are skipped, an invalid one raises
+        ValueError with its line number; the batches before it are already written.
+        """
+        if user.id is None:
+            raise ValueError("User ID cannot be None when importing conversations.")
+
+        result = ConversationImportResponse()
+        batch: list[ImportedConversation] = []
+        batch_messages = 0
+        line_number = 0
+        async for line in lines:
+            line_number += 1
+            if not line.strip():
+                continue
+            try:
+                conversation = ImportedConversation.model_validate_json(line)
+            except ValueError as e:
+                raise ValueError(f"Invalid conversation on line {line_number}: {e}") from e
+            batch.append(conversation)
+            batch_messages += len(conversation.messages)
+            if batch_messages >= self.batch_messages:
+                await self._write_batch(user.id, batch, result)
+                batch, batch_messages = [], 0
+        if batch:
+            await self._write_batch(user.id, batch, result)
+        return result
+
+    async def _write_batch(self, user_id: UUID, batch: list[ImportedConversation], result: ConversationImportResponse) -> None:
+        messages = [m.to_message(c.id) for c in batch for m in c.messages]
+        result.embedded_messages += await self._embed_missing(messages)
+        await self.conversation_repository.add_conversations(user_id, [c.to_conversation() for c in batch])
+        result.messages += await self.message_repository.copy_messages(user_id, messages)
+        result.conversations += len(batch)
+
+    async def _embed_missing(self, messages: list[Message]) -> int:
+        missing = [m for m in messages if m.embedding is None or m.embedding.size == 0]
+        for start in range(0, len(missing), self.embedding_batch_size):
+            chunk = missing[start : start + self.embedding_batch_size]
+            embeddings = await asyncio.to_thread(self.embedder.embed, [m.content for m in chunk])
+            for message, embedding in zip(chunk, embeddings, strict=True):
+                message.embedding = embedding
+        return len(missing)
+
+
+class ConversationArchiveService:
+    """
+    Moves the messages of inactive conversations out of the hot tables into an object store, and back
+    when the conversation is opened again.
+
+    `archive_inactive` (a scheduled job, docs/scripts/archive_conversations.py) archives the active
+    conversations without an update for CONVERSATION_ARCHIVE_AFTER_DAYS days: their messages, with
+    their embeddings, are written as a gzipped `ArchivedConversation` (see `archive_key`), deleted from
+    messages, and the conversation is marked archived. The conversation itself stays and is still
+    listed. `open` copies the messages of an archived conversation back and makes it active again; the
+    archive is kept, and replaced when the conversation is archived again.
+
+    A conversation moves in one transaction that locks it (`ConversationRepository.change_status`) and
+    the archive is written before the messages are deleted: a failure leaves them in the hot tables.
+    """
+
+    def __init__(
+        self,
+        conversation_repository: ConversationRepository,
+        message_repository: MessageRepository,
+        object_store: ObjectStore,
+        archive_after_days: int = CONVERSATION_ARCHIVE_AFTER_DAYS,
+        batch_size: int = CONVERSATION_ARCHIVE_BATCH_SIZE,
+    ):
+        self.conversation_repository = conversation_repository
+        self.message_repository = message_repository
+        self.object_store = object_store
+        self.archive_after_days = archive_after_days
+        self.batch_size = batch_size
+
+    async def archive_inactive(self, now: Optional[datetime] = None) -> ConversationArchiveResponse:
+        """Archive up to `batch_size` inactive conversations, each in its own transaction."""
+        updated_before = (now or datetime.now(timezone.utc)) - timedelta(days=self.archive_after_days)
+        result = ConversationArchiveResponse()
+        for conversation in await self.conversation_repository.find_inactive_conversations(updated_before, self.batch_size):
+            try:
+                archived = await self.archive(conversation, updated_before)
+            except Exception as e:
+                await self.conversation_repository.rollback()
+                logger.warning(f"Failed to archive conversation {conversation.id}, retried on the next run: {e}")
+                result.failed += 1
+                continue
+            if archived is not None:
+                result.conversations += 1
+                result.messages += archived
+        return result
+
+    async def archive(self, conversation: Conversation, updated_before: datetime) -> Optional[int]:
+        """
+        Archive `conversation` unless it was updated since `updated_before`.
+
+        :return: The number of messages archived, None if the conversation was not archived.
+        """
+        user_id = await self.conversation_repository.change_status(conversation.id, "active", "archived", updated_before=updated_before)
+        if user_id is None:
+            return None
+        messages = await self.message_repository.fetch_all_messages(conversation_id=conversation.id, with_embeddings=True)
+        archive = ArchivedConversation.from_conversation(user_id, conversation, messages)
+        await asyncio.to_thread(self.object_store.put, archive_key(user_id, conversation.id), archive.to_bytes())
+        return await self.message_repository.delete_archived_messages(user_id, conversation.id, messages)
+
+    async def open(self, conversation_id: UUID) -> Conversation:
+        """The conversation, active again with its messages copied back if it was archived."""
+        conversation = await self.conversation_repository.find_conversation_by_id(conversation_id)
+        if conversation.status != "archived":
+            return conversation
+        try:
+            await self.rehydrate(conversation_id)
+        except Exception:
+            await self.conversation_repository.rollback()
+            raise
+        return await self.conversation_repository.find_conversation_by_id(conversation_id)
+
+    async def rehydrate(self, conversation_id: UUID) -> int:
+        """
+        Copy the messages of the archived conversation back into messages.
+
+        :return: The number of messages copied, 0 if the conversation was not archived (anymore).
+        """
+        user_id = await self.conversation_repository.change_status(conversation_id, "archived", "active", touch=True)
+        if user_id is None:
+            return 0
+        archive = ArchivedConversation.from_bytes(await asyncio.to_thread(self.object_store.get, archive_key(user_id, conversation_id)))
+        count = await self.message_repository.copy_messages(user_id, (m.to_message(conversation_id) for m in archive.messages))
+        logger.info(f"Rehydrated {count} messages of conversation {conversation_id}")
+        return count
+
+    async def delete_archive(self, user_id: UUID, conversation_id: UUID) -> None:
+        await asyncio.to_thread(self.object_store.delete, archive_key(user_id, conversation_id))
+
+
+def archive_key(user_id: UUID, conversation_id: UUID) -> str:
+    """Object key of the archive of a conversation, grouped by user."""
+    return f"conversations/{user_id}/{conversation_id}.ndjson.gz"
+
+
+async def ndjson_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    """The lines of a byte stream (a request body), without their line breaks."""
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
@@ -5,6 +5,7 @@ from uuid import UUID, uuid4
 from pydantic import BaseModel, Field
 
 from app.common.models import Role
+from app.common.vector_types import Embedding
 
 
 class Message(BaseModel):
@@ -15,7 +16,7 @@ class Message(BaseModel):
 
     id: UUID = Field(default_factory=uuid4)
     content: str
-    embedding: Optional[list[float]] = None
+    embedding: Optional[Embedding] = None
     conversation_id: UUID
     role: Role
     parent_message_id: UUID | None = None
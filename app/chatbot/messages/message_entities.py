@@ -1,16 +1,20 @@
 from datetime import datetime, timezone
 import uuid
-from sqlalchemy import DateTime
+from sqlalchemy import BigInteger, ColumnElement, DateTime
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
-from pgvector.sqlalchemy import Vector
 from app.common.entities import BaseEntity
+from app.common.vector_index import vector_distance
+from app.common.vector_types import Embedding, EmbeddingVector
 from app.common.models import Role
 
 
 class MessageEntity(BaseEntity):
     """
     Represents a message in a conversation.
+
+    The table is partitioned by month of `created_at` (migration 011) and its primary key is
+    (id, created_at); ids are unique on their own, the mapping identifies messages by id.
     """
 
     __tablename__ = "messages"
@@ -21,7 +25,9 @@ class MessageEntity(BaseEntity):
     role: Mapped[Role] = mapped_column(nullable=False, doc="Role of the sender (e.g., user, assistant, system)")
     model_id: Mapped[str] = mapped_column(nullable=False, default="gemini-2.0-flash", doc="ID of the model used to generate the Message")
     message: Mapped[str] = mapped_column(nullable=False, doc="Content of the Message")
-    message_embedding: Mapped[list[float]] = mapped_column(Vector(1536), nullable=False, doc="Embeddings of the Message content for search and retrieval")
+    message_embedding: Mapped[Embedding] = mapped_column(
+        EmbeddingVector(1536), nullable=False, deferred=True, deferred_raiseload=True, doc="Embeddings of the Message content for search and retrieval"
+    )
     parent_message_id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), nullable=True, doc="ID of the parent Message in the conversation thread")
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
@@ -36,3 +42,20 @@ class MessageEntity(BaseEntity):
         onupdate=lambda: datetime.now(timezone.utc),
         doc="Timestamp when the Message was last updated",
     )
+
+    @classmethod
+    def embedding_distance(cls, embedding: Embedding, storage: str = "vector") -> ColumnElement[float]:
+        """L2, the canonical distance for messages (HNSW index with vector_l2_ops)"""
+        return vector_distance(cls.message_embedding, embedding, "l2", storage)
+
+
+class MessageCountEntity(BaseEntity):
+    """
+    Number of messages per sender, maintained by statement triggers on `messages` (migration 007),
+    so paginated listings report totals without counting the sender's messages.
+    """
+
+    __tablename__ = "message_counts"
+
+    sender_id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), primary_key=True, doc="ID of the User who sent the Messages")
+    message_count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, doc="Number of Messages of the sender")
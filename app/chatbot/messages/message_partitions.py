@@ -0,0 +1,165 @@
+"""
+Maintenance of the monthly partitions of the messages table (migration 011).
+
+Partitions are named messages_pYYYYMM and hold the messages created in that UTC month; messages of a
+month without a partition land in messages_default. `maintain_partitions` (run on a schedule, see
+docs/scripts/maintain_message_partitions.py):
+
+- creates the partitions of the current month and MESSAGE_PARTITION_MONTHS_AHEAD months ahead, so
+  new messages never go to the default partition, and of every month that has rows in the default
+  partition (an import of old history), moving those rows into it;
+- detaches the partitions older than MESSAGE_PARTITION_RETAIN_MONTHS months (0 keeps every month)
+  and takes their messages off the message counts. A detached partition stays a plain table, to be
+  archived or dropped (`drop=True`).
+
+A partition is created as a plain table, filled from the default partition and then attached, which
+only takes a SHARE UPDATE EXCLUSIVE lock on messages. Detaching takes an ACCESS EXCLUSIVE lock for a
+moment (DETACH ... CONCURRENTLY is not available with a default partition), bounded by
+`lock_timeout`: a partition that cannot be detached now is detached by the next run.
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+import os
+import re
+from typing import Optional
+
+from loguru import logger
+from sqlalchemy import Connection, Engine, text
+
+MESSAGE_PARTITION_MONTHS_AHEAD = int(os.getenv("MESSAGE_PARTITION_MONTHS_AHEAD", "3"))
+MESSAGE_PARTITION_RETAIN_MONTHS = int(os.getenv("MESSAGE_PARTITION_RETAIN_MONTHS", "0"))
+
+PARENT_TABLE = "messages"
+DEFAULT_PARTITION = "messages_default"
+LOCK_TIMEOUT = "5s"
+
+_PARTITION_NAME = re.compile(r"^messages_p(\d{4})(\d{2})$")
+
+
+def add_months(month: date, months: int) -> date:
+    """The first day of the month `months` after (or before) the month of `month`."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_of(day: date) -> date:
+    """The first day of the month of `day`."""
+    return date(day.year, day.month, 1)
+
+
+@dataclass(frozen=True, order=True)
+class MessagePartition:
+    """The partition of the messages of the UTC month starting on `month`."""
+
+    month: date
+
+    @classmethod
+    def from_name(cls, name: str) -> Optional["MessagePartition"]:
+        """The partition named `name`, None for any other table (the default partition)."""
+        match = _PARTITION_NAME.match(name)
+        return cls(date(int(match.group(1)), int(match.group(2)), 1)) if match else None
+
+    @property
+    def name(self) -> str:
+        return f"messages_p{self.month:%Y%m}"
+
+    @property
+    def bounds(self) -> tuple[str, str]:
+        """Lower (inclusive) and upper (exclusive) bound, as timestamptz literals."""
+        return f"'{self.month.isoformat()} 00:00:00+00'", f"'{add_months(self.month, 1).isoformat()} 00:00:00+00'"
+
+    def create_statements(self) -> list[str]:
+        """Create the partition, move its rows out of the default partition and attach it."""
+        lower, upper = self.bounds
+        in_month = f"created_at >= {lower} AND created_at < {upper}"
+        return [
+            f"CREATE TABLE {self.name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)",
+            # rows moved between partitions directly: no message counts trigger fires
+            f"INSERT INTO {self.name} SELECT * FROM {DEFAULT_PARTITION} WHERE {in_month}",
+            f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_month}",
+            f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {self.name} FOR VALUES FROM ({lower}) TO ({upper})",
+        ]
+
+    def detach_statements(self, drop: bool = False) -> list[str]:
+        """Detach the partition and take its messages off the message counts (see migration 007)."""
+        statements = [
+            f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'",
+            f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {self.name}",
+            f"""
+            UPDATE message_counts
+            SET message_count = message_counts.message_count - detached.message_count
+            FROM (
+              SELECT sender_id, count(*) AS message_count FROM {self.name}
+              WHERE sender_id IS NOT NULL
+              GROUP BY sender_id
+              ORDER BY sender_id
+            ) AS detached
+            WHERE message_counts.sender_id = detached.sender_id
+            """,
+        ]
+        if drop:
+            statements.append(f"DROP TABLE {self.name}")
+        return statements
+
+
+def partitions_to_create(existing: set[MessagePartition], default_months: set[date], today: date, months_ahead: int) -> list[MessagePartition]:
+    """The missing partitions of the current month, the `months_ahead` months after it and of `default_months`."""
+    months = {add_months(month_of(today), months) for months in range(months_ahead + 1)} | default_months
+    return sorted(partition for partition in map(MessagePartition, months) if partition not in existing)
+
+
+def partitions_to_detach(existing: set[MessagePartition], today: date, retain_months: int) -> list[MessagePartition]:
+    """The partitions of the months before the `retain_months` months up to the current one, none for 0."""
+    if retain_months <= 0:
+        return []
+    oldest_kept = add_months(month_of(today), -(retain_months - 1))
+    return sorted(partition for partition in existing if partition.month < oldest_kept)
+
+
+def attached_partitions(connection: Connection) -> set[MessagePartition]:
+    names = connection.scalars(text("SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = 'messages'::regclass"))
+    return {partition for partition in map(MessagePartition.from_name, names) if partition is not None}
+
+
+def default_partition_months(connection: Connection) -> set[date]:
+    """The UTC months of the rows in the default partition."""
+    months = connection.scalars(text(f"SELECT DISTINCT date_trunc('month', created_at AT TIME ZONE 'UTC')::date FROM {DEFAULT_PARTITION}"))
+    return set(months)
+
+
+def maintain_partitions(
+    engine: Engine,
+    months_ahead: int = MESSAGE_PARTITION_MONTHS_AHEAD,
+    retain_months: int = MESSAGE_PARTITION_RETAIN_MONTHS,
+    drop: bool = False,
+    today: Optional[date] = None,
+) -> tuple[list[str], list[str]]:
+    """
+    Create the missing partitions and detach the expired ones, one transaction per partition.
+    Returns the names of the partitions created and detached.
+    """
+    today = today or datetime.now(timezone.utc).date()
+    with engine.connect() as connection:
+        existing = attached_partitions(connection)
+        default_months = default_partition_months(connection)
+
+    created, detached = [], []
+    for partition in partitions_to_create(existing, default_months, today, months_ahead):
+        with engine.begin() as connection:
+            for statement in partition.create_statements():
+                connection.execute(text(statement))
+        logger.info(f"Created message partition {partition.name}")
+        created.append(partition.name)
+
+    for partition in partitions_to_detach(existing, today, retain_months):
+        try:
+            with engine.begin() as connection:
+                for statement in partition.detach_statements(drop):
+                    connection.execute(text(statement))
+        except Exception as e:
+            logger.warning(f"Failed to detach message partition {partition.name}, retried on the next run: {e}")
+            continue
+        logger.info(f"{'Dropped' if drop else 'Detached'} message partition {partition.name}")
+        detached.append(partition.name)
+    return created, detached
@@ -1,17 +1,42 @@
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Iterable, Optional
 from uuid import UUID
 
-from sqlalchemy import select
-from sqlalchemy.dialects.postgresql import insert
-from app.common.repositories import BaseRepository
-from sqlalchemy.orm import Session
+from sqlalchemy import ColumnElement, Delete, Select, delete, func, select, true
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import Insert, insert
+from app.common.repositories import AsyncBaseRepository, BaseRepository
+from sqlalchemy.orm import Session, undefer
 
 from app.chatbot.messages import Message
-from app.chatbot.messages.message_entities import MessageEntity
+from app.chatbot.messages.message_entities import MessageCountEntity, MessageEntity
 from app.chatbot.chatbot_models import PaginatedResult, MemoryEntry
 
 from app.chatbot.chatbot_models import MemoryType
-from app.common.models import MemoryManagementConfig
-from sqlalchemy import func
+from app.common.models import MemoryManagementConfig, Role
+from app.common.pagination import Cursor, in_rank_order, next_cursor, page_ids, ranked_id_cache, ranking_key, total_pages
+from app.common.pg_copy import CopyStream, binary_copy, copy_statement, encode_text, encode_timestamptz, encode_uuid, encode_vector
+from app.common.read_replica import read_only
+from app.common.vector_types import Embedding
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+# columns and binary encoders of the bulk import (`copy_messages`), see app.common.pg_copy
+MESSAGE_COPY_COLUMNS = (
+    "id",
+    "conversation_id",
+    "sender_id",
+    "role",
+    "model_id",
+    "message",
+    "message_embedding",
+    "parent_message_id",
+    "created_at",
+    "updated_at",
+)
+_role_processor = MessageEntity.__table__.c.role.type.bind_processor(postgresql.dialect())
+MESSAGE_COPY_ENCODERS = (encode_uuid, encode_uuid, encode_uuid, encode_text, encode_text, encode_text, encode_vector, encode_uuid, encode_timestamptz, encode_timestamptz)
 
 
 class MessageRepository(BaseRepository):
@@ -23,29 +48,10 @@ class MessageRepository(BaseRepository):
         :param message: Message object to be created or updated.
         :return: The created/updated Message object.
         """
-        stmt = insert(MessageEntity).values(
-            id=message.id,
-            conversation_id=message.conversation_id,
-            sender_id=sender_id,
-            role=message.role,
-            model_id=message.model_id,
-            message=message.content,
-            message_embedding=message.embedding,
-            parent_message_id=message.parent_message_id,
-        )
-
         # On conflict, update the message content and embedding
-        stmt = stmt.on_conflict_do_update(
-            index_elements=["id"],
-            set_={
-                "message": stmt.excluded.message,
-                "message_embedding": stmt.excluded.message_embedding,
-                "updated_at": stmt.excluded.updated_at,
-            },
-        )
-
-        session.execute(stmt)
+        session.execute(_upsert_message(message, sender_id, session.scalar(_created_at_of(message.id))))
         session.flush()
+        ranked_id_cache.invalidate("messages", sender_id)
 
         # Fetch the created/updated entity to get timestamps
         message_entity = session.get(MessageEntity, message.id)
@@ -70,14 +76,55 @@ class MessageRepository(BaseRepository):
                 for m in messages
             ]
         )
-        self.session.commit()
-
-    def fetch_all_by_conversation_id_and_embedding(self, conversation_id: UUID, embedding: list[float], top_k: int = 10):
-        stmt = (
-            select(MessageEntity)
-            .where(MessageEntity.conversation_id == conversation_id)
-            .order_by(MessageEntity.message_embedding.l2_distance(embedding), MessageEntity.updated_at.desc())
-            .limit(top_k)
+        self.commit()
+        ranked_id_cache.invalidate("messages", user_id)
+
+    def copy_messages(self, user_id: UUID, messages: Iterable[Message]) -> int:
+        """
+        Bulk insert `messages` with a binary COPY, streamed as they are iterated. Unlike `create_message`
+        there is no upsert and nothing is read back: the ids must be new and the embeddings set.
+
+        :return: The number of messages inserted.
+        """
+        count = 0
+
+        def rows():
+            nonlocal count
+            for message in messages:
+                count += 1
+                yield _copy_row(user_id, message)
+
+        driver_connection = self.session.connection().connection.driver_connection
+        with driver_connection.cursor() as cursor:
+            cursor.copy_expert(copy_statement("messages", MESSAGE_COPY_COLUMNS), CopyStream(binary_copy(rows(), MESSAGE_COPY_ENCODERS)))
+        self.commit()
+        ranked_id_cache.invalidate("messages", user_id)
+        return count
+
+    def delete_archived_messages(self, user_id: UUID, conversation_id: UUID, messages: list[Message]) -> int:
+        """
+        Delete `messages` of the conversation once they are archived and commit. Messages written since
+        they were read stay, and the range of their created_at limits the delete to the partitions
+        holding them.
+
+        :return: The number of messages deleted.
+        """
+        deleted = self.session.execute(_delete_messages(conversation_id, messages)).rowcount if messages else 0
+        self.commit()
+        ranked_id_cache.invalidate("messages", user_id)
+        return deleted
+
+    @read_only
+    def fetch_all_by_conversation_id_and_embedding(
+        self, conversation_id: UUID, embedding: Embedding, top_k: int = 10, ef_search: Optional[int] = None, with_embeddings: bool = False
+    ):
+        stmt = self.vector_search(
+            _select_messages(with_embeddings).where(MessageEntity.conversation_id == conversation_id),
+            MessageEntity,
+            embedding,
+            top_k,
+            MessageEntity.updated_at.desc(),
+            ef_search=ef_search,
         )
 
         entities = self.session.scalars(stmt).all()
@@ -88,7 +135,7 @@ class MessageRepository(BaseRepository):
                 role=e.role,
                 model_id=e.model_id,
                 content=e.message,
-                embedding=e.message_embedding,
+                embedding=e.loaded("message_embedding"),
                 parent_message_id=e.parent_message_id,
                 created_at=e.created_at,
                 updated_at=e.updated_at,
@@ -96,28 +143,22 @@ class MessageRepository(BaseRepository):
             for e in entities
         ]
 
-    async def fetch_all_messages(self, conversation_id: UUID) -> list[Message]:
-        entity_messages = self.session.query(MessageEntity).filter(MessageEntity.conversation_id == conversation_id).order_by(MessageEntity.created_at.asc()).all()
-        return [
-            Message(
-                id=e.id,
-                conversation_id=e.conversation_id,
-                content=e.message,
-                embedding=e.message_embedding,
-                role=e.role,
-                parent_message_id=e.parent_message_id,
-                created_at=e.created_at,
-                updated_at=e.updated_at,
-            )
-            for e in entity_messages
-        ]
+    @read_only
+    async def fetch_all_messages(self, conversation_id: UUID, with_embeddings: bool = False) -> list[Message]:
+        stmt = _select_messages(with_embeddings).where(MessageEntity.conversation_id == conversation_id).order_by(MessageEntity.created_at.asc())
+        return [_to_message(e) for e in self.session.scalars(stmt).all()]
 
-    async def search_all_by_user_id_and_embeddings(self, user_id: UUID, embeddings: list[float], top_k: int = 3) -> list[Message]:
-        stmt = (
-            select(MessageEntity)
-            .where(MessageEntity.sender_id == user_id)
-            .order_by(MessageEntity.message_embedding.l2_distance(embeddings), MessageEntity.created_at.desc())
-            .limit(top_k)
+    @read_only
+    async def search_all_by_user_id_and_embeddings(
+        self, user_id: UUID, embeddings: Embedding, top_k: int = 3, ef_search: Optional[int] = None, with_embeddings: bool = False
+    ) -> list[Message]:
+        stmt = self.vector_search(
+            _select_messages(with_embeddings).where(MessageEntity.sender_id == user_id, recall_window()),
+            MessageEntity,
+            embeddings,
+            top_k,
+            MessageEntity.created_at.desc(),
+            ef_search=ef_search,
         )
 
         entities = self.session.scalars(stmt).all()
@@ -128,7 +169,7 @@ class MessageRepository(BaseRepository):
                 role=e.role,
                 model_id=e.model_id,
                 content=e.message,
-                embedding=e.message_embedding,
+                embedding=e.loaded("message_embedding"),
                 parent_message_id=e.parent_message_id,
                 created_at=e.created_at,
                 updated_at=e.updated_at,
@@ -136,11 +177,22 @@ class MessageRepository(BaseRepository):
             for e in entities
         ]
 
-    async def fetch_all_paginated_by_user_id(self, user_id: UUID, page: int = 1, page_size: int = MemoryManagementConfig.CONVERSATION_PAGE_SIZE) -> PaginatedResult[Message]:
-        total_count = self.session.query(MessageEntity).filter(MessageEntity.sender_id == user_id).count()
-        stmt = select(MessageEntity).where(MessageEntity.sender_id == user_id).order_by(MessageEntity.created_at.desc()).offset((page - 1) * page_size).limit(page_size)
+    def count_by_sender_id(self, user_id: UUID) -> int:
+        return self.session.scalar(select(MessageCountEntity.message_count).where(MessageCountEntity.sender_id == user_id)) or 0
+
+    @read_only
+    async def fetch_all_paginated_by_user_id(
+        self, user_id: UUID, cursor: Optional[str] = None, page_size: int = MemoryManagementConfig.CONVERSATION_PAGE_SIZE, with_embeddings: bool = False
+    ) -> PaginatedResult[Message]:
+        """
+        Messages of the user, newest first. Pass the `next_cursor` of a page to get the page after it.
+        """
+        position = Cursor.decode(cursor) if cursor else None
+        page = position.page if position else 1
+        stmt = _latest_messages(user_id, position, with_embeddings).limit(page_size)
 
         entities = self.session.scalars(stmt).all()
+        total_count = self.count_by_sender_id(user_id)
 
         return PaginatedResult(
             results=[
@@ -150,7 +202,7 @@ class MessageRepository(BaseRepository):
                     role=e.role,
                     model_id=e.model_id,
                     content=e.message,
-                    embedding=e.message_embedding,
+                    embedding=e.loaded("message_embedding"),
                     parent_message_id=e.parent_message_id,
                     created_at=e.created_at,
                     updated_at=e.updated_at,
@@ -158,43 +210,48 @@ class MessageRepository(BaseRepository):
                 for e in entities
             ],
             page=page,
-            total_pages=total_count // page_size,
+            total_pages=total_pages(total_count, page_size),
             total_count=total_count,
             page_size=page_size,
+            next_cursor=next_cursor(entities, page, page_size),
         )
 
-    async def search_paginated_by_user_id_and_embeddings(self, user_id: UUID, embeddings: list[float], page: int = 1) -> PaginatedResult[MemoryEntry]:
+    @read_only
+    async def search_paginated_by_user_id_and_embeddings(
+        self, user_id: UUID, embeddings: Embedding, page: int = 1, ef_search: Optional[int] = None, with_embeddings: bool = False
+    ) -> PaginatedResult[MemoryEntry]:
+        """
+        Messages of the user most similar to `embeddings`, a page of the query's cached ranking
+        (see app.common.pagination).
+        """
         page_size = MemoryManagementConfig.MEMORY_SEARCH_PAGE_SIZE
-        offset = (page - 1) * page_size
-
-        # Get total count
-        count_stmt = select(func.count(MessageEntity.id)).where(MessageEntity.sender_id == user_id)
-        total_count = self.session.scalar(count_stmt) or 0
-        total_pages = (total_count + page_size - 1) // page_size
-
-        # Get paginated results
-        stmt = (
-            select(MessageEntity)
-            .where(MessageEntity.sender_id == user_id)
-            .order_by(MessageEntity.message_embedding.l2_distance(embeddings), MessageEntity.created_at.desc())
-            .offset(offset)
-            .limit(page_size)
+        ids = self.ranked_ids(
+            ranking_key("messages", user_id, embeddings),
+            _user_message_ids(user_id).where(recall_window()),
+            MessageEntity,
+            embeddings,
+            MessageEntity.created_at.desc(),
+            ef_search=ef_search,
+            # all-time count, an upper bound of the rows in the recall window: an exact scan is only
+            # chosen when the whole history is small, a long history searches iteratively
+            filtered_rows=self.count_by_sender_id(user_id),
         )
 
-        entities = self.session.scalars(stmt).all()
+        ids_on_page = page_ids(ids, page, page_size)
+        entities = in_rank_order(self.session.scalars(_select_messages(with_embeddings).where(MessageEntity.id.in_(ids_on_page), recall_window())).all(), ids_on_page)
         results = [
             MemoryEntry(
                 id=e.id,
                 user_id=user_id,
                 memory_type=MemoryType.RECALL,
                 content=e.message,
-                embedding=e.message_embedding,
+                embedding=e.loaded("message_embedding", []),
                 created_at=e.created_at,
             )
             for e in entities
         ]
 
-        return PaginatedResult[MemoryEntry](results=results, page=page, total_pages=total_pages, total_count=total_count, page_size=page_size)
+        return PaginatedResult[MemoryEntry](results=results, page=page, total_pages=total_pages(len(ids), page_size), total_count=len(ids), page_size=page_size)
 
     async def delete_message(self, message_id: UUID) -> None:
         """
@@ -203,4 +260,231 @@ class MessageRepository(BaseRepository):
         :param message_id: The ID of the message to delete.
         """
         self.session.query(MessageEntity).filter(MessageEntity.id == message_id).delete()
-        self.session.commit()
+        self.commit()
+
+
+def recall_window() -> ColumnElement[bool]:
+    """
+    Messages of the last MESSAGE_RECALL_WINDOW_DAYS days, all of them for 0. A bound parameter, so
+    searches only read the partitions of the window (migration 011).
+    """
+    days = MemoryManagementConfig.MESSAGE_RECALL_WINDOW_DAYS
+    if days <= 0:
+        return true()
+    return MessageEntity.created_at >= datetime.now(timezone.utc) - timedelta(days=days)
+
+
+def _select_messages(with_embeddings: bool = False) -> Select:
+    """Messages without their embedding unless asked for, the vector is most of the row."""
+    stmt = select(MessageEntity)
+    return stmt.options(undefer(MessageEntity.message_embedding)) if with_embeddings else stmt
+
+
+def _latest_messages(user_id: UUID, position: Optional[Cursor], with_embeddings: bool = False) -> Select:
+    stmt = _select_messages(with_embeddings).where(MessageEntity.sender_id == user_id)
+    if position is not None:
+        stmt = stmt.where(position.after(MessageEntity.created_at, MessageEntity.id))
+    return stmt.order_by(MessageEntity.created_at.desc(), MessageEntity.id.desc())
+
+
+def _user_message_ids(user_id: UUID) -> Select:
+    return select(MessageEntity.id).where(MessageEntity.sender_id == user_id)
+
+
+def _created_at_of(message_id: UUID) -> Select:
+    return select(MessageEntity.created_at).where(MessageEntity.id == message_id)
+
+
+def _upsert_message(message: Message, sender_id: UUID, created_at: Optional[datetime]) -> Insert:
+    """
+    Insert `message`, or update the content and embedding of the stored one. The partitioned table's
+    primary key is (id, created_at) (migration 011): an existing message is matched with the
+    `created_at` it was stored with, a new one gets the database time, never the client's.
+    """
+    stmt = insert(MessageEntity).values(
+        id=message.id,
+        conversation_id=message.conversation_id,
+        sender_id=sender_id,
+        role=message.role,
+        model_id=message.model_id,
+        message=message.content,
+        message_embedding=message.embedding,
+        parent_message_id=message.parent_message_id,
+        created_at=created_at if created_at is not None else func.now(),
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=["id", "created_at"],
+        set_={
+            "message": stmt.excluded.message,
+            "message_embedding": stmt.excluded.message_embedding,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+
+
+def _delete_messages(conversation_id: UUID, messages: list[Message]) -> Delete:
+    created_at = [m.created_at for m in messages]
+    return delete(MessageEntity).where(
+        MessageEntity.conversation_id == conversation_id,
+        MessageEntity.id.in_([m.id for m in messages]),
+        MessageEntity.created_at.between(min(created_at), max(created_at)),
+    )
+
+
+def _stored_role(role: Role) -> str:
+    """`role` as the ORM stores it: MessageEntity.role is an Enum of Role, kept as the member name ("USER")."""
+    assert _role_processor is not None
+    return _role_processor(role)
+
+
+def _copy_row(user_id: UUID, m: Message) -> tuple:
+    """`m` as a row of MESSAGE_COPY_COLUMNS."""
+    return (m.id, m.conversation_id, user_id, _stored_role(m.role), m.model_id, m.content, m.embedding, m.parent_message_id, m.created_at, m.updated_at)
+
+
+def _to_message(e: MessageEntity) -> Message:
+    return Message(
+        id=e.id,
+        conversation_id=e.conversation_id,
+        role=e.role,
+        model_id=e.model_id,
+        content=e.message,
+        embedding=e.loaded("message_embedding"),
+        parent_message_id=e.parent_message_id,
+        created_at=e.created_at,
+        updated_at=e.updated_at,
+    )
+
+
+class AsyncMessageRepository(AsyncBaseRepository):
+    """`MessageRepository` on the async backend, same domain API with every method awaitable."""
+
+    async def create_message(self, session: "AsyncSession", message: Message, sender_id: UUID) -> Message:
+        await session.execute(_upsert_message(message, sender_id, await session.scalar(_created_at_of(message.id))))
+        await session.flush()
+        ranked_id_cache.invalidate("messages", sender_id)
+
+        message_entity = await session.get(MessageEntity, message.id)
+        if message_entity:
+            message.created_at = message_entity.created_at
+            message.updated_at = message_entity.updated_at
+
+        return message
+
+    async def batch_add_messages(self, user_id: UUID, messages: list[Message]) -> None:
+        self.session.add_all(
+            [
+                MessageEntity(
+                    id=m.id,
+                    conversation_id=m.conversation_id,
+                    sender_id=user_id,
+                    role=m.role,
+                    message=m.content,
+                    message_embedding=m.embedding,
+                    parent_message_id=m.parent_message_id,
+                )
+                for m in messages
+            ]
+        )
+        await self.commit()
+        ranked_id_cache.invalidate("messages", user_id)
+
+    async def copy_messages(self, user_id: UUID, messages: Iterable[Message]) -> int:
+        # asyncpg encodes the records in the binary COPY format itself, vectors with the codec of register_embedding_codec
+        raw_connection = await (await self.session.connection()).get_raw_connection()
+        status = await raw_connection.driver_connection.copy_records_to_table(
+            "messages", records=(_copy_row(user_id, message) for message in messages), columns=MESSAGE_COPY_COLUMNS
+        )
+        await self.commit()
+        ranked_id_cache.invalidate("messages", user_id)
+        # command tag "COPY <rows>"
+        return int(status.split()[-1])
+
+    async def delete_archived_messages(self, user_id: UUID, conversation_id: UUID, messages: list[Message]) -> int:
+        deleted = (await self.session.execute(_delete_messages(conversation_id, messages))).rowcount if messages else 0
+        await self.commit()
+        ranked_id_cache.invalidate("messages", user_id)
+        return deleted
+
+    @read_only
+    async def fetch_all_by_conversation_id_and_embedding(
+        self, conversation_id: UUID, embedding: Embedding, top_k: int = 10, ef_search: Optional[int] = None, with_embeddings: bool = False
+    ) -> list[Message]:
+        stmt = await self.vector_search(
+            _select_messages(with_embeddings).where(MessageEntity.conversation_id == conversation_id),
+            MessageEntity,
+            embedding,
+            top_k,
+            MessageEntity.updated_at.desc(),
+            ef_search=ef_search,
+        )
+        return [_to_message(e) for e in await self.session.scalars(stmt)]
+
+    @read_only
+    async def fetch_all_messages(self, conversation_id: UUID, with_embeddings: bool = False) -> list[Message]:
+        stmt = _select_messages(with_embeddings).where(MessageEntity.conversation_id == conversation_id).order_by(MessageEntity.created_at.asc())
+        return [_to_message(e) for e in await self.session.scalars(stmt)]
+
+    @read_only
+    async def search_all_by_user_id_and_embeddings(
+        self, user_id: UUID, embeddings: Embedding, top_k: int = 3, ef_search: Optional[int] = None, with_embeddings: bool = False
+    ) -> list[Message]:
+        stmt = await self.vector_search(
+            _select_messages(with_embeddings).where(MessageEntity.sender_id == user_id, recall_window()),
+            MessageEntity,
+            embeddings,
+            top_k,
+            MessageEntity.created_at.desc(),
+            ef_search=ef_search,
+        )
+        return [_to_message(e) for e in await self.session.scalars(stmt)]
+
+    async def count_by_sender_id(self, user_id: UUID) -> int:
+        return await self.session.scalar(select(MessageCountEntity.message_count).where(MessageCountEntity.sender_id == user_id)) or 0
+
+    @read_only
+    async def fetch_all_paginated_by_user_id(
+        self, user_id: UUID, cursor: Optional[str] = None, page_size: int = MemoryManagementConfig.CONVERSATION_PAGE_SIZE, with_embeddings: bool = False
+    ) -> PaginatedResult[Message]:
+        position = Cursor.decode(cursor) if cursor else None
+        page = position.page if position else 1
+        entities = (await self.session.scalars(_latest_messages(user_id, position, with_embeddings).limit(page_size))).all()
+        total_count = await self.count_by_sender_id(user_id)
+
+        return PaginatedResult(
+            results=[_to_message(e) for e in entities],
+            page=page,
+            total_pages=total_pages(total_count, page_size),
+            total_count=total_count,
+            page_size=page_size,
+            next_cursor=next_cursor(entities, page, page_size),
+        )
+
+    @read_only
+    async def search_paginated_by_user_id_and_embeddings(
+        self, user_id: UUID, embeddings: Embedding, page: int = 1, ef_search: Optional[int] = None, with_embeddings: bool = False
+    ) -> PaginatedResult[MemoryEntry]:
+        page_size = MemoryManagementConfig.MEMORY_SEARCH_PAGE_SIZE
+        ids = await self.ranked_ids(
+            ranking_key("messages", user_id, embeddings),
+            _user_message_ids(user_id).where(recall_window()),
+            MessageEntity,
+            embeddings,
+            MessageEntity.created_at.desc(),
+            ef_search=ef_search,
+            # upper bound of the rows in the recall window, see MessageRepository
+            filtered_rows=await self.count_by_sender_id(user_id),
+        )
+
+        ids_on_page = page_ids(ids, page, page_size)
+        entities = in_rank_order((await self.session.scalars(_select_messages(with_embeddings).where(MessageEntity.id.in_(ids_on_page), recall_window()))).all(), ids_on_page)
+        results = [
+            MemoryEntry(id=e.id, user_id=user_id, memory_type=MemoryType.RECALL, content=e.message, embedding=e.loaded("message_embedding", []), created_at=e.created_at)
+            for e in entities
+        ]
+
+        return PaginatedResult[MemoryEntry](results=results, page=page, total_pages=total_pages(len(ids), page_size), total_count=len(ids), page_size=page_size)
+
+    async def delete_message(self, message_id: UUID) -> None:
+        await self.session.execute(delete(MessageEntity).where(MessageEntity.id == message_id))
+        await self.commit()
@@ -32,11 +32,11 @@ class MessageService:
         agent_response.embedding = await self.chatbot_service.generate_embedding(agent_response.content)
 
         # Create the user and agent message in the database
-        with self.transaction_manager as session:
-            self.repository.create_message(session=session, message=user_message, sender_id=user.id)
+        async with self.transaction_manager as session:
+            await self.repository.create_message(session=session, message=user_message, sender_id=user.id)
 
             agent_response.parent_message_id = user_message.id
-            self.repository.create_message(session=session, message=agent_response, sender_id=user.id)
+            await self.repository.create_message(session=session, message=agent_response, sender_id=user.id)
 
         return (user_message, agent_response)
 
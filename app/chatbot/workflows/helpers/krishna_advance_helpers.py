@@ -1,30 +1,53 @@
 from collections import deque
 from datetime import datetime, timezone
 import json
+from typing import Optional
+
 from loguru import logger
 
 from app.chatbot import BaseChatbot
 from app.chatbot.chatbot_models import ActionResult, SingleMessage, AgentState, AgentThought, Phase, StreamChunk, StreamStep
 from app.chatbot.components.conversation_manager import ConversationManager
+from app.chatbot.components.prompt_assembler import assemble_prompt
+from app.chatbot.components.prompt_budget import PromptBudget
+from app.chatbot.components.prompt_encoders import PROMPT_ENCODERS, PromptEncoder
 from app.chatbot.components.tools import conversation_search, mcp_tools, memory_tools_v3, python_code_runner, send_message
-from app.chatbot.components.tools_manager import ToolCategory, ToolsManager
-from app.chatbot.workflows.prompts.system.intuitive_knowledge import get_intuitive_knowledge
-from app.common.models import MemoryType, Role
-from app.common.utils import extract_tag_content, write_to_file
+from app.chatbot.components.tools_manager import ToolCategory, ToolRegistry, ToolsManager
+from app.common.models import Role
+from app.common.query_stats import mark_epoch
+from app.common.tracing import PromptTrace, PromptTracer
+from app.common.unit_of_work import savepoint
+from app.common.utils import extract_tag_content
 from app.common.workflows import BaseWorkflowHelper
 
 
+# Built once per process and shared read-only by every request
+KRISHNA_ADVANCE_TOOLS = ToolRegistry(
+    [
+        *[(ToolCategory.MEMORY, tool) for tool in memory_tools_v3.memory_tools_v3],
+        *[(ToolCategory.MCP, tool) for tool in mcp_tools.mcp_actions],
+        (ToolCategory.CORE, conversation_search),
+        (ToolCategory.CORE, send_message),
+        (ToolCategory.CODE, python_code_runner),
+    ]
+)
+
+
 class KrishnaAdvanceWorkflowHelper(BaseWorkflowHelper):
-    def __init__(self, chatbot: BaseChatbot, conversation_manager: ConversationManager, tools_manager: ToolsManager) -> None:
+    def __init__(
+        self,
+        chatbot: BaseChatbot,
+        conversation_manager: ConversationManager,
+        tools_manager: ToolsManager,
+        prompt_encoder: PromptEncoder = PROMPT_ENCODERS["compact"],
+        prompt_budget: Optional[PromptBudget] = None,
+        prompt_tracer: Optional[PromptTracer] = None,
+    ) -> None:
         super().__init__(chatbot, conversation_manager, tools_manager)
-        for tool in memory_tools_v3.memory_tools_v3:
-            tools_manager.register_tool(ToolCategory.MEMORY, tool)
-        for tool in mcp_tools.mcp_actions:
-            tools_manager.register_tool(ToolCategory.MCP, tool)
-
-        tools_manager.register_tool(ToolCategory.CORE, conversation_search)
-        tools_manager.register_tool(ToolCategory.CORE, send_message)
-        tools_manager.register_tool(ToolCategory.CODE, python_code_runner)
+        tools_manager.use_registry(KRISHNA_ADVANCE_TOOLS)
+        self.prompt_encoder = prompt_encoder
+        self.prompt_budget = prompt_budget or PromptBudget.from_config()
+        self.prompt_tracer = prompt_tracer or PromptTracer.disabled()
 
     def _check_duplicate_tool_call(self, state: AgentState) -> bool:
         """Check if the same tool is being called with identical parameters"""
@@ -45,44 +68,72 @@ class KrishnaAdvanceWorkflowHelper(BaseWorkflowHelper):
         """
         Build the prompt for the LLM with MemoryManagerV2 integration
         """
-        prompt = {
-            "system_prompt": {
-                "intuitive_knowledge": get_intuitive_knowledge(),
-                "available_memory_types": [label.value for label in MemoryType],
-                "available_actions": self.tools_manager.get_tools_schema(),
-                "output": {
-                    "critical_format_rules": self.tools_manager.format_rules,
-                    "format_name": self.tools_manager.format_name,
-                    "output_format": self.tools_manager.output_format_instructions,
-                    "output_examples": self.tools_manager.output_examples,
-                },
-            },
+        mark_epoch(state.epochs)
+        dynamic = {
             "current_time_in_utc": datetime.now(timezone.utc).isoformat(),
             "archival_memory": [v.serialize() for k, v in state.memory_blocks.items()],
             "recalled_memory": state.build_conversation_context(),
-            "conversation_history": [SingleMessage.from_message(m).model_dump_json() for m in await self.conversation_manager.get_messages(user=state.user)],
+            "conversation_history": [SingleMessage.from_message(m) for m in await self.conversation_manager.get_messages(user=state.user)],
             "heartbeats_used": state.epochs,
             "current_user_query": state.user_message,
         }
 
         if state.epochs > 10:
-            prompt.update({"CRITICAL": f"TOO MANY HEART BEATS USED (>{state.epochs}). RESPOND TO USER ASAP."})
+            dynamic.update({"CRITICAL": f"TOO MANY HEART BEATS USED (>{state.epochs}). RESPOND TO USER ASAP."})
 
-        state.prompt = json.dumps(prompt, indent=2, default=str)
-        logger.info(f"Prompt built for epoch {state.epochs}")
+        state.assembled_prompt = assemble_prompt(self.tools_manager, dynamic, self.prompt_encoder, self.prompt_budget)
+        state.prompt = state.assembled_prompt.text
+        segment_sizes = ", ".join(f"{s.name}={s.bytes}B/~{s.tokens}t" for s in state.assembled_prompt.segments)
+        logger.info(f"Prompt built for epoch {state.epochs} ({self.prompt_encoder.name}): {segment_sizes}")
+        logger.info(f"Prompt budget: {state.assembled_prompt.budget_report.summary()}")
         state.stream_queue.put_nowait(item=StreamChunk(content="Thinking...", step=StreamStep.ANALYSIS, step_title="Thinking..."))
-        write_to_file(f"/tmp/prompts/prompt_{state.epochs}.md", state.prompt)
         logger.debug(f"Prompt:\n{state.prompt}")
         return state
 
     async def thinker(self, state: AgentState) -> AgentState:
         plan_of_action = ""
-        async for chunk in self.chatbot.stream_response(prompt=state.prompt):
-            plan_of_action += str(chunk)
+        error = None
+        try:
+            stream = self.chatbot.stream_prompt(state.assembled_prompt) if state.assembled_prompt else self.chatbot.stream_response(prompt=state.prompt)
+            async for chunk in stream:
+                plan_of_action += str(chunk)
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            self._trace_prompt(state, plan_of_action, error)
 
         state.llm_response = plan_of_action
         return state
 
+    def _trace_prompt(self, state: AgentState, response: str, error: Optional[str]) -> None:
+        """Hand the prompt of this epoch to the tracer, which samples it and writes it off the event loop."""
+        if not self.prompt_tracer.should_trace(str(state.user.id), state.user.username):
+            return
+
+        metadata: dict = {"encoding": self.prompt_encoder.name}
+        assembled = state.assembled_prompt
+        if assembled:
+            metadata["prefix_version"] = assembled.prefix.version
+            metadata["segments"] = [{"name": s.name, "bytes": s.bytes, "tokens": s.tokens} for s in assembled.segments]
+            if assembled.budget_report:
+                metadata["budget"] = assembled.budget_report.as_dict()
+            if assembled.usage:
+                metadata["cache"] = vars(assembled.usage)
+
+        self.prompt_tracer.record(
+            PromptTrace(
+                user_id=str(state.user.id),
+                username=state.user.username,
+                conversation_id=str(state.conversation_id),
+                epoch=state.epochs,
+                prompt=state.prompt,
+                response=response,
+                metadata=metadata,
+                error=error,
+            )
+        )
+
     async def parse_actions(self, state: AgentState) -> AgentState:
         state.epochs += 1
         logger.info(f"Validating Response (Epoch {state.epochs})")
@@ -157,7 +208,9 @@ class KrishnaAdvanceWorkflowHelper(BaseWorkflowHelper):
             try:
                 # Use the tools manager to execute the tool
                 logger.info(f"Executing tool: {action.name}")
-                response = await self.tools_manager.execute_tool(state, thought)
+                # A failing tool only rolls back its own writes, the turn is committed once at the end
+                async with savepoint():
+                    response = await self.tools_manager.execute_tool(state, thought)
                 logger.info(f"Tool execution result type: {type(response).__name__}")
                 state.observations.append(response)
 
@@ -1,18 +1,99 @@
 import asyncio
-import os
-import shutil
-from typing import AsyncGenerator
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, AsyncGenerator
 from loguru import logger
 
 from app.chatbot import BaseChatbot
 from app.chatbot.chatbot_models import AgentState, Phase, StreamChunk
-from langgraph.graph import StateGraph, START, END
 
 from app.chatbot.conversation.conversation_repositories import ConversationRepository
 from app.chatbot.messages.message_repositories import MessageRepository
+from app.common.lazy import lazy_import
 from app.common.vector_embedders import BaseVectorEmbedder
 from app.common.workflows import BaseAgentWorkflow, BaseWorkflowHelper
 
+if TYPE_CHECKING:
+    from langchain_core.runnables import RunnableConfig
+
+langgraph_graph = lazy_import("langgraph.graph")
+
+
+def _helper(config: "RunnableConfig") -> BaseWorkflowHelper:
+    return config["configurable"]["workflow_helper"]
+
+
+async def _prompt_builder(state: AgentState, config: "RunnableConfig") -> AgentState:
+    return await _helper(config).prompt_builder(state)
+
+
+async def _thinker(state: AgentState, config: "RunnableConfig") -> AgentState:
+    return await _helper(config).thinker(state)
+
+
+async def _parse_actions(state: AgentState, config: "RunnableConfig") -> AgentState:
+    return await _helper(config).parse_actions(state)
+
+
+async def _execute_actions(state: AgentState, config: "RunnableConfig") -> AgentState:
+    return await _helper(config).execute_actions(state)
+
+
+async def _manage_conversations(state: AgentState, config: "RunnableConfig") -> AgentState:
+    return await _helper(config).manage_conversations(state)
+
+
+async def _persist_message_exchange(state: AgentState, config: "RunnableConfig") -> AgentState:
+    return await _helper(config).persist_message_exchange(state)
+
+
+async def _error_handler(state: AgentState, config: "RunnableConfig") -> AgentState:
+    return await _helper(config).error_handler(state)
+
+
+def _router(state: AgentState) -> str:
+    """
+    Route the workflow based on the current state.
+    """
+    if state.phase == Phase.NEED_TOOL:
+        return "prompt_builder"
+    elif state.phase == Phase.NEED_FINAL:
+        return "persist_message_exchange"
+    else:
+        return "error_handler"
+
+
+@lru_cache(maxsize=1)
+def get_compiled_graph() -> Any:
+    """
+    Build and compile the Krishna graph once per process.
+    Nodes resolve the per-request helper from `config["configurable"]["workflow_helper"]`.
+    """
+    StateGraph, START, END = langgraph_graph.StateGraph, langgraph_graph.START, langgraph_graph.END
+    graph = StateGraph(AgentState)
+
+    # 1) prompt_builder: ask LLM to think or finish
+    graph.add_node("prompt_builder", _prompt_builder)
+    graph.add_node("thinker", _thinker)
+    graph.add_node("parse_actions", _parse_actions)
+    graph.add_node("execute_actions", _execute_actions)
+    graph.add_node("router", _router)
+    graph.add_node("manage_conversations", _manage_conversations)
+    graph.add_node("persist_message_exchange", _persist_message_exchange)
+    graph.add_node("error_handler", _error_handler)
+
+    # Start → prompt_builder
+    graph.add_edge(START, "prompt_builder")
+    graph.add_edge("prompt_builder", "thinker")
+    graph.add_edge("thinker", "parse_actions")
+    graph.add_edge("parse_actions", "execute_actions")
+    graph.add_conditional_edges(
+        "execute_actions", _router, {"prompt_builder": "prompt_builder", "error_handler": "error_handler", "persist_message_exchange": "persist_message_exchange"}, END
+    )
+    graph.add_edge("persist_message_exchange", END)
+
+    logger.info("Compiled KrishnaAdvanceWorkflow graph")
+    return graph.compile()
+
 
 class KrishnaAdvanceWorkflow(BaseAgentWorkflow):
     """
@@ -32,55 +113,19 @@ class KrishnaAdvanceWorkflow(BaseAgentWorkflow):
         super().__init__(state, chatbot, message_repository=message_repository, conversation_repository=conversation_repository, embedder=embedder)
         self.workflow_helper = workflow_helper
 
-    def _router(self, state: AgentState) -> str:
-        """
-        Route the workflow based on the current state.
-        """
-        if state.phase == Phase.NEED_TOOL:
-            return "prompt_builder"
-        elif state.phase == Phase.NEED_FINAL:
-            return "persist_message_exchange"
-        else:
-            return "error_handler"
-
     async def run(self) -> AsyncGenerator[StreamChunk, None]:
         """
         Run the Krishna workflow and yield stream chunks.
         """
-        shutil.rmtree("/tmp/prompts", ignore_errors=True)
-        os.makedirs("/tmp/prompts", exist_ok=True)
-
-        helper = self.workflow_helper
-        graph = StateGraph(AgentState)
-
-        # 1) prompt_builder: ask LLM to think or finish
-        graph.add_node("prompt_builder", helper.prompt_builder)
-        graph.add_node("thinker", helper.thinker)
-        graph.add_node("parse_actions", helper.parse_actions)
-        graph.add_node("execute_actions", helper.execute_actions)
-        graph.add_node("router", self._router)
-        graph.add_node("manage_conversations", helper.manage_conversations)
-        graph.add_node("persist_message_exchange", helper.persist_message_exchange)
-        graph.add_node("error_handler", helper.error_handler)
-
-        # Start → prompt_builder
-        graph.add_edge(START, "prompt_builder")
-        graph.add_edge("prompt_builder", "thinker")
-        graph.add_edge("thinker", "parse_actions")
-        graph.add_edge("parse_actions", "execute_actions")
-        graph.add_conditional_edges(
-            "execute_actions", self._router, {"prompt_builder": "prompt_builder", "error_handler": "error_handler", "persist_message_exchange": "persist_message_exchange"}, END
-        )
-        graph.add_edge("persist_message_exchange", END)
-
-        app = graph.compile()
+        app = get_compiled_graph()
+        config = {"recursion_limit": 100, "configurable": {"workflow_helper": self.workflow_helper}}
 
         try:
 
             async def drive_workflow() -> None:
                 try:
                     state = self.state
-                    async for _ in app.astream(state, {"recursion_limit": 100}):
+                    async for _ in app.astream(state, config):
                         pass
                 finally:
                     await self.state.stream_queue.put(None)
@@ -0,0 +1,177 @@
+"""
+Write-behind access tracking and idle eviction of memory entries.
+
+Memory reads are plain SELECTs, so they can run on the read replica and leave no dead tuples, WAL or
+row locks behind. The reads report the entries they returned to `MemoryAccessTracker.record`, which
+only counts the hits in memory. A daemon thread writes the pending hits every
+MEMORY_ACCESS_FLUSH_SECONDS, or as soon as MEMORY_ACCESS_MAX_PENDING entries have hits, in one
+UPDATE ... FROM (VALUES ...): `access_count` grows by the hits and `last_accessed_at` moves to the
+latest access. A recalled entry that had been evicted is active again, which is what the former
+UPDATE ... SET is_active = true ... RETURNING of every read did.
+
+Every MEMORY_EVICTION_INTERVAL_SECONDS the thread also applies the eviction policy
+(`evict_idle_memories`) to the columns the hits feed. Hits still pending when the process dies are
+lost, access statistics are best effort.
+"""
+
+from datetime import datetime, timedelta, timezone
+import threading
+import time
+from typing import Callable, Iterable, Optional
+from uuid import UUID
+
+from loguru import logger
+from sqlalchemy import DateTime, Float, Integer, Interval, cast, column, func, literal, update, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.orm import Session
+
+from app.chatbot.workflows.memories.memory_entities import MemoryEntryEntity
+from app.common.models import MemoryManagementConfig, MemoryType
+
+# Memory blocks (persona, user profile, summary, system) are part of every prompt and never evicted
+EVICTABLE_MEMORY_TYPES = (MemoryType.RECALL, MemoryType.ARCHIVAL)
+
+
+def evict_idle_memories(session: Session, idle_days: float = MemoryManagementConfig.MEMORY_EVICTION_IDLE_DAYS) -> int:
+    """
+    Evict the active recall and archival entries not read for `idle_days` * (1 + ln(1 + access_count))
+    days, counted from their creation when they were never read: entries recalled often are kept longer.
+    Returns the number of entries evicted.
+    """
+    last_access = func.coalesce(MemoryEntryEntity.last_accessed_at, MemoryEntryEntity.created_at)
+    idle = literal(timedelta(days=idle_days), Interval)
+    stmt = (
+        update(MemoryEntryEntity)
+        .where(
+            MemoryEntryEntity.is_active,
+            MemoryEntryEntity.memory_type.in_([memory_type.value for memory_type in EVICTABLE_MEMORY_TYPES]),
+            # idle for the base time at least, a range on idx_memory_active_last_access
+            last_access < func.now() - idle,
+            last_access < func.now() - idle * (1 + func.ln(cast(1 + MemoryEntryEntity.access_count, Float))),
+        )
+        .values(is_active=False, evicted_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    return session.execute(stmt).rowcount
+
+
+class MemoryAccessTracker:
+    """Buffers the hits of memory reads and writes them behind on a daemon thread. Never blocks the reader."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        flush_seconds: float = MemoryManagementConfig.MEMORY_ACCESS_FLUSH_SECONDS,
+        max_pending: int = MemoryManagementConfig.MEMORY_ACCESS_MAX_PENDING,
+        eviction_seconds: Optional[float] = MemoryManagementConfig.MEMORY_EVICTION_INTERVAL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.session_factory = session_factory
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.eviction_seconds = eviction_seconds
+        self._clock = clock
+        self._evicted_at = clock()
+        # entry id -> (hits, last access)
+        self._pending: dict[UUID, tuple[int, datetime]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+
+    def record(self, entry_ids: Iterable[UUID]) -> None:
+        """Count one read of each of `entry_ids`, now."""
+        accessed_at = datetime.now(timezone.utc)
+        with self._lock:
+            for entry_id in entry_ids:
+                hits, _ = self._pending.get(entry_id, (0, accessed_at))
+                self._pending[entry_id] = (hits + 1, accessed_at)
+            pending = len(self._pending)
+        if pending:
+            self._ensure_worker()
+        if pending >= self.max_pending:
+            self._wake.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def flush(self) -> int:
+        """Write the pending hits now. Returns the number of entries updated."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            try:
+                with self.session_factory() as session, session.begin():
+                    return _write_hits(session, pending)
+            except Exception as e:
+                logger.warning(f"Failed to write the access statistics of {len(pending)} memory entries: {e}")
+                self._requeue(pending)
+                return 0
+
+    def evict(self) -> int:
+        with self.session_factory() as session, session.begin():
+            evicted = evict_idle_memories(session)
+        if evicted:
+            logger.info(f"Evicted {evicted} idle memory entries")
+        return evicted
+
+    def close(self) -> None:
+        """Stop the worker and write the hits still pending."""
+        self._closed.set()
+        self._wake.set()
+        if self._worker is not None:
+            self._worker.join(timeout=5)
+            self._worker = None
+        self.flush()
+
+    def _requeue(self, pending: dict[UUID, tuple[int, datetime]]) -> None:
+        """Merge the hits of a failed write back, dropped once the buffer is full."""
+        with self._lock:
+            for entry_id, (hits, accessed_at) in pending.items():
+                if entry_id in self._pending:
+                    newer_hits, newer_at = self._pending[entry_id]
+                    self._pending[entry_id] = (hits + newer_hits, max(accessed_at, newer_at))
+                elif len(self._pending) < self.max_pending:
+                    self._pending[entry_id] = (hits, accessed_at)
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None and not self._closed.is_set():
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="memory-access-tracker", daemon=True)
+                    self._worker.start()
+
+    def _run(self) -> None:
+        while not self._closed.is_set():
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self.flush()
+            if self.eviction_seconds is not None and self._clock() - self._evicted_at >= self.eviction_seconds:
+                self._evicted_at = self._clock()
+                try:
+                    self.evict()
+                except Exception as e:
+                    logger.warning(f"Failed to evict idle memory entries: {e}")
+
+
+def _write_hits(session: Session, pending: dict[UUID, tuple[int, datetime]]) -> int:
+    # sorted, so that concurrent writers lock the rows in the same order
+    accesses = values(column("id", PG_UUID(as_uuid=True)), column("hits", Integer), column("accessed_at", DateTime(timezone=True)), name="accesses").data(
+        [(entry_id, hits, accessed_at) for entry_id, (hits, accessed_at) in sorted(pending.items())]
+    )
+    stmt = (
+        update(MemoryEntryEntity)
+        .where(MemoryEntryEntity.id == accesses.c.id)
+        .values(
+            access_count=MemoryEntryEntity.access_count + accesses.c.hits,
+            last_accessed_at=func.greatest(MemoryEntryEntity.last_accessed_at, accesses.c.accessed_at),
+            is_active=True,
+            evicted_at=None,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return session.execute(stmt).rowcount
@@ -0,0 +1,192 @@
+"""
+Audit log of memory mutations, in the memory_audit_log table.
+
+The memory managers stage an event for every mutation (`audit`) on their session. The events are
+handed to the `MemoryAuditLog` once the session's transaction commits, the events of a rolled back
+transaction or savepoint (a failed turn or tool) are discarded. Inside a unit of work that is at the
+end of the turn, so the history only shows mutations that were actually written.
+
+The log queues the events in memory and a daemon thread writes them in multi-row INSERTs of up to
+MEMORY_AUDIT_BATCH_SIZE events, at the latest MEMORY_AUDIT_FLUSH_SECONDS after the first one of a
+batch was queued: no memory tool call waits for an audit insert. The queue holds up to
+MEMORY_AUDIT_MAX_PENDING events. When it is full new events are dropped ('drop'), or the committing
+caller waits up to MEMORY_AUDIT_BLOCK_SECONDS for room before dropping them ('block', this blocks
+the event loop on the async backend). Events still queued are written on shutdown (`close`).
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from enum import Enum
+import queue
+import threading
+import time
+from typing import Any, Callable, Optional
+from uuid import UUID
+
+from loguru import logger
+from sqlalchemy import Row, event, insert
+from sqlalchemy.orm import Session, SessionTransaction
+
+from app.chatbot.workflows.memories.memory_entities import MemoryAuditLogEntity, MemoryEntryEntity
+from app.common.models import MemoryManagementConfig
+
+# Longest text (content, replaced or appended text) kept in the detail of an event
+DETAIL_TEXT_LIMIT = 1000
+
+_STAGED_KEY = "memory_audit_events"
+
+
+class MemoryAuditAction(Enum):
+    CREATED = "created"
+    UPDATED = "updated"
+    EVICTED = "evicted"
+    SUMMARIZED = "summarized"
+    DELETED = "deleted"
+
+
+@dataclass
+class MemoryAuditEvent:
+    entry_id: UUID
+    user_id: Optional[UUID]
+    action: MemoryAuditAction
+    detail: dict[str, Any] = field(default_factory=dict)
+    action_time: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+    def to_row(self) -> dict[str, Any]:
+        return {"entry_id": self.entry_id, "user_id": self.user_id, "action": self.action.value, "detail": self.detail, "action_time": self.action_time}
+
+
+class MemoryAuditLog:
+    """Queues audit events and writes them in batches on a daemon thread."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        batch_size: int = MemoryManagementConfig.MEMORY_AUDIT_BATCH_SIZE,
+        flush_seconds: float = MemoryManagementConfig.MEMORY_AUDIT_FLUSH_SECONDS,
+        max_pending: int = MemoryManagementConfig.MEMORY_AUDIT_MAX_PENDING,
+        overflow: str = MemoryManagementConfig.MEMORY_AUDIT_OVERFLOW,
+        block_seconds: float = MemoryManagementConfig.MEMORY_AUDIT_BLOCK_SECONDS,
+    ):
+        if overflow not in ("drop", "block"):
+            raise ValueError(f"Unknown memory audit overflow policy: {overflow}. Available: drop, block")
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.overflow = overflow
+        self.block_seconds = block_seconds
+        self.dropped = 0
+        self._queue: queue.Queue[Optional[MemoryAuditEvent]] = queue.Queue(maxsize=max_pending)
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def stage(self, session: Any, audit_event: MemoryAuditEvent) -> None:
+        """Hold `audit_event` until the transaction of `session` (sync or async) commits."""
+        session = getattr(session, "sync_session", session)
+        transaction = session.get_nested_transaction() or session.get_transaction()
+        session.info.setdefault(_STAGED_KEY, []).append((transaction, self, audit_event))
+
+    def record(self, audit_event: MemoryAuditEvent) -> bool:
+        """Queue `audit_event` for writing. Returns False if the queue was full and it was dropped."""
+        self._ensure_worker()
+        try:
+            if self.overflow == "block":
+                self._queue.put(audit_event, timeout=self.block_seconds)
+            else:
+                self._queue.put_nowait(audit_event)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            # 1st, 2nd, 4th, 8th... drop, so a full queue does not flood the log
+            if self.dropped & (self.dropped - 1) == 0:
+                logger.warning(f"Memory audit event dropped, {self._queue.maxsize} events pending ({self.dropped} dropped so far)")
+            return False
+
+    def flush(self) -> None:
+        """Block until every queued event has been written."""
+        if self._worker is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        """Write the queued events and stop the worker."""
+        if self._worker is not None:
+            self._queue.put(None)
+            self._worker.join(timeout=10)
+            self._worker = None
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="memory-audit-log", daemon=True)
+                    self._worker.start()
+
+    def _next_batch(self) -> tuple[list[MemoryAuditEvent], bool]:
+        """The next batch of events, and whether the log was closed after it."""
+        first = self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size and (remaining := deadline - time.monotonic()) > 0:
+            try:
+                audit_event = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if audit_event is None:
+                return batch, True
+            batch.append(audit_event)
+        return batch, False
+
+    def _run(self) -> None:
+        while True:
+            batch, closed = self._next_batch()
+            try:
+                if batch:
+                    self._write(batch)
+            except Exception as e:
+                logger.warning(f"Failed to write {len(batch)} memory audit events: {e}")
+            finally:
+                for _ in range(len(batch) + closed):
+                    self._queue.task_done()
+            if closed:
+                return
+
+    def _write(self, batch: list[MemoryAuditEvent]) -> None:
+        with self.session_factory() as session, session.begin():
+            session.execute(insert(MemoryAuditLogEntity).values([audit_event.to_row() for audit_event in batch]))
+
+
+def audit(audit_log: Optional[MemoryAuditLog], session: Any, entity: MemoryEntryEntity | Row, action: MemoryAuditAction, operation: str, **detail: Any) -> None:
+    """
+    Stage the audit event of a mutation of `entity` (or of a row with its id, user_id and memory_type)
+    by `operation`, a no-op without an audit log.
+    """
+    if audit_log is None:
+        return
+    detail = {key: value[:DETAIL_TEXT_LIMIT] if isinstance(value, str) else value for key, value in detail.items()}
+    audit_log.stage(session, MemoryAuditEvent(entity.id, entity.user_id, action, {"operation": operation, "memory_type": entity.memory_type, **detail}))
+
+
+def _staged_in(transaction: Optional[SessionTransaction], ended: SessionTransaction) -> bool:
+    while transaction is not None:
+        if transaction is ended:
+            return True
+        transaction = transaction.parent
+    return False
+
+
+@event.listens_for(Session, "after_commit")
+def _record_committed(session: Session) -> None:
+    # also called for released savepoints, their events wait for the outermost transaction
+    if session.in_nested_transaction():
+        return
+    for _, audit_log, audit_event in session.info.pop(_STAGED_KEY, []):
+        audit_log.record(audit_event)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_rolled_back(session: Session, previous_transaction: SessionTransaction) -> None:
+    staged = session.info.get(_STAGED_KEY)
+    if staged:
+        session.info[_STAGED_KEY] = [item for item in staged if not _staged_in(item[0], previous_transaction)]
@@ -1,13 +1,14 @@
-from sqlalchemy import TEXT, DateTime
+from sqlalchemy import TEXT, BigInteger, ColumnElement, DateTime
 from sqlalchemy.orm import Mapped, mapped_column
-from pgvector.sqlalchemy import Vector
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID, JSONB, BOOLEAN
 from datetime import datetime, timezone
-from typing import Any, Self
+from typing import Optional, Self
 from uuid import UUID
 
 from app.chatbot.chatbot_models import MemoryEntry, MemoryType
 from app.common.entities import BaseEntity
+from app.common.vector_index import vector_distance
+from app.common.vector_types import Embedding, EmbeddingVector
 
 
 class MemoryEntryEntity(BaseEntity):
@@ -20,7 +21,7 @@ class MemoryEntryEntity(BaseEntity):
     memory_type: Mapped[str] = mapped_column(TEXT, nullable=False)
     content: Mapped[str] = mapped_column(TEXT, nullable=False)
     meta_info: Mapped[dict] = mapped_column(JSONB, nullable=False)
-    embedding: Mapped[Any] = mapped_column(Vector(1536), nullable=False)
+    embedding: Mapped[Embedding] = mapped_column(EmbeddingVector(1536), nullable=False, deferred=True, deferred_raiseload=True)
     is_active: Mapped[bool] = mapped_column(BOOLEAN, nullable=False)
     evicted_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
@@ -33,6 +34,14 @@ class MemoryEntryEntity(BaseEntity):
         default=datetime.now(timezone.utc),
         doc="Timestamp when the Memory Entry was created",
     )
+    # Written by the memory access tracker only, never from the domain model
+    last_accessed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True, doc="Timestamp when the Memory Entry was last read")
+    access_count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, server_default="0", doc="Number of reads of the Memory Entry")
+
+    @classmethod
+    def embedding_distance(cls, embedding: Embedding, storage: str = "vector") -> ColumnElement[float]:
+        """Cosine, the canonical distance for memory entries (HNSW index with vector_cosine_ops)"""
+        return vector_distance(cls.embedding, embedding, "cosine", storage)
 
     @classmethod
     def from_domain(cls, model: MemoryEntry) -> Self:
@@ -41,7 +50,7 @@ class MemoryEntryEntity(BaseEntity):
             user_id=model.user_id,
             memory_type=model.memory_type.value,
             content=model.content,
-            metadata=model.metadata,
+            meta_info=model.metadata,
             embedding=model.embedding,
             is_active=model.is_active,
             evicted_at=model.evicted_at,
@@ -55,8 +64,23 @@ class MemoryEntryEntity(BaseEntity):
             memory_type=MemoryType(self.memory_type),
             content=self.content,
             metadata=self.meta_info,
-            embedding=self.embedding,
+            embedding=self.loaded("embedding", []),
             is_active=self.is_active,
             evicted_at=self.evicted_at,
+            last_accessed_at=self.last_accessed_at,
+            access_count=self.access_count,
             created_at=self.created_at,
         )
+
+
+class MemoryAuditLogEntity(BaseEntity):
+    """One mutation of a Memory Entry, written by the memory audit log"""
+
+    __tablename__ = "memory_audit_log"
+
+    log_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    entry_id: Mapped[UUID] = mapped_column(PG_UUID(as_uuid=True), nullable=False)
+    user_id: Mapped[Optional[UUID]] = mapped_column(PG_UUID(as_uuid=True), nullable=True)
+    action: Mapped[str] = mapped_column(TEXT, nullable=False)
+    detail: Mapped[dict] = mapped_column(JSONB, nullable=True, default=dict)
+    action_time: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
@@ -1,43 +1,59 @@
+from typing import Optional, Sequence
 from uuid import UUID
 
-from sqlalchemy import func, select, update
+from sqlalchemy import select
+from sqlalchemy.orm import Session
 from app.chatbot.chatbot_models import MemoryEntry, PaginatedResult
+from app.chatbot.workflows.memories.memory_access import MemoryAccessTracker
 from app.chatbot.workflows.memories.memory_entities import MemoryEntryEntity
 from app.common.models import MemoryManagementConfig
 from app.common.repositories import BaseRepository
-from app.chatbot.messages.message_entities import MessageEntity
+from app.chatbot.messages.message_entities import MessageCountEntity, MessageEntity
+from app.chatbot.messages.message_repositories import recall_window
+from app.common.pagination import in_rank_order, page_ids, ranked_id_cache, ranking_key, total_pages
+from app.common.read_replica import read_only
+from app.common.vector_types import Embedding
 
 
 class MemoryManager(BaseRepository):
-    def search(self, user_id: UUID, embeddings: list[float], top_k: int = 3) -> list[MemoryEntry]:
-        sub_q = (
-            select(MemoryEntryEntity)
-            .where(MemoryEntryEntity.user_id == user_id)
-            .order_by(MemoryEntryEntity.embedding.l2_distance(embeddings), MemoryEntryEntity.created_at.desc())
-            .limit(top_k)
+    """
+    Memory entries of the v1 tools. Reads are plain SELECTs on the read replica, the entries they
+    return are reported to `access_tracker`, which writes their access statistics behind (see
+    app.chatbot.workflows.memories.memory_access).
+    """
+
+    def __init__(self, session: Session, access_tracker: Optional[MemoryAccessTracker] = None):
+        super().__init__(session)
+        self.access_tracker = access_tracker
+
+    def _accessed(self, entities: Sequence[MemoryEntryEntity]) -> list[MemoryEntry]:
+        if self.access_tracker is not None:
+            self.access_tracker.record(entity.id for entity in entities)
+        return [entity.to_domain() for entity in entities]
+
+    @read_only
+    def search(self, user_id: UUID, embeddings: Embedding, top_k: int = 3, ef_search: Optional[int] = None) -> list[MemoryEntry]:
+        stmt = self.vector_search(
+            select(MemoryEntryEntity).where(MemoryEntryEntity.user_id == user_id), MemoryEntryEntity, embeddings, top_k, MemoryEntryEntity.created_at.desc(), ef_search=ef_search
         )
-
-        stmt = update(MemoryEntryEntity).where(MemoryEntryEntity.id.in_(select(sub_q.c.id))).values(is_active=True).returning(MemoryEntryEntity)
-
-        result = self.session.execute(stmt)
-        # scalars() gives ORM‐mapped objects
-        entities = result.scalars().all()
-        self.session.commit()
-        return [ent.to_domain() for ent in entities]
+        return self._accessed(self.session.scalars(stmt).all())
 
     def update_memory(self, domain: MemoryEntry) -> None:
         """Upserts MemoryEntryEntity from a domain model"""
 
         memory_entity = MemoryEntryEntity.from_domain(domain)
         self.session.merge(memory_entity)
-        self.session.commit()
+        self.commit()
+        ranked_id_cache.invalidate("memory_entries", domain.user_id)
 
     def update_memory_batch(self, domains: list[MemoryEntry]) -> None:
         """Upserts a batch of MemoryEntryEntity from domain models"""
 
         memory_entities = [MemoryEntryEntity.from_domain(domain) for domain in domains]
         self.session.bulk_save_objects(memory_entities)
-        self.session.commit()
+        self.commit()
+        for user_id in {domain.user_id for domain in domains}:
+            ranked_id_cache.invalidate("memory_entries", user_id)
 
     def evict_memory(self, entry_id: UUID) -> None:
         """Makes the memory in-active"""
@@ -50,89 +66,66 @@ class MemoryManager(BaseRepository):
         self.session.query(MemoryEntryEntity).filter(MemoryEntryEntity.id.in_(ids)).delete()
         self.commit()
 
+    @read_only
     def read(self, user_id: UUID, limit: int = 100) -> list[MemoryEntry]:
         """Reads the top N latest entries"""
 
-        # 1) pick the IDs we want
-        subq = select(MemoryEntryEntity.id).where(MemoryEntryEntity.user_id == user_id).order_by(MemoryEntryEntity.created_at.desc()).limit(limit).subquery()
+        stmt = select(MemoryEntryEntity).where(MemoryEntryEntity.user_id == user_id).order_by(MemoryEntryEntity.created_at.desc()).limit(limit)
+        return self._accessed(self.session.scalars(stmt).all())
 
-        # 2) update + returning
-        stmt = (
-            update(MemoryEntryEntity).where(MemoryEntryEntity.id.in_(select(subq.c.id))).values(is_active=True).returning(MemoryEntryEntity)  # ← ask SQL to spill back full rows
-        )
-
-        result = self.session.execute(stmt)
-        # scalars() gives ORM‐mapped objects
-        entities = result.scalars().all()
-        self.session.commit()
-
-        return [ent.to_domain() for ent in entities]
-
-    def search_paginated(self, user_id: UUID, embeddings: list[float], page: int = 1) -> PaginatedResult[MemoryEntry]:
+    @read_only
+    def search_paginated(self, user_id: UUID, embeddings: Embedding, page: int = 1, ef_search: Optional[int] = None) -> PaginatedResult[MemoryEntry]:
         """Search memory with pagination support"""
 
         page_size = MemoryManagementConfig.MEMORY_SEARCH_PAGE_SIZE
-        offset = (page - 1) * page_size
-
-        # Get total count
-        count_stmt = select(func.count(MemoryEntryEntity.id)).where(MemoryEntryEntity.user_id == user_id, MemoryEntryEntity.is_active)
-        total_count = self.session.scalar(count_stmt) or 0
-        total_pages = (total_count + page_size - 1) // page_size  # Ceiling division
-
-        # Get paginated results
-        sub_q = (
-            select(MemoryEntryEntity)
-            .where(MemoryEntryEntity.user_id == user_id, MemoryEntryEntity.is_active)
-            .order_by(MemoryEntryEntity.embedding.l2_distance(embeddings), MemoryEntryEntity.created_at.desc())
-            .offset(offset)
-            .limit(page_size)
+
+        # Rank once per query, every page loads its ids (see app.common.pagination)
+        ids = self.ranked_ids(
+            ranking_key("memory_entries", user_id, embeddings),
+            select(MemoryEntryEntity.id).where(MemoryEntryEntity.user_id == user_id, MemoryEntryEntity.is_active),
+            MemoryEntryEntity,
+            embeddings,
+            MemoryEntryEntity.created_at.desc(),
+            ef_search=ef_search,
         )
 
-        stmt = update(MemoryEntryEntity).where(MemoryEntryEntity.id.in_(select(sub_q.c.id))).values(is_active=True).returning(MemoryEntryEntity)
-        result = self.session.execute(stmt)
-        # scalars() gives ORM‐mapped objects
-        entities = result.scalars().all()
-        self.session.commit()
+        ids_on_page = page_ids(ids, page, page_size)
+        entities = in_rank_order(self.session.scalars(select(MemoryEntryEntity).where(MemoryEntryEntity.id.in_(ids_on_page), MemoryEntryEntity.is_active)).all(), ids_on_page)
 
-        results = [entity.to_domain() for entity in entities]
-        return PaginatedResult[MemoryEntry](results=results, page=page, total_pages=total_pages, total_count=total_count, page_size=page_size)
+        results = self._accessed(entities)
+        return PaginatedResult[MemoryEntry](results=results, page=page, total_pages=total_pages(len(ids), page_size), total_count=len(ids), page_size=page_size)
 
-    async def search_conversation_paginated_by_user_id_and_embeddings(self, user_id: UUID, embeddings: list[float], page: int = 1) -> PaginatedResult[MemoryEntry]:
+    @read_only
+    async def search_conversation_paginated_by_user_id_and_embeddings(
+        self, user_id: UUID, embeddings: Embedding, page: int = 1, ef_search: Optional[int] = None
+    ) -> PaginatedResult[MemoryEntry]:
         from app.chatbot.chatbot_models import MemoryEntry, MemoryType
         from app.common.models import MemoryManagementConfig
-        from sqlalchemy import func
 
         page_size = MemoryManagementConfig.MEMORY_SEARCH_PAGE_SIZE
-        offset = (page - 1) * page_size
-
-        # Get total count
-        count_stmt = select(func.count(MessageEntity.id)).where(MessageEntity.sender_id == user_id)
-        total_count = self.session.scalar(count_stmt) or 0
-        total_pages = (total_count + page_size - 1) // page_size
-
-        distance_expr = MessageEntity.message_embedding.l2_distance(embeddings)
-        similarity_expr = (1 / (1 + distance_expr)).label("confidence")
-
-        # Get paginated results
-        stmt = (
-            select(MessageEntity, similarity_expr)
-            .where(MessageEntity.sender_id == user_id)
-            .order_by(MessageEntity.message_embedding.l2_distance(embeddings), MessageEntity.created_at.desc())
-            .offset(offset)
-            .limit(page_size)
+        message_count = self.session.scalar(select(MessageCountEntity.message_count).where(MessageCountEntity.sender_id == user_id)) or 0
+        ids = self.ranked_ids(
+            ranking_key("messages", user_id, embeddings),
+            select(MessageEntity.id).where(MessageEntity.sender_id == user_id, recall_window()),
+            MessageEntity,
+            embeddings,
+            MessageEntity.created_at.desc(),
+            ef_search=ef_search,
+            filtered_rows=message_count,
         )
 
-        rows = self.session.scalars(stmt).all()
+        ids_on_page = page_ids(ids, page, page_size)
+        rows = in_rank_order(self.session.scalars(select(MessageEntity).where(MessageEntity.id.in_(ids_on_page), recall_window())).all(), ids_on_page)
         results = [
             MemoryEntry(
                 id=e.id,
                 user_id=user_id,
                 memory_type=MemoryType.RECALL,
                 content=e.message,
-                embedding=e.message_embedding,
+                embedding=e.loaded("message_embedding", []),
                 created_at=e.created_at,
             )
             for e in rows
         ]
 
-        return PaginatedResult[MemoryEntry](results=results, page=page, total_pages=total_pages, total_count=total_count, page_size=page_size)
+        return PaginatedResult[MemoryEntry](results=results, page=page, total_pages=total_pages(len(ids), page_size), total_count=len(ids), page_size=page_size)
@@ -1,17 +1,31 @@
+from typing import TYPE_CHECKING, Optional
 from uuid import UUID, uuid4
 from sqlalchemy import select, delete
+from sqlalchemy.orm import Session
 from app.chatbot.chatbot_models import MemoryEntry
+from app.chatbot.workflows.memories.memory_audit import MemoryAuditAction, MemoryAuditLog, audit
 from app.chatbot.workflows.memories.memory_entities import MemoryEntryEntity
 from app.common.models import MemoryType
-from app.common.repositories import BaseRepository
+from app.common.repositories import AsyncBaseRepository, BaseRepository
+from app.common.vector_types import Embedding
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
 
 
 class MemoryManagerV2(BaseRepository):
-    """Memory manager with unique blocks per memory type"""
+    """Memory manager with unique blocks per memory type. Mutations are recorded in `audit_log`."""
+
+    def __init__(self, session: Session, audit_log: Optional[MemoryAuditLog] = None):
+        super().__init__(session)
+        self.audit_log = audit_log
 
-    def upsert_memory_block(self, user_id: UUID, memory_type: MemoryType, content: str, embedding: list[float] = None) -> MemoryEntry:
+    def upsert_memory_block(self, user_id: UUID, memory_type: MemoryType, content: str, embedding: Optional[Embedding] = None) -> MemoryEntry:
         """Create or update unique memory block for given type"""
 
+        return self._upsert(user_id, memory_type, content, embedding, "upsert_memory_block", text=content)
+
+    def _upsert(self, user_id: UUID, memory_type: MemoryType, content: str, embedding: Optional[Embedding], operation: str, **detail) -> MemoryEntry:
         # Check if block exists
         stmt = select(MemoryEntryEntity).where(MemoryEntryEntity.user_id == user_id, MemoryEntryEntity.memory_type == memory_type.value)
         existing = self.session.scalar(stmt)
@@ -19,16 +33,18 @@ class MemoryManagerV2(BaseRepository):
         if existing:
             # Update existing block
             existing.content = content
-            if embedding:
+            if embedding is not None:
                 existing.embedding = embedding
-            self.session.commit()
+            audit(self.audit_log, self.session, existing, MemoryAuditAction.UPDATED, operation, **detail)
+            self.commit()
             return existing.to_domain()
         else:
             # Create new block
-            memory_entry = MemoryEntry(id=uuid4(), user_id=user_id, memory_type=memory_type, content=content, embedding=embedding or [], metadata={})
+            memory_entry = MemoryEntry(id=uuid4(), user_id=user_id, memory_type=memory_type, content=content, embedding=embedding if embedding is not None else [], metadata={})
             entity = MemoryEntryEntity.from_domain(memory_entry)
             self.session.add(entity)
-            self.session.commit()
+            audit(self.audit_log, self.session, entity, MemoryAuditAction.CREATED, operation, **detail)
+            self.commit()
             return memory_entry
 
     def replace_in_memory_block(self, user_id: UUID, memory_type: MemoryType, old_text: str, new_text: str) -> MemoryEntry | None:
@@ -42,8 +58,9 @@ class MemoryManagerV2(BaseRepository):
 
         # Perform replacement
         entity.content = entity.content.replace(old_text, new_text)
+        audit(self.audit_log, self.session, entity, MemoryAuditAction.UPDATED, "replace_in_memory_block", old_text=old_text, new_text=new_text)
 
-        self.session.commit()
+        self.commit()
         return entity.to_domain()
 
     def read_memory_block(self, user_id: UUID, memory_type: MemoryType) -> MemoryEntry | None:
@@ -69,10 +86,16 @@ class MemoryManagerV2(BaseRepository):
     def delete_memory_block(self, user_id: UUID, memory_type: MemoryType) -> bool:
         """Delete entire memory block for given type"""
 
-        stmt = delete(MemoryEntryEntity).where(MemoryEntryEntity.user_id == user_id, MemoryEntryEntity.memory_type == memory_type.value)
-        result = self.session.execute(stmt)
-        self.session.commit()
-        return result.rowcount > 0
+        stmt = (
+            delete(MemoryEntryEntity)
+            .where(MemoryEntryEntity.user_id == user_id, MemoryEntryEntity.memory_type == memory_type.value)
+            .returning(MemoryEntryEntity.id, MemoryEntryEntity.user_id, MemoryEntryEntity.memory_type)
+        )
+        deleted = self.session.execute(stmt).all()
+        for row in deleted:
+            audit(self.audit_log, self.session, row, MemoryAuditAction.DELETED, "delete_memory_block")
+        self.commit()
+        return len(deleted) > 0
 
     def get_memory_block_size(self, user_id: UUID, memory_type: MemoryType) -> int:
         """Get character count of memory block"""
@@ -90,4 +113,93 @@ class MemoryManagerV2(BaseRepository):
         else:
             new_content = text
 
-        return self.upsert_memory_block(user_id, memory_type, new_content)
+        return self._upsert(user_id, memory_type, new_content, None, "append_to_memory_block", text=text)
+
+
+class AsyncMemoryManagerV2(AsyncBaseRepository):
+    """`MemoryManagerV2` on the async backend"""
+
+    def __init__(self, session: "AsyncSession", audit_log: Optional[MemoryAuditLog] = None):
+        super().__init__(session)
+        self.audit_log = audit_log
+
+    async def _find_block(self, user_id: UUID, memory_type: MemoryType) -> MemoryEntryEntity | None:
+        stmt = select(MemoryEntryEntity).where(MemoryEntryEntity.user_id == user_id, MemoryEntryEntity.memory_type == memory_type.value)
+        return await self.session.scalar(stmt)
+
+    async def upsert_memory_block(self, user_id: UUID, memory_type: MemoryType, content: str, embedding: Optional[Embedding] = None) -> MemoryEntry:
+        """Create or update unique memory block for given type"""
+
+        return await self._upsert(user_id, memory_type, content, embedding, "upsert_memory_block", text=content)
+
+    async def _upsert(self, user_id: UUID, memory_type: MemoryType, content: str, embedding: Optional[Embedding], operation: str, **detail) -> MemoryEntry:
+        existing = await self._find_block(user_id, memory_type)
+        if existing:
+            existing.content = content
+            if embedding is not None:
+                existing.embedding = embedding
+            audit(self.audit_log, self.session, existing, MemoryAuditAction.UPDATED, operation, **detail)
+            await self.commit()
+            return existing.to_domain()
+
+        memory_entry = MemoryEntry(id=uuid4(), user_id=user_id, memory_type=memory_type, content=content, embedding=embedding if embedding is not None else [], metadata={})
+        entity = MemoryEntryEntity.from_domain(memory_entry)
+        self.session.add(entity)
+        audit(self.audit_log, self.session, entity, MemoryAuditAction.CREATED, operation, **detail)
+        await self.commit()
+        return memory_entry
+
+    async def replace_in_memory_block(self, user_id: UUID, memory_type: MemoryType, old_text: str, new_text: str) -> MemoryEntry | None:
+        """Replace specific text within a memory block"""
+
+        entity = await self._find_block(user_id, memory_type)
+        if not entity:
+            return None
+
+        entity.content = entity.content.replace(old_text, new_text)
+        audit(self.audit_log, self.session, entity, MemoryAuditAction.UPDATED, "replace_in_memory_block", old_text=old_text, new_text=new_text)
+        await self.commit()
+        return entity.to_domain()
+
+    async def read_memory_block(self, user_id: UUID, memory_type: MemoryType) -> MemoryEntry | None:
+        """Read entire memory block for given type"""
+
+        entity = await self._find_block(user_id, memory_type)
+        return entity.to_domain() if entity else None
+
+    async def get_all_memory_blocks(self, user_id: UUID) -> dict[str, MemoryEntry]:
+        """Get all memory blocks for a user, organized by type"""
+
+        entities = await self.session.scalars(select(MemoryEntryEntity).where(MemoryEntryEntity.user_id == user_id))
+        return {MemoryType(entity.memory_type).value: entity.to_domain() for entity in entities}
+
+    async def delete_memory_block(self, user_id: UUID, memory_type: MemoryType) -> bool:
+        """Delete entire memory block for given type"""
+
+        stmt = (
+            delete(MemoryEntryEntity)
+            .where(MemoryEntryEntity.user_id == user_id, MemoryEntryEntity.memory_type == memory_type.value)
+            .returning(MemoryEntryEntity.id, MemoryEntryEntity.user_id, MemoryEntryEntity.memory_type)
+        )
+        deleted = (await self.session.execute(stmt)).all()
+        for row in deleted:
+            audit(self.audit_log, self.session, row, MemoryAuditAction.DELETED, "delete_memory_block")
+        await self.commit()
+        return len(deleted) > 0
+
+    async def get_memory_block_size(self, user_id: UUID, memory_type: MemoryType) -> int:
+        """Get character count of memory block"""
+
+        block = await self.read_memory_block(user_id, memory_type)
+        return len(block.content) if block else 0
+
+    async def append_to_memory_block(self, user_id: UUID, memory_type: MemoryType, text: str, separator: str = "\n") -> MemoryEntry:
+        """Append text to existing memory block or create new one"""
+
+        existing_block = await self.read_memory_block(user_id, memory_type)
+        if existing_block:
+            new_content = existing_block.content + separator + text if existing_block.content else text
+        else:
+            new_content = text
+
+        return await self._upsert(user_id, memory_type, new_content, None, "append_to_memory_block", text=text)
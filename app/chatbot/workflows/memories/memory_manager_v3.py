@@ -1,31 +1,48 @@
+import asyncio
+from typing import TYPE_CHECKING, Optional
 from uuid import UUID
 
-from sqlalchemy import select
+from sqlalchemy import Select, func, select
 from sqlalchemy.orm import Session
 from app.chatbot.chatbot_models import MemoryEntry, PaginatedResult
+from app.chatbot.workflows.memories.memory_audit import MemoryAuditAction, MemoryAuditLog, audit
 from app.chatbot.workflows.memories.memory_entities import MemoryEntryEntity
 from app.common.models import MemoryType
-from app.common.repositories import BaseRepository
+from app.common.repositories import AsyncBaseRepository, BaseRepository
 from app.common.vector_embedders import BaseVectorEmbedder
+from app.common.pagination import ranked_id_cache, ranking_key
+from app.common.read_replica import read_only
+from app.common.vector_types import Embedding
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def _page_ids(user_id: UUID, memory_type: MemoryType) -> Select:
+    return select(MemoryEntryEntity.id).where(MemoryEntryEntity.user_id == user_id, MemoryEntryEntity.memory_type == memory_type.value)
 
 
 class MemoryManagerV3(BaseRepository):
-    """Advance Paginated Memory Manager"""
+    """Advance Paginated Memory Manager. Mutations are recorded in `audit_log`."""
 
-    def __init__(self, session: Session, embedder: BaseVectorEmbedder):
+    def __init__(self, session: Session, embedder: BaseVectorEmbedder, audit_log: Optional[MemoryAuditLog] = None):
         super().__init__(session)
         self.embedder = embedder
+        self.audit_log = audit_log
         self.page_size = 100  # tokens
 
     def _convert_to_token_count(self, text: str) -> int:
         """Convert text length to approximate token count (1 token ≈ 4 characters)"""
         return len(text) // 4
 
+    def _count_pages(self, user_id: UUID, memory_type: MemoryType) -> int:
+        stmt = select(func.count(MemoryEntryEntity.id)).where(MemoryEntryEntity.user_id == user_id, MemoryEntryEntity.memory_type == memory_type.value)
+        return self.session.scalar(stmt) or 0
+
     def append(self, memory_entry: MemoryEntry) -> PaginatedResult[MemoryEntry]:
         """Appends the text to the given memory block. If the last page of memory block is full, it creates a new page and appends the text to it"""
-        total_pages = (
-            self.session.query(MemoryEntryEntity).filter(MemoryEntryEntity.user_id == memory_entry.user_id, MemoryEntryEntity.memory_type == memory_entry.memory_type.value).count()
-        )
+        total_pages = self._count_pages(memory_entry.user_id, memory_entry.memory_type)
+        ranked_id_cache.invalidate("memory_blocks", memory_entry.user_id)
         stmt = (
             select(MemoryEntryEntity)
             .where(MemoryEntryEntity.user_id == memory_entry.user_id, MemoryEntryEntity.memory_type == memory_entry.memory_type.value)
@@ -38,7 +55,8 @@ class MemoryManagerV3(BaseRepository):
             memory_entry.metadata["page_size"] = self._convert_to_token_count(memory_entry.content)
             entity = MemoryEntryEntity.from_domain(memory_entry)
             self.session.add(entity)
-            self.session.commit()
+            audit(self.audit_log, self.session, entity, MemoryAuditAction.CREATED, "append", page=1, text=memory_entry.content)
+            self.commit()
             return PaginatedResult(results=[entity.to_domain()], total_pages=1, page=1, total_count=self._convert_to_token_count(memory_entry.content), page_size=self.page_size)
 
         existing_page_tokens = self._convert_to_token_count(entity.content)
@@ -48,7 +66,8 @@ class MemoryManagerV3(BaseRepository):
             memory_entry.metadata["page_size"] = self._convert_to_token_count(memory_entry.content)
             entity = MemoryEntryEntity.from_domain(memory_entry)
             self.session.add(entity)
-            self.session.commit()
+            audit(self.audit_log, self.session, entity, MemoryAuditAction.CREATED, "append", page=total_pages + 1, text=memory_entry.content)
+            self.commit()
             return PaginatedResult(
                 results=[entity.to_domain()],
                 total_pages=total_pages + 1,
@@ -59,14 +78,19 @@ class MemoryManagerV3(BaseRepository):
         else:
             entity.content += memory_entry.content
             entity.embedding = self.embedder.embed_single_text(entity.content)
-            self.session.commit()
+            audit(self.audit_log, self.session, entity, MemoryAuditAction.UPDATED, "append", page=total_pages, text=memory_entry.content)
+            self.commit()
             return PaginatedResult(
                 results=[entity.to_domain()], total_pages=total_pages, page=total_pages, total_count=self._convert_to_token_count(entity.content), page_size=self.page_size
             )
 
     def replace(self, user_id: UUID, memory_type: MemoryType, page: int, old_txt: str, new_txt: str) -> PaginatedResult[MemoryEntry]:
         """Replaces the text in the specified page of the memory block."""
-        total_pages = self.session.query(MemoryEntryEntity).filter(MemoryEntryEntity.user_id == user_id, MemoryEntryEntity.memory_type == memory_type.value).count()
+        return self._replace(user_id, memory_type, page, old_txt, new_txt, MemoryAuditAction.UPDATED, "replace")
+
+    def _replace(self, user_id: UUID, memory_type: MemoryType, page: int, old_txt: str, new_txt: str, action: MemoryAuditAction, operation: str) -> PaginatedResult[MemoryEntry]:
+        total_pages = self._count_pages(user_id, memory_type)
+        ranked_id_cache.invalidate("memory_blocks", user_id)
         stmt = (
             select(MemoryEntryEntity)
             .where(MemoryEntryEntity.user_id == user_id, MemoryEntryEntity.memory_type == memory_type.value)
@@ -80,33 +104,128 @@ class MemoryManagerV3(BaseRepository):
 
         entity.content = entity.content.replace(old_txt, new_txt)
         entity.embedding = self.embedder.embed_single_text(entity.content)
-        self.session.commit()
+        audit(self.audit_log, self.session, entity, action, operation, page=page, old_text=old_txt, new_text=new_txt)
+        self.commit()
         return PaginatedResult(results=[entity.to_domain()], total_pages=total_pages, page=page, total_count=self._convert_to_token_count(entity.content), page_size=self.page_size)
 
     def evict(self, user_id: UUID, memory_type: MemoryType, page: int, text: str) -> PaginatedResult[MemoryEntry]:
-        return self.replace(user_id, memory_type, page, text, "")
+        return self._replace(user_id, memory_type, page, text, "", MemoryAuditAction.EVICTED, "evict")
 
-    def read(self, user_id: UUID, memory_type: MemoryType, query: str, page: int = 1) -> PaginatedResult[MemoryEntry]:
+    @read_only
+    def read(self, user_id: UUID, memory_type: MemoryType, query: str, page: int = 1, ef_search: Optional[int] = None) -> PaginatedResult[MemoryEntry]:
         """Reads the memory block and returns the text"""
-        embeddings = self.embedder.embed_single_text(query)
-
-        # Get total count of matching pages
-        total_count_stmt = select(MemoryEntryEntity).where(MemoryEntryEntity.user_id == user_id, MemoryEntryEntity.memory_type == memory_type.value)
-        total_pages = len(self.session.scalars(total_count_stmt).all())
-
+        # Pages are ranked once per query, later pages neither embed the query again nor search
+        key = ranking_key("memory_blocks", user_id, query, memory_type.value)
+        ids = ranked_id_cache.get(key)
+        if ids is None:
+            embeddings = self.embedder.embed_single_text(query)
+            ids = self.ranked_ids(key, _page_ids(user_id, memory_type), MemoryEntryEntity, embeddings, ef_search=ef_search, filtered_rows=self._count_pages(user_id, memory_type))
+
+        total_pages = len(ids)
         if total_pages == 0:
             return PaginatedResult(results=[], total_pages=0, page=page, total_count=0, page_size=self.page_size)
 
-        # Get the specific page requested
+        entity = self.session.get(MemoryEntryEntity, ids[page - 1]) if 0 < page <= total_pages else None
+        if not entity:
+            raise ValueError(f"Page {page} does not exist.")
+
+        return PaginatedResult(results=[entity.to_domain()], total_pages=total_pages, page=page, total_count=self._convert_to_token_count(entity.content), page_size=self.page_size)
+
+
+class AsyncMemoryManagerV3(AsyncBaseRepository):
+    """`MemoryManagerV3` on the async backend. Embedding calls are blocking HTTP calls, so they run in a worker thread."""
+
+    def __init__(self, session: "AsyncSession", embedder: BaseVectorEmbedder, audit_log: Optional[MemoryAuditLog] = None):
+        super().__init__(session)
+        self.embedder = embedder
+        self.audit_log = audit_log
+        self.page_size = 100  # tokens
+
+    def _convert_to_token_count(self, text: str) -> int:
+        """Convert text length to approximate token count (1 token ≈ 4 characters)"""
+        return len(text) // 4
+
+    async def _embed(self, text: str) -> Embedding:
+        return await asyncio.to_thread(self.embedder.embed_single_text, text)
+
+    async def _count_pages(self, user_id: UUID, memory_type: MemoryType) -> int:
+        stmt = select(func.count(MemoryEntryEntity.id)).where(MemoryEntryEntity.user_id == user_id, MemoryEntryEntity.memory_type == memory_type.value)
+        return await self.session.scalar(stmt) or 0
+
+    async def append(self, memory_entry: MemoryEntry) -> PaginatedResult[MemoryEntry]:
+        """Appends the text to the given memory block. If the last page of memory block is full, it creates a new page and appends the text to it"""
+        total_pages = await self._count_pages(memory_entry.user_id, memory_entry.memory_type)
+        ranked_id_cache.invalidate("memory_blocks", memory_entry.user_id)
+        stmt = (
+            select(MemoryEntryEntity)
+            .where(MemoryEntryEntity.user_id == memory_entry.user_id, MemoryEntryEntity.memory_type == memory_entry.memory_type.value)
+            .order_by(MemoryEntryEntity.created_at.desc())
+            .limit(1)
+        )
+        entity = await self.session.scalar(stmt)
+        new_content_tokens = self._convert_to_token_count(memory_entry.content)
+        if not entity or self._convert_to_token_count(entity.content) + new_content_tokens > self.page_size:
+            # memory block is empty or its last page is full, create a new page
+            memory_entry.metadata["page_size"] = new_content_tokens
+            entity = MemoryEntryEntity.from_domain(memory_entry)
+            self.session.add(entity)
+            audit(self.audit_log, self.session, entity, MemoryAuditAction.CREATED, "append", page=total_pages + 1, text=memory_entry.content)
+            await self.commit()
+            return PaginatedResult(results=[entity.to_domain()], total_pages=total_pages + 1, page=total_pages + 1, total_count=new_content_tokens, page_size=self.page_size)
+
+        entity.content += memory_entry.content
+        entity.embedding = await self._embed(entity.content)
+        audit(self.audit_log, self.session, entity, MemoryAuditAction.UPDATED, "append", page=total_pages, text=memory_entry.content)
+        await self.commit()
+        return PaginatedResult(
+            results=[entity.to_domain()], total_pages=total_pages, page=total_pages, total_count=self._convert_to_token_count(entity.content), page_size=self.page_size
+        )
+
+    async def replace(self, user_id: UUID, memory_type: MemoryType, page: int, old_txt: str, new_txt: str) -> PaginatedResult[MemoryEntry]:
+        """Replaces the text in the specified page of the memory block."""
+        return await self._replace(user_id, memory_type, page, old_txt, new_txt, MemoryAuditAction.UPDATED, "replace")
+
+    async def _replace(
+        self, user_id: UUID, memory_type: MemoryType, page: int, old_txt: str, new_txt: str, action: MemoryAuditAction, operation: str
+    ) -> PaginatedResult[MemoryEntry]:
+        total_pages = await self._count_pages(user_id, memory_type)
+        ranked_id_cache.invalidate("memory_blocks", user_id)
         stmt = (
             select(MemoryEntryEntity)
             .where(MemoryEntryEntity.user_id == user_id, MemoryEntryEntity.memory_type == memory_type.value)
-            .order_by(MemoryEntryEntity.embedding.cosine_distance(embeddings))
+            .order_by(MemoryEntryEntity.created_at.asc())
             .offset(page - 1)
             .limit(1)
         )
-        entity = self.session.scalar(stmt)
+        entity = await self.session.scalar(stmt)
+        if not entity:
+            raise ValueError(f"Provide page: {page} does not exists.")
+
+        entity.content = entity.content.replace(old_txt, new_txt)
+        entity.embedding = await self._embed(entity.content)
+        audit(self.audit_log, self.session, entity, action, operation, page=page, old_text=old_txt, new_text=new_txt)
+        await self.commit()
+        return PaginatedResult(results=[entity.to_domain()], total_pages=total_pages, page=page, total_count=self._convert_to_token_count(entity.content), page_size=self.page_size)
+
+    async def evict(self, user_id: UUID, memory_type: MemoryType, page: int, text: str) -> PaginatedResult[MemoryEntry]:
+        return await self._replace(user_id, memory_type, page, text, "", MemoryAuditAction.EVICTED, "evict")
+
+    @read_only
+    async def read(self, user_id: UUID, memory_type: MemoryType, query: str, page: int = 1, ef_search: Optional[int] = None) -> PaginatedResult[MemoryEntry]:
+        """Reads the memory block and returns the text"""
+        key = ranking_key("memory_blocks", user_id, query, memory_type.value)
+        ids = ranked_id_cache.get(key)
+        if ids is None:
+            embeddings = await self._embed(query)
+            ids = await self.ranked_ids(
+                key, _page_ids(user_id, memory_type), MemoryEntryEntity, embeddings, ef_search=ef_search, filtered_rows=await self._count_pages(user_id, memory_type)
+            )
+
+        total_pages = len(ids)
+        if total_pages == 0:
+            return PaginatedResult(results=[], total_pages=0, page=page, total_count=0, page_size=self.page_size)
 
+        entity = await self.session.get(MemoryEntryEntity, ids[page - 1]) if 0 < page <= total_pages else None
         if not entity:
             raise ValueError(f"Page {page} does not exist.")
 
@@ -0,0 +1,58 @@
+"""
+Sessions of the async DB backend (DB_BACKEND=async, asyncpg).
+
+Kept out of app.common.db_connect so that `sqlalchemy.ext.asyncio` is only imported when the async
+backend opens its first session (app.common.config) or a script uses it, not on every cold start.
+"""
+
+import asyncio
+
+from sqlalchemy import Engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.common.db_connect import READ_REPLICA_ENABLED, async_engine_provider, async_reader_engine_provider
+from app.common.read_replica import RoutingSession
+
+
+def _sync_reader_engine() -> Engine:
+    return async_reader_engine_provider.get_engine().sync_engine
+
+
+class SerializedAsyncSession(AsyncSession):
+    """
+    A request's session is shared by everything the handler runs concurrently (e.g. tools gathered
+    in one epoch). AsyncSession rejects concurrent operations, so they are run one at a time.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._operation_lock = asyncio.Lock()
+
+
+def _serialized(name: str):
+    operation = getattr(AsyncSession, name)
+
+    async def serialized(self: SerializedAsyncSession, *args, **kwargs):
+        async with self._operation_lock:
+            return await operation(self, *args, **kwargs)
+
+    serialized.__name__ = name
+    return serialized
+
+
+# `scalars` goes through `execute`
+for _name in ("execute", "scalar", "get", "flush", "commit", "rollback", "refresh", "delete", "merge", "close"):
+    setattr(SerializedAsyncSession, _name, _serialized(_name))
+
+
+class LazyAsyncSessionMaker(async_sessionmaker):
+    """`async_sessionmaker` that binds to the async engine only when the first session is opened."""
+
+    def __call__(self, **local_kw):
+        local_kw.setdefault("bind", async_engine_provider.get_engine())
+        if READ_REPLICA_ENABLED:
+            local_kw.setdefault("reader", _sync_reader_engine)
+        return super().__call__(**local_kw)
+
+
+AsyncSessionLocal = LazyAsyncSessionMaker(class_=SerializedAsyncSession, sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False)
@@ -1,4 +1,5 @@
-from typing import Literal, Optional
+import atexit
+from typing import TYPE_CHECKING, Literal, Optional
 import os
 from sqlalchemy.orm import Session
 
@@ -6,25 +7,37 @@ from app.chatbot import BaseChatbot, ClaudeSonnetChatbot, GeminiChatbot
 from app.chatbot.chatbot_models import AgentState
 from app.chatbot.chatbot_services import ChatbotService
 from app.chatbot.components.conversation_manager import ConversationManager, SlidingWindowConversationManager
+from app.chatbot.components.prompt_encoders import get_prompt_encoder
+from app.chatbot.components.tools_manager import ToolsManager
 from app.chatbot.components.tools_manager.json_tools_manager import JsonToolsManager
 from app.chatbot.components.tools_manager.yaml_tools_manager import YamlToolsManager
 from app.chatbot.workflows.helpers.krishna_advance_helpers import KrishnaAdvanceWorkflowHelper
 from app.chatbot.workflows.krishna_advance import KrishnaAdvanceWorkflow
 from app.chatbot.workflows.krishna_mini import KrishnaMiniWorkflow
+from app.chatbot.workflows.memories.memory_access import MemoryAccessTracker
+from app.chatbot.workflows.memories.memory_audit import MemoryAuditLog
 from app.chatbot.workflows.memories.memory_manager import MemoryManager
-from app.chatbot.workflows.memories.memory_manager_v2 import MemoryManagerV2
-from app.chatbot.workflows.memories.memory_manager_v3 import MemoryManagerV3
+from app.chatbot.workflows.memories.memory_manager_v2 import AsyncMemoryManagerV2, MemoryManagerV2
+from app.chatbot.workflows.memories.memory_manager_v3 import AsyncMemoryManagerV3, MemoryManagerV3
+from app.common.container import Container, Lifetime
 from app.common.db_connect import SessionLocal
-from app.common.repositories import TransactionManager
+from app.common.models import MemoryManagementConfig
+from app.common.object_store import LocalObjectStore, ObjectStore, S3ObjectStore
+from app.common.repositories import AsyncTransactionManager, AwaitableRepository, TransactionManager
+from app.common.unit_of_work import UnitOfWork, current_unit_of_work
+from app.common.tracing import DatabaseTraceSink, NullTraceSink, PromptTracer, RingBufferTraceSink, RotatingFileTraceSink, TraceSampler, TraceSink
 from app.common.vector_embedders import BaseVectorEmbedder, LangChainTitanEmbedder
 from app.common.workflows import BaseAgentWorkflow
 from app.chatbot.chatbot_models import AgentVersion
-from app.chatbot.messages.message_repositories import MessageRepository
+from app.chatbot.messages.message_repositories import AsyncMessageRepository, MessageRepository
 from app.chatbot.messages.message_services import MessageService
 from app.user.user_services import UserService
-from app.user.user_repository import UserRepository
-from app.chatbot.conversation.conversation_repositories import ConversationRepository
-from app.chatbot.conversation.conversation_services import ConversationService
+from app.user.user_repository import AsyncUserRepository, UserRepository
+from app.chatbot.conversation.conversation_repositories import AsyncConversationRepository, ConversationRepository
+from app.chatbot.conversation.conversation_services import ConversationArchiveService, ConversationImportService, ConversationService
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
 
 
 # Application configuration settings
@@ -35,91 +48,283 @@ class AppConfig:
     # Can be overridden by environment variable TOOL_FORMAT
     TOOL_FORMAT = os.getenv("TOOL_FORMAT", "yaml").lower()
 
+    # Prompt encoding: 'compact' or 'json' (indented, messages embedded as JSON strings)
+    # Can be overridden by environment variable PROMPT_ENCODING
+    PROMPT_ENCODING = os.getenv("PROMPT_ENCODING", "compact").lower()
+
+    # Prompt traces: 'disabled', 'ring' (in memory), 'file' (rotating JSON lines) or 'db' (prompt_traces table)
+    # Sampled per request by PROMPT_TRACE_SAMPLE_RATE, users in PROMPT_TRACE_USERS (ids or usernames) are always traced
+    PROMPT_TRACE_SINK = os.getenv("PROMPT_TRACE_SINK", "file" if os.getenv("STAGE", "local").lower() == "local" else "disabled").lower()
+    PROMPT_TRACE_SAMPLE_RATE = float(os.getenv("PROMPT_TRACE_SAMPLE_RATE", "1.0"))
+    PROMPT_TRACE_USERS = frozenset(u.strip() for u in os.getenv("PROMPT_TRACE_USERS", "").split(",") if u.strip())
+    PROMPT_TRACE_DIR = os.getenv("PROMPT_TRACE_DIR", "/tmp/prompt_traces")
+
+    # Database backend for the repositories: 'sync' (psycopg2) or 'async' (asyncpg with AsyncSession)
+    # Repository methods are awaited on both, the sync ones run their queries on the event loop
+    # Can be overridden by environment variable DB_BACKEND
+    DB_BACKEND = os.getenv("DB_BACKEND", "sync").lower()
+
+    # Object store of the conversation archive: the S3 bucket CONVERSATION_ARCHIVE_BUCKET (keys prefixed
+    # with CONVERSATION_ARCHIVE_PREFIX) when set, otherwise the directory CONVERSATION_ARCHIVE_DIR
+    CONVERSATION_ARCHIVE_BUCKET = os.getenv("CONVERSATION_ARCHIVE_BUCKET")
+    CONVERSATION_ARCHIVE_PREFIX = os.getenv("CONVERSATION_ARCHIVE_PREFIX", "")
+    CONVERSATION_ARCHIVE_DIR = os.getenv("CONVERSATION_ARCHIVE_DIR", "/tmp/conversation_archive")
+
 
 def get_session() -> Session:
+    return SessionFactory.get_session()
+
+
+def _build_chatbot(owner: str, model_name: str, temperature: float) -> BaseChatbot:
+    if owner == "google":
+        return GeminiChatbot(model_name=model_name, temperature=temperature)
+    elif owner == "anthropic" and model_name == "sonnet3":
+        return ClaudeSonnetChatbot()
+    raise ValueError(f"Unknown chatbot: {owner} {model_name}")
+
+
+def _build_embedding_model(name: Literal["titan", "gemini"]) -> BaseVectorEmbedder:
+    # match name:
+    #     case "titan":
+    # return LangChainTitanEmbedder()
+    # case "gemini":
+    #     return GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-exp-03-07")
+    return LangChainTitanEmbedder()
+
+
+def _build_unit_of_work() -> UnitOfWork:
+    if AppConfig.DB_BACKEND == "async":
+        from app.common.async_sessions import AsyncSessionLocal
+
+        return UnitOfWork(session_factory=AsyncSessionLocal, is_async=True)
+    return UnitOfWork(session_factory=SessionLocal)
+
+
+def _build_session() -> Session:
+    unit_of_work = current_unit_of_work()
+    if unit_of_work is not None and not unit_of_work.is_async:
+        return unit_of_work.session
     return SessionLocal()
 
 
-# ----- Service and Repository Factories (unchanged) -----
+def _build_async_session() -> "AsyncSession":
+    from app.common.async_sessions import AsyncSessionLocal
+
+    unit_of_work = current_unit_of_work()
+    if unit_of_work is not None and unit_of_work.is_async:
+        return unit_of_work.session
+    return AsyncSessionLocal()
+
+
+def _repository(sync_class: type, async_class: type, **kwargs):
+    """Build the repository for the configured DB backend, both expose an awaitable API."""
+    match AppConfig.DB_BACKEND:
+        case "async":
+            return async_class(session=SessionFactory.get_async_session(), **kwargs)
+        case "sync":
+            return AwaitableRepository(sync_class(session=SessionFactory.get_session(), **kwargs))
+        case _:
+            raise ValueError(f"Unknown DB backend: {AppConfig.DB_BACKEND}. Available: sync, async")
+
+
+def _build_transaction_manager() -> TransactionManager | AsyncTransactionManager:
+    if AppConfig.DB_BACKEND == "async":
+        return AsyncTransactionManager(session=SessionFactory.get_async_session())
+    return TransactionManager(session=SessionFactory.get_session())
+
+
+def _build_prompt_tracer(sink_name: str) -> PromptTracer:
+    sink: TraceSink
+    match sink_name:
+        case "disabled":
+            sink = NullTraceSink()
+        case "ring":
+            sink = RingBufferTraceSink()
+        case "file":
+            sink = RotatingFileTraceSink(AppConfig.PROMPT_TRACE_DIR)
+        case "db":
+            sink = DatabaseTraceSink(session_factory=SessionLocal)
+        case _:
+            raise ValueError(f"Unknown prompt trace sink: {sink_name}. Available: disabled, ring, file, db")
+
+    tracer = PromptTracer(sink, TraceSampler(rate=AppConfig.PROMPT_TRACE_SAMPLE_RATE, users=AppConfig.PROMPT_TRACE_USERS))
+    # Write out queued traces on shutdown
+    atexit.register(tracer.close)
+    return tracer
+
+
+def _build_memory_access_tracker() -> MemoryAccessTracker:
+    tracker = MemoryAccessTracker(session_factory=SessionLocal)
+    # Write out pending hits on shutdown
+    atexit.register(tracker.close)
+    return tracker
+
+
+def _build_memory_audit_log() -> Optional[MemoryAuditLog]:
+    if not MemoryManagementConfig.MEMORY_AUDIT_ENABLED:
+        return None
+    audit_log = MemoryAuditLog(session_factory=SessionLocal)
+    # Write out queued audit events on shutdown
+    atexit.register(audit_log.close)
+    return audit_log
+
+
+def _build_conversation_archive_store() -> ObjectStore:
+    if AppConfig.CONVERSATION_ARCHIVE_BUCKET:
+        return S3ObjectStore(AppConfig.CONVERSATION_ARCHIVE_BUCKET, prefix=AppConfig.CONVERSATION_ARCHIVE_PREFIX)
+    return LocalObjectStore(AppConfig.CONVERSATION_ARCHIVE_DIR)
+
+
+# ----- Dependency registrations -----
+# LLM and embedding clients are process singletons, everything bound to the DB session lives for one request.
+container = Container()
+container.register("chatbot", _build_chatbot, Lifetime.SINGLETON)
+container.register("embedding_model", _build_embedding_model, Lifetime.SINGLETON)
+container.register("prompt_tracer", _build_prompt_tracer, Lifetime.SINGLETON)
+container.register("unit_of_work", _build_unit_of_work, Lifetime.REQUEST)
+container.register("session", _build_session, Lifetime.REQUEST, dispose=lambda session: session.close())
+container.register("async_session", _build_async_session, Lifetime.REQUEST, dispose=lambda session: session.close())
+container.register("transaction_manager", _build_transaction_manager, Lifetime.REQUEST)
+container.register("conversation_repository", lambda: _repository(ConversationRepository, AsyncConversationRepository), Lifetime.REQUEST)
+container.register("user_repository", lambda: _repository(UserRepository, AsyncUserRepository), Lifetime.REQUEST)
+container.register("message_repository", lambda: _repository(MessageRepository, AsyncMessageRepository), Lifetime.REQUEST)
+container.register("memory_access_tracker", _build_memory_access_tracker, Lifetime.SINGLETON)
+container.register(
+    "memory_manager",
+    lambda: MemoryManager(session=SessionFactory.get_session(), access_tracker=container.resolve("memory_access_tracker")),
+    Lifetime.REQUEST,
+)
+container.register("memory_audit_log", _build_memory_audit_log, Lifetime.SINGLETON)
+container.register("memory_manager_v2", lambda: _repository(MemoryManagerV2, AsyncMemoryManagerV2, audit_log=container.resolve("memory_audit_log")), Lifetime.REQUEST)
+container.register(
+    "memory_manager_v3",
+    lambda: _repository(MemoryManagerV3, AsyncMemoryManagerV3, embedder=ChatbotFactory.get_embedding_model("titan"), audit_log=container.resolve("memory_audit_log")),
+    Lifetime.REQUEST,
+)
+container.register(
+    "conversation_service",
+    lambda: ConversationService(conversation_repository=RepositoryFactory.get_conversation_repository(), embedding_model=ChatbotFactory.get_embedding_model("titan")),
+    Lifetime.REQUEST,
+)
+container.register(
+    "conversation_import_service",
+    lambda: ConversationImportService(
+        conversation_repository=RepositoryFactory.get_conversation_repository(),
+        message_repository=RepositoryFactory.get_message_repository(),
+        embedding_model=ChatbotFactory.get_embedding_model("titan"),
+    ),
+    Lifetime.REQUEST,
+)
+container.register("conversation_archive_store", _build_conversation_archive_store, Lifetime.SINGLETON)
+container.register(
+    "conversation_archive_service",
+    lambda: ConversationArchiveService(
+        conversation_repository=RepositoryFactory.get_conversation_repository(),
+        message_repository=RepositoryFactory.get_message_repository(),
+        object_store=container.resolve("conversation_archive_store"),
+    ),
+    Lifetime.REQUEST,
+)
+container.register("user_service", lambda: UserService(RepositoryFactory.get_user_repository()), Lifetime.REQUEST)
+container.register(
+    "chatbot_service",
+    lambda: ChatbotService(
+        chatbot=ChatbotFactory.create_chatbot(owner="anthropic", model_name="sonnet3", temperature=0.0),
+        embedding_model=ChatbotFactory.get_embedding_model(name="titan"),
+        memory_manager=RepositoryFactory.get_memory_manager_v2_repository(),
+    ),
+    Lifetime.REQUEST,
+)
+container.register(
+    "message_service",
+    lambda: MessageService(
+        RepositoryFactory.get_transaction_manager(),
+        RepositoryFactory.get_message_repository(),
+        ServiceFactory.get_chatbot_service(),
+    ),
+    Lifetime.REQUEST,
+)
+
+
+# ----- Service and Repository Factories (resolved through the container) -----
 class SessionFactory:
     @staticmethod
     def get_session() -> Session:
-        return SessionLocal()
+        return container.resolve("session")
+
+    @staticmethod
+    def get_async_session() -> "AsyncSession":
+        return container.resolve("async_session")
 
 
 class ServiceFactory:
     @staticmethod
     def get_conversation_service() -> ConversationService:
-        return ConversationService(conversation_repository=RepositoryFactory.get_conversation_repository(), embedding_model=ChatbotFactory.get_embedding_model("titan"))
+        return container.resolve("conversation_service")
+
+    @staticmethod
+    def get_conversation_import_service() -> ConversationImportService:
+        return container.resolve("conversation_import_service")
+
+    @staticmethod
+    def get_conversation_archive_service() -> ConversationArchiveService:
+        return container.resolve("conversation_archive_service")
 
     @staticmethod
     def get_user_service() -> UserService:
-        return UserService(RepositoryFactory.get_user_repository())
+        return container.resolve("user_service")
 
     @staticmethod
     def get_chatbot_service() -> ChatbotService:
-        return ChatbotService(
-            chatbot=ChatbotFactory.create_chatbot(owner="anthropic", model_name="sonnet3", temperature=0.0),
-            embedding_model=ChatbotFactory.get_embedding_model(name="titan"),
-            memory_manager=RepositoryFactory.get_memory_manager_v2_repository(),
-        )
+        return container.resolve("chatbot_service")
 
     @staticmethod
     def get_message_service() -> MessageService:
-        return MessageService(
-            RepositoryFactory.get_transaction_manager(),
-            RepositoryFactory.get_message_repository(),
-            ServiceFactory.get_chatbot_service(),
-        )
+        return container.resolve("message_service")
 
 
 class RepositoryFactory:
     @staticmethod
-    def get_transaction_manager() -> TransactionManager:
-        return TransactionManager(session=SessionFactory.get_session())
+    def get_unit_of_work() -> UnitOfWork:
+        return container.resolve("unit_of_work")
+
+    @staticmethod
+    def get_transaction_manager() -> TransactionManager | AsyncTransactionManager:
+        return container.resolve("transaction_manager")
 
     @staticmethod
     def get_conversation_repository() -> ConversationRepository:
-        return ConversationRepository(session=SessionFactory.get_session())
+        return container.resolve("conversation_repository")
 
     @staticmethod
     def get_user_repository() -> UserRepository:
-        return UserRepository(session=SessionFactory.get_session())
+        return container.resolve("user_repository")
 
     @staticmethod
     def get_message_repository() -> MessageRepository:
-        return MessageRepository(session=SessionFactory.get_session())
+        return container.resolve("message_repository")
 
     @staticmethod
     def get_memory_manager_repository() -> MemoryManager:
-        return MemoryManager(session=SessionFactory.get_session())
+        return container.resolve("memory_manager")
 
     @staticmethod
     def get_memory_manager_v2_repository() -> MemoryManagerV2:
-        return MemoryManagerV2(session=SessionFactory.get_session())
+        return container.resolve("memory_manager_v2")
 
     @staticmethod
     def get_memory_manager_v3_repository() -> MemoryManagerV3:
-        return MemoryManagerV3(session=SessionFactory.get_session(), embedder=ChatbotFactory.get_embedding_model("titan"))
+        return container.resolve("memory_manager_v3")
 
 
 class ChatbotFactory:
     @staticmethod
     def create_chatbot(owner: str, model_name: str, temperature: float = 0.0) -> BaseChatbot:
-        if owner == "google":
-            return GeminiChatbot(model_name=model_name, temperature=temperature)
-        elif owner == "anthropic" and model_name == "sonnet3":
-            return ClaudeSonnetChatbot()
-        raise ValueError(f"Unknown chatbot: {owner} {model_name}")
+        return container.resolve("chatbot", owner, model_name, temperature)
 
     @staticmethod
     def get_embedding_model(name: Literal["titan", "gemini"]) -> BaseVectorEmbedder:
-        # match name:
-        #     case "titan":
-        # return LangChainTitanEmbedder()
-        # case "gemini":
-        #     return GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-exp-03-07")
-        return LangChainTitanEmbedder()
+        return container.resolve("embedding_model", name)
 
 
 class ToolsManagerFactory:
@@ -149,21 +354,19 @@ class ToolsManagerFactory:
 
         format_type = (format_type or default_format or "yaml").lower()
 
-        if format_type == "json":
-            return JsonToolsManager()
-        else:  # Default to YAML
-            return YamlToolsManager()
+        return container.resolve("tools_manager", format_type)
+
+
+class TracingFactory:
+    @staticmethod
+    def get_prompt_tracer() -> PromptTracer:
+        return container.resolve("prompt_tracer", AppConfig.PROMPT_TRACE_SINK)
 
 
 class ConversationManagerFactory:
     @classmethod
     def get_sliding_window_conversation_manager(cls) -> ConversationManager:
-        return SlidingWindowConversationManager(
-            chatbot=ChatbotFactory.create_chatbot(owner="anthropic", model_name="sonnet3"),
-            message_repository=RepositoryFactory.get_message_repository(),
-            conversation_repository=RepositoryFactory.get_conversation_repository(),
-            embedder=ChatbotFactory.get_embedding_model("titan"),
-        )
+        return container.resolve("sliding_window_conversation_manager")
 
 
 class WorkflowFactory:
@@ -177,10 +380,15 @@ class WorkflowFactory:
         cls,
         version: AgentVersion,
         state: AgentState,
-        chatbot: BaseChatbot = ChatbotFactory.create_chatbot(owner="anthropic", model_name="sonnet3"),
+        chatbot: Optional[BaseChatbot] = None,
     ) -> BaseAgentWorkflow:
+        return container.resolve("workflow", version, state, chatbot)
+
+    @classmethod
+    def _build_workflow(cls, version: AgentVersion, state: AgentState, chatbot: Optional[BaseChatbot] = None) -> BaseAgentWorkflow:
         if version not in cls._workflows:
             raise ValueError(f"Unknown workflow version: {version}. Available: {list(cls._workflows.keys())}")
+        chatbot = chatbot or ChatbotFactory.create_chatbot(owner="anthropic", model_name="sonnet3")
         workflow_class = cls._workflows[version]
 
         if workflow_class == KrishnaAdvanceWorkflow:
@@ -194,6 +402,8 @@ class WorkflowFactory:
                     chatbot=chatbot,
                     conversation_manager=ConversationManagerFactory.get_sliding_window_conversation_manager(),
                     tools_manager=ToolsManagerFactory.get_tools_manager(format_type="json"),
+                    prompt_encoder=get_prompt_encoder(AppConfig.PROMPT_ENCODING),
+                    prompt_tracer=TracingFactory.get_prompt_tracer(),
                 ),
             )
 
@@ -214,6 +424,28 @@ class VectorEmbedderFactory:
     @classmethod
     def get_vector_embedder(cls, name: Literal["titan", "gemini"]):
         if name == "titan":
-            return LangChainTitanEmbedder()
+            return ChatbotFactory.get_embedding_model(name)
         else:
             raise ValueError(f"Unknown vector embedder: {name}")
+
+
+def _build_tools_manager(format_type: str) -> ToolsManager:
+    if format_type == "json":
+        return JsonToolsManager()
+    else:  # Default to YAML
+        return YamlToolsManager()
+
+
+# Per-turn objects carry conversation state and must never be shared between requests
+container.register("tools_manager", _build_tools_manager, Lifetime.TRANSIENT)
+container.register(
+    "sliding_window_conversation_manager",
+    lambda: SlidingWindowConversationManager(
+        chatbot=ChatbotFactory.create_chatbot(owner="anthropic", model_name="sonnet3"),
+        message_repository=RepositoryFactory.get_message_repository(),
+        conversation_repository=RepositoryFactory.get_conversation_repository(),
+        embedder=ChatbotFactory.get_embedding_model("titan"),
+    ),
+    Lifetime.TRANSIENT,
+)
+container.register("workflow", WorkflowFactory._build_workflow, Lifetime.TRANSIENT)
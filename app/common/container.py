@@ -0,0 +1,148 @@
+"""
+Process-scoped dependency container.
+
+Dependencies are registered once with an explicit lifetime:
+
+- SINGLETON: built once per process (LLM and embedding clients, anything holding a connection pool or TLS session)
+- REQUEST: built once per request scope (DB session, repositories and services bound to it)
+- TRANSIENT: built on every resolve (per-turn state such as workflows and conversation managers)
+
+A request scope is opened by `RequestScopeMiddleware` for every HTTP request. Outside of a scope,
+REQUEST dependencies degrade to TRANSIENT so scripts and background tasks keep working. Disposers
+may be coroutine functions (e.g. closing an AsyncSession); use `async_request_scope` for those.
+"""
+
+import inspect
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, AsyncIterator, Callable, Hashable, Iterator, Optional
+
+from loguru import logger
+
+
+class Lifetime(Enum):
+    SINGLETON = "singleton"
+    REQUEST = "request"
+    TRANSIENT = "transient"
+
+
+@dataclass(frozen=True)
+class Registration:
+    factory: Callable[..., Any]
+    lifetime: Lifetime
+    dispose: Optional[Callable[[Any], None]] = None
+
+
+class RequestScope:
+    """Instances resolved within one request, disposed in reverse creation order on exit."""
+
+    def __init__(self) -> None:
+        self.instances: dict[Hashable, Any] = {}
+        self._disposers: list[tuple[Callable[[Any], None], Any]] = []
+
+    def add(self, key: Hashable, instance: Any, dispose: Optional[Callable[[Any], None]]) -> None:
+        self.instances[key] = instance
+        if dispose:
+            self._disposers.append((dispose, instance))
+
+    def close(self) -> None:
+        while self._disposers:
+            dispose, instance = self._disposers.pop()
+            try:
+                result = dispose(instance)
+                if inspect.isawaitable(result):
+                    logger.warning(f"Async disposer of {instance!r} called from a sync request scope, it was not awaited")
+                    if inspect.iscoroutine(result):
+                        result.close()
+            except Exception as e:
+                logger.warning(f"Failed to dispose request scoped dependency {instance!r}: {e}")
+        self.instances.clear()
+
+    async def aclose(self) -> None:
+        while self._disposers:
+            dispose, instance = self._disposers.pop()
+            try:
+                result = dispose(instance)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.warning(f"Failed to dispose request scoped dependency {instance!r}: {e}")
+        self.instances.clear()
+
+
+_current_scope: ContextVar[Optional[RequestScope]] = ContextVar("request_scope", default=None)
+
+
+class Container:
+    def __init__(self) -> None:
+        self._registrations: dict[str, Registration] = {}
+        self._singletons: dict[Hashable, Any] = {}
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable[..., Any], lifetime: Lifetime, dispose: Optional[Callable[[Any], None]] = None) -> None:
+        """
+        Register `factory` under `name`. Positional arguments passed to `resolve` are forwarded to the
+        factory and are part of the cache key, so e.g. one singleton is kept per chatbot model.
+        """
+        self._registrations[name] = Registration(factory=factory, lifetime=lifetime, dispose=dispose)
+
+    def resolve(self, name: str, *args: Hashable) -> Any:
+        registration = self._registrations.get(name)
+        if registration is None:
+            raise KeyError(f"No dependency registered under '{name}'")
+
+        key = (name, *args)
+        match registration.lifetime:
+            case Lifetime.SINGLETON:
+                if key not in self._singletons:
+                    with self._lock:
+                        if key not in self._singletons:
+                            self._singletons[key] = registration.factory(*args)
+                return self._singletons[key]
+            case Lifetime.REQUEST:
+                scope = _current_scope.get()
+                if scope is None:
+                    return registration.factory(*args)
+                if key not in scope.instances:
+                    scope.add(key, registration.factory(*args), registration.dispose)
+                return scope.instances[key]
+            case Lifetime.TRANSIENT:
+                return registration.factory(*args)
+
+    @contextmanager
+    def request_scope(self) -> Iterator[RequestScope]:
+        """Open a request scope for the current context, reusing an already open one."""
+        if _current_scope.get() is not None:
+            yield _current_scope.get()  # type: ignore[misc]
+            return
+
+        scope = RequestScope()
+        token = _current_scope.set(scope)
+        try:
+            yield scope
+        finally:
+            _current_scope.reset(token)
+            scope.close()
+
+    @asynccontextmanager
+    async def async_request_scope(self) -> AsyncIterator[RequestScope]:
+        """Like `request_scope`, awaiting async disposers on exit."""
+        if _current_scope.get() is not None:
+            yield _current_scope.get()  # type: ignore[misc]
+            return
+
+        scope = RequestScope()
+        token = _current_scope.set(scope)
+        try:
+            yield scope
+        finally:
+            _current_scope.reset(token)
+            await scope.aclose()
+
+    def reset_singletons(self) -> None:
+        """Drop cached singletons, e.g. between tests."""
+        with self._lock:
+            self._singletons.clear()
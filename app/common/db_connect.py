@@ -1,25 +1,50 @@
 # Database connection for Aurora Serverless RDS and local PostgreSQL
 import logging
 import os
-import boto3
+import threading
+import time
 import json
-from sqlalchemy import create_engine
-from sqlalchemy.engine.url import URL
-from sqlalchemy.orm import sessionmaker, scoped_session
+from typing import TYPE_CHECKING, Any, Callable, Optional
+from sqlalchemy import Engine, create_engine, event
+from sqlalchemy.engine.url import URL, make_url
+from sqlalchemy.orm import sessionmaker
+
+from app.common.db_pool import PoolMetrics, behind_rds_proxy, default_pool_profile, pool_profile_kwargs
+from app.common.lazy import lazy_import
+from app.common.query_stats import instrument_engine
+from app.common.read_replica import RoutingSession
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine
+
+boto3 = lazy_import("boto3")
 
 STAGE = os.getenv("STAGE", "local").lower()
 AWS_REGION = os.getenv("REGION", "us-east-1")
 
-# Aurora Serverless RDS configuration
-if STAGE in ["dev", "prod"]:
-    RDS_ENDPOINT = os.getenv("RDS_ENDPOINT")
-    if not RDS_ENDPOINT:
-        raise RuntimeError("RDS_ENDPOINT must be set")
+# Aurora Serverless RDS configuration (validated lazily, on first engine use)
+RDS_ENDPOINT = os.getenv("RDS_ENDPOINT")
+
+# Read replica for the `read_only` repository methods (see app.common.read_replica): the Aurora reader
+# endpoint on dev/prod, the port of the docker compose replica on local. Disabled when unset or READ_REPLICA=false
+RDS_READER_ENDPOINT = os.getenv("RDS_READER_ENDPOINT")
+POSTGRES_REPLICA_PORT = os.getenv("POSTGRES_REPLICA_PORT")
+READ_REPLICA_ENABLED = os.getenv("READ_REPLICA", "true").lower() == "true" and bool(POSTGRES_REPLICA_PORT if STAGE == "local" else RDS_READER_ENDPOINT)
 
 POSTGRES_USER = os.getenv("POSTGRES_USER")
 POSTGRES_DB = os.getenv("POSTGRES_DB")
 POSTGRES_PW = os.getenv("POSTGRES_PASSWORD", "")  # only used for local dev
 
+# How long a password fetched from Secrets Manager is trusted before it is re-read
+CREDENTIAL_TTL_SECONDS = int(os.getenv("DB_CREDENTIAL_TTL_SECONDS", "900"))
+
+# Connection pool profile: 'lambda' or 'server' (see app.common.db_pool)
+DB_POOL_PROFILE = default_pool_profile()
+
+logger = logging.getLogger(__name__)
+
+TimingHook = Callable[[str, float], None]
+
 
 def get_rds_master_password() -> str:
     """
@@ -36,34 +61,71 @@ def get_rds_master_password() -> str:
     return secret["password"]
 
 
-def make_base_url() -> str:
+class CachedCredential:
+    """
+    Caches a secret for `ttl_seconds` so that Secrets Manager is hit at most once per TTL,
+    and lets callers invalidate it when the database rejects the cached value.
+    """
+
+    def __init__(self, fetch: Callable[[], str], ttl_seconds: int = CREDENTIAL_TTL_SECONDS, clock: Callable[[], float] = time.monotonic):
+        self._fetch = fetch
+        self._ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._value: Optional[str] = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> str:
+        with self._lock:
+            if self._value is None or self._clock() - self._fetched_at >= self._ttl_seconds:
+                self._value = self._fetch()
+                self._fetched_at = self._clock()
+            return self._value
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._value = None
+
+
+def _is_auth_failure(error: Exception) -> bool:
+    message = str(error).lower()
+    return "password authentication failed" in message or "authentication failed" in message
+
+
+def make_base_url(drivername: str = "postgresql+psycopg2", reader: bool = False) -> str:
     """
-    Build connection URL for Aurora Serverless RDS or local PostgreSQL.
+    Build connection URL for Aurora Serverless RDS or local PostgreSQL, of the read replica with `reader`.
     """
     if STAGE == "local":
         # Local development with Docker PostgreSQL
         url = URL.create(
-            drivername="postgresql+psycopg2",
+            drivername=drivername,
             username=POSTGRES_USER,
             password=POSTGRES_PW,
             host="localhost",
-            port=5432,
+            port=int(POSTGRES_REPLICA_PORT or 5433) if reader else 5432,
             database=POSTGRES_DB,
         )
         return url.render_as_string(hide_password=False)
     else:
+        endpoint = RDS_READER_ENDPOINT if reader else RDS_ENDPOINT
+        if not endpoint:
+            raise RuntimeError("RDS_READER_ENDPOINT must be set" if reader else "RDS_ENDPOINT must be set")
         # Aurora Serverless RDS connection
         url = URL.create(
-            drivername="postgresql+psycopg2",
+            drivername=drivername,
             username=POSTGRES_USER,
             password="",
-            host=RDS_ENDPOINT,
+            host=endpoint,
             port=5432,
             database=POSTGRES_DB,
         )
         return url.render_as_string(hide_password=False)
 
 
+rds_password = CachedCredential(fetch=get_rds_master_password)
+
+
 def make_connect_args() -> dict:
     """
     For local: use password.
@@ -72,27 +134,204 @@ def make_connect_args() -> dict:
     if STAGE == "local":
         return {"sslmode": "disable"}
     else:
-        password = get_rds_master_password()
-        return {"password": password, "sslmode": "require"}
+        return {"password": rds_password.get(), "sslmode": "require"}
+
+
+class EngineProvider:
+    """
+    Creates the SQLAlchemy engine on first use and caches it for the lifetime of the process.
+
+    On dev/prod the password is not baked into the engine: it is injected on every new DBAPI
+    connection from a `CachedCredential`, and a rejected password is refreshed once and retried,
+    so a rotated secret is picked up without restarting the container.
+
+    With a `pool_profile` the pool is configured by `app.common.db_pool` and reports `pool_metrics`.
+    """
+
+    default_engine_kwargs: dict[str, Any] = {"pool_pre_ping": True, "future": True}
+    is_async = False
+
+    def __init__(
+        self,
+        url_factory: Callable[[], str] = make_base_url,
+        connect_args: Optional[dict[str, Any]] = None,
+        credential: Optional[CachedCredential] = None,
+        engine_kwargs: Optional[dict[str, Any]] = None,
+        pool_profile: Optional[str] = None,
+    ):
+        self._url_factory = url_factory
+        self._connect_args = connect_args or {}
+        self._credential = credential
+        self._engine_kwargs = engine_kwargs or {}
+        self.pool_profile = pool_profile
+        self.pool_metrics = PoolMetrics()
+        self._engine: Optional[Engine] = None
+        self._lock = threading.Lock()
+        self._timing_hooks: list[TimingHook] = []
+
+    def add_timing_hook(self, hook: TimingHook) -> None:
+        """Register a callable receiving `(phase, elapsed_seconds)` for engine creation and connects."""
+        self._timing_hooks.append(hook)
+
+    def _emit(self, phase: str, elapsed: float) -> None:
+        for hook in self._timing_hooks:
+            try:
+                hook(phase, elapsed)
+            except Exception as e:
+                logger.warning(f"Timing hook failed for {phase}: {e}")
+
+    @property
+    def is_initialized(self) -> bool:
+        return self._engine is not None
+
+    def get_engine(self) -> Engine:
+        if self._engine is not None:
+            return self._engine
 
+        with self._lock:
+            if self._engine is None:
+                started = time.perf_counter()
+                self._engine = self._create_engine()
+                self._emit("engine_create", time.perf_counter() - started)
+        return self._engine
 
-# Build the SQLAlchemy engine and session
-_engine = create_engine(
-    make_base_url(),
-    connect_args=make_connect_args(),
-    pool_pre_ping=True,
-    future=True,
+    def _engine_options(self, url: str) -> dict[str, Any]:
+        options = dict(self.default_engine_kwargs)
+        if self.pool_profile:
+            options.update(pool_profile_kwargs(self.pool_profile, rds_proxy=behind_rds_proxy(make_url(url).host), async_engine=self.is_async))
+        return {**options, **self._engine_kwargs}
+
+    def _create_engine(self) -> Engine:
+        url = self._url_factory()
+        engine = create_engine(url, connect_args=self._connect_args, **self._engine_options(url))
+        engine.pool.metrics = self.pool_metrics  # type: ignore[attr-defined]
+        event.listen(engine, "do_connect", self._do_connect)
+        instrument_engine(engine)
+        return engine
+
+    def pool_status(self) -> dict[str, Any]:
+        """Pool profile, settings and checkout counters of the engine, for the health endpoint."""
+        pool = self._engine.pool if self._engine is not None else None
+        return {"profile": self.pool_profile, "initialized": pool is not None, "pool": pool.status() if pool is not None else None, **self.pool_metrics.snapshot(pool)}
+
+    def _do_connect(self, dialect, conn_rec, cargs, cparams):
+        started = time.perf_counter()
+        try:
+            if self._credential is None:
+                return dialect.connect(*cargs, **cparams)
+
+            cparams["password"] = self._credential.get()
+            try:
+                return dialect.connect(*cargs, **cparams)
+            except Exception as e:
+                if not _is_auth_failure(e):
+                    raise
+                logger.warning("Database rejected cached credential, refreshing from Secrets Manager")
+                self._credential.invalidate()
+                cparams["password"] = self._credential.get()
+                return dialect.connect(*cargs, **cparams)
+        finally:
+            self._emit("connect", time.perf_counter() - started)
+
+    def dispose(self) -> None:
+        with self._lock:
+            if self._engine is not None:
+                self._engine.dispose()
+                self._engine = None
+
+
+def _log_timing(phase: str, elapsed: float) -> None:
+    logger.info(f"db {phase} took {elapsed * 1000:.1f}ms")
+
+
+engine_provider = EngineProvider(
+    connect_args={"sslmode": "disable" if STAGE == "local" else "require"},
+    credential=None if STAGE == "local" else rds_password,
+    pool_profile=DB_POOL_PROFILE,
+)
+engine_provider.add_timing_hook(_log_timing)
+
+reader_engine_provider = EngineProvider(
+    url_factory=lambda: make_base_url(reader=True),
+    connect_args={"sslmode": "disable" if STAGE == "local" else "require"},
+    credential=None if STAGE == "local" else rds_password,
+    pool_profile=DB_POOL_PROFILE,
+)
+reader_engine_provider.add_timing_hook(_log_timing)
+
+
+def _register_vector(dbapi_connection, connection_record) -> None:
+    from app.common.vector_types import register_embedding_codec
+
+    dbapi_connection.run_async(register_embedding_codec)
+
+
+class AsyncEngineProvider(EngineProvider):
+    """
+    `EngineProvider` for an `AsyncEngine` on asyncpg. Credentials are injected the same way, and the
+    pgvector codecs are registered on every new connection. `sqlalchemy.ext.asyncio` is imported with
+    the first engine, the sessions are in app.common.async_sessions.
+    """
+
+    default_engine_kwargs: dict[str, Any] = {"pool_pre_ping": True}
+    is_async = True
+
+    def get_engine(self) -> "AsyncEngine":  # type: ignore[override]
+        return super().get_engine()  # type: ignore[return-value]
+
+    def _create_engine(self) -> "AsyncEngine":  # type: ignore[override]
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        url = self._url_factory()
+        engine = create_async_engine(url, connect_args=self._connect_args, **self._engine_options(url))
+        engine.pool.metrics = self.pool_metrics  # type: ignore[attr-defined]
+        event.listen(engine.sync_engine, "do_connect", self._do_connect)
+        event.listen(engine.sync_engine, "connect", _register_vector)
+        instrument_engine(engine.sync_engine)
+        return engine
+
+    def dispose(self) -> None:
+        raise TypeError("Use `await dispose_async()` to dispose an async engine")
+
+    async def dispose_async(self) -> None:
+        engine, self._engine = self._engine, None
+        if engine is not None:
+            await engine.dispose()
+
+
+async_engine_provider = AsyncEngineProvider(
+    url_factory=lambda: make_base_url("postgresql+asyncpg"),
+    connect_args={"ssl": False if STAGE == "local" else "require"},
+    credential=None if STAGE == "local" else rds_password,
+    pool_profile=DB_POOL_PROFILE,
+)
+async_engine_provider.add_timing_hook(_log_timing)
+
+async_reader_engine_provider = AsyncEngineProvider(
+    url_factory=lambda: make_base_url("postgresql+asyncpg", reader=True),
+    connect_args={"ssl": False if STAGE == "local" else "require"},
+    credential=None if STAGE == "local" else rds_password,
+    pool_profile=DB_POOL_PROFILE,
 )
+async_reader_engine_provider.add_timing_hook(_log_timing)
+
+
+class LazySessionMaker(sessionmaker):
+    """`sessionmaker` that binds to the engine only when the first session is opened."""
+
+    def __call__(self, **local_kw):
+        local_kw.setdefault("bind", engine_provider.get_engine())
+        if READ_REPLICA_ENABLED:
+            local_kw.setdefault("reader", reader_engine_provider.get_engine)
+        return super().__call__(**local_kw)
 
 
-SessionLocal = scoped_session(
-    sessionmaker(
-        bind=_engine,
-        autoflush=False,
-        autocommit=False,
-        expire_on_commit=False,
-        future=True,
-    )
+# A plain factory: request sessions are owned by the unit of work (app.common.unit_of_work), a
+# thread-local scoped_session would be shared by every request running on the event loop thread
+SessionLocal = LazySessionMaker(
+    class_=RoutingSession,
+    autoflush=False,
+    expire_on_commit=False,
 )
 
 
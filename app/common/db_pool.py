@@ -0,0 +1,159 @@
+"""
+Connection pool profiles and pool metrics.
+
+- lambda: a container serves one request at a time. Behind RDS Proxy it keeps a single pooled
+  connection and lets the proxy multiplex. Without a proxy it keeps no idle connection at all
+  (NullPool), so a burst of concurrent containers does not hold Aurora connections once their
+  requests are done.
+- server: a long-lived uvicorn process streaming many turns at once. It uses a sized QueuePool in
+  LIFO order, so idle connections beyond the working set age out, and recycles connections before
+  server-side timeouts.
+
+Pre-ping is off in both profiles because it costs one round trip per checkout. Stale connections
+are recycled, or invalidated on their first disconnect error.
+
+The pools count checkouts, checkout latency, time spent waiting at the pool limit, overflow
+connections and timeouts (`PoolMetrics`).
+"""
+
+from dataclasses import dataclass, field
+import os
+import threading
+import time
+from typing import Any, Optional
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, Pool, QueuePool
+
+POOL_PROFILES = ("lambda", "server")
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() == "true"
+
+
+def default_pool_profile() -> str:
+    """DB_POOL_PROFILE if set, otherwise `lambda` when running in AWS Lambda and `server` elsewhere."""
+    configured = os.getenv("DB_POOL_PROFILE")
+    if configured:
+        return configured.lower()
+    return "lambda" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "server"
+
+
+def behind_rds_proxy(host: Optional[str]) -> bool:
+    """DB_RDS_PROXY if set, otherwise whether `host` is an RDS Proxy endpoint (`<name>.proxy-<id>.<region>.rds.amazonaws.com`)."""
+    configured = os.getenv("DB_RDS_PROXY")
+    if configured:
+        return configured.lower() == "true"
+    return bool(host) and ".proxy-" in host  # type: ignore[operator]
+
+
+@dataclass
+class PoolMetrics:
+    checkouts: int = 0
+    checkout_seconds: float = 0.0
+    max_checkout_seconds: float = 0.0
+    waits: int = 0
+    wait_seconds: float = 0.0
+    overflows: int = 0
+    timeouts: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record_checkout(self, elapsed: float, waited: bool, overflowed: bool) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.checkout_seconds += elapsed
+            self.max_checkout_seconds = max(self.max_checkout_seconds, elapsed)
+            if waited:
+                self.waits += 1
+                self.wait_seconds += elapsed
+            if overflowed:
+                self.overflows += 1
+
+    def record_timeout(self, elapsed: float) -> None:
+        with self._lock:
+            self.timeouts += 1
+            self.waits += 1
+            self.wait_seconds += elapsed
+
+    def snapshot(self, pool: Optional[Pool] = None) -> dict[str, Any]:
+        with self._lock:
+            snapshot: dict[str, Any] = {
+                "checkouts": self.checkouts,
+                "checkout_ms_avg": round(1000 * self.checkout_seconds / self.checkouts, 3) if self.checkouts else 0.0,
+                "checkout_ms_max": round(1000 * self.max_checkout_seconds, 3),
+                "waits": self.waits,
+                "wait_ms_total": round(1000 * self.wait_seconds, 3),
+                "overflows": self.overflows,
+                "timeouts": self.timeouts,
+            }
+        if isinstance(pool, QueuePool):
+            snapshot.update(size=pool.size(), checked_in=pool.checkedin(), checked_out=pool.checkedout(), overflow=max(pool.overflow(), 0))
+        return snapshot
+
+
+class _MeteredPool:
+    """Times `_do_get`, the pool internal every checkout goes through, including waits for a free connection."""
+
+    metrics: Optional[PoolMetrics] = None
+
+    def _do_get(self):
+        metrics = self.metrics
+        if metrics is None:
+            return super()._do_get()  # type: ignore[misc]
+
+        overflow_before = self._overflow_connections()
+        # QueuePool internals: at the limit the checkout blocks until a connection is returned
+        at_limit = -1 < getattr(self, "_max_overflow", -1) <= getattr(self, "_overflow", -1)
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()  # type: ignore[misc]
+        except exc.TimeoutError:
+            metrics.record_timeout(time.perf_counter() - started)
+            raise
+        metrics.record_checkout(time.perf_counter() - started, waited=at_limit, overflowed=self._overflow_connections() > overflow_before)
+        return connection
+
+    def _overflow_connections(self) -> int:
+        return max(self.overflow(), 0) if isinstance(self, QueuePool) else 0
+
+    def recreate(self):
+        pool = super().recreate()  # type: ignore[misc]
+        pool.metrics = self.metrics
+        return pool
+
+
+class MeteredQueuePool(_MeteredPool, QueuePool):
+    pass
+
+
+class MeteredAsyncAdaptedQueuePool(_MeteredPool, AsyncAdaptedQueuePool):
+    pass
+
+
+class MeteredNullPool(_MeteredPool, NullPool):
+    pass
+
+
+def pool_profile_kwargs(profile: str, rds_proxy: bool = False, async_engine: bool = False) -> dict[str, Any]:
+    """Engine keyword arguments for a pool profile."""
+    queue_pool = MeteredAsyncAdaptedQueuePool if async_engine else MeteredQueuePool
+    match profile:
+        case "lambda" if rds_proxy:
+            return {"poolclass": queue_pool, "pool_size": 1, "max_overflow": 0, "pool_timeout": DB_POOL_TIMEOUT, "pool_recycle": DB_POOL_RECYCLE, "pool_pre_ping": False}
+        case "lambda":
+            return {"poolclass": MeteredNullPool, "pool_pre_ping": False}
+        case "server":
+            return {
+                "poolclass": queue_pool,
+                "pool_size": DB_POOL_SIZE,
+                "max_overflow": DB_MAX_OVERFLOW,
+                "pool_timeout": DB_POOL_TIMEOUT,
+                "pool_recycle": DB_POOL_RECYCLE,
+                "pool_use_lifo": True,
+                "pool_pre_ping": DB_POOL_PRE_PING,
+            }
+        case _:
+            raise ValueError(f"Unknown pool profile: {profile}. Available: {list(POOL_PROFILES)}")
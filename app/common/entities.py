@@ -1,3 +1,6 @@
+from typing import Any
+
+from sqlalchemy import inspect
 from sqlalchemy.orm import DeclarativeBase
 
 
@@ -8,3 +11,13 @@ class BaseEntity(DeclarativeBase):
     """
 
     __abstract__ = True
+
+    def loaded(self, key: str, default: Any = None) -> Any:
+        """
+        Value of the attribute `key`, or `default` when it was not loaded. Vector columns are deferred
+        and only loaded when a query asks for them (`undefer`), so domain conversions read them here
+        instead of triggering a load per row.
+        """
+        if key in inspect(self).unloaded:
+            return default
+        return getattr(self, key)
@@ -0,0 +1,66 @@
+"""
+Lazy loading registry for heavy third-party dependencies.
+
+Provider SDKs (LangChain, LangGraph), browser automation, PDF parsing and MCP clients are only needed
+once a workflow or tool actually runs. Modules register them with `lazy_import` and the import is
+deferred to the first attribute access, keeping them out of the cold-start import graph.
+"""
+
+import importlib
+import threading
+import time
+from types import ModuleType
+from typing import Any, Optional
+
+from loguru import logger
+
+
+class LazyModule:
+    """Proxy that imports `module_name` on first attribute access."""
+
+    def __init__(self, module_name: str):
+        self.module_name = module_name
+        self.load_seconds: Optional[float] = None
+        self._module: Optional[ModuleType] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._module is not None
+
+    def load(self) -> ModuleType:
+        if self._module is not None:
+            return self._module
+
+        with self._lock:
+            if self._module is None:
+                started = time.perf_counter()
+                module = importlib.import_module(self.module_name)
+                self.load_seconds = time.perf_counter() - started
+                self._module = module
+                logger.debug(f"Lazily imported {self.module_name} in {self.load_seconds * 1000:.1f}ms")
+        return self._module
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.load(), name)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.is_loaded else "not loaded"
+        return f"<LazyModule {self.module_name} ({state})>"
+
+
+_registry: dict[str, LazyModule] = {}
+_registry_lock = threading.Lock()
+
+
+def lazy_import(module_name: str) -> LazyModule:
+    """Return the shared lazy proxy for `module_name`, registering it if needed."""
+    with _registry_lock:
+        if module_name not in _registry:
+            _registry[module_name] = LazyModule(module_name)
+        return _registry[module_name]
+
+
+def loaded_dependencies() -> dict[str, float]:
+    """Registered dependencies that have been imported so far, with their import time in seconds."""
+    return {name: module.load_seconds or 0.0 for name, module in _registry.items() if module.is_loaded}
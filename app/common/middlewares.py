@@ -1,7 +1,18 @@
+from typing import Callable
+from uuid import uuid4
+
+from starlette.datastructures import Headers, MutableHeaders
 from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from fastapi import Request
+from loguru import logger
+
+from app.common.config import RepositoryFactory, ServiceFactory, container
+from app.common.query_stats import QUERY_STATS_HEADER, QUERY_STATS_HEADER_ENABLED, QueryStats, collect_queries, request_completed
+from app.common.tracing import request_id_var
+from app.common.unit_of_work import UnitOfWork
 
-from app.common.config import ServiceFactory
+REQUEST_ID_HEADER = "x-request-id"
 
 
 class UserPopulationMiddleware(BaseHTTPMiddleware):
@@ -22,3 +33,122 @@ class UserPopulationMiddleware(BaseHTTPMiddleware):
         request.state.user = user
         response = await call_next(request)
         return response
+
+
+class RequestScopeMiddleware:
+    """
+    Pure ASGI middleware opening a dependency container request scope around the whole request,
+    including streamed response bodies, so request-lifetime dependencies are shared within it.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async with container.async_request_scope():
+            await self.app(scope, receive, send)
+
+
+class UnitOfWorkMiddleware:
+    """
+    Pure ASGI middleware running each request in one unit of work (see app.common.unit_of_work).
+    It is committed right before the last response body chunk is sent, so a client reacting to the
+    response sees its writes, and rolled back when the request raises or answers with a server error.
+    """
+
+    def __init__(self, app: ASGIApp, unit_of_work_factory: Callable[[], UnitOfWork] = RepositoryFactory.get_unit_of_work):
+        self.app = app
+        self.unit_of_work_factory = unit_of_work_factory
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        unit_of_work = self.unit_of_work_factory()
+
+        async def send_after_commit(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] >= 500:
+                unit_of_work.rollback_only = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                await unit_of_work.complete()
+            await send(message)
+
+        async with unit_of_work:
+            await self.app(scope, receive, send_after_commit)
+
+
+class RequestIdMiddleware:
+    """
+    Pure ASGI middleware assigning every request an ID: the incoming `x-request-id` header, the Lambda
+    request ID, or a new one. It is available through `app.common.tracing.get_request_id()`, added to
+    log records and echoed in the response headers.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        aws_context = scope.get("aws.context")
+        request_id = Headers(scope=scope).get(REQUEST_ID_HEADER) or getattr(aws_context, "aws_request_id", None) or uuid4().hex
+
+        async def send_with_request_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[REQUEST_ID_HEADER] = request_id
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            with logger.contextualize(request_id=request_id):
+                await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
+
+
+class QueryStatsMiddleware:
+    """
+    Pure ASGI middleware collecting the database queries of each request (see app.common.query_stats).
+    The summary is logged when the request completes, with a warning per repeated statement. With
+    `header` (QUERY_STATS_HEADER) the response carries `x-db-queries`: streamed responses send their
+    headers first, so it counts the queries up to the response start and the log the whole request.
+    """
+
+    def __init__(self, app: ASGIApp, header: bool = QUERY_STATS_HEADER_ENABLED):
+        self.app = app
+        self.header = header
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with collect_queries(f"{scope['method']} {scope['path']}") as stats:
+
+            async def send_with_query_stats(message: Message) -> None:
+                if self.header and message["type"] == "http.response.start":
+                    MutableHeaders(scope=message)[QUERY_STATS_HEADER] = stats.header_value()
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_query_stats)
+            finally:
+                _log_query_stats(stats)
+                request_completed(stats)
+
+
+def _log_query_stats(stats: QueryStats) -> None:
+    if not stats.queries:
+        return
+    epochs = ", ".join(f"epoch {epoch}: {epoch_stats.queries} in {epoch_stats.seconds * 1000:.1f}ms" for epoch, epoch_stats in stats.epochs.items())
+    slowest = "".join(f"\n  {s.max_seconds * 1000:.1f}ms x{s.count}: {s.sql}" for s in stats.slowest())
+    logger.info(f"db {stats.label}: {stats.queries} queries in {stats.seconds * 1000:.1f}ms{f' ({epochs})' if epochs else ''}, slowest:{slowest}")
+    for repeated in stats.repeated():
+        logger.warning(f"db {stats.label}: statement run {repeated.count} times ({repeated.total_seconds * 1000:.1f}ms), possible N+1: {repeated.sql}")
@@ -1,4 +1,5 @@
 from enum import Enum
+import os
 from typing import ClassVar
 from uuid import uuid4
 from pydantic import BaseModel
@@ -64,6 +65,32 @@ class MemoryManagementConfig(BaseModel):
     MEMORY_SEARCH_PAGE_SIZE: ClassVar[int] = 10
     MEMORY_OVERFLOW_THRESHOLD: ClassVar[float] = 0.8
 
+    # Recall searches over the user's messages only look this many days back (0 for the whole history),
+    # which keeps them on the recent monthly partitions of messages
+    MESSAGE_RECALL_WINDOW_DAYS: ClassVar[int] = int(os.getenv("MESSAGE_RECALL_WINDOW_DAYS", "365"))
+
+    # Token budget of one LLM prompt. The budgets above are enforced on it as shares of CONTEXT_LENGTH.
+    PROMPT_CONTEXT_LENGTH: ClassVar[int] = int(os.getenv("PROMPT_CONTEXT_LENGTH", "32000"))
+
+    # Write-behind access tracking of memory reads: pending hits are written every MEMORY_ACCESS_FLUSH_SECONDS,
+    # or as soon as MEMORY_ACCESS_MAX_PENDING entries have pending hits
+    MEMORY_ACCESS_FLUSH_SECONDS: ClassVar[float] = float(os.getenv("MEMORY_ACCESS_FLUSH_SECONDS", "5"))
+    MEMORY_ACCESS_MAX_PENDING: ClassVar[int] = int(os.getenv("MEMORY_ACCESS_MAX_PENDING", "10000"))
+    # Recall and archival entries not read for MEMORY_EVICTION_IDLE_DAYS * (1 + ln(1 + hits)) days are evicted,
+    # checked every MEMORY_EVICTION_INTERVAL_SECONDS by the access tracker
+    MEMORY_EVICTION_IDLE_DAYS: ClassVar[float] = float(os.getenv("MEMORY_EVICTION_IDLE_DAYS", "30"))
+    MEMORY_EVICTION_INTERVAL_SECONDS: ClassVar[float] = float(os.getenv("MEMORY_EVICTION_INTERVAL_SECONDS", "3600"))
+
+    # Audit log of memory mutations, queued and written in batches of up to MEMORY_AUDIT_BATCH_SIZE rows at least
+    # every MEMORY_AUDIT_FLUSH_SECONDS. With MEMORY_AUDIT_MAX_PENDING events queued, new events are dropped
+    # ('drop') or wait up to MEMORY_AUDIT_BLOCK_SECONDS for room ('block')
+    MEMORY_AUDIT_ENABLED: ClassVar[bool] = os.getenv("MEMORY_AUDIT_ENABLED", "true").lower() == "true"
+    MEMORY_AUDIT_BATCH_SIZE: ClassVar[int] = int(os.getenv("MEMORY_AUDIT_BATCH_SIZE", "500"))
+    MEMORY_AUDIT_FLUSH_SECONDS: ClassVar[float] = float(os.getenv("MEMORY_AUDIT_FLUSH_SECONDS", "2"))
+    MEMORY_AUDIT_MAX_PENDING: ClassVar[int] = int(os.getenv("MEMORY_AUDIT_MAX_PENDING", "10000"))
+    MEMORY_AUDIT_OVERFLOW: ClassVar[str] = os.getenv("MEMORY_AUDIT_OVERFLOW", "drop").lower()
+    MEMORY_AUDIT_BLOCK_SECONDS: ClassVar[float] = float(os.getenv("MEMORY_AUDIT_BLOCK_SECONDS", "0.05"))
+
 
 class MemoryType(Enum):
     PERSONA = ("persona", int(MemoryManagementConfig.CONTEXT_LENGTH * 0.05))
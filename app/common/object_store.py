@@ -0,0 +1,89 @@
+"""
+Object storage for data moved out of the database (the conversation archive, see
+app.chatbot.conversation.conversation_services.ConversationArchiveService).
+
+Objects are immutable byte strings under a key of `/`-separated segments. `S3ObjectStore` keeps them
+in an S3 bucket (dev/prod), `LocalObjectStore` in a directory (local development and tests). Both are
+blocking: async callers run them in a thread.
+"""
+
+from abc import ABC, abstractmethod
+import os
+import tempfile
+
+from app.common.exceptions import NotFoundException
+from app.common.lazy import lazy_import
+
+boto3 = lazy_import("boto3")
+
+
+class ObjectStore(ABC):
+    @abstractmethod
+    def put(self, key: str, data: bytes) -> None:
+        """Store `data` under `key`, replacing the object stored there."""
+
+    @abstractmethod
+    def get(self, key: str) -> bytes:
+        """The object stored under `key`, raises NotFoundException without one."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Delete the object stored under `key`, if any."""
+
+
+class LocalObjectStore(ObjectStore):
+    """Objects as files under `root`, written to a temporary file and renamed so readers never see a partial object."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".partial-")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def get(self, key: str) -> bytes:
+        try:
+            with open(self._path(key), "rb") as file:
+                return file.read()
+        except FileNotFoundError as e:
+            raise NotFoundException(f"Object {key} was not found!") from e
+
+    def delete(self, key: str) -> None:
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _path(self, key: str) -> str:
+        if not key or key.startswith("/") or ".." in key.split("/"):
+            raise ValueError(f"Invalid object key: {key}")
+        return os.path.join(self.root, *key.split("/"))
+
+
+class S3ObjectStore(ObjectStore):
+    """Objects in `bucket`, their keys prefixed with `prefix`."""
+
+    def __init__(self, bucket: str, prefix: str = "", region_name: str | None = None):
+        self.bucket = bucket
+        self.prefix = prefix
+        self._client = boto3.client("s3", region_name=region_name)
+
+    def put(self, key: str, data: bytes) -> None:
+        self._client.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=data)
+
+    def get(self, key: str) -> bytes:
+        try:
+            return self._client.get_object(Bucket=self.bucket, Key=self.prefix + key)["Body"].read()
+        except self._client.exceptions.NoSuchKey as e:
+            raise NotFoundException(f"Object {key} was not found in {self.bucket}!") from e
+
+    def delete(self, key: str) -> None:
+        self._client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
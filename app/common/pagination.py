@@ -0,0 +1,129 @@
+"""
+Pagination for repository listings and similarity searches.
+
+- Ordered listings page with keyset cursors: the cursor carries the (created_at, id) of the last
+  row of a page and the next page starts right after it through the index, so page N reads
+  page_size rows like page 1 instead of skipping N * page_size rows with OFFSET.
+- Similarity searches rank once: the first page of a query runs one vector search for the ids of
+  the best RANKED_IDS_LIMIT rows and caches them per owner and query for RANKED_IDS_TTL_SECONDS.
+  Every page then loads its page_size ids by primary key. The ranking also gives the total, so a
+  search never counts the owner's rows: results past the ranking are not paged.
+
+The cache is process local: another worker ranks the query again, which costs what the first page
+did. Writes invalidate the owner's rankings in this process; in others they expire with the TTL.
+"""
+
+import base64
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Hashable, Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy import ColumnElement, and_, or_
+
+from app.common.vector_types import as_embedding
+
+RANKED_IDS_LIMIT = int(os.getenv("RANKED_IDS_LIMIT", "200"))
+RANKED_IDS_TTL_SECONDS = float(os.getenv("RANKED_IDS_TTL_SECONDS", "300"))
+RANKED_IDS_CACHE_SIZE = int(os.getenv("RANKED_IDS_CACHE_SIZE", "1024"))
+
+
+def total_pages(total_count: int, page_size: int) -> int:
+    return (total_count + page_size - 1) // page_size
+
+
+@dataclass(frozen=True)
+class Cursor:
+    """Position after the last row of a page, ordered by (created_at, id) descending."""
+
+    created_at: datetime
+    id: UUID
+    page: int
+
+    def encode(self) -> str:
+        payload = json.dumps({"created_at": self.created_at.isoformat(), "id": str(self.id), "page": self.page}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> "Cursor":
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+            return cls(created_at=datetime.fromisoformat(payload["created_at"]), id=UUID(payload["id"]), page=int(payload["page"]))
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"Invalid pagination cursor: {token}") from e
+
+    def after(self, created_at: ColumnElement, id: ColumnElement) -> ColumnElement[bool]:
+        """Rows after the cursor. The bare `created_at <=` bounds the index range scan."""
+        return and_(created_at <= self.created_at, or_(created_at < self.created_at, id < self.id))
+
+
+def next_cursor(rows: Sequence[Any], page: int, page_size: int) -> Optional[str]:
+    """Cursor of the page after `rows`, None when `rows` is the last page."""
+    if len(rows) < page_size:
+        return None
+    return Cursor(created_at=rows[-1].created_at, id=rows[-1].id, page=page + 1).encode()
+
+
+def ranking_key(namespace: str, owner_id: Any, query: str | Sequence[float], *scope: Hashable) -> tuple:
+    """Cache key of a ranking: an embedding is keyed by the digest of its float32 values."""
+    if not isinstance(query, str):
+        query = hashlib.blake2b(as_embedding(query).tobytes(), digest_size=16).hexdigest()
+    return (namespace, owner_id, query, *scope)
+
+
+class RankedIdCache:
+    """LRU cache of ranked ids with a TTL, shared by the repositories of a process."""
+
+    def __init__(self, max_entries: int = RANKED_IDS_CACHE_SIZE, ttl_seconds: float = RANKED_IDS_TTL_SECONDS, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict[tuple, tuple[float, list]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[list]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._clock() - entry[0] >= self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: tuple, ids: list) -> None:
+        with self._lock:
+            self._entries[key] = (self._clock(), ids)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, namespace: str, owner_id: Any) -> None:
+        """Drop every ranking of `owner_id` in `namespace`, after the owner's rows changed."""
+        with self._lock:
+            for key in [key for key in self._entries if key[:2] == (namespace, owner_id)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+ranked_id_cache = RankedIdCache()
+
+
+def page_ids(ids: list, page: int, page_size: int) -> list:
+    return ids[(page - 1) * page_size : page * page_size]
+
+
+def in_rank_order(rows: Sequence[Any], ids: list) -> list:
+    """`rows` loaded by id, back in the order of `ids`."""
+    rank = {id: position for position, id in enumerate(ids)}
+    return sorted(rows, key=lambda row: rank[row.id])
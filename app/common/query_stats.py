@@ -0,0 +1,165 @@
+"""
+Database query statistics per request and per workflow epoch.
+
+`instrument_engine` hooks SQLAlchemy's cursor events on an engine. Statements executed while a
+`QueryStats` is active in the context (`collect_queries`, `QueryStatsMiddleware`) are recorded:
+
+- the number of queries and the total database time
+- per normalized statement (bound parameters, literals and IN lists replaced by `?`): executions,
+  total and slowest time. The same statement run QUERY_REPEAT_THRESHOLD times or more in one request
+  is reported as repeated, the N+1 pattern of a query per row.
+- per workflow epoch (`mark_epoch`), queries and time
+
+Outside of a collection the hooks only look up the context variable.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import lru_cache
+import os
+import re
+import threading
+import time
+from typing import Callable, Iterator, Optional
+
+from sqlalchemy import Engine, event
+
+STAGE = os.getenv("STAGE", "local").lower()
+
+QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", "5"))
+SLOWEST_STATEMENTS = 5
+# Debug response header with the query count, on by default on the local stage only
+QUERY_STATS_HEADER = "x-db-queries"
+QUERY_STATS_HEADER_ENABLED = os.getenv("QUERY_STATS_HEADER", "true" if STAGE == "local" else "false").lower() == "true"
+
+_query_stats_var: ContextVar[Optional["QueryStats"]] = ContextVar("query_stats", default=None)
+
+_WHITESPACE = re.compile(r"\s+")
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PARAMETERS = re.compile(r"%\(\w+\)s|\$\d+|__\[POSTCOMPILE_\w+\]|\?")
+_IN_LISTS = re.compile(r"\bIN \(\?(?:, \?)*\)", re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(statement: str) -> str:
+    """`statement` on one line with bound parameters, literals and IN lists replaced by `?`."""
+    sql = _WHITESPACE.sub(" ", statement).strip()
+    sql = _LITERALS.sub("?", _PARAMETERS.sub("?", sql))
+    return _IN_LISTS.sub("IN (?)", sql)
+
+
+@dataclass
+class StatementStats:
+    sql: str
+    count: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+
+@dataclass
+class EpochStats:
+    queries: int = 0
+    seconds: float = 0.0
+
+
+class QueryStats:
+    """Queries of one request (or test). Sync repositories run in worker threads, so recording is locked."""
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.queries = 0
+        self.seconds = 0.0
+        self.statements: dict[str, StatementStats] = {}
+        self.epoch: Optional[int] = None
+        self.epochs: dict[int, EpochStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, seconds: float) -> None:
+        sql = normalize_sql(statement)
+        with self._lock:
+            self.queries += 1
+            self.seconds += seconds
+            stats = self.statements.get(sql)
+            if stats is None:
+                stats = self.statements[sql] = StatementStats(sql)
+            stats.count += 1
+            stats.total_seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            if self.epoch is not None:
+                epoch = self.epochs.setdefault(self.epoch, EpochStats())
+                epoch.queries += 1
+                epoch.seconds += seconds
+
+    def slowest(self, count: int = SLOWEST_STATEMENTS) -> list[StatementStats]:
+        return sorted(self.statements.values(), key=lambda stats: stats.max_seconds, reverse=True)[:count]
+
+    def repeated(self, threshold: int = QUERY_REPEAT_THRESHOLD) -> list[StatementStats]:
+        """Statements run `threshold` times or more, the most repeated first."""
+        return sorted((stats for stats in self.statements.values() if stats.count >= threshold), key=lambda stats: stats.count, reverse=True)
+
+    def over_budget(self, queries: int, repeats: Optional[int] = None) -> list[str]:
+        """Why these statistics exceed a budget of `queries` queries and `repeats` runs of one statement, empty when they do not."""
+        reasons = []
+        if self.queries > queries:
+            reasons.append(f"{self.queries} queries, budget {queries}")
+        if repeats is not None:
+            reasons.extend(f"statement run {stats.count} times, budget {repeats}: {stats.sql}" for stats in self.repeated(repeats + 1))
+        return reasons
+
+    def header_value(self) -> str:
+        return f"count={self.queries}; time_ms={self.seconds * 1000:.1f}; repeated={len(self.repeated())}"
+
+
+@contextmanager
+def collect_queries(label: str = "") -> Iterator[QueryStats]:
+    """Record the queries run in this context, including tasks and `asyncio.to_thread` calls started from it."""
+    stats = QueryStats(label)
+    token = _query_stats_var.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats_var.reset(token)
+
+
+def mark_epoch(epoch: int) -> None:
+    """Attribute the following queries of the current request to workflow epoch `epoch`."""
+    stats = _query_stats_var.get()
+    if stats is not None:
+        stats.epoch = epoch
+
+
+_request_listeners: list[Callable[[QueryStats], None]] = []
+
+
+def add_request_listener(listener: Callable[[QueryStats], None]) -> None:
+    """Call `listener` with the statistics of every completed request (the query budget of the tests)."""
+    _request_listeners.append(listener)
+
+
+def remove_request_listener(listener: Callable[[QueryStats], None]) -> None:
+    _request_listeners.remove(listener)
+
+
+def request_completed(stats: QueryStats) -> None:
+    for listener in list(_request_listeners):
+        listener(stats)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if context is not None and _query_stats_var.get() is not None:
+        context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    stats = _query_stats_var.get()
+    started = getattr(context, "_query_started", None)
+    if stats is not None and started is not None:
+        stats.record(statement, time.perf_counter() - started)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Record the statements of `engine` (the `sync_engine` of an async engine) in the active `QueryStats`."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
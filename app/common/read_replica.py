@@ -0,0 +1,84 @@
+"""
+Read/write routing between the writer and a read replica (the Aurora reader endpoint, or the local
+replica of docker compose).
+
+Repository methods decorated with `read_only` (or code in a `replica_reads()` block) run their
+statements on the replica: the vector searches and history reads that would otherwise compete with
+the writes for the writer's CPU. Everything else goes to the writer.
+
+Read-your-writes within a turn: the session of a unit of work lives for the whole request, and once
+it has written (a flush, an INSERT/UPDATE/DELETE, raw SQL or a raw connection outside of a read-only
+method) it is pinned to the writer, so later reads of the turn see the writes the replica may not
+have replayed yet. Statements of a read-only method that write still go to the writer, and pin.
+
+Without a replica configured (see app.common.db_connect) sessions only use the writer.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+import inspect
+from typing import Any, Callable, Iterator, Optional, TypeVar
+
+from sqlalchemy import Engine, TextClause
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_replica_reads_var: ContextVar[bool] = ContextVar("replica_reads", default=False)
+
+
+@contextmanager
+def replica_reads() -> Iterator[None]:
+    """Route the reads of this block to the read replica."""
+    token = _replica_reads_var.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads_var.reset(token)
+
+
+def read_only(method: F) -> F:
+    """Mark a repository method as read-only: its statements are routed to the read replica."""
+    if inspect.iscoroutinefunction(method):
+
+        @wraps(method)
+        async def read_only_coroutine(*args, **kwargs):
+            with replica_reads():
+                return await method(*args, **kwargs)
+
+        return read_only_coroutine  # type: ignore[return-value]
+
+    @wraps(method)
+    def read_only_method(*args, **kwargs):
+        with replica_reads():
+            return method(*args, **kwargs)
+
+    return read_only_method  # type: ignore[return-value]
+
+
+def _is_write(clause: Any) -> bool:
+    return isinstance(clause, UpdateBase) or getattr(clause, "_for_update_arg", None) is not None
+
+
+class RoutingSession(Session):
+    """
+    Session bound to the writer that runs the reads of `read_only` methods on `reader()`, until it
+    is pinned to the writer by its first write. Used as `sync_session_class` by the async sessions,
+    with the reader's `sync_engine`.
+    """
+
+    def __init__(self, *args: Any, reader: Optional[Callable[[], Engine]] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.reader = reader
+        self.pinned_to_writer = False
+
+    def get_bind(self, mapper: Any = None, *, clause: Any = None, **kwargs: Any) -> Any:
+        if self.reader is not None and not self.pinned_to_writer:
+            reading = _replica_reads_var.get()
+            if self._flushing or _is_write(clause) or (not reading and (clause is None or isinstance(clause, TextClause))):
+                self.pinned_to_writer = True
+            elif reading:
+                return self.reader()
+        return super().get_bind(mapper, clause=clause, **kwargs)
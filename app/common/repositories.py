@@ -1,4 +1,15 @@
-from sqlalchemy.orm import Session
+import inspect
+from typing import TYPE_CHECKING, Any, Optional
+
+from sqlalchemy import Select
+from sqlalchemy.orm import Session, SessionTransaction
+
+from app.common.pagination import RANKED_IDS_LIMIT, ranked_id_cache
+from app.common.unit_of_work import current_unit_of_work, in_unit_of_work
+from app.common.vector_index import candidate_rows, filter_strategy, nearest, search_settings_statement
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession, AsyncSessionTransaction
 
 
 class BaseRepository:
@@ -10,12 +21,55 @@ class BaseRepository:
         """
         self.session = session
 
+    @property
+    def session(self) -> Session:
+        """The session of the current (sync) unit of work, the injected session outside of one."""
+        unit_of_work = current_unit_of_work()
+        if unit_of_work is not None and not unit_of_work.is_async:
+            return unit_of_work.session
+        return self._session
+
+    @session.setter
+    def session(self, session: Session) -> None:
+        self._session = session
+
     def commit(self):
-        self.session.commit()
+        if in_unit_of_work(self.session):
+            # committed once at the end of the turn
+            self.session.flush()
+        else:
+            self.session.commit()
 
     def rollback(self):
         self.session.rollback()
 
+    def prepare_vector_search(self, rows: int, ef_search: Optional[int] = None, filtered_rows: Optional[int] = None) -> str:
+        """
+        Apply the HNSW settings of the next vector search in this transaction and return its filter
+        strategy, for `nearest` (see app.common.vector_index).
+        """
+        strategy = filter_strategy(filtered_rows)
+        if (statement := search_settings_statement(rows, ef_search, strategy)) is not None:
+            self.session.execute(statement)
+        return strategy
+
+    def vector_search(self, stmt: Select, entity: Any, embedding: Any, limit: int, *order_by: Any, ef_search: Optional[int] = None, filtered_rows: Optional[int] = None) -> Select:
+        """`stmt` as a search for the `limit` `entity` rows nearest to `embedding`, with the HNSW settings applied."""
+        strategy = self.prepare_vector_search(candidate_rows(entity.__tablename__, limit), ef_search, filtered_rows)
+        return nearest(stmt, entity, embedding, strategy, limit, *order_by)
+
+    def ranked_ids(self, key: tuple, stmt: Select, entity: Any, embedding: Any, *order_by: Any, ef_search: Optional[int] = None, filtered_rows: Optional[int] = None) -> list:
+        """
+        Ids of the RANKED_IDS_LIMIT rows of `stmt`, a select of `entity` ids, nearest to `embedding`,
+        cached under `key` (see app.common.pagination).
+        """
+        ids = ranked_id_cache.get(key)
+        if ids is None:
+            search = self.vector_search(stmt, entity, embedding, RANKED_IDS_LIMIT, *order_by, ef_search=ef_search, filtered_rows=filtered_rows)
+            ids = list(self.session.scalars(search))
+            ranked_id_cache.put(key, ids)
+        return ids
+
     def close(self):
         self.session.close()
 
@@ -28,13 +82,138 @@ class TransactionManager(BaseRepository):
 
     def __init__(self, session: Session):
         super().__init__(session)
+        self._savepoint: Optional[SessionTransaction] = None
 
     def __enter__(self):
+        if in_unit_of_work(self.session):
+            self._savepoint = self.session.begin_nested()
         return self.session
 
     def __exit__(self, exc_type, exc_value, traceback):
+        if self._savepoint is not None:
+            savepoint, self._savepoint = self._savepoint, None
+            if savepoint.is_active and exc_type is None:
+                savepoint.commit()
+            elif savepoint.is_active:
+                savepoint.rollback()
+            return
         if exc_type is None:
             self.commit()
         else:
             self.rollback()
         self.close()
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.__exit__(exc_type, exc_value, traceback)
+
+
+class AsyncBaseRepository:
+    """Base class for repositories on the async (asyncpg) backend."""
+
+    def __init__(self, session: "AsyncSession"):
+        self.session = session
+
+    @property
+    def session(self) -> "AsyncSession":
+        """The session of the current (async) unit of work, the injected session outside of one."""
+        unit_of_work = current_unit_of_work()
+        if unit_of_work is not None and unit_of_work.is_async:
+            return unit_of_work.session
+        return self._session
+
+    @session.setter
+    def session(self, session: "AsyncSession") -> None:
+        self._session = session
+
+    async def commit(self):
+        if in_unit_of_work(self.session):
+            # committed once at the end of the turn
+            await self.session.flush()
+        else:
+            await self.session.commit()
+
+    async def rollback(self):
+        await self.session.rollback()
+
+    async def prepare_vector_search(self, rows: int, ef_search: Optional[int] = None, filtered_rows: Optional[int] = None) -> str:
+        """
+        Apply the HNSW settings of the next vector search in this transaction and return its filter
+        strategy, for `nearest` (see app.common.vector_index).
+        """
+        strategy = filter_strategy(filtered_rows)
+        if (statement := search_settings_statement(rows, ef_search, strategy)) is not None:
+            await self.session.execute(statement)
+        return strategy
+
+    async def vector_search(
+        self, stmt: Select, entity: Any, embedding: Any, limit: int, *order_by: Any, ef_search: Optional[int] = None, filtered_rows: Optional[int] = None
+    ) -> Select:
+        """`stmt` as a search for the `limit` `entity` rows nearest to `embedding`, with the HNSW settings applied."""
+        strategy = await self.prepare_vector_search(candidate_rows(entity.__tablename__, limit), ef_search, filtered_rows)
+        return nearest(stmt, entity, embedding, strategy, limit, *order_by)
+
+    async def ranked_ids(self, key: tuple, stmt: Select, entity: Any, embedding: Any, *order_by: Any, ef_search: Optional[int] = None, filtered_rows: Optional[int] = None) -> list:
+        """
+        Ids of the RANKED_IDS_LIMIT rows of `stmt`, a select of `entity` ids, nearest to `embedding`,
+        cached under `key` (see app.common.pagination).
+        """
+        ids = ranked_id_cache.get(key)
+        if ids is None:
+            search = await self.vector_search(stmt, entity, embedding, RANKED_IDS_LIMIT, *order_by, ef_search=ef_search, filtered_rows=filtered_rows)
+            ids = list(await self.session.scalars(search))
+            ranked_id_cache.put(key, ids)
+        return ids
+
+    async def close(self):
+        await self.session.close()
+
+
+class AsyncTransactionManager(AsyncBaseRepository):
+    """Async counterpart of `TransactionManager`, used with `async with`."""
+
+    def __init__(self, session: "AsyncSession"):
+        super().__init__(session)
+        self._savepoint: Optional["AsyncSessionTransaction"] = None
+
+    async def __aenter__(self):
+        if in_unit_of_work(self.session):
+            self._savepoint = await self.session.begin_nested()
+        return self.session
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        if self._savepoint is not None:
+            savepoint, self._savepoint = self._savepoint, None
+            if savepoint.is_active and exc_type is None:
+                await savepoint.commit()
+            elif savepoint.is_active:
+                await savepoint.rollback()
+            return
+        if exc_type is None:
+            await self.commit()
+        else:
+            await self.rollback()
+        await self.close()
+
+
+class AwaitableRepository:
+    """
+    Exposes a sync repository through the async repository API: every method call returns an
+    awaitable. Lets callers await repositories regardless of the configured DB backend.
+    """
+
+    def __init__(self, repository: Any):
+        self._repository = repository
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._repository, name)
+        if not callable(attribute):
+            return attribute
+
+        async def call(*args, **kwargs):
+            result = attribute(*args, **kwargs)
+            return await result if inspect.isawaitable(result) else result
+
+        return call
@@ -0,0 +1,36 @@
+"""
+Fast token estimation.
+
+No tokenizer ships for the Bedrock Claude models, so token counts are estimated from the character
+length. The characters-per-token ratio starts at MemoryManagementConfig.AVERAGE_TOKEN_SIZE and is
+calibrated against the input token counts the provider reports for each prompt.
+"""
+
+import math
+
+from app.common.models import MemoryManagementConfig
+
+
+class TokenEstimator:
+    def __init__(self, chars_per_token: float = MemoryManagementConfig.AVERAGE_TOKEN_SIZE, smoothing: float = 0.2, bounds: tuple[float, float] = (1.5, 8.0)):
+        self.chars_per_token = float(chars_per_token)
+        self.smoothing = smoothing
+        self.bounds = bounds
+
+    def count(self, text: str) -> int:
+        return math.ceil(len(text) / self.chars_per_token)
+
+    def chars_for(self, tokens: int) -> int:
+        """Number of characters that fit in `tokens`."""
+        return max(int(tokens * self.chars_per_token), 0)
+
+    def calibrate(self, text: str, actual_tokens: int) -> None:
+        """Move the ratio towards the one observed for `text` (exponential moving average)."""
+        if not text or actual_tokens <= 0:
+            return
+        observed = min(max(len(text) / actual_tokens, self.bounds[0]), self.bounds[1])
+        self.chars_per_token += self.smoothing * (observed - self.chars_per_token)
+
+
+# Shared by the prompt encoders, the prompt budget and memory blocks so calibration benefits all of them
+token_estimator = TokenEstimator()
@@ -0,0 +1,40 @@
+from datetime import datetime, timezone
+from typing import Optional, Self
+
+from sqlalchemy import TEXT, BigInteger, DateTime, Integer
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.common.entities import BaseEntity
+from app.common.tracing import PromptTrace
+
+
+class PromptTraceEntity(BaseEntity):
+    """Sampled LLM prompt of one workflow epoch"""
+
+    __tablename__ = "prompt_traces"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    request_id: Mapped[Optional[str]] = mapped_column(TEXT, nullable=True)
+    user_id: Mapped[str] = mapped_column(TEXT, nullable=False)
+    conversation_id: Mapped[str] = mapped_column(TEXT, nullable=False)
+    epoch: Mapped[int] = mapped_column(Integer, nullable=False)
+    prompt: Mapped[str] = mapped_column(TEXT, nullable=False)
+    response: Mapped[str] = mapped_column(TEXT, nullable=False, default="")
+    error: Mapped[Optional[str]] = mapped_column(TEXT, nullable=True)
+    meta_info: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    @classmethod
+    def from_domain(cls, trace: PromptTrace) -> Self:
+        return cls(
+            request_id=trace.request_id,
+            user_id=trace.user_id,
+            conversation_id=trace.conversation_id,
+            epoch=trace.epoch,
+            prompt=trace.prompt,
+            response=trace.response,
+            error=trace.error,
+            meta_info=trace.metadata,
+            created_at=trace.created_at,
+        )
@@ -0,0 +1,197 @@
+"""
+Sampled prompt traces.
+
+Workflows hand a `PromptTrace` to the `PromptTracer`, which decides whether the request is sampled
+and queues the trace for a background thread, so no disk or database I/O happens on the event loop.
+Sampling is decided per request (all epochs of a sampled request are kept) from a rate, and users
+listed in PROMPT_TRACE_USERS are always traced. Traces carry the request ID set by
+`RequestIdMiddleware` so they can be correlated with logs.
+
+Sinks:
+- disabled: drop everything
+- ring: keep the most recent traces in memory
+- file: JSON lines in a size-rotated local file
+- db: rows in the prompt_traces table
+"""
+
+from abc import ABC, abstractmethod
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+import hashlib
+import json
+import logging
+from logging.handlers import RotatingFileHandler
+import os
+import queue
+import threading
+from typing import Any, Callable, Iterable, Optional
+from uuid import uuid4
+
+from loguru import logger
+from sqlalchemy.orm import Session
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+def get_request_id() -> Optional[str]:
+    return request_id_var.get()
+
+
+@dataclass
+class PromptTrace:
+    user_id: str
+    conversation_id: str
+    epoch: int
+    prompt: str
+    response: str = ""
+    request_id: Optional[str] = field(default_factory=get_request_id)
+    username: Optional[str] = None
+    metadata: dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), default=str)
+
+
+class TraceSink(ABC):
+    @abstractmethod
+    def write(self, trace: PromptTrace) -> None:
+        """Persist one trace. Called from the tracer's background thread."""
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class NullTraceSink(TraceSink):
+    def write(self, trace: PromptTrace) -> None:
+        pass
+
+
+class RingBufferTraceSink(TraceSink):
+    def __init__(self, capacity: int = 200):
+        self._traces: deque[PromptTrace] = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def write(self, trace: PromptTrace) -> None:
+        with self._lock:
+            self._traces.append(trace)
+
+    def recent(self, request_id: Optional[str] = None) -> list[PromptTrace]:
+        with self._lock:
+            return [t for t in self._traces if request_id is None or t.request_id == request_id]
+
+
+class RotatingFileTraceSink(TraceSink):
+    """One JSON trace per line in `<directory>/prompt_traces.jsonl`, rotated by size."""
+
+    def __init__(self, directory: str, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "prompt_traces.jsonl")
+        self._handler = RotatingFileHandler(self.path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+
+    def write(self, trace: PromptTrace) -> None:
+        self._handler.emit(logging.makeLogRecord({"msg": trace.to_json(), "levelno": logging.INFO}))
+
+    def close(self) -> None:
+        self._handler.close()
+
+
+class DatabaseTraceSink(TraceSink):
+    def __init__(self, session_factory: Callable[[], Session]):
+        self.session_factory = session_factory
+
+    def write(self, trace: PromptTrace) -> None:
+        from app.common.trace_entities import PromptTraceEntity
+
+        with self.session_factory() as session, session.begin():
+            session.add(PromptTraceEntity.from_domain(trace))
+
+
+class TraceSampler:
+    def __init__(self, rate: float = 1.0, users: Iterable[str] = ()):
+        self.rate = min(max(rate, 0.0), 1.0)
+        self.users = frozenset(users)
+
+    def should_sample(self, request_id: Optional[str], *user_keys: Optional[str]) -> bool:
+        if self.users.intersection(str(k) for k in user_keys if k):
+            return True
+        if self.rate >= 1.0:
+            return True
+        if self.rate <= 0.0:
+            return False
+        # Hash of the request ID, so every epoch of a request gets the same decision
+        key = request_id or uuid4().hex
+        bucket = int(hashlib.sha1(key.encode()).hexdigest()[:8], 16) / 0xFFFFFFFF
+        return bucket < self.rate
+
+
+class PromptTracer:
+    """Samples traces and writes them to the sink on a daemon thread. Never blocks the caller."""
+
+    def __init__(self, sink: TraceSink, sampler: Optional[TraceSampler] = None, max_pending: int = 1000):
+        self.sink = sink
+        self.sampler = sampler or TraceSampler()
+        self.dropped = 0
+        self._queue: queue.Queue[Optional[PromptTrace]] = queue.Queue(maxsize=max_pending)
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def disabled(cls) -> "PromptTracer":
+        return cls(NullTraceSink(), TraceSampler(rate=0.0))
+
+    @property
+    def enabled(self) -> bool:
+        return not isinstance(self.sink, NullTraceSink)
+
+    def should_trace(self, user_id: Optional[str] = None, username: Optional[str] = None) -> bool:
+        return self.enabled and self.sampler.should_sample(get_request_id(), user_id, username)
+
+    def record(self, trace: PromptTrace) -> bool:
+        """Queue `trace` if its request is sampled. Returns False if it was not sampled or dropped."""
+        if not self.should_trace(trace.user_id, trace.username):
+            return False
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(trace)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.debug(f"Prompt trace dropped, {self._queue.maxsize} traces pending ({self.dropped} dropped so far)")
+            return False
+
+    def flush(self) -> None:
+        """Block until every queued trace has been written."""
+        if self._worker is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        if self._worker is not None:
+            self._queue.put(None)
+            self._worker.join(timeout=5)
+            self._worker = None
+        self.sink.close()
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="prompt-tracer", daemon=True)
+                    self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            trace = self._queue.get()
+            try:
+                if trace is None:
+                    return
+                self.sink.write(trace)
+            except Exception as e:
+                logger.warning(f"Failed to write prompt trace for request {trace.request_id if trace else None}: {e}")
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,145 @@
+"""
+Request scoped unit of work.
+
+`UnitOfWorkMiddleware` runs every HTTP request in one `UnitOfWork` bound to a context variable, so
+concurrent requests on the same event loop never share a session (the thread-local `scoped_session`
+gave every request on a worker thread the same one). Repositories use the session of the current
+unit of work and flush instead of committing: the turn is committed once when the request ends, and
+rolled back as a whole when it fails. Tools run in nested savepoints (`savepoint()`) so a failing
+tool only discards its own writes.
+
+Work that outlives the request, like the conversation title update, runs in its own unit of work
+through `detached()`.
+"""
+
+from contextlib import asynccontextmanager
+from contextvars import ContextVar, Token
+import inspect
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Optional, TypeVar, Union
+
+from sqlalchemy.orm import Session
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+T = TypeVar("T")
+
+AnySession = Union[Session, "AsyncSession"]
+
+
+async def _resolve(result: Any) -> Any:
+    return await result if inspect.isawaitable(result) else result
+
+
+class UnitOfWork:
+    """One session and one transaction for a request. The session is only opened when first used."""
+
+    def __init__(self, session_factory: Callable[[], AnySession], is_async: bool = False):
+        self.session_factory = session_factory
+        self.is_async = is_async
+        self.rollback_only = False
+        self.completed = False
+        self._session: Optional[AnySession] = None
+        self._token: Optional[Token] = None
+
+    @property
+    def started(self) -> bool:
+        return self._session is not None
+
+    @property
+    def session(self) -> Any:
+        if self._session is None:
+            self._session = self.session_factory()
+        return self._session
+
+    def owns(self, session: Any) -> bool:
+        return session is not None and session is self._session
+
+    def fork(self) -> "UnitOfWork":
+        """A new unit of work on the same backend, with its own session."""
+        return UnitOfWork(self.session_factory, is_async=self.is_async)
+
+    async def complete(self) -> None:
+        """Commit the turn, or roll it back if it was marked rollback only. Later calls are no-ops."""
+        if self.completed:
+            return
+        self.completed = True
+        if self._session is None:
+            return
+        if self.rollback_only:
+            await _resolve(self._session.rollback())
+        else:
+            await _resolve(self._session.commit())
+
+    async def close(self) -> None:
+        session, self._session = self._session, None
+        if session is not None:
+            await _resolve(session.close())
+
+    @asynccontextmanager
+    async def savepoint(self) -> AsyncIterator[None]:
+        """Nested transaction, released when the block succeeds and rolled back on its own when it raises."""
+        nested = await _resolve(self.session.begin_nested())
+        try:
+            yield
+        except BaseException:
+            if nested.is_active:
+                await _resolve(nested.rollback())
+            raise
+        if nested.is_active:
+            await _resolve(nested.commit())
+
+    async def __aenter__(self) -> "UnitOfWork":
+        self._token = _current_unit_of_work.set(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        if self._token is not None:
+            _current_unit_of_work.reset(self._token)
+            self._token = None
+        try:
+            if exc_type is not None:
+                self.rollback_only = True
+            await self.complete()
+        finally:
+            await self.close()
+
+
+_current_unit_of_work: ContextVar[Optional[UnitOfWork]] = ContextVar("unit_of_work", default=None)
+
+
+def current_unit_of_work() -> Optional[UnitOfWork]:
+    return _current_unit_of_work.get()
+
+
+def in_unit_of_work(session: Any) -> bool:
+    """Whether `session` belongs to the current unit of work, i.e. it must not be committed directly."""
+    unit_of_work = current_unit_of_work()
+    return unit_of_work is not None and unit_of_work.owns(session)
+
+
+@asynccontextmanager
+async def savepoint() -> AsyncIterator[None]:
+    """Savepoint in the current unit of work, a no-op outside of one."""
+    unit_of_work = current_unit_of_work()
+    if unit_of_work is None:
+        yield
+        return
+    async with unit_of_work.savepoint():
+        yield
+
+
+def detached(fn: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> Awaitable[T]:
+    """
+    Wrap `fn(*args, **kwargs)` for `asyncio.create_task`: it runs in a fork of the current unit of
+    work and commits on its own, instead of writing into a request that may already be finished.
+    """
+    parent = current_unit_of_work()
+
+    async def run() -> T:
+        if parent is None:
+            return await fn(*args, **kwargs)
+        async with parent.fork():
+            return await fn(*args, **kwargs)
+
+    return run()
@@ -1,16 +1,19 @@
 from abc import abstractmethod
 import os
 
-from langchain_aws import BedrockEmbeddings
+from app.common.lazy import lazy_import
+from app.common.vector_types import Embedding, as_embedding
+
+langchain_aws = lazy_import("langchain_aws")
 
 
 class BaseVectorEmbedder:
     @abstractmethod
-    def embed(self, texts: list[str]) -> list[list[float]]:
+    def embed(self, texts: list[str]) -> list[Embedding]:
         raise NotImplementedError("Must be implemented by child class")
 
     @abstractmethod
-    def embed_single_text(self, text: str) -> list[float]:
+    def embed_single_text(self, text: str) -> Embedding:
         raise NotImplementedError("Must be implemented by child class")
 
 
@@ -26,8 +29,10 @@ class LangChainTitanEmbedder(BaseVectorEmbedder):
         max_tokens: int = 32000,
     ):
         stage = os.getenv("STAGE", "local").lower()
-        if BedrockEmbeddings is None:
-            raise ImportError("langchain-aws is not installed; pip install langchain-aws")
+        try:
+            BedrockEmbeddings = langchain_aws.BedrockEmbeddings
+        except ImportError as e:
+            raise ImportError("langchain-aws is not installed; pip install langchain-aws") from e
 
         # Model kwargs - keep minimal to avoid schema violations
         model_kwargs = {}
@@ -38,7 +43,7 @@ class LangChainTitanEmbedder(BaseVectorEmbedder):
         else:
             self.model = BedrockEmbeddings(model_id=model_id, region_name=region_name, model_kwargs=model_kwargs)
 
-    def embed(self, texts: list[str]) -> list[list[float]]:
+    def embed(self, texts: list[str]) -> list[Embedding]:
         """
         Embed multiple documents/texts at once.
         Truncates texts if they're too long to avoid token limit errors.
@@ -48,9 +53,9 @@ class LangChainTitanEmbedder(BaseVectorEmbedder):
         max_chars = 30000
         truncated_texts = [text[:max_chars] if len(text) > max_chars else text for text in texts]
 
-        return self.model.embed_documents(truncated_texts)
+        return [as_embedding(embedding) for embedding in self.model.embed_documents(truncated_texts)]
 
-    def embed_single_text(self, text: str) -> list[float]:
+    def embed_single_text(self, text: str) -> Embedding:
         """
         Embed a single query/text.
         Truncates text if it's too long to avoid token limit errors.
@@ -61,4 +66,4 @@ class LangChainTitanEmbedder(BaseVectorEmbedder):
         if len(text) > max_chars:
             text = text[:max_chars]
 
-        return self.model.embed_query(text)
+        return as_embedding(self.model.embed_query(text))
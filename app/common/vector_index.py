@@ -0,0 +1,136 @@
+"""
+HNSW vector search settings.
+
+Each table has one canonical distance, the one its HNSW index is built for (migration 005):
+messages use L2 (`vector_l2_ops`), memory entries and conversation summaries use cosine
+(`vector_cosine_ops`). Entities expose it as `embedding_distance()`; ordering by any other distance
+cannot use the index.
+
+`hnsw.ef_search` is the candidate list size of an index scan: higher values trade speed for recall,
+and a scan never returns more than ef_search rows, so it is raised to cover LIMIT + OFFSET.
+
+Recall searches are filtered per user (or conversation). The HNSW index is global, so a plain index
+scan finds ef_search nearest rows of all users and filters them afterwards: for a user owning a small
+share of the table that leaves fewer rows than the page asked for. Filtered searches use one of
+(VECTOR_FILTER_STRATEGY):
+
+- iterative: pgvector >= 0.8 iterative index scans (`hnsw.iterative_scan = strict_order`). The scan
+  keeps going until enough rows pass the filter, up to `hnsw.max_scan_tuples` visited tuples.
+- exact: order by `distance + 0`, which the HNSW index cannot serve, so the planner reads the user's
+  rows through their btree index and sorts them. Always complete, linear in the rows of the user.
+- auto (default): exact when the search knows the filtered row count and it is at most
+  VECTOR_EXACT_SCAN_ROWS, iterative otherwise.
+
+The HNSW index of a table can be built on a quantized copy of the vectors instead of the vectors
+themselves (VECTOR_STORAGE_<TABLE>, e.g. VECTOR_STORAGE_MESSAGES, applied by migration 008):
+
+- vector (default): the full float32 vectors.
+- halfvec: `column::halfvec(1536)`, half the index size.
+- bit: `binary_quantize(column)::bit(1536)` with hamming distance, 1/32 of the index size.
+
+The table keeps the full vectors. A quantized search ranks candidate_rows() candidates on the
+index and re-ranks them on the full vectors (`nearest`), so the order is exact among the candidates
+and recall only depends on the true neighbours being among them. Needs pgvector >= 0.7.
+"""
+
+import os
+from typing import Any, Optional
+
+from sqlalchemy import ColumnElement, Select, cast, func, literal, select
+
+from app.common.lazy import lazy_import
+
+# halfvec and bit types of the quantized searches
+pgvector_types = lazy_import("pgvector.sqlalchemy")
+
+# pgvector's default, searches needing no more rows than this do not set it
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "40"))
+HNSW_MAX_EF_SEARCH = 1000
+HNSW_MAX_SCAN_TUPLES = int(os.getenv("HNSW_MAX_SCAN_TUPLES", "20000"))
+
+FILTER_STRATEGIES = ("auto", "iterative", "exact")
+VECTOR_FILTER_STRATEGY = os.getenv("VECTOR_FILTER_STRATEGY", "auto").lower()
+VECTOR_EXACT_SCAN_ROWS = int(os.getenv("VECTOR_EXACT_SCAN_ROWS", "20000"))
+
+VECTOR_STORAGES = ("vector", "halfvec", "bit")
+# candidates ranked on the quantized index per row returned, the cruder the quantization the more
+RERANK_FACTORS = {"halfvec": int(os.getenv("HALFVEC_RERANK_FACTOR", "2")), "bit": int(os.getenv("BIT_RERANK_FACTOR", "8"))}
+
+
+def ef_search_for(rows: int, ef_search: Optional[int] = None) -> int:
+    return min(max(ef_search or HNSW_EF_SEARCH, rows), HNSW_MAX_EF_SEARCH)
+
+
+def filter_strategy(filtered_rows: Optional[int] = None, strategy: Optional[str] = None) -> str:
+    """The strategy, `iterative` or `exact`, for a search over `filtered_rows` rows (None when unknown)."""
+    strategy = (strategy or VECTOR_FILTER_STRATEGY).lower()
+    if strategy not in FILTER_STRATEGIES:
+        raise ValueError(f"Unknown vector filter strategy: {strategy}. Available: {list(FILTER_STRATEGIES)}")
+    if strategy == "auto":
+        return "exact" if filtered_rows is not None and filtered_rows <= VECTOR_EXACT_SCAN_ROWS else "iterative"
+    return strategy
+
+
+def search_settings_statement(rows: int, ef_search: Optional[int] = None, strategy: str = "iterative") -> Optional[Select]:
+    """
+    `SET LOCAL` of the HNSW settings for a search returning `rows` rows (offset included), or None when
+    there is nothing to set. set_config(..., true) is transaction scoped like SET LOCAL.
+    """
+    if strategy == "exact":
+        return None
+    value = ef_search_for(rows, ef_search)
+    settings = {"hnsw.iterative_scan": "strict_order", "hnsw.max_scan_tuples": str(HNSW_MAX_SCAN_TUPLES)}
+    if ef_search is not None or value != HNSW_EF_SEARCH:
+        settings["hnsw.ef_search"] = str(value)
+    return select(*(func.set_config(name, setting, True) for name, setting in settings.items()))
+
+
+def order_by_distance(distance: ColumnElement, strategy: str) -> ColumnElement:
+    """`distance` as the ORDER BY of a search run with `strategy`."""
+    return distance + 0 if strategy == "exact" else distance
+
+
+def vector_storage(table: str) -> str:
+    """The storage of the HNSW index of `table`: `vector`, `halfvec` or `bit`."""
+    storage = os.getenv(f"VECTOR_STORAGE_{table.upper()}", "vector").lower()
+    if storage not in VECTOR_STORAGES:
+        raise ValueError(f"Unknown vector storage for {table}: {storage}. Available: {list(VECTOR_STORAGES)}")
+    return storage
+
+
+def candidate_rows(table: str, rows: int) -> int:
+    """Rows the index scan of a search returning `rows` rows reads, the re-ranked candidates on a quantized table."""
+    storage = vector_storage(table)
+    return rows if storage == "vector" else rows * RERANK_FACTORS[storage]
+
+
+def vector_distance(column: Any, embedding: Any, distance: str, storage: str = "vector") -> ColumnElement[float]:
+    """
+    `distance` (`l2` or `cosine`) between the vector `column` and `embedding`, on their `storage`
+    representation. The quantized expressions are those of the indexes of migration 008.
+    """
+    if storage == "vector":
+        return column.l2_distance(embedding) if distance == "l2" else column.cosine_distance(embedding)
+    dimensions = column.type.dim
+    query = cast(literal(embedding, column.type), column.type)
+    if storage == "bit":
+        return cast(func.binary_quantize(column), pgvector_types.BIT(dimensions)).hamming_distance(func.binary_quantize(query))
+    column, query = cast(column, pgvector_types.HALFVEC(dimensions)), cast(query, pgvector_types.HALFVEC(dimensions))
+    return column.l2_distance(query) if distance == "l2" else column.cosine_distance(query)
+
+
+def nearest(stmt: Select, entity: Any, embedding: Any, strategy: str, limit: int, *order_by: Any) -> Select:
+    """
+    `stmt` ordered by the distance of `entity` rows to `embedding`, then `order_by`, and limited to
+    `limit` rows. On a quantized table the index ranks the candidates among the rows `stmt` filters
+    and the full vectors re-rank them. Exact scans read the full vectors anyway.
+    """
+    distance = entity.embedding_distance(embedding)
+    storage = vector_storage(entity.__tablename__)
+    if storage == "vector" or strategy == "exact":
+        return stmt.order_by(order_by_distance(distance, strategy), *order_by).limit(limit)
+
+    candidates = select(entity.id).order_by(entity.embedding_distance(embedding, storage)).limit(candidate_rows(entity.__tablename__, limit))
+    if stmt.whereclause is not None:
+        candidates = candidates.where(stmt.whereclause)
+    return stmt.where(entity.id.in_(candidates.correlate(None))).order_by(distance, *order_by).limit(limit)
@@ -0,0 +1,133 @@
+"""
+Embedding values: one contiguous float32 numpy array from the embedder to the database and back.
+
+- `as_embedding` turns what an embedder, pgvector, a request or a row returns into a 1-D
+  C-contiguous float32 array. Such an array, or a buffer of float32 values, is used without a copy.
+- `Embedding` is the pydantic field type. Validation calls `as_embedding`, so domain models keep
+  the array the embedder returned. JSON output is a list of numbers.
+- `EmbeddingVector` is the column type of the vector columns. On asyncpg the array is bound as is
+  and travels in pgvector's binary format (`register_embedding_codec`). psycopg2 cannot bind binary
+  parameters, so the sync engine sends the text form and parses results straight into float32.
+"""
+
+from __future__ import annotations
+
+import struct
+from typing import TYPE_CHECKING, Annotated, Any
+
+from pydantic import PlainSerializer, PlainValidator, WithJsonSchema
+from sqlalchemy import Dialect, Float, Operators
+from sqlalchemy.types import TypeEngine, UserDefinedType
+
+from app.common.lazy import lazy_import
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pgvector
+else:
+    np = lazy_import("numpy")
+    pgvector = lazy_import("pgvector")
+
+
+def as_embedding(value: Any) -> np.ndarray:
+    """`value` as a 1-D C-contiguous float32 array, the array itself when it already is one."""
+    if isinstance(value, np.ndarray) and value.dtype == np.float32 and value.ndim == 1 and value.flags.c_contiguous:
+        return value
+    if isinstance(value, pgvector.Vector):
+        return value.to_numpy()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        # raw native float32 values, e.g. a memoryview of an array('f')
+        return np.frombuffer(value, dtype=np.float32)
+    if isinstance(value, str):
+        return np.fromstring(value.strip("[]"), dtype=np.float32, sep=",")
+    try:
+        embedding = np.ascontiguousarray(value, dtype=np.float32)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Expected a sequence of floats as embedding, got {type(value).__name__}") from e
+    if embedding.ndim != 1:
+        raise ValueError(f"Expected a 1-D embedding, got shape {embedding.shape}")
+    return embedding
+
+
+def empty_embedding() -> np.ndarray:
+    return np.empty(0, dtype=np.float32)
+
+
+def to_text(embedding: np.ndarray) -> str:
+    """pgvector text form, for drivers without binary parameters."""
+    return "[" + ",".join(map(str, embedding.tolist())) + "]"
+
+
+def to_binary(value: Any) -> bytes:
+    """pgvector binary form: dimensions and an unused uint16, then big-endian float32 values."""
+    embedding = as_embedding(value)
+    return struct.pack(">HH", len(embedding), 0) + embedding.astype(">f4", copy=False).tobytes()
+
+
+def from_binary(data: bytes) -> np.ndarray:
+    dimensions, _ = struct.unpack_from(">HH", data)
+    return np.frombuffer(data, dtype=">f4", count=dimensions, offset=4).astype(np.float32)
+
+
+# numpy is loaded with the first embedding, not on import: models only name the array type for type checkers
+Embedding = Annotated[
+    np.ndarray if TYPE_CHECKING else Any,
+    PlainValidator(as_embedding),
+    PlainSerializer(lambda embedding: embedding.tolist(), when_used="json"),
+    WithJsonSchema({"type": "array", "items": {"type": "number"}}),
+]
+
+
+class EmbeddingVector(UserDefinedType[Any]):
+    """pgvector `vector` column holding `Embedding` arrays, with the distance operators of pgvector.sqlalchemy.VECTOR."""
+
+    cache_ok = True
+
+    def __init__(self, dim: int | None = None) -> None:
+        super().__init__()
+        self.dim = dim
+
+    def get_col_spec(self, **kw: Any) -> str:
+        return "VECTOR" if self.dim is None else f"VECTOR({self.dim})"
+
+    def bind_processor(self, dialect: Dialect) -> Any:
+        if dialect.driver == "asyncpg":
+
+            def process(value: Any) -> Any:
+                return None if value is None else as_embedding(value)
+
+        else:
+
+            def process(value: Any) -> Any:
+                return None if value is None else to_text(as_embedding(value))
+
+        return process
+
+    def result_processor(self, dialect: Dialect, coltype: Any) -> Any:
+        def process(value: Any) -> np.ndarray | None:
+            return None if value is None else as_embedding(value)
+
+        return process
+
+    class Comparator(TypeEngine.Comparator[Any]):
+        def l2_distance(self, other: object, /) -> Operators:
+            return self.op("<->", return_type=Float)(other)
+
+        def max_inner_product(self, other: object, /) -> Operators:
+            return self.op("<#>", return_type=Float)(other)
+
+        def cosine_distance(self, other: object, /) -> Operators:
+            return self.op("<=>", return_type=Float)(other)
+
+        def l1_distance(self, other: object, /) -> Operators:
+            return self.op("<+>", return_type=Float)(other)
+
+    comparator_factory = Comparator
+
+
+async def register_embedding_codec(connection: Any) -> None:
+    """pgvector codecs on an asyncpg connection, with `vector` encoded from and decoded to float32 arrays."""
+    from pgvector.asyncpg import register_vector
+
+    await register_vector(connection)
+    await connection.set_type_codec("vector", schema="public", encoder=to_binary, decoder=from_binary, format="binary")
@@ -4,7 +4,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from mangum import Mangum
 from mangum.types import LambdaContext
 from app.common import get_controllers
-from app.common.middlewares import UserPopulationMiddleware
+from app.common.middlewares import QueryStatsMiddleware, RequestIdMiddleware, RequestScopeMiddleware, UnitOfWorkMiddleware, UserPopulationMiddleware
 from loguru import logger
 
 app = FastAPI()
@@ -23,6 +23,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 app.add_middleware(UserPopulationMiddleware)
+app.add_middleware(UnitOfWorkMiddleware)
+# Outside the unit of work and the user lookup, so their queries and the commit are counted
+app.add_middleware(QueryStatsMiddleware)
+# Added last so they are outermost and the request scope and ID also cover the middlewares above
+app.add_middleware(RequestScopeMiddleware)
+app.add_middleware(RequestIdMiddleware)
 
 for controller in get_controllers():
     app.include_router(controller().router)
@@ -61,6 +67,17 @@ async def run_migrations():
         return {"status": "error", "output": str(e)}
 
 
+@app.get("/health/db")
+async def database_pool_status():
+    """Connection pool profile and checkout counters of the sync and async engines, writer and read replica"""
+    from app.common.db_connect import READ_REPLICA_ENABLED, async_engine_provider, async_reader_engine_provider, engine_provider, reader_engine_provider
+
+    status = {"sync": engine_provider.pool_status(), "async": async_engine_provider.pool_status()}
+    if READ_REPLICA_ENABLED:
+        status.update({"sync_reader": reader_engine_provider.pool_status(), "async_reader": async_reader_engine_provider.pool_status()})
+    return status
+
+
 asgi_handler = Mangum(app)
 
 
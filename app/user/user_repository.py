@@ -1,5 +1,8 @@
 from uuid import UUID
-from app.common.repositories import BaseRepository
+
+from sqlalchemy import select
+
+from app.common.repositories import AsyncBaseRepository, BaseRepository
 from app.user import User as UserDomain
 from app.common.exceptions import NotFoundException
 from app.user.user_entities import UserEntity
@@ -40,7 +43,7 @@ class UserRepository(BaseRepository):
         """Update an existing user's information."""
         existing_user = self.get_user_by_id(user_id)
         existing_user.username = user.username
-        self.session.commit()
+        self.commit()
 
     def delete_user(self, user_id: UUID) -> bool:
         """Delete a user by their ID."""
@@ -50,3 +53,47 @@ class UserRepository(BaseRepository):
             self.commit()
             return True
         return False
+
+
+class AsyncUserRepository(AsyncBaseRepository):
+    """`UserRepository` on the async backend, same domain API with every method awaitable."""
+
+    async def _find_entity(self, *criteria) -> UserEntity | None:
+        return await self.session.scalar(select(UserEntity).where(*criteria).limit(1))
+
+    async def get_user_by_id(self, user_id: UUID) -> UserDomain:
+        user = await self._find_entity(UserEntity.id == user_id)
+        if not user:
+            raise NotFoundException(f"User with ID {user_id} not found.")
+        return UserDomain.from_entity(user)
+
+    async def get_user_by_username(self, username: str) -> UserDomain:
+        user = await self._find_entity(UserEntity.username == username)
+        if not user:
+            raise NotFoundException(f"User with username '{username}' not found.")
+        return UserDomain.from_entity(user)
+
+    async def create_user(self, username: str) -> UserDomain:
+        if await self._find_entity(UserEntity.username == username):
+            raise ValueError(f"User with username {username} already exists.")
+
+        new_user = UserEntity()
+        new_user.username = username
+        self.session.add(new_user)
+        await self.commit()
+        return UserDomain.from_entity(new_user)
+
+    async def update_user(self, user_id: UUID, user: UserDomain) -> None:
+        existing_user = await self._find_entity(UserEntity.id == user_id)
+        if not existing_user:
+            raise NotFoundException(f"User with ID {user_id} not found.")
+        existing_user.username = user.username
+        await self.commit()
+
+    async def delete_user(self, user_id: UUID) -> bool:
+        user = await self._find_entity(UserEntity.id == user_id)
+        if not user:
+            raise NotFoundException(f"User with ID {user_id} not found.")
+        await self.session.delete(user)
+        await self.commit()
+        return True
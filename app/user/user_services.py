@@ -9,11 +9,11 @@ class UserService:
         self.user_repository = user_repository
 
     async def get_user(self, user_id: UUID) -> User:
-        return self.user_repository.get_user_by_id(user_id)
+        return await self.user_repository.get_user_by_id(user_id)
 
     async def get_user_by_username(self, username: str) -> User:
-        return self.user_repository.get_user_by_username(username)
+        return await self.user_repository.get_user_by_username(username)
 
     async def add_user(self, userRequest: UserCreateRequest) -> User:
-        user = self.user_repository.create_user(username=userRequest.username)
+        user = await self.user_repository.create_user(username=userRequest.username)
         return user
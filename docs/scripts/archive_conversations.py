@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+archive_conversations.py
+
+Archival of inactive conversations (see ConversationArchiveService): the messages of the active
+conversations without an update for --inactive-days days are written to the conversation archive
+(the S3 bucket CONVERSATION_ARCHIVE_BUCKET, or the directory CONVERSATION_ARCHIVE_DIR) and deleted
+from the messages table. They are copied back when the user opens the conversation again.
+
+Run it daily (cron, a scheduled task). Each run archives up to --limit conversations, the least
+recently updated first, each in its own transaction; a conversation that fails is retried on the next
+run. An archive is one line of gzipped NDJSON in the import format:
+
+    zcat <archive>.ndjson.gz | python docs/scripts/import_conversations.py --username alice -
+
+Uses the configured DB backend (DB_BACKEND) and the same environment as the API (STAGE, POSTGRES_*).
+
+Usage:
+    python docs/scripts/archive_conversations.py [--inactive-days 90] [--limit 500]
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.chatbot.conversation.conversation_services import CONVERSATION_ARCHIVE_AFTER_DAYS, CONVERSATION_ARCHIVE_BATCH_SIZE
+from app.common.config import ServiceFactory, container
+from app.common.db_connect import async_engine_provider, engine_provider
+
+
+async def run(inactive_days: int, limit: int) -> None:
+    async with container.async_request_scope():
+        service = ServiceFactory.get_conversation_archive_service()
+        service.archive_after_days = inactive_days
+        service.batch_size = limit
+
+        started = time.perf_counter()
+        result = await service.archive_inactive()
+        elapsed = time.perf_counter() - started
+    print(f"archived {result.conversations} conversations, {result.messages} messages in {elapsed:.1f}s ({result.failed} failed)")
+    await async_engine_provider.dispose_async()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--inactive-days", type=int, default=CONVERSATION_ARCHIVE_AFTER_DAYS, help="days without an update before a conversation is archived")
+    parser.add_argument("--limit", type=int, default=CONVERSATION_ARCHIVE_BATCH_SIZE, help="conversations archived in this run")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.inactive_days, args.limit))
+    engine_provider.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+bench_db_loop_lag.py
+
+Measure event loop lag under mixed streaming and vector search load, on the sync (psycopg2) and the
+async (asyncpg) repository backends. Streaming clients emit a chunk every few milliseconds like the
+SSE endpoint does, while search workers run `search_all_by_user_id_and_embeddings` against the
+messages table. A ticker records how late the loop wakes it up: with the sync backend every query
+blocks the loop, so the lag grows with the query time.
+
+Needs a reachable Postgres with pgvector (the local docker compose database) and the same
+environment as the API (STAGE, POSTGRES_*).
+
+Usage:
+    python docs/scripts/bench_db_loop_lag.py [--seconds 10] [--streams 20] [--searchers 8]
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from uuid import uuid4
+
+from app.chatbot.messages.message_repositories import AsyncMessageRepository, MessageRepository
+from app.common.async_sessions import AsyncSessionLocal
+from app.common.db_connect import SessionLocal, async_engine_provider
+from app.common.repositories import AwaitableRepository
+
+from bench_stats import percentile
+
+EMBEDDING_DIMENSIONS = 1024
+TICK_SECONDS = 0.005
+CHUNK_SECONDS = 0.01
+
+
+async def ticker(stop: asyncio.Event, lags: list[float]) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append(time.perf_counter() - started - TICK_SECONDS)
+
+
+async def stream(stop: asyncio.Event, chunks: list[int]) -> None:
+    while not stop.is_set():
+        await asyncio.sleep(CHUNK_SECONDS)
+        chunks[0] += 1
+
+
+async def search(stop: asyncio.Event, make_repository, queries: list[float]) -> None:
+    repository = make_repository()
+    user_id = uuid4()
+    try:
+        while not stop.is_set():
+            embedding = [random.random() for _ in range(EMBEDDING_DIMENSIONS)]
+            started = time.perf_counter()
+            await repository.search_all_by_user_id_and_embeddings(user_id=user_id, embeddings=embedding, top_k=10)
+            queries.append(time.perf_counter() - started)
+    finally:
+        await repository.close()
+
+
+async def run(backend: str, seconds: float, streams: int, searchers: int) -> dict[str, float]:
+    if backend == "async":
+
+        def make_repository():
+            return AsyncMessageRepository(session=AsyncSessionLocal())
+    else:
+
+        def make_repository():
+            return AwaitableRepository(MessageRepository(session=SessionLocal()))
+
+    stop, lags, queries, chunks = asyncio.Event(), [], [], [0]
+    tasks = [asyncio.create_task(ticker(stop, lags))]
+    tasks += [asyncio.create_task(stream(stop, chunks)) for _ in range(streams)]
+    tasks += [asyncio.create_task(search(stop, make_repository, queries)) for _ in range(searchers)]
+
+    await asyncio.sleep(seconds)
+    stop.set()
+    await asyncio.gather(*tasks)
+    if backend == "async":
+        await async_engine_provider.dispose_async()
+
+    expected_chunks = streams * seconds / CHUNK_SECONDS
+    return {
+        "lag_p50_ms": percentile(lags, 0.5) * 1000,
+        "lag_p99_ms": percentile(lags, 0.99) * 1000,
+        "lag_max_ms": max(lags, default=0.0) * 1000,
+        "queries": len(queries),
+        "query_mean_ms": statistics.fmean(queries) * 1000 if queries else 0.0,
+        "chunks_delivered_pct": 100 * chunks[0] / expected_chunks,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--streams", type=int, default=20)
+    parser.add_argument("--searchers", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"{'backend':<8} {'lag p50':>9} {'lag p99':>9} {'lag max':>9} {'queries':>8} {'query ms':>9} {'chunks %':>9}")
+    for backend in ("sync", "async"):
+        result = asyncio.run(run(backend, args.seconds, args.streams, args.searchers))
+        print(
+            f"{backend:<8} {result['lag_p50_ms']:>9.1f} {result['lag_p99_ms']:>9.1f} {result['lag_max_ms']:>9.1f} "
+            f"{result['queries']:>8} {result['query_mean_ms']:>9.1f} {result['chunks_delivered_pct']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
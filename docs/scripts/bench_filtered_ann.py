@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+bench_filtered_ann.py
+
+Latency and completeness of per-user filtered vector searches, for each filter strategy of
+`app.common.vector_index`:
+
+- plain: HNSW index scan without iterative scans (what the searches did before)
+- iterative: pgvector iterative index scan (`hnsw.iterative_scan = strict_order`)
+- exact: the user's rows through the btree index, sorted by distance
+
+The scratch table `bench_filtered_ann` (user_id, embedding) is seeded server side with random
+vectors, indexed like `messages` (HNSW vector_l2_ops plus a btree on the user), and dropped again
+unless --keep is given. For each strategy the script reports p50/p95 latency, the share of searches
+returning a full top-k and recall@k against the exact result.
+
+The default scale (10k users x 10k messages, 100M rows) needs a large disk and hours of index build:
+start with --users 1000 --messages-per-user 1000. Needs Postgres with pgvector >= 0.8 and the same
+environment as the API (STAGE, POSTGRES_*).
+
+Usage:
+    python docs/scripts/bench_filtered_ann.py [--users 10000] [--messages-per-user 10000] [--dimensions 128] [--queries 200] [--top-k 10] [--keep]
+"""
+
+import argparse
+import random
+import time
+
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import Column, Integer, MetaData, Table, select, text
+
+from app.common.db_connect import engine_provider
+from app.common.vector_index import order_by_distance, search_settings_statement
+
+from bench_stats import percentile
+
+SEED_BATCH_ROWS = 1_000_000
+
+
+def seed(engine, table: Table, users: int, messages_per_user: int, dimensions: int) -> None:
+    total = users * messages_per_user
+    with engine.begin() as connection:
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        table.metadata.drop_all(connection)
+        table.metadata.create_all(connection)
+    for start in range(0, total, SEED_BATCH_ROWS):
+        stop = min(start + SEED_BATCH_ROWS, total)
+        with engine.begin() as connection:
+            # the correlated `WHERE g > 0` makes Postgres draw a new vector per row
+            connection.execute(
+                text(
+                    f"INSERT INTO {table.name} (user_id, embedding) "
+                    f"SELECT g % :users, (SELECT array_agg(random()) FROM generate_series(1, :dimensions) WHERE g > 0)::vector "
+                    f"FROM generate_series(:start, :stop - 1) AS g"
+                ),
+                {"users": users, "dimensions": dimensions, "start": start, "stop": stop},
+            )
+        print(f"seeded {stop}/{total} rows", flush=True)
+
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        connection.execute(text(f"CREATE INDEX ON {table.name} (user_id)"))
+        connection.execute(text(f"CREATE INDEX ON {table.name} USING hnsw (embedding vector_l2_ops) WITH (m = 16, ef_construction = 64)"))
+        connection.execute(text(f"ANALYZE {table.name}"))
+    print(f"indexes built in {time.perf_counter() - started:.1f}s", flush=True)
+
+
+def search(engine, table: Table, strategy: str, user_id: int, query: list[float], top_k: int) -> tuple[list[int], float]:
+    stmt = select(table.c.id).where(table.c.user_id == user_id).order_by(order_by_distance(table.c.embedding.l2_distance(query), strategy)).limit(top_k)
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        if strategy == "plain":
+            connection.execute(text("SET LOCAL hnsw.iterative_scan = off"))
+        elif (statement := search_settings_statement(top_k, strategy=strategy)) is not None:
+            connection.execute(statement)
+        ids = list(connection.scalars(stmt))
+    return ids, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--messages-per-user", type=int, default=10_000)
+    parser.add_argument("--dimensions", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--skip-seed", action="store_true", help="reuse the table of a previous --keep run")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch table")
+    args = parser.parse_args()
+
+    engine = engine_provider.get_engine()
+    table = Table(
+        "bench_filtered_ann",
+        MetaData(),
+        Column("id", Integer, primary_key=True),
+        Column("user_id", Integer, nullable=False),
+        Column("embedding", Vector(args.dimensions), nullable=False),
+    )
+    if not args.skip_seed:
+        seed(engine, table, args.users, args.messages_per_user, args.dimensions)
+
+    rng = random.Random(42)
+    searches = [(rng.randrange(args.users), [rng.random() for _ in range(args.dimensions)]) for _ in range(args.queries)]
+    exact = {}
+    results: dict[str, dict[str, float]] = {}
+    for strategy in ("exact", "iterative", "plain"):
+        latencies, complete, recalls = [], 0, []
+        for i, (user_id, query) in enumerate(searches):
+            ids, elapsed = search(engine, table, strategy, user_id, query, args.top_k)
+            if strategy == "exact":
+                exact[i] = ids
+            latencies.append(elapsed)
+            complete += len(ids) == len(exact[i])
+            recalls.append(len(set(ids) & set(exact[i])) / len(exact[i]) if exact[i] else 1.0)
+        results[strategy] = {
+            "p50_ms": percentile(latencies, 0.5) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "complete_pct": 100 * complete / len(searches),
+            "recall": sum(recalls) / len(recalls),
+        }
+
+    print(f"{'strategy':<10} {'p50 ms':>8} {'p95 ms':>8} {'full top-k %':>13} {f'recall@{args.top_k}':>10}")
+    for strategy, result in results.items():
+        print(f"{strategy:<10} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['complete_pct']:>13.1f} {result['recall']:>10.3f}")
+
+    if not args.keep:
+        with engine.begin() as connection:
+            table.metadata.drop_all(connection)
+    engine_provider.dispose()
+
+
+if __name__ == "__main__":
+    main()
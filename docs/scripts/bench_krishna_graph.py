@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+bench_krishna_graph.py
+
+Measure the per-turn orchestration overhead of KrishnaAdvanceWorkflow: building and
+compiling the LangGraph on every message (before) vs reusing the process-level
+compiled graph (after). The workflow helper is a no-op so only graph cost is measured.
+
+Usage:
+    python docs/scripts/bench_krishna_graph.py [turns]
+"""
+
+import asyncio
+import sys
+import time
+from uuid import uuid4
+
+from app.chatbot.chatbot_models import AgentState, Phase
+from app.chatbot.workflows import krishna_advance
+from app.user import User
+
+
+class NoopHelper:
+    """Implements the helper node surface without touching the LLM or the database."""
+
+    async def prompt_builder(self, state: AgentState) -> AgentState:
+        return state
+
+    async def thinker(self, state: AgentState) -> AgentState:
+        return state
+
+    async def parse_actions(self, state: AgentState) -> AgentState:
+        return state
+
+    async def execute_actions(self, state: AgentState) -> AgentState:
+        state.phase = Phase.NEED_FINAL
+        return state
+
+    async def manage_conversations(self, state: AgentState) -> AgentState:
+        return state
+
+    async def persist_message_exchange(self, state: AgentState) -> AgentState:
+        return state
+
+    async def error_handler(self, state: AgentState) -> AgentState:
+        return state
+
+
+def new_state() -> AgentState:
+    return AgentState(user=User(id=uuid4(), username="bench"), conversation_id=uuid4(), user_message="hello")
+
+
+def compile_per_turn():
+    """The pre-cache behaviour: a fresh StateGraph is built and compiled for every message."""
+    krishna_advance.get_compiled_graph.cache_clear()
+    return krishna_advance.get_compiled_graph()
+
+
+async def run_turns(turns: int, graph_provider) -> float:
+    helper = NoopHelper()
+    started = time.perf_counter()
+    for _ in range(turns):
+        app = graph_provider()
+        async for _ in app.astream(new_state(), {"recursion_limit": 100, "configurable": {"workflow_helper": helper}}):
+            pass
+    return (time.perf_counter() - started) / turns
+
+
+async def main():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    # Warm up imports and the compiled graph
+    await run_turns(5, krishna_advance.get_compiled_graph)
+
+    before = await run_turns(turns, compile_per_turn)
+    after = await run_turns(turns, krishna_advance.get_compiled_graph)
+
+    print(f"turns: {turns}")
+    print(f"compile per turn : {before * 1000:8.2f} ms/turn")
+    print(f"cached graph     : {after * 1000:8.2f} ms/turn")
+    print(f"saved per turn   : {(before - after) * 1000:8.2f} ms ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+bench_message_ingest.py
+
+Message ingestion throughput, in messages/second, of each write path of the message repositories:
+
+- upsert: `create_message` per message (upsert, flush and re-fetch), one transaction per batch
+- orm: `batch_add_messages` (`session.add_all` of entities)
+- copy: `copy_messages` on psycopg2, rows encoded by app.common.pg_copy and sent with `copy_expert`
+- copy-async: `copy_messages` on asyncpg (`copy_records_to_table`)
+
+Every path writes the same random messages with 1536-dimension embeddings into a scratch
+conversation of a scratch user, both deleted afterwards. The upsert path is the slowest by far,
+--upsert-messages caps the number of messages it writes.
+
+Needs Postgres with pgvector and the same environment as the API (STAGE, POSTGRES_*).
+
+Usage:
+    python docs/scripts/bench_message_ingest.py [--messages 20000] [--batch 5000] [--upsert-messages 2000]
+"""
+
+import argparse
+import asyncio
+import time
+from uuid import UUID, uuid4
+
+import numpy as np
+from sqlalchemy import text
+
+from app.chatbot.messages import Message
+from app.chatbot.messages.message_repositories import AsyncMessageRepository, MessageRepository
+from app.common.async_sessions import AsyncSessionLocal
+from app.common.db_connect import SessionLocal, async_engine_provider, engine_provider
+from app.common.models import Role
+
+DIMENSIONS = 1536
+
+
+def make_messages(conversation_id: UUID, count: int, rng: np.random.Generator) -> list[Message]:
+    return [
+        Message(
+            content=f"imported message {i} " * 20,
+            role=Role.USER if i % 2 == 0 else Role.ASSISTANT,
+            conversation_id=conversation_id,
+            embedding=rng.random(DIMENSIONS, dtype=np.float32),
+        )
+        for i in range(count)
+    ]
+
+
+def batches(messages: list[Message], size: int) -> list[list[Message]]:
+    return [messages[start : start + size] for start in range(0, len(messages), size)]
+
+
+def upsert(user_id: UUID, messages: list[Message], batch: int) -> None:
+    for chunk in batches(messages, batch):
+        with SessionLocal() as session:
+            repository = MessageRepository(session=session)
+            for message in chunk:
+                repository.create_message(session, message, user_id)
+            session.commit()
+
+
+def orm(user_id: UUID, messages: list[Message], batch: int) -> None:
+    for chunk in batches(messages, batch):
+        with SessionLocal() as session:
+            MessageRepository(session=session).batch_add_messages(user_id, chunk)
+
+
+def copy(user_id: UUID, messages: list[Message], batch: int) -> None:
+    for chunk in batches(messages, batch):
+        with SessionLocal() as session:
+            MessageRepository(session=session).copy_messages(user_id, chunk)
+
+
+def copy_async(user_id: UUID, messages: list[Message], batch: int) -> None:
+    async def run() -> None:
+        for chunk in batches(messages, batch):
+            async with AsyncSessionLocal() as session:
+                await AsyncMessageRepository(session=session).copy_messages(user_id, chunk)
+        await async_engine_provider.dispose_async()
+
+    asyncio.run(run())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--batch", type=int, default=5000, help="messages per transaction")
+    parser.add_argument("--upsert-messages", type=int, default=2000)
+    args = parser.parse_args()
+
+    engine = engine_provider.get_engine()
+    user_id, conversation_id = uuid4(), uuid4()
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO users (id, username) VALUES (:id, :username)"), {"id": user_id, "username": f"bench-ingest-{user_id}"})
+        connection.execute(text("INSERT INTO conversations (id, user_id, title, status) VALUES (:id, :user_id, 'bench', 'active')"), {"id": conversation_id, "user_id": user_id})
+
+    rng = np.random.default_rng(42)
+    print(f"{'path':<11} {'messages':>9} {'seconds':>8} {'messages/s':>11}")
+    try:
+        for name, write in (("upsert", upsert), ("orm", orm), ("copy", copy), ("copy-async", copy_async)):
+            count = min(args.messages, args.upsert_messages) if name == "upsert" else args.messages
+            messages = make_messages(conversation_id, count, rng)
+            started = time.perf_counter()
+            write(user_id, messages, args.batch)
+            elapsed = time.perf_counter() - started
+            print(f"{name:<11} {count:>9} {elapsed:>8.2f} {count / elapsed:>11.0f}", flush=True)
+    finally:
+        with engine.begin() as connection:
+            connection.execute(text("DELETE FROM conversations WHERE id = :id"), {"id": conversation_id})
+            connection.execute(text("DELETE FROM message_counts WHERE sender_id = :id"), {"id": user_id})
+            connection.execute(text("DELETE FROM users WHERE id = :id"), {"id": user_id})
+        engine_provider.dispose()
+
+
+if __name__ == "__main__":
+    main()
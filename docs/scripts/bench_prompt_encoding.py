@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+bench_prompt_encoding.py
+
+Compare prompt encoders on recorded Krishna prompts: bytes and estimated tokens per section and in
+total. Recorded prompts are the JSON files the workflow used to write to /tmp/prompts (either one
+JSON document, or the static prefix and dynamic suffix documents one after the other). When no
+recordings are found a synthetic prompt with the real system prompt and tool schema is used.
+
+Usage:
+    python docs/scripts/bench_prompt_encoding.py [recordings_dir]
+"""
+
+from datetime import datetime, timedelta, timezone
+import json
+from pathlib import Path
+import sys
+from typing import Any
+
+from app.chatbot.chatbot_models import SingleMessage
+from app.chatbot.components.prompt_encoders import PROMPT_ENCODERS, EncodedPrompt
+from app.chatbot.components.tools_manager.json_tools_manager import JsonToolsManager
+from app.chatbot.workflows.helpers.krishna_advance_helpers import KRISHNA_ADVANCE_TOOLS
+from app.chatbot.workflows.prompts.system.intuitive_knowledge import get_intuitive_knowledge
+from app.common.models import MemoryType, Role
+
+
+def load_recording(path: Path) -> dict[str, Any]:
+    """Merge every JSON document in the file into one set of top-level sections."""
+    text, decoder, sections, position = path.read_text(), json.JSONDecoder(), {}, 0
+    while position < len(text):
+        if text[position].isspace():
+            position += 1
+            continue
+        document, position = decoder.raw_decode(text, position)
+        sections.update(document.pop("system_prompt", {}))
+        sections.update(document)
+
+    # Recordings hold messages as JSON strings, turn them back into messages
+    sections["conversation_history"] = [SingleMessage.model_validate_json(m) if isinstance(m, str) else m for m in sections.get("conversation_history", [])]
+    return sections
+
+
+def synthetic_prompt() -> dict[str, Any]:
+    tools_manager = JsonToolsManager(KRISHNA_ADVANCE_TOOLS)
+    started = datetime(2025, 6, 1, 12, 0, tzinfo=timezone.utc)
+    history = [
+        SingleMessage(
+            message=f'Message {i}: "quoted" text\nwith a second line and some code `print("hi")`',
+            role=Role.USER if i % 2 == 0 else Role.ASSISTANT,
+            timestamp=started + timedelta(minutes=i),
+        )
+        for i in range(20)
+    ]
+    return {
+        "intuitive_knowledge": get_intuitive_knowledge(),
+        "available_memory_types": [label.value for label in MemoryType],
+        "available_actions": {category: [action.model_dump() for action in actions] for category, actions in tools_manager.get_tools_schema().items()},
+        "output": {
+            "critical_format_rules": tools_manager.format_rules,
+            "format_name": tools_manager.format_name,
+            "output_format": tools_manager.output_format_instructions,
+            "output_examples": tools_manager.output_examples,
+        },
+        "current_time_in_utc": started.isoformat(),
+        "archival_memory": [{"type": "persona", "content": "Prefers concise answers.\nWorks in Python."}],
+        "recalled_memory": {},
+        "conversation_history": history,
+        "heartbeats_used": 1,
+        "current_user_query": "Summarise what we discussed",
+    }
+
+
+def report(name: str, encoded: EncodedPrompt) -> None:
+    print(f"\n[{name}] total: {encoded.bytes} bytes, ~{encoded.tokens} tokens")
+    for segment in encoded.segments:
+        print(f"  {segment.name:<24} {segment.bytes:>8} bytes {segment.tokens:>7} tokens")
+
+
+def main():
+    recordings_dir = Path(sys.argv[1] if len(sys.argv) > 1 else "/tmp/prompts")
+    recordings = sorted(recordings_dir.glob("*.md")) if recordings_dir.is_dir() else []
+    prompts = [load_recording(path) for path in recordings] or [synthetic_prompt()]
+    print(f"prompts: {len(prompts)} ({'recorded in ' + str(recordings_dir) if recordings else 'synthetic'})")
+
+    totals = {}
+    for encoder in PROMPT_ENCODERS.values():
+        encoded = [encoder.encode(prompt) for prompt in prompts]
+        report(f"{encoder.name}, first prompt", encoded[0])
+        totals[encoder.name] = (sum(e.bytes for e in encoded), sum(e.tokens for e in encoded))
+
+    baseline_bytes, baseline_tokens = totals["json"]
+    print("\nall prompts:")
+    for name, (total_bytes, total_tokens) in totals.items():
+        print(f"  {name:<8} {total_bytes:>10} bytes {total_tokens:>9} tokens ({100 * total_tokens / baseline_tokens:5.1f}% of json)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+bench_quantized_ann.py
+
+Index size, latency and recall@k of each vector storage of `app.common.vector_index`:
+
+- vector: HNSW index on the full vectors
+- halfvec: HNSW index on `embedding::halfvec`, candidates re-ranked on the full vectors
+- bit: HNSW index on `binary_quantize(embedding)::bit`, candidates re-ranked on the full vectors
+
+The scratch table `bench_quantized_ann` (id, embedding) is seeded server side with random unit
+vectors and dropped again unless --keep is given. Each storage gets its own index, built while the
+others are dropped, and the queries run through `nearest` like the repository searches. Recall@k
+is measured against the exact top-k (a sequential scan on the full vectors).
+
+Needs Postgres with pgvector >= 0.8 and the same environment as the API (STAGE, POSTGRES_*).
+
+Usage:
+    python docs/scripts/bench_quantized_ann.py [--rows 100000] [--dimensions 1536] [--queries 100] [--top-k 10] [--keep]
+"""
+
+import argparse
+import os
+import random
+import time
+
+from sqlalchemy import Integer, select, text
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+from app.common.db_connect import engine_provider
+from app.common.vector_index import RERANK_FACTORS, candidate_rows, nearest, search_settings_statement, vector_distance
+from app.common.vector_types import EmbeddingVector
+
+from bench_stats import percentile
+
+SEED_BATCH_ROWS = 50_000
+TABLE = "bench_quantized_ann"
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+def bench_entity(dimensions: int) -> type:
+    class BenchRow(Base):
+        __tablename__ = TABLE
+
+        id: Mapped[int] = mapped_column(Integer, primary_key=True)
+        embedding = mapped_column(EmbeddingVector(dimensions), nullable=False)
+
+        @classmethod
+        def embedding_distance(cls, embedding, storage: str = "vector"):
+            return vector_distance(cls.embedding, embedding, "cosine", storage)
+
+    return BenchRow
+
+
+def seed(engine, rows: int, dimensions: int) -> None:
+    with engine.begin() as connection:
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        Base.metadata.drop_all(connection)
+        Base.metadata.create_all(connection)
+    for start in range(0, rows, SEED_BATCH_ROWS):
+        stop = min(start + SEED_BATCH_ROWS, rows)
+        with engine.begin() as connection:
+            # the correlated `WHERE g > 0` makes Postgres draw a new vector per row
+            connection.execute(
+                text(
+                    f"INSERT INTO {TABLE} (id, embedding) "
+                    f"SELECT g, l2_normalize((SELECT array_agg(random() - 0.5) FROM generate_series(1, :dimensions) WHERE g > 0)::vector) "
+                    f"FROM generate_series(:start, :stop - 1) AS g"
+                ),
+                {"dimensions": dimensions, "start": start, "stop": stop},
+            )
+        print(f"seeded {stop}/{rows} rows", flush=True)
+
+
+def build_index(engine, storage: str, dimensions: int) -> tuple[float, int]:
+    key = {
+        "vector": "embedding vector_cosine_ops",
+        "halfvec": f"(embedding::halfvec({dimensions})) halfvec_cosine_ops",
+        "bit": f"(binary_quantize(embedding)::bit({dimensions})) bit_hamming_ops",
+    }[storage]
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP INDEX IF EXISTS {TABLE}_hnsw"))
+        started = time.perf_counter()
+        connection.execute(text(f"CREATE INDEX {TABLE}_hnsw ON {TABLE} USING hnsw ({key}) WITH (m = 16, ef_construction = 64)"))
+        elapsed = time.perf_counter() - started
+        connection.execute(text(f"ANALYZE {TABLE}"))
+        size = connection.scalar(text(f"SELECT pg_relation_size('{TABLE}_hnsw')"))
+    return elapsed, size
+
+
+def search(engine, entity: type, query: list[float], strategy: str, top_k: int) -> tuple[list[int], float]:
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        if (statement := search_settings_statement(candidate_rows(TABLE, top_k), strategy=strategy)) is not None:
+            connection.execute(statement)
+        ids = list(connection.scalars(nearest(select(entity.id), entity, query, strategy, top_k)))
+    return ids, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--skip-seed", action="store_true", help="reuse the table of a previous --keep run")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch table")
+    args = parser.parse_args()
+
+    engine = engine_provider.get_engine()
+    entity = bench_entity(args.dimensions)
+    if not args.skip_seed:
+        seed(engine, args.rows, args.dimensions)
+
+    rng = random.Random(42)
+    queries = [[rng.random() - 0.5 for _ in range(args.dimensions)] for _ in range(args.queries)]
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP INDEX IF EXISTS {TABLE}_hnsw"))
+    exact = [search(engine, entity, query, "exact", args.top_k)[0] for query in queries]
+
+    print(f"{'storage':<8} {'candidates':>10} {'index MB':>9} {'build s':>8} {'p50 ms':>8} {'p95 ms':>8} {f'recall@{args.top_k}':>10}")
+    for storage in ("vector", "halfvec", "bit"):
+        os.environ[f"VECTOR_STORAGE_{TABLE.upper()}"] = storage
+        build_seconds, size = build_index(engine, storage, args.dimensions)
+        latencies, recalls = [], []
+        for query, expected in zip(queries, exact):
+            ids, elapsed = search(engine, entity, query, "iterative", args.top_k)
+            latencies.append(elapsed)
+            recalls.append(len(set(ids) & set(expected)) / len(expected))
+        candidates = args.top_k * RERANK_FACTORS.get(storage, 1)
+        print(
+            f"{storage:<8} {candidates:>10} {size / 2**20:>9.1f} {build_seconds:>8.1f} {percentile(latencies, 0.5) * 1000:>8.1f} "
+            f"{percentile(latencies, 0.95) * 1000:>8.1f} {sum(recalls) / len(recalls):>10.3f}"
+        )
+
+    if not args.keep:
+        with engine.begin() as connection:
+            Base.metadata.drop_all(connection)
+    engine_provider.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+"""
+bench_stats.py
+
+Statistics shared by the bench scripts of this directory, imported as a sibling module
+(`python docs/scripts/<bench>.py` puts docs/scripts on sys.path).
+"""
+
+
+def percentile(values: list[float], q: float) -> float:
+    """The `q` quantile (0..1) of `values` by the nearest-rank method, 0.0 without values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
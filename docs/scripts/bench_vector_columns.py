@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+bench_vector_columns.py
+
+Cost of loading message embeddings on a history read, with and without the vector column.
+`fetch_all_messages` (GET /conversations/{id}/messages) runs both ways on the same conversation:
+the default read, which leaves the deferred `message_embedding` out, and `with_embeddings=True`.
+For each the script reports the row bytes the query returns (pg_column_size of the result rows),
+the peak Python memory allocated while building the domain objects, the growth of the process RSS
+and the latency.
+
+Uses the conversation with the most messages unless --conversation-id is given. Needs a reachable
+Postgres with data (the local docker compose database) and the same environment as the API (STAGE,
+POSTGRES_*).
+
+Usage:
+    python docs/scripts/bench_vector_columns.py [--conversation-id UUID] [--repeat 20]
+"""
+
+import argparse
+import asyncio
+import gc
+import resource
+import statistics
+import time
+import tracemalloc
+from uuid import UUID
+
+from sqlalchemy import func, select, text
+
+from app.chatbot.messages.message_entities import MessageEntity
+from app.chatbot.messages.message_repositories import MessageRepository
+from app.common.db_connect import SessionLocal
+
+
+def rss_kb() -> int:
+    """Current resident set size, from /proc on Linux, peak RSS elsewhere."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize() // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def largest_conversation(session) -> UUID:
+    stmt = select(MessageEntity.conversation_id).group_by(MessageEntity.conversation_id).order_by(func.count().desc()).limit(1)
+    conversation_id = session.scalar(stmt)
+    if conversation_id is None:
+        raise SystemExit("No messages found, pass --conversation-id or seed the database first")
+    return conversation_id
+
+
+def row_bytes(session, conversation_id: UUID, with_embeddings: bool) -> int:
+    columns = [column.name for column in MessageEntity.__table__.columns if with_embeddings or column.name != "message_embedding"]
+    query = text(f"SELECT coalesce(sum(pg_column_size(t.*)), 0) FROM (SELECT {', '.join(columns)} FROM messages WHERE conversation_id = :conversation_id) AS t")
+    return session.scalar(query, {"conversation_id": conversation_id})
+
+
+def measure(conversation_id: UUID, with_embeddings: bool, repeat: int) -> dict[str, float]:
+    latencies, peaks, rss_growth = [], [], []
+    for _ in range(repeat):
+        session = SessionLocal()
+        repository = MessageRepository(session=session)
+        gc.collect()
+        rss_before = rss_kb()
+        tracemalloc.start()
+        started = time.perf_counter()
+        messages = asyncio.run(repository.fetch_all_messages(conversation_id, with_embeddings=with_embeddings))
+        latencies.append(time.perf_counter() - started)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        rss_growth.append(rss_kb() - rss_before)
+        count = len(messages)
+        del messages
+        session.close()
+
+    with SessionLocal() as session:
+        transferred = row_bytes(session, conversation_id, with_embeddings)
+    return {
+        "messages": count,
+        "row_kb": transferred / 1024,
+        "python_peak_kb": statistics.median(peaks) / 1024,
+        "rss_growth_kb": statistics.median(rss_growth),
+        "latency_ms": statistics.median(latencies) * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversation-id", type=UUID)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with SessionLocal() as session:
+        conversation_id = args.conversation_id or largest_conversation(session)
+
+    print(f"{'read':<18} {'messages':>8} {'row KB':>9} {'python KB':>10} {'RSS KB':>8} {'ms':>7}")
+    for label, with_embeddings in (("without vectors", False), ("with vectors", True)):
+        result = measure(conversation_id, with_embeddings, args.repeat)
+        print(f"{label:<18} {result['messages']:>8} {result['row_kb']:>9.1f} {result['python_peak_kb']:>10.1f} {result['rss_growth_kb']:>8.0f} {result['latency_ms']:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+import_conversations.py
+
+Import chat histories exported from other systems into the conversations of a user, the CLI of
+`POST /api/v1/chatbot/conversations/import`. The input is NDJSON, one conversation per line:
+
+    {"id": "...", "title": "...", "created_at": "...", "messages": [
+        {"role": "user", "content": "...", "created_at": "...", "embedding": [...]}, ...]}
+
+Everything but `role` and `content` is optional; ids are generated when missing and embeddings are
+computed in batches with the Titan embedder. Messages are written with a binary COPY
+(`ConversationImportService`), each batch in its own transaction: after a failure, drop the lines of
+the batches reported as imported and rerun.
+
+Uses the configured DB backend (DB_BACKEND) and the same environment as the API (STAGE, POSTGRES_*).
+
+Usage:
+    python docs/scripts/import_conversations.py --username alice conversations.ndjson
+    zcat export.ndjson.gz | python docs/scripts/import_conversations.py --username alice -
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from typing import AsyncIterator
+
+from app.common.config import ServiceFactory, container
+from app.common.db_connect import async_engine_provider, engine_provider
+
+
+async def file_lines(path: str) -> AsyncIterator[bytes]:
+    with open(path, "rb") if path != "-" else sys.stdin.buffer as file:
+        for line in file:
+            yield line
+
+
+async def run(path: str, username: str, batch_messages: int) -> None:
+    async with container.async_request_scope():
+        user = await ServiceFactory.get_user_service().get_user_by_username(username)
+        service = ServiceFactory.get_conversation_import_service()
+        service.batch_messages = batch_messages
+
+        started = time.perf_counter()
+        result = await service.import_ndjson(user=user, lines=file_lines(path))
+        elapsed = time.perf_counter() - started
+    print(
+        f"imported {result.conversations} conversations, {result.messages} messages "
+        f"({result.embedded_messages} embedded) in {elapsed:.1f}s, {result.messages / max(elapsed, 1e-9):.0f} messages/s"
+    )
+    await async_engine_provider.dispose_async()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="NDJSON file, - for stdin")
+    parser.add_argument("--username", required=True, help="user owning the imported conversations")
+    parser.add_argument("--batch-messages", type=int, default=5000, help="messages copied per transaction")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.path, args.username, args.batch_messages))
+    engine_provider.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+import_time_report.py
+
+Profile the cold import of the API with `python -X importtime` and write a
+report of the most expensive modules (by cumulative time).
+
+Usage:
+    python docs/scripts/import_time_report.py [module] [output_file]
+
+Defaults to `app.main` and `docs/importtime/app_main.txt`.
+"""
+
+import os
+import subprocess
+import sys
+
+TOP_N = 40
+
+
+def profile(module: str) -> list[tuple[int, int, str]]:
+    """Return (self_us, cumulative_us, name) for every module imported by `module`."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, check=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    return rows
+
+
+def main():
+    module = sys.argv[1] if len(sys.argv) > 1 else "app.main"
+    output_file = sys.argv[2] if len(sys.argv) > 2 else os.path.join("docs", "importtime", "app_main.txt")
+
+    # Warm-up run so that bytecode compilation does not skew the numbers, then the best of three like
+    # tests/unit/test_import_budget.py, which checks the cold import against this report's total
+    profile(module)
+    runs = [profile(module) for _ in range(3)]
+    total_us, rows = min((next(cumulative for _, cumulative, name in rows if name.strip() == module), rows) for rows in runs)
+
+    lines = [
+        f"# python -X importtime -c 'import {module}' (python {sys.version.split()[0]})",
+        f"# total: {total_us / 1000:.1f} ms, modules: {len(rows)}",
+        "#",
+        f"# {'self [us]':>10} | {'cumulative':>10} | module",
+    ]
+    for self_us, cumulative_us, name in sorted(rows, key=lambda r: r[1], reverse=True)[:TOP_N]:
+        lines.append(f"  {self_us:>10} | {cumulative_us:>10} | {name}")
+
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    with open(output_file, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    print(f"Import time report written to: {output_file} ({total_us / 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+maintain_message_partitions.py
+
+Maintenance of the monthly partitions of the messages table (migration 011, see
+app.chatbot.messages.message_partitions): creates the partitions of the current month and of the
+months ahead, moves the rows of the default partition into partitions of their own, and detaches the
+partitions older than the retention (kept as plain tables, unless --drop).
+
+Run it daily or weekly (cron, a scheduled task), well before the last partition ahead is reached: new
+messages of a month without a partition go to the default partition, which slows down the next run.
+
+Needs the same environment as the API (STAGE, POSTGRES_*).
+
+Usage:
+    python docs/scripts/maintain_message_partitions.py [--months-ahead 3] [--retain-months 24] [--drop]
+"""
+
+import argparse
+
+from app.chatbot.messages.message_partitions import MESSAGE_PARTITION_MONTHS_AHEAD, MESSAGE_PARTITION_RETAIN_MONTHS, maintain_partitions
+from app.common.db_connect import engine_provider
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--months-ahead", type=int, default=MESSAGE_PARTITION_MONTHS_AHEAD, help="months after the current one to create partitions for")
+    parser.add_argument("--retain-months", type=int, default=MESSAGE_PARTITION_RETAIN_MONTHS, help="months kept attached, the current one included (0 keeps all)")
+    parser.add_argument("--drop", action="store_true", help="drop the detached partitions instead of keeping their tables")
+    args = parser.parse_args()
+
+    try:
+        created, detached = maintain_partitions(engine_provider.get_engine(), months_ahead=args.months_ahead, retain_months=args.retain_months, drop=args.drop)
+    finally:
+        engine_provider.dispose()
+    print(f"created: {', '.join(created) or '-'}")
+    print(f"{'dropped' if args.drop else 'detached'}: {', '.join(detached) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
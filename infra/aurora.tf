@@ -211,6 +211,21 @@ resource "aws_rds_cluster_instance" "aurora_serverless" {
   tags = var.tags
 }
 
+# Aurora Serverless v2 reader instance, behind the cluster reader endpoint (RDS_READER_ENDPOINT):
+# serves the read-only repository methods, vector searches and history reads, off the writer
+resource "aws_rds_cluster_instance" "aurora_serverless_reader" {
+  identifier         = "${var.project_name}-aurora-serverless-reader"
+  cluster_identifier = aws_rds_cluster.aurora_serverless.id
+  instance_class     = "db.serverless"
+  engine             = aws_rds_cluster.aurora_serverless.engine
+  engine_version     = aws_rds_cluster.aurora_serverless.engine_version
+  promotion_tier     = 15
+
+  tags = var.tags
+
+  depends_on = [aws_rds_cluster_instance.aurora_serverless]
+}
+
 # Data source for availability zones
 data "aws_availability_zones" "available" {
   state = "available"
@@ -15,6 +15,7 @@ module "api_lambda" {
     ecr_repository_name        = aws_ecr_repository.innomightlabs_api.name
     ecr_repository_url         = aws_ecr_repository.innomightlabs_api.repository_url
     aurora_serverless_endpoint = aws_rds_cluster.aurora_serverless.endpoint
+    aurora_reader_endpoint     = aws_rds_cluster.aurora_serverless.reader_endpoint
     aurora_cluster_identifier  = aws_rds_cluster.aurora_serverless.cluster_identifier
     rds_secret_arn            = aws_rds_cluster.aurora_serverless.master_user_secret[0].secret_arn
     private_subnet_id          = aws_subnet.private.id
@@ -108,6 +108,7 @@ resource "aws_lambda_function" "innomightlabs_api" {
     variables = {
       DSQL_ENDPOINT     = var.api_lambda_variables.dsql_cluster_arn
       RDS_ENDPOINT      = var.api_lambda_variables.aurora_serverless_endpoint
+      RDS_READER_ENDPOINT = var.api_lambda_variables.aurora_reader_endpoint
       RDS_SECRET_ARN    = var.api_lambda_variables.rds_secret_arn
       DB_TYPE           = "rds"
       POSTGRES_USER     = var.api_lambda_variables.postgres_user
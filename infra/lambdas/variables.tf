@@ -12,6 +12,7 @@ variable "api_lambda_variables" {
     ecr_repository_name        = string
     ecr_repository_url         = string
     aurora_serverless_endpoint = string
+    aurora_reader_endpoint     = string
     aurora_cluster_identifier  = string
     rds_secret_arn            = string
     private_subnet_id          = string
@@ -0,0 +1,19 @@
+-- Sampled LLM prompts, written off the request path by app.common.tracing.DatabaseTraceSink
+CREATE TABLE IF NOT EXISTS prompt_traces (
+  id               BIGSERIAL      PRIMARY KEY,
+  request_id       TEXT           NULL,
+  user_id          TEXT           NOT NULL,
+  conversation_id  TEXT           NOT NULL,
+  epoch            INTEGER        NOT NULL,
+  prompt           TEXT           NOT NULL,
+  response         TEXT           NOT NULL DEFAULT '',
+  error            TEXT           NULL,
+  meta_info        JSONB          NOT NULL DEFAULT '{}',
+  created_at       TIMESTAMPTZ    NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_prompt_traces_request
+  ON prompt_traces(request_id);
+
+CREATE INDEX IF NOT EXISTS idx_prompt_traces_conversation_created
+  ON prompt_traces(conversation_id, created_at DESC);
@@ -0,0 +1,24 @@
+-- HNSW indexes for vector search (pgvector >= 0.5), one per table with the operator class of the
+-- table's canonical distance (app.common.vector_index). The ivfflat indexes were built without an
+-- operator class, i.e. for L2 only, and on empty tables, so cosine searches never used them.
+--
+-- Built CONCURRENTLY so writes keep going during the build; every statement runs outside a
+-- transaction. A build that fails leaves an INVALID index behind: drop it before rerunning.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_messages_embedding_hnsw
+  ON messages USING hnsw (message_embedding vector_l2_ops)
+  WITH (m = 16, ef_construction = 64);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_memory_embedding_hnsw
+  ON memory_entries USING hnsw (embedding vector_cosine_ops)
+  WITH (m = 16, ef_construction = 64);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_conversations_summary_embedding_hnsw
+  ON conversations USING hnsw (summary_embedding vector_cosine_ops)
+  WITH (m = 16, ef_construction = 64);
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_messages_embedding;
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_memory_embedding;
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_conversations_summary_embedding;
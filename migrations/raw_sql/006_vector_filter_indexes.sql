@@ -0,0 +1,9 @@
+-- Btree indexes for the per-user rows of filtered vector searches. The `exact` filter strategy
+-- (app.common.vector_index) reads a user's rows through them and sorts by distance, instead of
+-- scanning the whole table. Built CONCURRENTLY, outside a transaction.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_messages_sender_created
+  ON messages(sender_id, created_at DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_memory_user_type
+  ON memory_entries(user_id, memory_type);
@@ -0,0 +1,53 @@
+-- Messages per sender, maintained by statement level triggers on messages so that paginated
+-- listings read their total instead of counting the sender's history (app.common.pagination).
+CREATE TABLE IF NOT EXISTS message_counts (
+  sender_id      UUID      PRIMARY KEY,
+  message_count  BIGINT    NOT NULL DEFAULT 0
+);
+
+-- One row per sender and statement; senders are locked in a fixed order so that concurrent batches
+-- cannot deadlock on each other's counters.
+CREATE OR REPLACE FUNCTION message_counts_after_insert() RETURNS trigger AS $$
+BEGIN
+  INSERT INTO message_counts (sender_id, message_count)
+  SELECT sender_id, count(*) FROM inserted_messages
+  WHERE sender_id IS NOT NULL
+  GROUP BY sender_id
+  ORDER BY sender_id
+  ON CONFLICT (sender_id) DO UPDATE SET message_count = message_counts.message_count + EXCLUDED.message_count;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION message_counts_after_delete() RETURNS trigger AS $$
+BEGIN
+  UPDATE message_counts
+  SET message_count = message_counts.message_count - deleted.message_count
+  FROM (
+    SELECT sender_id, count(*) AS message_count FROM deleted_messages
+    WHERE sender_id IS NOT NULL
+    GROUP BY sender_id
+    ORDER BY sender_id
+  ) AS deleted
+  WHERE message_counts.sender_id = deleted.sender_id;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER messages_count_after_insert
+  AFTER INSERT ON messages
+  REFERENCING NEW TABLE AS inserted_messages
+  FOR EACH STATEMENT EXECUTE FUNCTION message_counts_after_insert();
+
+CREATE TRIGGER messages_count_after_delete
+  AFTER DELETE ON messages
+  REFERENCING OLD TABLE AS deleted_messages
+  FOR EACH STATEMENT EXECUTE FUNCTION message_counts_after_delete();
+
+-- Backfill in the migration transaction: CREATE TRIGGER holds off writes to messages until commit,
+-- so no message is counted twice or missed.
+INSERT INTO message_counts (sender_id, message_count)
+SELECT sender_id, count(*) FROM messages
+WHERE sender_id IS NOT NULL
+GROUP BY sender_id
+ON CONFLICT (sender_id) DO UPDATE SET message_count = EXCLUDED.message_count;
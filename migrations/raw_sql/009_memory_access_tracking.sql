@@ -0,0 +1,11 @@
+-- Access tracking of memory entries, written behind the reads by the memory access tracker
+-- (app.chatbot.workflows.memories.memory_access) instead of an UPDATE ... RETURNING per lookup.
+-- Adding columns with constant defaults does not rewrite the table.
+ALTER TABLE memory_entries
+  ADD COLUMN IF NOT EXISTS last_accessed_at  TIMESTAMPTZ  NULL,
+  ADD COLUMN IF NOT EXISTS access_count      BIGINT       NOT NULL DEFAULT 0;
+
+-- Eviction candidates: active entries by the time of their last access (or creation)
+CREATE INDEX IF NOT EXISTS idx_memory_active_last_access
+  ON memory_entries ((COALESCE(last_accessed_at, created_at)))
+  WHERE is_active;
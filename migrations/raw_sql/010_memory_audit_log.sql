@@ -0,0 +1,18 @@
+-- History of memory mutations, written in batches by the memory audit log
+-- (app.chatbot.workflows.memories.memory_audit).
+-- The history outlives the entries: deleting a memory block must neither fail on its audit rows nor
+-- remove them, so the foreign key to memory_entries goes.
+ALTER TABLE memory_audit_log
+  DROP CONSTRAINT IF EXISTS memory_audit_log_entry_id_fkey,
+  DROP CONSTRAINT IF EXISTS memory_audit_log_action_check,
+  ADD COLUMN IF NOT EXISTS user_id UUID NULL;
+
+ALTER TABLE memory_audit_log
+  ADD CONSTRAINT memory_audit_log_action_check
+    CHECK (action IN ('created','updated','evicted','summarized','deleted'));
+
+-- History of an entry, and of everything a user's agent did to its memory
+CREATE INDEX IF NOT EXISTS idx_memory_audit_entry_time
+  ON memory_audit_log(entry_id, action_time);
+CREATE INDEX IF NOT EXISTS idx_memory_audit_user_time
+  ON memory_audit_log(user_id, action_time);
@@ -0,0 +1,75 @@
+-- Monthly range partitions of messages by created_at. Vacuum, index builds and vector scans work per
+-- month, and searches bounded by created_at (the recall window) only read the recent partitions.
+-- Partitions are named messages_pYYYYMM and bounded by UTC months; rows outside of every partition
+-- land in messages_default. The maintenance command (app.chatbot.messages.message_partitions) creates
+-- the months ahead, moves stray rows out of the default partition and detaches old months.
+--
+-- Runs in one transaction holding an ACCESS EXCLUSIVE lock on messages while the rows are copied and
+-- indexed: run it in a maintenance window on large installations.
+
+ALTER TABLE messages RENAME TO messages_unpartitioned;
+ALTER TABLE messages_unpartitioned RENAME CONSTRAINT messages_pkey TO messages_unpartitioned_pkey;
+
+-- The primary key of a partitioned table includes the partition key, so nothing can reference
+-- messages(id) alone any more: parent_message_id is a plain column.
+CREATE TABLE messages (
+  id UUID NOT NULL DEFAULT gen_random_uuid(),
+  conversation_id UUID NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
+  sender_id UUID REFERENCES users(id),
+  role VARCHAR(20) NOT NULL,               -- 'user', 'assistant', 'system', etc.
+  model_id VARCHAR(50) NOT NULL DEFAULT 'gemini-2.0-flash',
+  message TEXT NOT NULL,
+  message_embedding VECTOR(1536),                  -- optional message embedding (for search)
+  parent_message_id UUID,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE messages_default PARTITION OF messages DEFAULT;
+
+-- A partition per month from the oldest message to three months ahead
+DO $$
+DECLARE
+  month DATE;
+BEGIN
+  FOR month IN
+    SELECT generate_series(
+      date_trunc('month', COALESCE((SELECT min(created_at) FROM messages_unpartitioned), now()) AT TIME ZONE 'UTC'),
+      date_trunc('month', now() AT TIME ZONE 'UTC') + interval '3 months',
+      interval '1 month'
+    )::date
+  LOOP
+    EXECUTE format(
+      'CREATE TABLE %I PARTITION OF messages FOR VALUES FROM (%L) TO (%L)',
+      'messages_p' || to_char(month, 'YYYYMM'),
+      month::text || ' 00:00:00+00',
+      (month + interval '1 month')::date::text || ' 00:00:00+00'
+    );
+  END LOOP;
+END $$;
+
+-- Copied before the indexes are built, each partition's indexes are then built in bulk. The message
+-- counts triggers are created afterwards, the copied messages are already counted.
+INSERT INTO messages (id, conversation_id, sender_id, role, model_id, message, message_embedding, parent_message_id, created_at, updated_at)
+SELECT id, conversation_id, sender_id, role, model_id, message, message_embedding, parent_message_id, created_at, updated_at
+FROM messages_unpartitioned;
+
+DROP TABLE messages_unpartitioned;
+
+ALTER TABLE messages ADD PRIMARY KEY (id, created_at);
+
+CREATE INDEX idx_messages_conversation_created_at
+  ON messages(conversation_id, created_at);
+
+CREATE INDEX idx_messages_sender_created
+  ON messages(sender_id, created_at DESC);
+
+CREATE TRIGGER messages_count_after_insert
+  AFTER INSERT ON messages
+  REFERENCING NEW TABLE AS inserted_messages
+  FOR EACH STATEMENT EXECUTE FUNCTION message_counts_after_insert();
+
+CREATE TRIGGER messages_count_after_delete
+  AFTER DELETE ON messages
+  REFERENCING OLD TABLE AS deleted_messages
+  FOR EACH STATEMENT EXECUTE FUNCTION message_counts_after_delete();
@@ -0,0 +1,6 @@
+-- Archival of inactive conversations (ConversationArchiveService): the archival job looks up the
+-- active conversations by the time of their last update. Archived conversations keep their row, only
+-- their messages move to the conversation archive.
+CREATE INDEX IF NOT EXISTS idx_conversations_active_updated_at
+  ON conversations (updated_at)
+  WHERE status = 'active';
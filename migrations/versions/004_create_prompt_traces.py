@@ -0,0 +1,36 @@
+"""create prompt traces
+
+Revision ID: 004
+Revises: 003
+Create Date: 2025-08-04 10:12:31.482190
+
+"""
+
+import os
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "004"
+down_revision: Union[str, None] = "003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    sql_path = os.path.join(
+        os.path.dirname(__file__),  # current directory of this file
+        os.pardir,
+        "raw_sql",
+        "004_create_prompt_traces.sql",
+    )
+    with open(sql_path, "r") as file:
+        op.execute(file.read())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TABLE IF EXISTS prompt_traces CASCADE;")
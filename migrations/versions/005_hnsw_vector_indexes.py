@@ -0,0 +1,50 @@
+"""hnsw vector indexes
+
+Revision ID: 005
+Revises: 004
+Create Date: 2025-08-06 09:41:17.204518
+
+"""
+
+import os
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "005"
+down_revision: Union[str, None] = "004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    sql_path = os.path.join(
+        os.path.dirname(__file__),  # current directory of this file
+        os.pardir,
+        "raw_sql",
+        "005_hnsw_vector_indexes.sql",
+    )
+    with open(sql_path, "r") as file:
+        # comment lines dropped before splitting, a ';' in a comment must not split a statement
+        sql = "".join(line for line in file if not line.lstrip().startswith("--"))
+    statements = [statement.strip() for statement in sql.split(";")]
+
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        for statement in statements:
+            if statement:
+                op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_messages_embedding ON messages USING ivfflat (message_embedding);")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_memory_embedding ON memory_entries USING ivfflat (embedding) WITH (lists = 100);")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_conversations_summary_embedding ON conversations USING ivfflat (summary_embedding);")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_messages_embedding_hnsw;")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_memory_embedding_hnsw;")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_conversations_summary_embedding_hnsw;")
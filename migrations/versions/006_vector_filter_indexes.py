@@ -0,0 +1,46 @@
+"""vector filter indexes
+
+Revision ID: 006
+Revises: 005
+Create Date: 2025-08-08 14:22:05.671390
+
+"""
+
+import os
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "006"
+down_revision: Union[str, None] = "005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    sql_path = os.path.join(
+        os.path.dirname(__file__),  # current directory of this file
+        os.pardir,
+        "raw_sql",
+        "006_vector_filter_indexes.sql",
+    )
+    with open(sql_path, "r") as file:
+        # comment lines dropped before splitting, a ';' in a comment must not split a statement
+        sql = "".join(line for line in file if not line.lstrip().startswith("--"))
+    statements = [statement.strip() for statement in sql.split(";")]
+
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        for statement in statements:
+            if statement:
+                op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_messages_sender_created;")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_memory_user_type;")
@@ -0,0 +1,40 @@
+"""create message counts
+
+Revision ID: 007
+Revises: 006
+Create Date: 2025-08-11 11:05:48.913264
+
+"""
+
+import os
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "007"
+down_revision: Union[str, None] = "006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    sql_path = os.path.join(
+        os.path.dirname(__file__),  # current directory of this file
+        os.pardir,
+        "raw_sql",
+        "007_create_message_counts.sql",
+    )
+    with open(sql_path, "r") as file:
+        op.execute(file.read())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS messages_count_after_insert ON messages;")
+    op.execute("DROP TRIGGER IF EXISTS messages_count_after_delete ON messages;")
+    op.execute("DROP FUNCTION IF EXISTS message_counts_after_insert();")
+    op.execute("DROP FUNCTION IF EXISTS message_counts_after_delete();")
+    op.execute("DROP TABLE IF EXISTS message_counts CASCADE;")
@@ -0,0 +1,75 @@
+"""quantized vector indexes
+
+Revision ID: 008
+Revises: 007
+Create Date: 2025-08-13 10:12:39.508127
+
+Builds the HNSW index of each vector column on the storage configured for its table
+(VECTOR_STORAGE_<TABLE>, see app.common.vector_index): the full vectors, `::halfvec(1536)` or
+`binary_quantize(...)::bit(1536)`. The index of the configured storage is built before the others
+are dropped, so searches keep an index throughout. Needs pgvector >= 0.7 for halfvec and bit.
+
+To change the storage of a table later, set the variable and run `alembic downgrade 007` then
+`alembic upgrade 008`: the downgrade rebuilds the full vector indexes of migration 005.
+
+Built CONCURRENTLY, outside a transaction. A build that fails leaves an INVALID index behind: drop
+it before rerunning.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+from app.common.vector_index import VECTOR_STORAGES, vector_storage
+
+
+# revision identifiers, used by Alembic.
+revision: str = "008"
+down_revision: Union[str, None] = "007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DIMENSIONS = 1536
+
+# table, vector column, canonical distance, name of the full vector index (migration 005)
+VECTOR_INDEXES = [
+    ("messages", "message_embedding", "l2", "idx_messages_embedding_hnsw"),
+    ("memory_entries", "embedding", "cosine", "idx_memory_embedding_hnsw"),
+    ("conversations", "summary_embedding", "cosine", "idx_conversations_summary_embedding_hnsw"),
+]
+
+
+def index_name(name: str, storage: str) -> str:
+    return name if storage == "vector" else name.replace("_hnsw", f"_{storage}_hnsw")
+
+
+def index_key(column: str, distance: str, storage: str) -> str:
+    """Expression and operator class, the same expressions as `app.common.vector_index.vector_distance`."""
+    if storage == "bit":
+        return f"(binary_quantize({column})::bit({DIMENSIONS})) bit_hamming_ops"
+    if storage == "halfvec":
+        return f"({column}::halfvec({DIMENSIONS})) halfvec_{distance}_ops"
+    return f"{column} vector_{distance}_ops"
+
+
+def build_indexes(storages: dict[str, str]) -> None:
+    with op.get_context().autocommit_block():
+        for table, column, distance, name in VECTOR_INDEXES:
+            storage = storages[table]
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name(name, storage)} "
+                f"ON {table} USING hnsw ({index_key(column, distance, storage)}) WITH (m = 16, ef_construction = 64)"
+            )
+            for other in VECTOR_STORAGES:
+                if other != storage:
+                    op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name(name, other)}")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    build_indexes({table: vector_storage(table) for table, *_ in VECTOR_INDEXES})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    build_indexes({table: "vector" for table, *_ in VECTOR_INDEXES})
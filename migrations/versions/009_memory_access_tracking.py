@@ -0,0 +1,37 @@
+"""memory access tracking
+
+Revision ID: 009
+Revises: 008
+Create Date: 2025-08-14 09:31:02.184577
+
+"""
+
+import os
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "009"
+down_revision: Union[str, None] = "008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    sql_path = os.path.join(
+        os.path.dirname(__file__),  # current directory of this file
+        os.pardir,
+        "raw_sql",
+        "009_memory_access_tracking.sql",
+    )
+    with open(sql_path, "r") as file:
+        op.execute(file.read())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS idx_memory_active_last_access;")
+    op.execute("ALTER TABLE memory_entries DROP COLUMN IF EXISTS access_count, DROP COLUMN IF EXISTS last_accessed_at;")
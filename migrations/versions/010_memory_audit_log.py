@@ -0,0 +1,42 @@
+"""memory audit log
+
+Revision ID: 010
+Revises: 009
+Create Date: 2025-08-15 10:12:47.530918
+
+"""
+
+import os
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "010"
+down_revision: Union[str, None] = "009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    sql_path = os.path.join(
+        os.path.dirname(__file__),  # current directory of this file
+        os.pardir,
+        "raw_sql",
+        "010_memory_audit_log.sql",
+    )
+    with open(sql_path, "r") as file:
+        op.execute(file.read())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS idx_memory_audit_user_time;")
+    op.execute("DROP INDEX IF EXISTS idx_memory_audit_entry_time;")
+    # rows of deleted entries and of the new actions cannot satisfy the former constraints
+    op.execute("DELETE FROM memory_audit_log WHERE action NOT IN ('evicted','summarized','updated') OR entry_id NOT IN (SELECT id FROM memory_entries);")
+    op.execute("ALTER TABLE memory_audit_log DROP CONSTRAINT IF EXISTS memory_audit_log_action_check, DROP COLUMN IF EXISTS user_id;")
+    op.execute("ALTER TABLE memory_audit_log ADD CONSTRAINT memory_audit_log_action_check CHECK (action IN ('evicted','summarized','updated'));")
+    op.execute("ALTER TABLE memory_audit_log ADD CONSTRAINT memory_audit_log_entry_id_fkey FOREIGN KEY (entry_id) REFERENCES memory_entries(id);")
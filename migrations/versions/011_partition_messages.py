@@ -0,0 +1,103 @@
+"""partition messages
+
+Revision ID: 011
+Revises: 010
+Create Date: 2025-08-18 08:47:15.902344
+
+Range partitions messages by month of created_at, see raw_sql/011_partition_messages.sql. The HNSW
+index is built on the partitioned table, i.e. one index per partition (new partitions get theirs when
+they are attached), on the storage configured for messages (VECTOR_STORAGE_MESSAGES, migration 008).
+"""
+
+import os
+from typing import Sequence, Union
+
+from alembic import op
+
+from app.common.vector_index import vector_storage
+
+
+# revision identifiers, used by Alembic.
+revision: str = "011"
+down_revision: Union[str, None] = "010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DIMENSIONS = 1536
+
+
+def create_vector_index() -> None:
+    """The messages index of migration 008, built without CONCURRENTLY (not supported on partitioned tables)."""
+    storage = vector_storage("messages")
+    if storage == "bit":
+        name, key = "idx_messages_embedding_bit_hnsw", f"(binary_quantize(message_embedding)::bit({DIMENSIONS})) bit_hamming_ops"
+    elif storage == "halfvec":
+        name, key = "idx_messages_embedding_halfvec_hnsw", f"(message_embedding::halfvec({DIMENSIONS})) halfvec_l2_ops"
+    else:
+        name, key = "idx_messages_embedding_hnsw", "message_embedding vector_l2_ops"
+    op.execute(f"CREATE INDEX {name} ON messages USING hnsw ({key}) WITH (m = 16, ef_construction = 64)")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    sql_path = os.path.join(
+        os.path.dirname(__file__),  # current directory of this file
+        os.pardir,
+        "raw_sql",
+        "011_partition_messages.sql",
+    )
+    with open(sql_path, "r") as file:
+        op.execute(file.read())
+    create_vector_index()
+    op.execute("ANALYZE messages;")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("ALTER TABLE messages RENAME TO messages_partitioned;")
+    op.execute("ALTER TABLE messages_partitioned RENAME CONSTRAINT messages_pkey TO messages_partitioned_pkey;")
+    op.execute(
+        """
+        CREATE TABLE messages (
+          id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+          conversation_id UUID NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
+          sender_id UUID REFERENCES users(id),
+          role VARCHAR(20) NOT NULL,
+          model_id VARCHAR(50) NOT NULL DEFAULT 'gemini-2.0-flash',
+          message TEXT NOT NULL,
+          message_embedding VECTOR(1536),
+          parent_message_id UUID,
+          created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+          updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+        """
+    )
+    # Detached partitions are not copied back (their tables are kept), so parents may be missing
+    op.execute(
+        """
+        INSERT INTO messages (id, conversation_id, sender_id, role, model_id, message, message_embedding, parent_message_id, created_at, updated_at)
+        SELECT id, conversation_id, sender_id, role, model_id, message, message_embedding, parent_message_id, created_at, updated_at
+        FROM messages_partitioned;
+        """
+    )
+    op.execute("ALTER TABLE messages ADD CONSTRAINT messages_parent_message_id_fkey FOREIGN KEY (parent_message_id) REFERENCES messages(id) NOT VALID;")
+    op.execute("DROP TABLE messages_partitioned;")
+    op.execute("CREATE INDEX idx_messages_conversation_created_at ON messages(conversation_id, created_at);")
+    op.execute("CREATE INDEX idx_messages_sender_created ON messages(sender_id, created_at DESC);")
+    create_vector_index()
+    op.execute(
+        """
+        CREATE TRIGGER messages_count_after_insert
+          AFTER INSERT ON messages
+          REFERENCING NEW TABLE AS inserted_messages
+          FOR EACH STATEMENT EXECUTE FUNCTION message_counts_after_insert();
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER messages_count_after_delete
+          AFTER DELETE ON messages
+          REFERENCING OLD TABLE AS deleted_messages
+          FOR EACH STATEMENT EXECUTE FUNCTION message_counts_after_delete();
+        """
+    )
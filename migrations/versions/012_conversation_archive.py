@@ -0,0 +1,36 @@
+"""conversation archive
+
+Revision ID: 012
+Revises: 011
+Create Date: 2025-08-21 09:03:26.114870
+
+"""
+
+import os
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "012"
+down_revision: Union[str, None] = "011"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    sql_path = os.path.join(
+        os.path.dirname(__file__),  # current directory of this file
+        os.pardir,
+        "raw_sql",
+        "012_conversation_archive.sql",
+    )
+    with open(sql_path, "r") as file:
+        op.execute(file.read())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS idx_conversations_active_updated_at;")
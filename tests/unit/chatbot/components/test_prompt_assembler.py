@@ -0,0 +1,51 @@
+import json
+
+from pydantic import BaseModel
+
+from app.chatbot.components.prompt_assembler import CACHE_CHECKPOINT, assemble_prompt, get_static_prefix
+from app.chatbot.components.prompt_encoders import JsonPromptEncoder
+from app.chatbot.components.tools_manager import ToolCategory, ToolRegistry
+from app.chatbot.components.tools_manager.json_tools_manager import JsonToolsManager
+from app.common.utils import tool
+
+
+class EchoParams(BaseModel):
+    text: str
+
+
+@tool("echo_prefix", description="Echo the text back", args_schema=EchoParams)
+async def echo_prefix(state, input: EchoParams):
+    return input.text
+
+
+def test_static_prefix_is_byte_stable_across_turns():
+    registry = ToolRegistry([(ToolCategory.MISC, echo_prefix)])
+
+    first = assemble_prompt(JsonToolsManager(registry), {"heartbeats_used": 0, "current_user_query": "hi"}, JsonPromptEncoder())
+    second = assemble_prompt(JsonToolsManager(registry), {"heartbeats_used": 3, "current_user_query": "hello"}, JsonPromptEncoder())
+
+    assert first.prefix is second.prefix
+    assert first.dynamic_suffix != second.dynamic_suffix
+    assert "current_user_query" not in first.prefix.text
+    assert json.loads(first.prefix.text)["available_actions"]["MISC"][0]["name"] == "echo_prefix"
+
+
+def test_prefix_changes_with_the_tool_registry():
+    registry = ToolRegistry([(ToolCategory.MISC, echo_prefix)])
+
+    encoder = JsonPromptEncoder()
+    assert get_static_prefix(JsonToolsManager(registry), encoder).version != get_static_prefix(JsonToolsManager(ToolRegistry()), encoder).version
+
+
+def test_cache_checkpoint_sits_after_the_prefix_and_usage_reports_hit_bytes():
+    prompt = assemble_prompt(JsonToolsManager(ToolRegistry()), {"current_user_query": "hi"}, JsonPromptEncoder())
+
+    prefix_block, suffix_block = prompt.to_content_blocks()
+    assert prefix_block["cache_control"] == CACHE_CHECKPOINT
+    assert "cache_control" not in suffix_block
+
+    miss = prompt.record_usage({"input_tokens": 10, "input_token_details": {"cache_creation": 2000}})
+    assert miss.cache_hit_bytes == 0 and miss.cache_write_tokens == 2000
+
+    hit = prompt.record_usage({"input_tokens": 10, "input_token_details": {"cache_read": 2000}})
+    assert hit.cache_hit_bytes == len(prompt.prefix.text.encode())
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta, timezone
+
+from app.chatbot.chatbot_models import SingleMessage
+from app.chatbot.components.prompt_budget import PromptBudget
+from app.chatbot.components.prompt_encoders import CompactPromptEncoder, SegmentStats
+from app.common.models import MemoryManagementConfig, Role
+from app.common.tokens import TokenEstimator
+
+STARTED = datetime(2025, 6, 1, tzinfo=timezone.utc)
+
+
+def sections(messages: int) -> dict:
+    return {
+        "archival_memory": [
+            {"header": "[PERSONA]", "id": "1", "content": "p" * 4000},
+            {"header": "[USER_PROFILE]", "id": "2", "content": "short profile"},
+        ],
+        "recalled_memory": {"stats": "[Conversation Search]", "memory": [{"content": f"hit {i} " + "r" * 400} for i in range(20)]},
+        "conversation_history": [SingleMessage(message=f"message {i} " + "m" * 200, role=Role.USER, timestamp=STARTED + timedelta(minutes=i)) for i in range(messages)],
+        "current_user_query": "q" * 2000,
+    }
+
+
+def test_pooled_sections_are_trimmed_to_their_quotas():
+    budget = PromptBudget.from_config(context_length=4000)
+    allocated, report = budget.allocate(sections(messages=200), CompactPromptEncoder())
+
+    for name, (used, quota) in report.pools.items():
+        if name != "system":
+            assert used <= quota, name
+    # newest messages and the best ranked search results survive
+    assert allocated["conversation_history"][-1].message.startswith("message 199")
+    assert allocated["recalled_memory"]["memory"][0]["content"].startswith("hit 0")
+    # small blocks are kept whole, the oversized one keeps its most recent end
+    assert allocated["archival_memory"][1]["content"] == "short profile"
+    assert 0 < len(allocated["archival_memory"][0]["content"]) < 4000
+    # the user query is never trimmed
+    assert allocated["current_user_query"] == "q" * 2000
+
+
+def test_prompt_stays_bounded_as_the_conversation_grows():
+    budget = PromptBudget.from_config(context_length=4000)
+    encoder = CompactPromptEncoder()
+
+    reports = [budget.allocate(sections(messages=n), encoder)[1] for n in (50, 500, 5000)]
+
+    assert all(r.pools["recall"][0] <= r.pools["recall"][1] for r in reports)
+    assert max(r.total_tokens for r in reports) - min(r.total_tokens for r in reports) <= 5
+
+
+def test_report_covers_static_and_dynamic_segments():
+    budget = PromptBudget.from_config()
+    _, report = budget.allocate({"current_user_query": "hi"}, CompactPromptEncoder(), static_segments=[SegmentStats("intuitive_knowledge", 40, 10)])
+
+    assert report.pools["system"] == (10, MemoryManagementConfig.PROMPT_CONTEXT_LENGTH // 2)
+    assert [s["name"] for s in report.as_dict()["segments"]] == ["intuitive_knowledge", "current_user_query"]
+
+
+def test_estimator_calibrates_towards_provider_counts():
+    estimator = TokenEstimator(chars_per_token=4)
+    for _ in range(50):
+        estimator.calibrate("x" * 3000, 1000)
+
+    assert round(estimator.chars_per_token, 1) == 3.0
+    assert estimator.count("x" * 300) == 100
@@ -0,0 +1,39 @@
+import json
+from datetime import datetime, timezone
+
+from app.chatbot.chatbot_models import SingleMessage
+from app.chatbot.components.prompt_encoders import CompactPromptEncoder, JsonPromptEncoder, get_prompt_encoder
+from app.common.models import Role
+
+SECTIONS = {
+    "archival_memory": [{"type": "persona", "content": 'Likes "quotes"\nand newlines'}],
+    "recalled_memory": {},
+    "conversation_history": [
+        SingleMessage(message='He said "hi"', role=Role.USER, timestamp=datetime(2025, 6, 1, 12, 0, tzinfo=timezone.utc)),
+        SingleMessage(message="Hello!", role=Role.ASSISTANT, timestamp=datetime(2025, 6, 1, 12, 1, tzinfo=timezone.utc)),
+    ],
+    "heartbeats_used": 2,
+    "current_user_query": "What did I say?",
+}
+
+
+def test_json_encoder_matches_the_original_layout():
+    encoded = JsonPromptEncoder().encode(SECTIONS)
+
+    assert encoded.text == json.dumps(SECTIONS, indent=2, default=str)
+
+
+def test_compact_encoder_does_not_double_encode_messages():
+    encoded = CompactPromptEncoder().encode(SECTIONS)
+
+    assert '\\"' not in encoded.text.split("## conversation_history")[1]
+    assert '[User - (2025-06-01 12:00:00)] He said "hi"' in encoded.text
+    assert encoded.bytes < JsonPromptEncoder().encode(SECTIONS).bytes
+
+
+def test_segments_report_bytes_and_tokens_per_section():
+    encoded = get_prompt_encoder("compact").encode(SECTIONS)
+
+    assert [segment.name for segment in encoded.segments] == list(SECTIONS)
+    history = next(segment for segment in encoded.segments if segment.name == "conversation_history")
+    assert history.bytes > 0 and 0 < history.tokens <= history.bytes
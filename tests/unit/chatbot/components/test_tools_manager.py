@@ -0,0 +1,64 @@
+from unittest.mock import Mock
+
+import pytest
+from pydantic import BaseModel
+
+from app.chatbot.components.tools_manager import ToolCategory, ToolRegistry
+from app.chatbot.components.tools_manager.json_tools_manager import JsonToolsManager
+from app.chatbot.components.tools_manager.yaml_tools_manager import YamlToolsManager
+from app.chatbot.workflows.helpers.krishna_advance_helpers import KRISHNA_ADVANCE_TOOLS, KrishnaAdvanceWorkflowHelper
+from app.common.utils import tool
+
+
+class EchoParams(BaseModel):
+    text: str
+
+
+@tool("echo", description="Echo the text back", args_schema=EchoParams)
+async def echo(state, input: EchoParams):
+    return input.text
+
+
+def test_registry_is_read_only():
+    registry = ToolRegistry([(ToolCategory.MISC, echo)])
+
+    with pytest.raises(TypeError):
+        registry.tools_by_name["other"] = echo  # type: ignore[index]
+    with pytest.raises(ValueError):
+        ToolRegistry([(ToolCategory.MISC, echo), (ToolCategory.CORE, echo)])
+
+
+def test_schema_and_renderings_are_computed_once():
+    registry = ToolRegistry([(ToolCategory.MISC, echo)])
+
+    assert registry.schema is registry.schema
+    assert registry.rendered_json is registry.rendered_json
+    assert registry.schema["MISC"][0].params["properties"]["text"]["type"] == "string"
+    assert JsonToolsManager(registry).render_tools_schema() == registry.rendered_json
+    assert YamlToolsManager(registry).render_tools_schema() == registry.rendered_yaml
+
+
+def test_version_tracks_schema_content():
+    send_message = KRISHNA_ADVANCE_TOOLS.tools_by_name["send_message"]
+    full = ToolRegistry([(ToolCategory.MISC, echo), (ToolCategory.CORE, send_message)])
+
+    assert full.version == ToolRegistry([(ToolCategory.MISC, echo), (ToolCategory.CORE, send_message)]).version
+    assert full.subset(names=["echo"]).version != full.version
+    assert list(full.subset(categories=[ToolCategory.CORE]).tools_by_name) == ["send_message"]
+
+
+def test_helpers_share_the_registry_without_growing_it():
+    for _ in range(3):
+        manager = JsonToolsManager()
+        KrishnaAdvanceWorkflowHelper(chatbot=Mock(), conversation_manager=Mock(), tools_manager=manager)
+        assert manager.registry is KRISHNA_ADVANCE_TOOLS
+
+    assert len(KRISHNA_ADVANCE_TOOLS.tools_by_category["CORE"]) == 2
+
+
+def test_register_tool_does_not_leak_into_shared_registry():
+    manager = JsonToolsManager(KRISHNA_ADVANCE_TOOLS)
+    manager.register_tool(ToolCategory.MISC, echo)
+
+    assert "echo" in manager.tools_by_name
+    assert "echo" not in KRISHNA_ADVANCE_TOOLS
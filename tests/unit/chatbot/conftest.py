@@ -0,0 +1,65 @@
+import threading
+from contextlib import nullcontext
+from types import SimpleNamespace
+from typing import Callable, Generator, Optional
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import Compiled
+from sqlalchemy.orm import Session
+
+
+class RecordingSession:
+    """
+    Stands in for the session of a background writer (`session_factory`): records every statement it
+    executes, compiled for PostgreSQL. Waits for `release` before executing when given, raises when
+    `fail` is set, and reports the `rowcount` computed from the compiled statement.
+    """
+
+    def __init__(self, statements: list, fail: bool = False, release: Optional[threading.Event] = None, rowcount: Callable[[Compiled], int] = lambda compiled: 0):
+        self.statements = statements
+        self.fail = fail
+        self.release = release
+        self.rowcount = rowcount
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def begin(self):
+        return nullcontext()
+
+    def execute(self, stmt):
+        if self.release is not None:
+            self.release.wait(timeout=5)
+        if self.fail:
+            raise RuntimeError("writer unavailable")
+        compiled = stmt.compile(dialect=postgresql.dialect())
+        self.statements.append(compiled)
+        return SimpleNamespace(rowcount=self.rowcount(compiled))
+
+
+@pytest.fixture
+def recording_session() -> type[RecordingSession]:
+    return RecordingSession
+
+
+@pytest.fixture
+def sqlite_session() -> Generator[Callable[..., Session], None, None]:
+    """Opens sessions on an in-memory sqlite database holding the tables of the given entities."""
+    sessions: list[Session] = []
+
+    def open_session(*entities) -> Session:
+        engine = create_engine("sqlite://")
+        for entity in entities:
+            entity.__table__.create(engine)
+        session = Session(engine, expire_on_commit=False)
+        sessions.append(session)
+        return session
+
+    yield open_session
+    for session in sessions:
+        session.close()
@@ -0,0 +1,56 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from sqlalchemy import String, insert, type_coerce
+from sqlalchemy.orm import Session
+
+from app.chatbot.conversation.conversation_entities import ConversationEntity
+from app.chatbot.conversation.conversation_repositories import ConversationRepository
+from app.chatbot.conversation.conversation_services import ConversationArchiveService
+from app.chatbot.messages.message_entities import MessageEntity
+from app.chatbot.messages.message_repositories import MESSAGE_COPY_COLUMNS, MessageRepository, _copy_row
+from app.common.models import Role
+from app.common.object_store import LocalObjectStore
+from app.common.repositories import AwaitableRepository
+
+
+class CopyingMessageRepository(MessageRepository):
+    """sqlite has no COPY: the rows of the binary COPY are inserted as they are, without the bind processing of the column types"""
+
+    def copy_messages(self, user_id, messages):
+        rows = [dict(zip(MESSAGE_COPY_COLUMNS, _copy_row(user_id, m))) for m in messages]
+        for row in rows:
+            self.session.execute(insert(MessageEntity).values({**row, "role": type_coerce(row["role"], String)}))
+        self.commit()
+        return len(rows)
+
+
+def test_rehydrated_messages_are_read_back_through_the_entity(sqlite_session, tmp_path):
+    session: Session = sqlite_session(ConversationEntity, MessageEntity)
+    user_id, updated_at = uuid4(), datetime.now(timezone.utc) - timedelta(days=45)
+    conversation = ConversationEntity(id=uuid4(), user_id=user_id, title="chat", status="active", created_at=updated_at, updated_at=updated_at)
+    session.add(conversation)
+    session.add_all(
+        [
+            MessageEntity(conversation_id=conversation.id, sender_id=user_id, role=role, message=role.value, message_embedding=[0.5] * 3, created_at=updated_at)
+            for role in (Role.USER, Role.ASSISTANT)
+        ]
+    )
+    session.commit()
+
+    service = ConversationArchiveService(
+        AwaitableRepository(ConversationRepository(session=session)),
+        AwaitableRepository(CopyingMessageRepository(session=session)),
+        LocalObjectStore(str(tmp_path)),
+        archive_after_days=30,
+    )
+    assert asyncio.run(service.archive_inactive()).messages == 2
+    assert session.query(MessageEntity).count() == 0
+
+    session.expunge_all()
+    assert asyncio.run(service.open(conversation.id)).status == "active"
+
+    session.expunge_all()
+    messages = asyncio.run(MessageRepository(session=session).fetch_all_messages(conversation.id))
+    assert sorted((m.role.value, m.content) for m in messages) == [("assistant", "assistant"), ("user", "user")]
@@ -0,0 +1,47 @@
+from datetime import date, datetime, timedelta, timezone
+
+from app.chatbot.messages.message_partitions import MessagePartition, add_months, partitions_to_create, partitions_to_detach
+from app.chatbot.messages.message_repositories import recall_window
+from app.common.models import MemoryManagementConfig
+
+
+def partitions(*months: str) -> set[MessagePartition]:
+    return {MessagePartition.from_name(f"messages_p{month}") for month in months}  # type: ignore[misc]
+
+
+def test_partitions_are_named_and_bounded_by_utc_month():
+    partition = MessagePartition(date(2025, 12, 1))
+
+    assert partition.name == "messages_p202512"
+    assert partition.bounds == ("'2025-12-01 00:00:00+00'", "'2026-01-01 00:00:00+00'")
+    assert MessagePartition.from_name("messages_p202512") == partition
+    assert MessagePartition.from_name("messages_default") is None
+    assert add_months(date(2025, 1, 1), -1) == date(2024, 12, 1)
+
+
+def test_missing_months_ahead_and_months_of_the_default_partition_are_created():
+    existing = partitions("202507", "202508")
+
+    created = partitions_to_create(existing, {date(2023, 2, 1)}, today=date(2025, 7, 19), months_ahead=3)
+
+    assert [p.name for p in created] == ["messages_p202302", "messages_p202509", "messages_p202510"]
+    statements = created[0].create_statements()
+    assert statements[0].startswith("CREATE TABLE messages_p202302 (LIKE messages")
+    assert statements[-1] == "ALTER TABLE messages ATTACH PARTITION messages_p202302 FOR VALUES FROM ('2023-02-01 00:00:00+00') TO ('2023-03-01 00:00:00+00')"
+
+
+def test_partitions_older_than_the_retention_are_detached():
+    existing = partitions("202505", "202506", "202507", "202508")
+
+    assert partitions_to_detach(existing, today=date(2025, 7, 19), retain_months=0) == []
+    assert [p.name for p in partitions_to_detach(existing, today=date(2025, 7, 19), retain_months=2)] == ["messages_p202505"]
+    assert MessagePartition(date(2025, 5, 1)).detach_statements(drop=True)[-1] == "DROP TABLE messages_p202505"
+
+
+def test_recall_searches_are_bounded_by_the_window(monkeypatch):
+    monkeypatch.setattr(MemoryManagementConfig, "MESSAGE_RECALL_WINDOW_DAYS", 30)
+    cutoff = recall_window().right.value
+    assert abs(cutoff - (datetime.now(timezone.utc) - timedelta(days=30))) < timedelta(seconds=5)
+
+    monkeypatch.setattr(MemoryManagementConfig, "MESSAGE_RECALL_WINDOW_DAYS", 0)
+    assert str(recall_window()) == "true"
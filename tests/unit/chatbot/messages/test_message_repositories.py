@@ -0,0 +1,38 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import Session
+
+from app.chatbot.messages.message_entities import MessageEntity
+from app.chatbot.messages.message_repositories import MessageRepository
+from app.common.models import Role
+
+
+@pytest.fixture
+def session(sqlite_session) -> Session:
+    return sqlite_session(MessageEntity)
+
+
+def test_messages_are_read_without_their_embedding_unless_asked(session: Session):
+    conversation_id = uuid4()
+    session.add_all([MessageEntity(conversation_id=conversation_id, role=Role.USER, message=f"message {i}", message_embedding=[float(i)] * 3) for i in range(3)])
+    session.commit()
+    session.expunge_all()
+
+    statements: list[str] = []
+    event.listen(session.bind, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+    repository = MessageRepository(session=session)
+
+    messages = asyncio.run(repository.fetch_all_messages(conversation_id))
+    assert [m.content for m in messages] == ["message 0", "message 1", "message 2"]
+    assert all(m.embedding is None for m in messages)
+    assert "message_embedding" not in statements[-1]
+    with pytest.raises(InvalidRequestError):
+        session.get(MessageEntity, messages[0].id).message_embedding  # no lazy load per row
+
+    session.expunge_all()
+    messages = asyncio.run(repository.fetch_all_messages(conversation_id, with_embeddings=True))
+    assert [list(m.embedding) for m in messages] == [[0.0] * 3, [1.0] * 3, [2.0] * 3]
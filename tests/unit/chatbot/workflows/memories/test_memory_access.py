@@ -0,0 +1,118 @@
+from datetime import datetime, timezone
+import time
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.chatbot.workflows.memories.memory_access import MemoryAccessTracker
+from app.chatbot.workflows.memories.memory_entities import MemoryEntryEntity
+from app.chatbot.workflows.memories.memory_manager import MemoryManager
+from app.common.models import MemoryType
+
+
+def written_hits(update) -> dict:
+    """entry id -> hits, of the VALUES rows of an access statistics UPDATE"""
+    rows = len([name for name in update.params if name.startswith("param_")]) // 3
+    return {update.params[f"param_{3 * row + 1}"]: update.params[f"param_{3 * row + 2}"] for row in range(rows)}
+
+
+def written_rows(update) -> int:
+    return len(written_hits(update))
+
+
+@pytest.fixture
+def tracker(recording_session):
+    def build(statements: list, **kwargs) -> MemoryAccessTracker:
+        return MemoryAccessTracker(session_factory=lambda: recording_session(statements, rowcount=written_rows), flush_seconds=60, eviction_seconds=None, **kwargs)
+
+    return build
+
+
+def test_hits_are_merged_per_entry_and_written_in_one_update(tracker):
+    statements: list = []
+    access_tracker = tracker(statements)
+    first, second = uuid4(), uuid4()
+
+    access_tracker.record([first, second])
+    access_tracker.record([first])
+    assert access_tracker.pending == 2
+
+    assert access_tracker.flush() == 2
+    assert access_tracker.pending == 0 and access_tracker.flush() == 0
+    access_tracker.close()
+
+    [update] = statements
+    assert str(update).startswith("UPDATE memory_entries SET")
+    assert "FROM (VALUES" in str(update)
+    assert written_hits(update) == {first: 2, second: 1}
+
+
+def test_hits_of_a_failed_write_are_kept_for_the_next_flush(recording_session):
+    statements: list = []
+    failing = True
+    access_tracker = MemoryAccessTracker(session_factory=lambda: recording_session(statements, fail=failing, rowcount=written_rows), flush_seconds=60, eviction_seconds=None)
+    entry_id = uuid4()
+
+    access_tracker.record([entry_id])
+    assert access_tracker.flush() == 0
+    access_tracker.record([entry_id])
+    assert access_tracker.pending == 1
+
+    failing = False
+    assert access_tracker.flush() == 1
+    assert written_hits(statements[0]) == {entry_id: 2}
+    access_tracker.close()
+
+
+def test_the_worker_flushes_once_the_buffer_is_full(tracker):
+    statements: list = []
+    access_tracker = tracker(statements, max_pending=2)
+
+    access_tracker.record([uuid4()])
+    time.sleep(0.05)
+    assert statements == []
+
+    access_tracker.record([uuid4()])
+    deadline = time.monotonic() + 2
+    while not statements and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(statements) == 1 and access_tracker.pending == 0
+    access_tracker.close()
+
+
+@pytest.fixture
+def session(sqlite_session) -> Session:
+    return sqlite_session(MemoryEntryEntity)
+
+
+def test_reads_are_selects_that_report_their_entries(session: Session):
+    user_id = uuid4()
+    entries = [
+        MemoryEntryEntity(
+            id=uuid4(),
+            user_id=user_id,
+            memory_type=MemoryType.RECALL.value,
+            content=f"memory {i}",
+            meta_info={},
+            embedding=[0.0] * 3,
+            is_active=True,
+            created_at=datetime(2026, 1, i + 1, tzinfo=timezone.utc),
+        )
+        for i in range(3)
+    ]
+    session.add_all(entries)
+    session.commit()
+
+    statements: list[str] = []
+    event.listen(session.bind, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+    recorded: list = []
+    memory_manager = MemoryManager(session=session, access_tracker=SimpleNamespace(record=lambda ids: recorded.extend(ids)))
+
+    memories = memory_manager.read(user_id, limit=2)
+
+    assert [m.content for m in memories] == ["memory 2", "memory 1"]
+    assert recorded == [entries[2].id, entries[1].id]
+    assert all(statement.lstrip().upper().startswith("SELECT") for statement in statements)
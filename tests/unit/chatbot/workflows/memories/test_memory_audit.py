@@ -0,0 +1,123 @@
+import asyncio
+import threading
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.chatbot.workflows.memories.memory_audit import MemoryAuditAction, MemoryAuditEvent, MemoryAuditLog
+from app.chatbot.workflows.memories.memory_entities import MemoryEntryEntity
+from app.chatbot.workflows.memories.memory_manager_v2 import MemoryManagerV2
+from app.common.models import MemoryType
+from app.common.unit_of_work import UnitOfWork
+
+
+@pytest.fixture
+def audit_log(recording_session):
+    def build(statements: list, release: threading.Event | None = None, **kwargs) -> MemoryAuditLog:
+        return MemoryAuditLog(session_factory=lambda: recording_session(statements, release=release), **kwargs)
+
+    return build
+
+
+def batch_sizes(statements: list) -> list[int]:
+    # five values per row of an INSERT
+    return [len(insert.params) // 5 for insert in statements]
+
+
+def event() -> MemoryAuditEvent:
+    return MemoryAuditEvent(uuid4(), uuid4(), MemoryAuditAction.UPDATED, {"operation": "replace"})
+
+
+def test_events_are_written_in_batches_of_bounded_size(audit_log):
+    statements: list = []
+    log = audit_log(statements, batch_size=2, flush_seconds=0.2)
+
+    assert all(log.record(event()) for _ in range(5))
+    log.flush()
+    log.close()
+
+    assert sorted(batch_sizes(statements), reverse=True) == [2, 2, 1]
+
+
+def test_events_are_dropped_while_the_queue_is_full_and_drained_on_close(audit_log):
+    statements: list = []
+    release = threading.Event()
+    log = audit_log(statements, release, batch_size=1, flush_seconds=0.01, max_pending=1)
+
+    assert log.record(event())  # taken by the worker, which waits for the writer
+    while log._queue.qsize():
+        release.wait(0.01)
+    assert log.record(event())
+    assert not log.record(event())
+    assert log.dropped == 1
+
+    release.set()
+    log.close()
+    assert batch_sizes(statements) == [1, 1]
+
+
+def test_unknown_overflow_policies_are_rejected(audit_log):
+    with pytest.raises(ValueError, match="overflow"):
+        audit_log([], overflow="grow")
+
+
+class StagedEvents(MemoryAuditLog):
+    def __init__(self):
+        super().__init__(session_factory=lambda: None)
+        self.recorded: list[MemoryAuditEvent] = []
+
+    def record(self, audit_event: MemoryAuditEvent) -> bool:
+        self.recorded.append(audit_event)
+        return True
+
+
+@pytest.fixture
+def session(sqlite_session) -> Session:
+    return sqlite_session(MemoryEntryEntity)
+
+
+def test_mutations_are_audited_once_committed(session: Session):
+    log = StagedEvents()
+    memory_manager = MemoryManagerV2(session=session, audit_log=log)
+    user_id = uuid4()
+
+    entry = memory_manager.upsert_memory_block(user_id, MemoryType.PERSONA, "Krishna", embedding=[0.0] * 3)
+    memory_manager.append_to_memory_block(user_id, MemoryType.PERSONA, "likes tea")
+    memory_manager.replace_in_memory_block(user_id, MemoryType.PERSONA, "tea", "coffee")
+    assert memory_manager.delete_memory_block(user_id, MemoryType.PERSONA)
+
+    assert [(e.entry_id, e.action, e.detail["operation"]) for e in log.recorded] == [
+        (entry.id, MemoryAuditAction.CREATED, "upsert_memory_block"),
+        (entry.id, MemoryAuditAction.UPDATED, "append_to_memory_block"),
+        (entry.id, MemoryAuditAction.UPDATED, "replace_in_memory_block"),
+        (entry.id, MemoryAuditAction.DELETED, "delete_memory_block"),
+    ]
+    assert log.recorded[2].detail == {"operation": "replace_in_memory_block", "memory_type": "persona", "old_text": "tea", "new_text": "coffee"}
+
+
+def test_mutations_rolled_back_are_not_audited(session: Session):
+    log = StagedEvents()
+    memory_manager = MemoryManagerV2(session=session, audit_log=log)
+    user_id = uuid4()
+    memory_manager.upsert_memory_block(user_id, MemoryType.PERSONA, "Krishna", embedding=[0.0] * 3)
+    log.recorded.clear()
+
+    async def turn(fail: bool):
+        recorded = len(log.recorded)
+        async with UnitOfWork(session_factory=lambda: session) as unit_of_work:
+            memory_manager.append_to_memory_block(user_id, MemoryType.PERSONA, "kept")
+            with pytest.raises(RuntimeError):
+                async with unit_of_work.savepoint():
+                    memory_manager.append_to_memory_block(user_id, MemoryType.PERSONA, "tool failed")
+                    raise RuntimeError("tool failed")
+            assert len(log.recorded) == recorded  # nothing before the turn commits
+            if fail:
+                raise RuntimeError("turn failed")
+
+    asyncio.run(turn(fail=False))
+    assert [e.detail["text"] for e in log.recorded] == ["kept"]
+
+    with pytest.raises(RuntimeError, match="turn failed"):
+        asyncio.run(turn(fail=True))
+    assert len(log.recorded) == 1
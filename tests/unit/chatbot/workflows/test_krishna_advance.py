@@ -44,3 +44,58 @@ Write me a python script that can multiply two numbers, e.g. 72737 and -12319.
         chunks.append(chunk)
 
     print(f"\nWorkflow completed. Total chunks: {len(chunks)}")
+
+
+class RecordingHelper:
+    """Workflow helper stub recording which nodes ran for its request."""
+
+    def __init__(self) -> None:
+        self.calls: list[str] = []
+
+    async def _record(self, name: str, state):
+        self.calls.append(name)
+        return state
+
+    async def prompt_builder(self, state):
+        return await self._record("prompt_builder", state)
+
+    async def thinker(self, state):
+        return await self._record("thinker", state)
+
+    async def parse_actions(self, state):
+        return await self._record("parse_actions", state)
+
+    async def execute_actions(self, state):
+        from app.chatbot.chatbot_models import Phase
+
+        state.phase = Phase.NEED_FINAL
+        return await self._record("execute_actions", state)
+
+    async def manage_conversations(self, state):
+        return await self._record("manage_conversations", state)
+
+    async def persist_message_exchange(self, state):
+        return await self._record("persist_message_exchange", state)
+
+    async def error_handler(self, state):
+        return await self._record("error_handler", state)
+
+
+@pytest.mark.asyncio
+async def test_compiled_graph_is_shared_and_parameterised_by_helper():
+    from app.chatbot.chatbot_models import AgentState
+    from app.chatbot.workflows.krishna_advance import KrishnaAdvanceWorkflow, get_compiled_graph
+    from app.user import User
+    from uuid import uuid4
+
+    helpers = [RecordingHelper(), RecordingHelper()]
+    for helper in helpers:
+        state = AgentState(user=User(id=uuid4(), username="tester"), conversation_id=uuid4(), user_message="hi")
+        wf = KrishnaAdvanceWorkflow(state=state, chatbot=None, conversation_repository=None, message_repository=None, embedder=None, workflow_helper=helper)
+        async for _ in wf.run():
+            pass
+
+    assert get_compiled_graph() is get_compiled_graph()
+    assert get_compiled_graph.cache_info().misses == 1
+    for helper in helpers:
+        assert helper.calls == ["prompt_builder", "thinker", "parse_actions", "execute_actions", "persist_message_exchange"]
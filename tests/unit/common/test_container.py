@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from app.common.container import Container, Lifetime
+
+
+class Client:
+    def __init__(self, *args) -> None:
+        self.args = args
+        self.closed = False
+
+    def close(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture
+def container() -> Container:
+    container = Container()
+    container.register("llm", Client, Lifetime.SINGLETON)
+    container.register("session", Client, Lifetime.REQUEST, dispose=Client.close)
+    container.register("state", Client, Lifetime.TRANSIENT)
+    return container
+
+
+def test_singletons_are_cached_per_arguments(container: Container):
+    assert container.resolve("llm", "sonnet") is container.resolve("llm", "sonnet")
+    assert container.resolve("llm", "sonnet") is not container.resolve("llm", "haiku")
+
+
+def test_transients_are_built_on_every_resolve(container: Container):
+    assert container.resolve("state") is not container.resolve("state")
+
+
+def test_request_scope_shares_and_disposes_instances(container: Container):
+    with container.request_scope():
+        session = container.resolve("session")
+        assert container.resolve("session") is session
+
+    assert session.closed
+    with container.request_scope():
+        assert container.resolve("session") is not session
+
+
+def test_request_dependencies_outside_a_scope_are_transient(container: Container):
+    assert container.resolve("session") is not container.resolve("session")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_request_scopes_are_isolated(container: Container):
+    async def handle_request() -> Client:
+        with container.request_scope():
+            session = container.resolve("session")
+            await asyncio.sleep(0)
+            assert container.resolve("session") is session
+            return session
+
+    first, second = await asyncio.gather(handle_request(), handle_request())
+    assert first is not second
+
+
+def test_unknown_dependency_raises(container: Container):
+    with pytest.raises(KeyError):
+        container.resolve("missing")
+
+
+@pytest.mark.asyncio
+async def test_async_request_scope_awaits_async_disposers(container: Container):
+    closed = []
+
+    async def close(instance) -> None:
+        closed.append(instance)
+
+    container.register("async_session", Client, Lifetime.REQUEST, dispose=close)
+    async with container.async_request_scope():
+        async_session = container.resolve("async_session")
+        session = container.resolve("session")
+
+    assert closed == [async_session]
+    assert session.closed
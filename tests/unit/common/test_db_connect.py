@@ -0,0 +1,54 @@
+from unittest.mock import Mock
+
+from sqlalchemy import text
+
+from app.common.db_connect import CachedCredential, EngineProvider
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_cached_credential_is_fetched_once_per_ttl():
+    fetch = Mock(side_effect=["first", "second"])
+    clock = FakeClock()
+    credential = CachedCredential(fetch=fetch, ttl_seconds=60, clock=clock)
+
+    assert credential.get() == "first"
+    clock.now = 59
+    assert credential.get() == "first"
+    clock.now = 60
+    assert credential.get() == "second"
+    assert fetch.call_count == 2
+
+
+def test_cached_credential_invalidate_forces_refetch():
+    fetch = Mock(side_effect=["stale", "rotated"])
+    credential = CachedCredential(fetch=fetch, ttl_seconds=60, clock=FakeClock())
+
+    assert credential.get() == "stale"
+    credential.invalidate()
+    assert credential.get() == "rotated"
+
+
+def test_engine_is_created_lazily_and_reported_to_timing_hooks():
+    url_factory = Mock(return_value="sqlite://")
+    provider = EngineProvider(url_factory=url_factory)
+    timings: list[str] = []
+    provider.add_timing_hook(lambda phase, elapsed: timings.append(phase))
+
+    assert not provider.is_initialized
+    url_factory.assert_not_called()
+
+    engine = provider.get_engine()
+    assert provider.get_engine() is engine
+    url_factory.assert_called_once()
+
+    with engine.connect() as conn:
+        assert conn.execute(text("select 1")).scalar() == 1
+
+    assert timings == ["engine_create", "connect"]
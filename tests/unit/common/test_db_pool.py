@@ -0,0 +1,58 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import exc, text
+
+from app.common.db_connect import EngineProvider
+from app.common.db_pool import MeteredNullPool, MeteredQueuePool, behind_rds_proxy, pool_profile_kwargs
+
+
+def test_lambda_profile_holds_no_idle_connections_without_a_proxy():
+    assert pool_profile_kwargs("lambda")["poolclass"] is MeteredNullPool
+
+    behind_proxy = pool_profile_kwargs("lambda", rds_proxy=True)
+    assert (behind_proxy["pool_size"], behind_proxy["max_overflow"], behind_proxy["pool_pre_ping"]) == (1, 0, False)
+
+
+def test_server_profile_is_a_lifo_queue_pool_with_recycle():
+    kwargs = pool_profile_kwargs("server")
+    assert kwargs["poolclass"] is MeteredQueuePool
+    assert kwargs["pool_use_lifo"] and kwargs["pool_recycle"] > 0
+
+    with pytest.raises(ValueError):
+        pool_profile_kwargs("tiny")
+
+
+def test_rds_proxy_is_detected_from_the_endpoint(monkeypatch):
+    monkeypatch.delenv("DB_RDS_PROXY", raising=False)
+    assert behind_rds_proxy("api.proxy-abc123.us-east-1.rds.amazonaws.com")
+    assert not behind_rds_proxy("api.cluster-abc123.us-east-1.rds.amazonaws.com")
+
+
+def test_pool_reports_checkouts_waits_overflow_and_timeouts(tmp_path):
+    provider = EngineProvider(
+        url_factory=lambda: f"sqlite:///{tmp_path / 'pool.db'}",
+        pool_profile="server",
+        engine_kwargs={"pool_size": 1, "max_overflow": 1, "pool_timeout": 0.2},
+    )
+    engine = provider.get_engine()
+
+    first, second = engine.connect(), engine.connect()
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+
+    def release_later():
+        time.sleep(0.05)
+        first.close()
+
+    threading.Thread(target=release_later).start()
+    with engine.connect() as third:
+        assert third.execute(text("select 1")).scalar() == 1
+    second.close()
+
+    status = provider.pool_status()
+    assert status["profile"] == "server"
+    assert (status["checkouts"], status["overflows"], status["timeouts"]) == (3, 1, 1)
+    assert status["waits"] == 2 and status["wait_ms_total"] >= 200
+    provider.dispose()
@@ -0,0 +1,104 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.chatbot.messages.message_entities import MessageEntity
+from app.chatbot.workflows.memories.memory_manager_v3 import MemoryManagerV3
+from app.common.models import MemoryType
+from app.common.pagination import Cursor, RankedIdCache, in_rank_order, next_cursor, page_ids, ranked_id_cache, ranking_key, total_pages
+
+
+def test_cursor_round_trips_and_rejects_garbage():
+    cursor = Cursor(created_at=datetime(2025, 8, 1, 12, 30, tzinfo=timezone.utc), id=uuid4(), page=3)
+
+    assert Cursor.decode(cursor.encode()) == cursor
+    with pytest.raises(ValueError):
+        Cursor.decode("not-a-cursor")
+
+
+def test_cursor_continues_after_the_last_row_of_the_page():
+    rows = [SimpleNamespace(created_at=datetime(2025, 8, 1, tzinfo=timezone.utc), id=uuid4()) for _ in range(3)]
+
+    assert next_cursor(rows, page=1, page_size=4) is None
+    cursor = Cursor.decode(next_cursor(rows, page=1, page_size=3))
+    assert (cursor.id, cursor.page) == (rows[-1].id, 2)
+
+    condition = str(cursor.after(MessageEntity.created_at, MessageEntity.id).compile(dialect=postgresql.dialect()))
+    assert "messages.created_at <=" in condition and "messages.id <" in condition
+
+
+def test_ranked_id_cache_expires_evicts_and_invalidates():
+    now = [0.0]
+    cache = RankedIdCache(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+    user_a, user_b = uuid4(), uuid4()
+
+    cache.put(ranking_key("messages", user_a, [0.1, 0.2]), [1, 2])
+    assert cache.get(ranking_key("messages", user_a, [0.1, 0.2])) == [1, 2]
+    assert cache.get(ranking_key("messages", user_a, [0.1, 0.3])) is None
+
+    cache.put(ranking_key("messages", user_a, "q2"), [3])
+    cache.put(ranking_key("messages", user_b, "q"), [4])
+    assert cache.get(ranking_key("messages", user_a, [0.1, 0.2])) is None  # least recently used
+
+    cache.invalidate("messages", user_a)
+    assert cache.get(ranking_key("messages", user_a, "q2")) is None
+    assert cache.get(ranking_key("messages", user_b, "q")) == [4]
+
+    now[0] = 10
+    assert cache.get(ranking_key("messages", user_b, "q")) is None
+
+
+def test_pages_of_a_ranking():
+    ids = list(range(25))
+    rows = [SimpleNamespace(id=i) for i in (12, 10, 11)]
+
+    assert page_ids(ids, 2, 10) == list(range(10, 20))
+    assert page_ids(ids, 4, 10) == []
+    assert total_pages(len(ids), 10) == 3
+    assert [row.id for row in in_rank_order(rows, [10, 11, 12])] == [10, 11, 12]
+
+
+class CountingEmbedder:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def embed_single_text(self, text: str) -> list[float]:
+        self.calls += 1
+        return [0.0] * 3
+
+
+class RankingSession:
+    """Answers the page count, the ranking and the lookups by id of `MemoryManagerV3.read`."""
+
+    def __init__(self, ids: list) -> None:
+        self.ids = ids
+        self.searches = 0
+
+    def scalar(self, statement):
+        return len(self.ids)
+
+    def scalars(self, statement):
+        self.searches += 1
+        return iter(self.ids)
+
+    def get(self, entity, id):
+        return SimpleNamespace(content="x" * 40, to_domain=lambda: SimpleNamespace(id=id))
+
+
+def test_memory_block_pages_rank_the_query_once():
+    ranked_id_cache.clear()
+    ids = [uuid4() for _ in range(3)]
+    session, embedder = RankingSession(ids), CountingEmbedder()
+    manager = MemoryManagerV3(session=session, embedder=embedder)  # type: ignore[arg-type]
+    user_id = uuid4()
+
+    pages = [manager.read(user_id, MemoryType.USER_PROFILE, "favourite food", page=page) for page in (1, 2, 3)]
+
+    assert [page.results[0].id for page in pages] == ids
+    assert all(page.total_pages == 3 for page in pages)
+    assert (embedder.calls, session.searches) == (1, 1)
+    with pytest.raises(ValueError):
+        manager.read(user_id, MemoryType.USER_PROFILE, "favourite food", page=4)
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta, timezone
+import struct
+from uuid import uuid4
+
+import numpy as np
+from sqlalchemy import String, create_engine, insert, select, type_coerce
+from sqlalchemy.orm import Session
+
+from app.chatbot.messages import Message
+from app.chatbot.messages.message_entities import MessageEntity
+from app.chatbot.messages.message_repositories import MESSAGE_COPY_COLUMNS, MESSAGE_COPY_ENCODERS, _copy_row
+from app.common.models import Role
+from app.common.pg_copy import COPY_HEADER, CopyStream, binary_copy, copy_statement, encode_timestamptz
+from app.common.vector_types import from_binary
+
+
+def decode(data: bytes) -> list[list[bytes | None]]:
+    """Rows of binary COPY data, each field as its raw bytes."""
+    assert data.startswith(COPY_HEADER)
+    offset, rows = len(COPY_HEADER), []
+    while True:
+        (fields,) = struct.unpack_from(">h", data, offset)
+        offset += 2
+        if fields == -1:
+            assert offset == len(data)
+            return rows
+        row = []
+        for _ in range(fields):
+            (length,) = struct.unpack_from(">i", data, offset)
+            offset += 4
+            row.append(None if length == -1 else data[offset : offset + length])
+            offset += max(length, 0)
+        rows.append(row)
+
+
+def test_messages_are_encoded_in_the_binary_copy_format():
+    user_id = uuid4()
+    embedding = np.random.default_rng(7).random(1536, dtype=np.float32)
+    message = Message(content="héllo", role=Role.ASSISTANT, conversation_id=uuid4(), embedding=embedding)
+
+    data = b"".join(binary_copy([_copy_row(user_id, message)] * 3, MESSAGE_COPY_ENCODERS, chunk_rows=2))
+
+    rows = decode(data)
+    assert len(rows) == 3
+    row = dict(zip(MESSAGE_COPY_COLUMNS, rows[0]))
+    assert row["id"] == message.id.bytes and row["sender_id"] == user_id.bytes
+    assert row["message"] == "héllo".encode()
+    assert np.array_equal(from_binary(row["message_embedding"]), embedding)
+    assert row["parent_message_id"] is None
+    assert copy_statement("messages", MESSAGE_COPY_COLUMNS).startswith("COPY messages (id, conversation_id, sender_id, role")
+
+
+def test_copied_messages_are_read_back_through_the_entity():
+    message = Message(content="hi", role=Role.ASSISTANT, conversation_id=uuid4())
+    [row] = decode(b"".join(binary_copy([_copy_row(uuid4(), message)], MESSAGE_COPY_ENCODERS)))
+    copied_role = dict(zip(MESSAGE_COPY_COLUMNS, row))["role"].decode()
+
+    engine = create_engine("sqlite://")
+    MessageEntity.__table__.create(engine)
+    with Session(engine) as session:
+        # the role as COPY wrote it, without the bind processing of the Enum column
+        session.execute(
+            insert(MessageEntity).values(
+                id=message.id, conversation_id=message.conversation_id, role=type_coerce(copied_role, String), message=message.content, message_embedding=[0.0] * 3
+            )
+        )
+        assert session.scalars(select(MessageEntity)).one().role is Role.ASSISTANT
+
+
+def test_timestamps_are_microseconds_since_2000():
+    assert encode_timestamptz(datetime(2000, 1, 1, tzinfo=timezone.utc)) == struct.pack(">q", 0)
+    assert encode_timestamptz(datetime(2000, 1, 2, 0, 0, 0, 5)) == struct.pack(">q", 86_400_000_005)
+    assert encode_timestamptz(datetime(2000, 1, 1, 1, tzinfo=timezone(timedelta(hours=2)))) == struct.pack(">q", -3_600_000_000)
+
+
+def test_copy_stream_reads_across_chunks():
+    stream = CopyStream(iter([b"abc", b"", b"defgh"]))
+
+    assert stream.read(2) == b"ab"
+    assert stream.read(4) == b"c"
+    assert stream.read() == b"defgh"
+    assert stream.read(8) == b""
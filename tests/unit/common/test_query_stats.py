@@ -0,0 +1,64 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from app.common.middlewares import QueryStatsMiddleware
+from app.common.query_stats import QUERY_REPEAT_THRESHOLD, QUERY_STATS_HEADER, collect_queries, instrument_engine, mark_epoch, normalize_sql
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    instrument_engine(engine)
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, owner TEXT)"))
+        connection.execute(text("INSERT INTO items (id, owner) VALUES (1, 'a'), (2, 'a'), (3, 'b')"))
+    yield engine
+    engine.dispose()
+
+
+def test_normalized_sql_ignores_values():
+    assert normalize_sql("SELECT *\n  FROM items WHERE owner = 'x' AND id IN (%(id_1_1)s, %(id_1_2)s) LIMIT 10") == "SELECT * FROM items WHERE owner = ? AND id IN (?) LIMIT ?"
+    assert normalize_sql("SELECT * FROM items WHERE id = $1 AND id_2 > 3.5") == "SELECT * FROM items WHERE id = ? AND id_2 > ?"
+
+
+def test_queries_are_counted_per_statement_and_epoch(engine):
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        with collect_queries("turn") as stats:
+            connection.execute(text("SELECT id FROM items WHERE owner = 'a'"))
+            mark_epoch(1)
+            for id in range(1, QUERY_REPEAT_THRESHOLD + 1):
+                connection.execute(text("SELECT owner FROM items WHERE id = :id"), {"id": id})
+
+    assert stats.queries == QUERY_REPEAT_THRESHOLD + 1
+    assert stats.epochs[1].queries == QUERY_REPEAT_THRESHOLD
+    assert [(s.sql, s.count) for s in stats.repeated()] == [("SELECT owner FROM items WHERE id = ?", QUERY_REPEAT_THRESHOLD)]
+    assert stats.over_budget(queries=10) == []
+    assert len(stats.over_budget(queries=2, repeats=1)) == 2
+
+
+def items_app(engine) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(QueryStatsMiddleware, header=True)
+
+    @app.get("/owners/{owner}/items")
+    async def owner_items(owner: str):
+        with engine.connect() as connection:
+            ids = connection.scalars(text("SELECT id FROM items WHERE owner = :owner"), {"owner": owner}).all()
+            return [connection.scalar(text("SELECT owner FROM items WHERE id = :id"), {"id": id}) for id in ids]
+
+    return app
+
+
+def test_responses_carry_the_query_count(engine):
+    response = TestClient(items_app(engine)).get("/owners/a/items")
+
+    assert response.headers[QUERY_STATS_HEADER].startswith("count=3; time_ms=")
+
+
+@pytest.mark.query_budget(3, repeats=2)
+def test_requests_stay_within_their_query_budget(engine):
+    assert TestClient(items_app(engine)).get("/owners/a/items").json() == ["a", "a"]
@@ -0,0 +1,86 @@
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import create_engine, select, text
+
+from app.chatbot.conversation.conversation_entities import ConversationEntity
+from app.chatbot.conversation.conversation_repositories import ConversationRepository
+from app.common.read_replica import RoutingSession, read_only
+from app.common.repositories import BaseRepository
+from app.user import User
+
+
+def conversation_engine(title: str, user_id):
+    engine = create_engine("sqlite://")
+    ConversationEntity.__table__.create(engine)
+    with engine.begin() as connection:
+        connection.execute(ConversationEntity.__table__.insert().values(id=uuid4(), user_id=user_id, title=title, status="active"))
+    return engine
+
+
+@pytest.fixture
+def user() -> User:
+    return User(id=uuid4(), username="alice")
+
+
+@pytest.fixture
+def engines(user: User):
+    return conversation_engine("on the writer", user.id), conversation_engine("on the replica", user.id)
+
+
+class TitleRepository(BaseRepository):
+    @read_only
+    def titles(self) -> list[str]:
+        return list(self.session.scalars(select(ConversationEntity.title).order_by(ConversationEntity.title)))
+
+    def writer_titles(self) -> list[str]:
+        return list(self.session.scalars(select(ConversationEntity.title).order_by(ConversationEntity.title)))
+
+
+def test_read_only_methods_read_from_the_replica_until_the_session_writes(engines, user: User):
+    writer, reader = engines
+    with RoutingSession(bind=writer, reader=lambda: reader, expire_on_commit=False) as session:
+        repository = ConversationRepository(session=session)
+        titles = TitleRepository(session=session)
+
+        assert [c.title for c in repository.fetch_all_conversations_by_user(user)] == ["on the replica"]
+        assert titles.writer_titles() == ["on the writer"]
+        assert not session.pinned_to_writer
+
+        session.add(ConversationEntity(id=uuid4(), user_id=user.id, title="new", status="active"))
+        session.flush()
+
+        # read-your-writes: the replica has not seen the new conversation
+        assert session.pinned_to_writer
+        assert titles.titles() == ["new", "on the writer"]
+
+
+def test_writes_of_read_only_methods_go_to_the_writer(engines):
+    writer, reader = engines
+
+    class Repository(BaseRepository):
+        @read_only
+        def rename_all(self) -> None:
+            self.session.execute(ConversationEntity.__table__.update().values(title="renamed"))
+
+        @read_only
+        def settings(self) -> None:
+            self.session.execute(text("SELECT 1"))
+
+    with RoutingSession(bind=writer, reader=lambda: reader) as session:
+        Repository(session=session).settings()
+        assert not session.pinned_to_writer
+
+        Repository(session=session).rename_all()
+        session.commit()
+
+    with writer.connect() as connection:
+        assert connection.scalar(select(ConversationEntity.title)) == "renamed"
+    with reader.connect() as connection:
+        assert connection.scalar(select(ConversationEntity.title)) == "on the replica"
+
+
+def test_sessions_without_a_replica_use_the_writer(engines):
+    writer, _ = engines
+    with RoutingSession(bind=writer) as session:
+        assert TitleRepository(session=session).titles() == ["on the writer"]
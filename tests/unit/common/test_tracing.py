@@ -0,0 +1,86 @@
+import json
+import threading
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.common.middlewares import RequestIdMiddleware
+from app.common.tracing import PromptTrace, PromptTracer, RingBufferTraceSink, RotatingFileTraceSink, TraceSampler, TraceSink, get_request_id, request_id_var
+
+
+def trace(epoch: int = 0, user_id: str = "user-1") -> PromptTrace:
+    return PromptTrace(user_id=user_id, conversation_id="conversation-1", epoch=epoch, prompt="x" * 100)
+
+
+def test_sampling_is_per_request_and_forced_for_listed_users():
+    sampler = TraceSampler(rate=0.5, users=["debug-user"])
+
+    decisions = {request_id: sampler.should_sample(request_id, "someone") for request_id in (f"req-{i}" for i in range(200))}
+    assert all(sampler.should_sample(request_id, "someone") == sampled for request_id, sampled in decisions.items())
+    assert 50 < sum(decisions.values()) < 150
+    assert all(sampler.should_sample(request_id, "debug-user") for request_id in decisions)
+    assert not TraceSampler(rate=0.0).should_sample("req-1", "someone")
+
+
+def test_traces_are_written_off_the_calling_thread_with_the_request_id():
+    writer_threads = []
+
+    class RecordingSink(RingBufferTraceSink):
+        def write(self, trace: PromptTrace) -> None:
+            writer_threads.append(threading.current_thread())
+            super().write(trace)
+
+    sink = RecordingSink()
+    tracer = PromptTracer(sink)
+    token = request_id_var.set("req-42")
+    try:
+        assert tracer.record(trace(epoch=0)) and tracer.record(trace(epoch=1))
+    finally:
+        request_id_var.reset(token)
+    tracer.flush()
+
+    assert [t.epoch for t in sink.recent(request_id="req-42")] == [0, 1]
+    assert threading.current_thread() not in writer_threads
+    tracer.close()
+
+
+def test_full_queue_drops_instead_of_blocking():
+    release = threading.Event()
+
+    class BlockedSink(TraceSink):
+        def write(self, trace: PromptTrace) -> None:
+            release.wait(5)
+
+    tracer = PromptTracer(BlockedSink(), max_pending=1)
+    results = [tracer.record(trace(epoch=i)) for i in range(5)]
+    release.set()
+    tracer.close()
+
+    assert not all(results) and tracer.dropped > 0
+
+
+def test_rotating_file_sink_rotates_by_size(tmp_path):
+    sink = RotatingFileTraceSink(str(tmp_path), max_bytes=500, backup_count=2)
+    for epoch in range(10):
+        sink.write(trace(epoch=epoch))
+    sink.close()
+
+    files = sorted(p.name for p in tmp_path.iterdir())
+    assert files == ["prompt_traces.jsonl", "prompt_traces.jsonl.1", "prompt_traces.jsonl.2"]
+    assert json.loads((tmp_path / "prompt_traces.jsonl").read_text().splitlines()[-1])["epoch"] == 9
+
+
+def test_request_id_middleware_sets_and_echoes_the_request_id():
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"request_id": get_request_id()}
+
+    app.add_middleware(RequestIdMiddleware)
+    client = TestClient(app)
+
+    response = client.get("/ping", headers={"x-request-id": "abc"})
+    assert response.json() == {"request_id": "abc"}
+    assert response.headers["x-request-id"] == "abc"
+    assert client.get("/ping").headers["x-request-id"]
@@ -0,0 +1,162 @@
+import asyncio
+import random
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+from app.common.middlewares import UnitOfWorkMiddleware
+from app.common.repositories import BaseRepository
+from app.common.unit_of_work import UnitOfWork, detached, savepoint
+
+TURNS = 100
+
+
+class FakeSavepoint:
+    def __init__(self, session: "FakeSession") -> None:
+        self.session = session
+        self.mark = len(session.pending)
+        self.is_active = True
+
+    def commit(self) -> None:
+        self.is_active = False
+
+    def rollback(self) -> None:
+        del self.session.pending[self.mark :]
+        self.is_active = False
+
+
+class FakeSession:
+    """Records what a request did with its session. Committed rows go to the shared database."""
+
+    def __init__(self, database: list[str]) -> None:
+        self.database = database
+        self.pending: list[str] = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.closed = False
+
+    def add(self, row: str) -> None:
+        self.pending.append(row)
+
+    def flush(self) -> None:
+        pass
+
+    def commit(self) -> None:
+        self.database.extend(self.pending)
+        self.pending = []
+        self.commits += 1
+
+    def rollback(self) -> None:
+        self.pending = []
+        self.rollbacks += 1
+
+    def close(self) -> None:
+        self.closed = True
+
+    def begin_nested(self) -> FakeSavepoint:
+        return FakeSavepoint(self)
+
+
+class NoteRepository(BaseRepository):
+    def add(self, row: str) -> None:
+        self.session.add(row)
+        self.commit()
+
+
+async def failing_tool(repository: NoteRepository, turn: int) -> None:
+    repository.add(f"tool-{turn}")
+    await asyncio.sleep(0)
+    raise RuntimeError("tool failed")
+
+
+@pytest.fixture
+def database() -> list[str]:
+    return []
+
+
+@pytest.fixture
+def sessions(database: list[str]) -> list[FakeSession]:
+    return []
+
+
+@pytest.fixture
+def app(database: list[str], sessions: list[FakeSession]) -> FastAPI:
+    def session_factory() -> FakeSession:
+        session = FakeSession(database)
+        sessions.append(session)
+        return session
+
+    # One repository for every request: the session comes from the request's unit of work
+    repository = NoteRepository(session=None)  # type: ignore[arg-type]
+    app = FastAPI()
+
+    @app.post("/turns/{turn}")
+    async def chat_turn(turn: int):
+        repository.add(f"user-{turn}")
+        await asyncio.sleep(random.random() / 100)
+        if turn % 7 == 0:
+            raise RuntimeError("turn failed")
+
+        async def stream():
+            for chunk in range(3):
+                await asyncio.sleep(random.random() / 100)
+                yield f"{turn}:{chunk}\n"
+            try:
+                async with savepoint():
+                    if turn % 5 == 0:
+                        await failing_tool(repository, turn)
+                    repository.add(f"tool-{turn}")
+            except RuntimeError:
+                pass
+            repository.add(f"assistant-{turn}")
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    app.add_middleware(UnitOfWorkMiddleware, unit_of_work_factory=lambda: UnitOfWork(session_factory=session_factory))
+    return app
+
+
+@pytest.mark.asyncio
+async def test_concurrent_turns_are_isolated_and_committed_once(app: FastAPI, database: list[str], sessions: list[FakeSession]):
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        responses = await asyncio.gather(*(client.post(f"/turns/{turn}") for turn in range(1, TURNS + 1)))
+
+    failed = {turn for turn in range(1, TURNS + 1) if turn % 7 == 0}
+    assert {turn for turn, response in zip(range(1, TURNS + 1), responses) if response.status_code == 500} == failed
+
+    # one session per turn, committed exactly once, or rolled back for failed turns
+    assert len(sessions) == TURNS
+    assert sum(session.commits for session in sessions) == TURNS - len(failed)
+    assert all(session.commits + session.rollbacks == 1 and session.closed for session in sessions)
+
+    expected = set()
+    for turn in set(range(1, TURNS + 1)) - failed:
+        expected |= {f"user-{turn}", f"assistant-{turn}"} | (set() if turn % 5 == 0 else {f"tool-{turn}"})
+    assert set(database) == expected
+    assert len(database) == len(expected)
+
+
+@pytest.mark.asyncio
+async def test_detached_work_commits_in_its_own_unit_of_work(database: list[str], sessions: list[FakeSession]):
+    def session_factory() -> FakeSession:
+        sessions.append(FakeSession(database))
+        return sessions[-1]
+
+    repository = NoteRepository(session=None)  # type: ignore[arg-type]
+
+    async def update_title() -> None:
+        await asyncio.sleep(0.01)
+        repository.add("title")
+
+    async with UnitOfWork(session_factory=session_factory):
+        repository.add("message")
+        task = asyncio.create_task(detached(update_title))
+    await task
+
+    request_session, title_session = sessions
+    assert request_session is not title_session
+    assert request_session.commits == title_session.commits == 1
+    assert database == ["message", "title"]
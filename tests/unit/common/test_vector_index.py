@@ -0,0 +1,199 @@
+import math
+import os
+import random
+
+import pytest
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, insert, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+from app.chatbot.conversation.conversation_entities import ConversationEntity
+from app.chatbot.messages.message_entities import MessageEntity
+from app.chatbot.workflows.memories.memory_entities import MemoryEntryEntity
+from app.common.vector_index import (
+    HNSW_EF_SEARCH,
+    HNSW_MAX_EF_SEARCH,
+    RERANK_FACTORS,
+    VECTOR_EXACT_SCAN_ROWS,
+    candidate_rows,
+    ef_search_for,
+    filter_strategy,
+    nearest,
+    order_by_distance,
+    search_settings_statement,
+    vector_distance,
+    vector_storage,
+)
+from app.common.vector_types import EmbeddingVector
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+def compile(expression) -> str:
+    return str(expression.compile(dialect=postgresql.dialect()))
+
+
+def settings(statement) -> list:
+    return list(statement.compile().params.values())
+
+
+def test_ef_search_covers_the_rows_of_the_search():
+    assert "hnsw.ef_search" not in settings(search_settings_statement(10))
+    assert ef_search_for(HNSW_EF_SEARCH + 60) == HNSW_EF_SEARCH + 60
+    assert ef_search_for(10, ef_search=200) == 200
+    assert ef_search_for(10_000) == HNSW_MAX_EF_SEARCH
+    assert "hnsw.ef_search" in settings(search_settings_statement(HNSW_EF_SEARCH + 1))
+
+
+def test_entities_order_by_the_distance_of_their_index():
+    embedding = [0.0] * 3
+    assert "<->" in compile(MessageEntity.embedding_distance(embedding))
+    assert "<=>" in compile(MemoryEntryEntity.embedding_distance(embedding))
+    assert "<=>" in compile(ConversationEntity.embedding_distance(embedding))
+
+
+def test_filter_strategy_scans_small_filters_exactly():
+    assert filter_strategy(VECTOR_EXACT_SCAN_ROWS, "auto") == "exact"
+    assert filter_strategy(VECTOR_EXACT_SCAN_ROWS + 1, "auto") == "iterative"
+    assert filter_strategy(None, "auto") == "iterative"
+    assert filter_strategy(10, "iterative") == "iterative"
+    with pytest.raises(ValueError):
+        filter_strategy(10, "partitioned")
+
+    distance = MessageEntity.embedding_distance([0.0] * 3)
+    assert search_settings_statement(10, strategy="exact") is None
+    assert "strict_order" in settings(search_settings_statement(10, strategy="iterative"))
+    assert compile(order_by_distance(distance, "exact")).startswith(f"({compile(distance)}) + ")
+    assert order_by_distance(distance, "iterative") is distance
+
+
+def test_quantized_storage_reranks_index_candidates(monkeypatch):
+    embedding = [0.0] * 3
+    assert "AS HALFVEC(1536)) <->" in compile(MessageEntity.embedding_distance(embedding, "halfvec"))
+    assert "AS HALFVEC(1536)) <=>" in compile(MemoryEntryEntity.embedding_distance(embedding, "halfvec"))
+    assert "binary_quantize(conversations.summary_embedding) AS BIT(1536)) <~> binary_quantize(" in compile(ConversationEntity.embedding_distance(embedding, "bit"))
+
+    stmt = select(MessageEntity.id).where(MessageEntity.sender_id.is_(None))
+    assert vector_storage("messages") == "vector" and candidate_rows("messages", 10) == 10
+    assert "IN (SELECT" not in compile(nearest(stmt, MessageEntity, embedding, "iterative", 10))
+
+    monkeypatch.setenv("VECTOR_STORAGE_MESSAGES", "bit")
+    assert candidate_rows("messages", 10) == 10 * RERANK_FACTORS["bit"]
+    search = nearest(stmt, MessageEntity, embedding, "iterative", 10)
+    candidates, reranked = compile(search).split(") ORDER BY ")
+    assert "messages.id IN (SELECT messages.id \nFROM messages" in candidates and "<~>" in candidates
+    assert reranked.startswith("messages.message_embedding <->")
+    assert "IN (SELECT" not in compile(nearest(stmt, MessageEntity, embedding, "exact", 10))
+
+    monkeypatch.setenv("VECTOR_STORAGE_MESSAGES", "pq")
+    with pytest.raises(ValueError):
+        vector_storage("messages")
+
+
+DIMENSIONS = 8
+USERS = 500
+ROWS_PER_USER = 20
+TOP_K = 10
+QUANTIZED_DIMENSIONS = 256
+QUANTIZED_ROWS = 5000
+
+
+@pytest.fixture(scope="module")
+def filtered_table():
+    engine = create_engine(TEST_DATABASE_URL)
+    metadata = MetaData()
+    table = Table(
+        "test_filtered_ann", metadata, Column("id", Integer, primary_key=True), Column("user_id", Integer, nullable=False), Column("embedding", Vector(DIMENSIONS), nullable=False)
+    )
+    rng = random.Random(7)
+    rows = [{"id": i, "user_id": i % USERS, "embedding": [rng.random() for _ in range(DIMENSIONS)]} for i in range(USERS * ROWS_PER_USER)]
+    with engine.begin() as connection:
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        metadata.drop_all(connection)
+        metadata.create_all(connection)
+        connection.execute(insert(table), rows)
+        connection.execute(text("CREATE INDEX ON test_filtered_ann USING hnsw (embedding vector_l2_ops)"))
+        connection.execute(text("ANALYZE test_filtered_ann"))
+    yield engine, table, rows
+    with engine.begin() as connection:
+        metadata.drop_all(connection)
+    engine.dispose()
+
+
+def search(engine, table, query: list[float], user_id: int, strategy: str, iterative_scan: bool = True) -> list[int]:
+    stmt = select(table.c.id).where(table.c.user_id == user_id).order_by(order_by_distance(table.c.embedding.l2_distance(query), strategy)).limit(TOP_K)
+    with engine.begin() as connection:
+        if strategy == "iterative":
+            # the only plan left is the HNSW index scan, like on a large table
+            connection.execute(text("SET LOCAL enable_seqscan = off"))
+        if iterative_scan and (statement := search_settings_statement(TOP_K, strategy=strategy)) is not None:
+            connection.execute(statement)
+        return list(connection.scalars(stmt))
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="needs TEST_DATABASE_URL, a Postgres with pgvector >= 0.8")
+def test_filtered_searches_return_the_complete_top_k(filtered_table):
+    engine, table, rows = filtered_table
+    rng = random.Random(11)
+
+    for user_id in rng.sample(range(USERS), 5):
+        query = [rng.random() for _ in range(DIMENSIONS)]
+        user_rows = [row for row in rows if row["user_id"] == user_id]
+        expected = [row["id"] for row in sorted(user_rows, key=lambda row: math.dist(row["embedding"], query))[:TOP_K]]
+
+        # a plain index scan finds ef_search rows of all users and filters most of them out
+        assert len(search(engine, table, query, user_id, "iterative", iterative_scan=False)) < TOP_K
+
+        assert search(engine, table, query, user_id, "exact") == expected
+        iterative = search(engine, table, query, user_id, "iterative")
+        assert len(iterative) == TOP_K
+        assert len(set(iterative) & set(expected)) >= TOP_K - 1
+
+
+class QuantizedBase(DeclarativeBase):
+    pass
+
+
+class QuantizedRow(QuantizedBase):
+    __tablename__ = "test_quantized_ann"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    embedding = mapped_column(EmbeddingVector(QUANTIZED_DIMENSIONS), nullable=False)
+
+    @classmethod
+    def embedding_distance(cls, embedding, storage: str = "vector"):
+        return vector_distance(cls.embedding, embedding, "cosine", storage)
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="needs TEST_DATABASE_URL, a Postgres with pgvector >= 0.8")
+@pytest.mark.parametrize("storage, min_recall", [("halfvec", 0.95), ("bit", 0.7)])
+def test_quantized_searches_recall_the_exact_top_k(monkeypatch, storage, min_recall):
+    engine = create_engine(TEST_DATABASE_URL)
+    rng = random.Random(5)
+    rows = [{"id": i, "embedding": [rng.gauss(0, 1) for _ in range(QUANTIZED_DIMENSIONS)]} for i in range(QUANTIZED_ROWS)]
+    monkeypatch.setenv("VECTOR_STORAGE_TEST_QUANTIZED_ANN", storage)
+    key = f"(binary_quantize(embedding)::bit({QUANTIZED_DIMENSIONS})) bit_hamming_ops" if storage == "bit" else f"(embedding::halfvec({QUANTIZED_DIMENSIONS})) halfvec_cosine_ops"
+    with engine.begin() as connection:
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        QuantizedBase.metadata.drop_all(connection)
+        QuantizedBase.metadata.create_all(connection)
+        connection.execute(insert(QuantizedRow), rows)
+        connection.execute(text(f"CREATE INDEX ON test_quantized_ann USING hnsw ({key})"))
+        connection.execute(text("ANALYZE test_quantized_ann"))
+
+    try:
+        recalls = []
+        for _ in range(20):
+            query = [rng.gauss(0, 1) for _ in range(QUANTIZED_DIMENSIONS)]
+            with engine.begin() as connection:
+                exact = list(connection.scalars(nearest(select(QuantizedRow.id), QuantizedRow, query, "exact", TOP_K)))
+                connection.execute(text("SET LOCAL enable_seqscan = off"))
+                connection.execute(search_settings_statement(candidate_rows("test_quantized_ann", TOP_K)))
+                quantized = list(connection.scalars(nearest(select(QuantizedRow.id), QuantizedRow, query, "iterative", TOP_K)))
+            recalls.append(len(set(exact) & set(quantized)) / TOP_K)
+        assert sum(recalls) / len(recalls) >= min_recall
+    finally:
+        with engine.begin() as connection:
+            QuantizedBase.metadata.drop_all(connection)
+        engine.dispose()
@@ -0,0 +1,56 @@
+from array import array
+from uuid import uuid4
+
+import numpy as np
+import pytest
+from pgvector import Vector
+from pydantic import ValidationError
+from sqlalchemy.dialects.postgresql import asyncpg, psycopg2
+
+from app.chatbot.chatbot_models import MemoryEntry
+from app.chatbot.messages import Message
+from app.common.models import MemoryType, Role
+from app.common.vector_types import EmbeddingVector, as_embedding, from_binary, to_binary
+
+
+def test_models_keep_the_embedder_array():
+    embedding = np.linspace(-1, 1, 1536, dtype=np.float32)
+
+    message = Message(content="hi", role=Role.USER, conversation_id=uuid4(), embedding=embedding)
+
+    assert message.embedding is embedding
+    assert message.model_dump()["embedding"] is embedding
+    assert Message.model_validate_json(message.model_dump_json()).embedding.tolist() == embedding.tolist()
+
+
+def test_models_convert_other_values_to_float32():
+    entry = MemoryEntry(user_id=uuid4(), memory_type=MemoryType.USER_PROFILE, content="x", embedding=[0.5, 1, 2])
+
+    assert entry.embedding.dtype == np.float32 and entry.embedding.flags.c_contiguous
+    assert MemoryEntry(user_id=uuid4(), memory_type=MemoryType.USER_PROFILE, content="x").embedding.shape == (0,)
+    assert as_embedding(Vector([1.0, 2.0])).tolist() == [1.0, 2.0]
+    assert as_embedding(memoryview(array("f", [1.0, 2.0]))).tolist() == [1.0, 2.0]
+    with pytest.raises(ValidationError):
+        Message(content="hi", role=Role.USER, conversation_id=uuid4(), embedding=[[0.1, 0.2]])
+
+
+def test_binary_codec_round_trips():
+    embedding = np.random.default_rng(3).random(1536, dtype=np.float32)
+
+    data = to_binary(embedding)
+
+    assert data == Vector(embedding).to_binary()
+    decoded = from_binary(data)
+    assert decoded.dtype == np.float32 and np.array_equal(decoded, embedding)
+
+
+def test_column_binds_arrays_per_driver():
+    column = EmbeddingVector(3)
+    embedding = np.array([0.1, 0.25, -3], dtype=np.float32)
+
+    assert column.bind_processor(asyncpg.dialect())(embedding) is embedding
+
+    text = column.bind_processor(psycopg2.dialect())(embedding)
+    assert Vector.from_text(text) == Vector(embedding)
+    assert np.array_equal(column.result_processor(psycopg2.dialect(), None)(text), embedding)
+    assert column.result_processor(psycopg2.dialect(), None)(None) is None
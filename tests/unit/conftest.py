@@ -3,6 +3,7 @@ from unittest.mock import AsyncMock, patch
 from fastapi import FastAPI
 import pytest
 from app.common.controller import BaseController
+from app.common.query_stats import QueryStats, add_request_listener, collect_queries, remove_request_listener
 
 
 @pytest.fixture(scope="module")
@@ -45,3 +46,32 @@ def mock_user_service() -> Generator[AsyncMock, None, None]:
     # 3) Patch the exact import path that UserController uses
     with patch("app.common.config.ServiceFactory.get_user_service", new=_fake_get_user_service):
         yield fake_service
+
+
+@pytest.fixture(autouse=True)
+def query_budget(request: pytest.FixtureRequest) -> Generator[None, None, None]:
+    """
+    Enforce `@pytest.mark.query_budget(queries, repeats=None)`: every request served during the test
+    (through QueryStatsMiddleware), or the test itself when it serves none, must stay within it.
+    """
+    marker = request.node.get_closest_marker("query_budget")
+    if marker is None:
+        yield
+        return
+
+    served: list[QueryStats] = []
+    listener = served.append
+    add_request_listener(listener)
+    try:
+        with collect_queries(request.node.name) as test_stats:
+            yield
+    finally:
+        remove_request_listener(listener)
+
+    failures = []
+    for stats in served or [test_stats]:
+        if reasons := stats.over_budget(*marker.args, **marker.kwargs):
+            slowest = "".join(f"\n    x{s.count} {s.max_seconds * 1000:.1f}ms: {s.sql}" for s in stats.slowest())
+            failures.append(f"{stats.label}: {'; '.join(reasons)}{slowest}")
+    if failures:
+        pytest.fail("Query budget exceeded\n" + "\n".join(failures), pytrace=False)
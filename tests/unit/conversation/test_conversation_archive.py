@@ -0,0 +1,143 @@
+import asyncio
+import copy
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import numpy as np
+import pytest
+
+from app.chatbot.conversation import Conversation
+from app.chatbot.conversation.conversation_services import ConversationArchiveService, archive_key
+from app.chatbot.messages import Message
+from app.common.exceptions import NotFoundException
+from app.common.models import Role
+from app.common.object_store import LocalObjectStore
+
+NOW = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+
+class InMemoryRepository:
+    """Conversations and messages of one user, changes kept until a commit or rollback"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.conversations: dict = {}
+        self.messages: list[Message] = []
+        self._committed = None
+        self.commit()
+
+    def add(self, updated_at: datetime, messages: int) -> Conversation:
+        conversation = Conversation(id=uuid4(), title="chat", status="active", created_at=updated_at, updated_at=updated_at)
+        self.conversations[conversation.id] = conversation
+        for i in range(messages):
+            role = Role.USER if i % 2 == 0 else Role.ASSISTANT
+            self.messages.append(
+                Message(conversation_id=conversation.id, role=role, content=f"message {i}", model_id="sonnet", embedding=np.full(3, i, dtype=np.float32), created_at=updated_at)
+            )
+        self.commit()
+        return conversation
+
+    def conversation_messages(self, conversation_id) -> list[Message]:
+        return [m for m in self.messages if m.conversation_id == conversation_id]
+
+    def commit(self):
+        self._committed = copy.deepcopy((self.conversations, self.messages))
+
+    async def rollback(self):
+        self.conversations, self.messages = copy.deepcopy(self._committed)
+
+    async def find_inactive_conversations(self, updated_before, limit):
+        inactive = [c for c in self.conversations.values() if c.status == "active" and c.updated_at < updated_before]
+        return sorted(inactive, key=lambda c: c.updated_at)[:limit]
+
+    async def change_status(self, conversation_id, from_status, to_status, updated_before=None, touch=False):
+        conversation = self.conversations[conversation_id]
+        if conversation.status != from_status or (updated_before is not None and conversation.updated_at >= updated_before):
+            return None
+        conversation.status = to_status
+        if touch:
+            conversation.updated_at = datetime.now(timezone.utc)
+        return self.user_id
+
+    async def find_conversation_by_id(self, conversation_id):
+        if conversation_id not in self.conversations:
+            raise NotFoundException()
+        return self.conversations[conversation_id].model_copy()
+
+    async def fetch_all_messages(self, conversation_id, with_embeddings=False):
+        assert with_embeddings
+        return self.conversation_messages(conversation_id)
+
+    async def delete_archived_messages(self, user_id, conversation_id, messages):
+        ids = {m.id for m in messages}
+        self.messages = [m for m in self.messages if m.id not in ids]
+        self.commit()
+        return len(ids)
+
+    async def copy_messages(self, user_id, messages):
+        messages = list(messages)
+        self.messages.extend(messages)
+        self.commit()
+        return len(messages)
+
+
+class FailingStore(LocalObjectStore):
+    def put(self, key, data):
+        raise OSError("bucket unavailable")
+
+
+def service(repository, store) -> ConversationArchiveService:
+    return ConversationArchiveService(repository, repository, store, archive_after_days=30, batch_size=10)
+
+
+def test_inactive_conversations_are_archived_and_rehydrated_when_opened(tmp_path):
+    repository = InMemoryRepository(uuid4())
+    store = LocalObjectStore(str(tmp_path))
+    inactive = repository.add(NOW - timedelta(days=45), messages=3)
+    recent = repository.add(NOW - timedelta(days=2), messages=2)
+    before = repository.conversation_messages(inactive.id)
+
+    result = asyncio.run(service(repository, store).archive_inactive(now=NOW))
+
+    assert (result.conversations, result.messages, result.failed) == (1, 3, 0)
+    assert repository.conversations[inactive.id].status == "archived"
+    assert repository.conversation_messages(inactive.id) == []
+    assert len(repository.conversation_messages(recent.id)) == 2
+    assert (tmp_path / archive_key(repository.user_id, inactive.id)).exists()
+
+    conversation = asyncio.run(service(repository, store).open(inactive.id))
+
+    assert conversation.status == "active"
+    after = repository.conversation_messages(inactive.id)
+    assert [(m.id, m.role, m.content, m.model_id, m.created_at) for m in after] == [(m.id, m.role, m.content, m.model_id, m.created_at) for m in before]
+    assert [m.embedding.tolist() for m in after] == [m.embedding.tolist() for m in before]
+
+
+def test_messages_stay_hot_when_the_archive_cannot_be_written(tmp_path):
+    repository = InMemoryRepository(uuid4())
+    inactive = repository.add(NOW - timedelta(days=45), messages=2)
+
+    result = asyncio.run(service(repository, FailingStore(str(tmp_path))).archive_inactive(now=NOW))
+
+    assert (result.conversations, result.failed) == (0, 1)
+    assert repository.conversations[inactive.id].status == "active"
+    assert len(repository.conversation_messages(inactive.id)) == 2
+
+
+def test_opening_an_active_conversation_does_not_read_the_archive(tmp_path):
+    repository = InMemoryRepository(uuid4())
+    active = repository.add(NOW, messages=1)
+
+    assert asyncio.run(service(repository, FailingStore(str(tmp_path))).open(active.id)).status == "active"
+
+
+def test_local_store_rejects_keys_outside_of_its_directory(tmp_path):
+    store = LocalObjectStore(str(tmp_path))
+    store.put("a/b.gz", b"data")
+
+    assert store.get("a/b.gz") == b"data"
+    store.delete("a/b.gz")
+    with pytest.raises(NotFoundException):
+        store.get("a/b.gz")
+    with pytest.raises(ValueError):
+        store.put("../escape", b"data")
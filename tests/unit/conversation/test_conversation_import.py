@@ -0,0 +1,72 @@
+import asyncio
+import json
+from uuid import uuid4
+
+import numpy as np
+import pytest
+
+from app.chatbot.conversation.conversation_services import ConversationImportService, ndjson_lines
+from app.user import User
+
+
+class RecordingRepository:
+    def __init__(self):
+        self.conversations: list[list] = []
+        self.messages: list[list] = []
+
+    async def add_conversations(self, user_id, conversations):
+        self.conversations.append(conversations)
+
+    async def copy_messages(self, user_id, messages):
+        messages = list(messages)
+        self.messages.append(messages)
+        return len(messages)
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.calls: list[int] = []
+
+    def embed(self, texts):
+        self.calls.append(len(texts))
+        return [np.full(4, len(text), dtype=np.float32) for text in texts]
+
+
+async def chunked(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start : start + size]
+
+
+def conversation_line(messages: int, embedded: bool = False) -> str:
+    return json.dumps(
+        {
+            "title": "from elsewhere",
+            "messages": [{"role": "user", "content": f"message {i}", **({"embedding": [0.5] * 4} if embedded else {})} for i in range(messages)],
+        }
+    )
+
+
+def test_conversations_are_copied_in_batches_with_missing_embeddings_computed():
+    repository, embedder = RecordingRepository(), CountingEmbedder()
+    service = ConversationImportService(repository, repository, embedder, batch_messages=4, embedding_batch_size=3)
+    body = "\n".join([conversation_line(3), "", conversation_line(2, embedded=True), conversation_line(1)]).encode()
+
+    result = asyncio.run(service.import_ndjson(User(id=uuid4(), username="alice"), ndjson_lines(chunked(body, 7))))
+
+    assert (result.conversations, result.messages, result.embedded_messages) == (3, 6, 4)
+    assert [len(batch) for batch in repository.conversations] == [2, 1]
+    assert [len(batch) for batch in repository.messages] == [5, 1]
+    assert embedder.calls == [3, 1]
+    first = repository.messages[0]
+    assert first[0].conversation_id == repository.conversations[0][0].id
+    assert first[0].embedding.tolist() == [9.0] * 4 and first[3].embedding.tolist() == [0.5] * 4
+
+
+def test_invalid_lines_are_reported_with_their_number():
+    repository = RecordingRepository()
+    service = ConversationImportService(repository, repository, CountingEmbedder())
+    body = f'{conversation_line(1)}\n{{"messages": [{{"role": "nobody", "content": "x"}}]}}\n'.encode()
+
+    with pytest.raises(ValueError, match="line 2"):
+        asyncio.run(service.import_ndjson(User(id=uuid4(), username="alice"), ndjson_lines(chunked(body, 1024))))
+    assert repository.messages == []
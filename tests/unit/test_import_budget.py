@@ -0,0 +1,61 @@
+import os
+import subprocess
+import sys
+
+# Cold import profile of app.main, regenerated with docs/scripts/import_time_report.py when the import graph changes
+IMPORT_TIME_REPORT = os.path.join(os.path.dirname(__file__), "..", "..", "docs", "importtime", "app_main.txt")
+# A cold import this many times slower than the report means a new eager import, not a slower machine or scheduler noise
+IMPORT_TIME_TOLERANCE = float(os.getenv("IMPORT_TIME_TOLERANCE", "2.0"))
+
+# Loaded (through app.common.lazy or on first use) only when a workflow, a tool, an embedding or the async DB backend needs them
+LAZY_DEPENDENCIES = [
+    "langchain_aws",
+    "langchain_google_genai",
+    "langchain_core",
+    "langgraph",
+    "playwright",
+    "pdfminer",
+    "strands_tools",
+    "wikipedia",
+    "bs4",
+    "aiohttp",
+    "boto3",
+    "mcp",
+    "numpy",
+    "pgvector",
+    "sqlalchemy.ext.asyncio",
+]
+
+
+def _import_profile(module: str) -> dict[str, int]:
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, check=True)
+    cumulative_by_module = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:") :].split("|")
+        cumulative_by_module[name.strip()] = int(cumulative_us)
+    return cumulative_by_module
+
+
+def test_cold_import_does_not_load_heavy_dependencies():
+    imported = _import_profile("app.main")
+
+    loaded = sorted({name for name in imported for dep in LAZY_DEPENDENCIES if name == dep or name.startswith(f"{dep}.")})
+    assert not loaded, f"Heavy dependencies imported eagerly by app.main: {loaded}"
+
+
+def _report_total_ms() -> float:
+    with open(IMPORT_TIME_REPORT) as report:
+        for line in report:
+            if line.startswith("# total:"):
+                return float(line.split()[2])
+    raise AssertionError(f"No total in {IMPORT_TIME_REPORT}")
+
+
+def test_cold_import_time_within_report_tolerance():
+    # Best of three to keep scheduler noise out of the measurement
+    total_ms = min(_import_profile("app.main")["app.main"] for _ in range(3)) / 1000
+    budget_ms = _report_total_ms() * IMPORT_TIME_TOLERANCE
+
+    assert total_ms <= budget_ms, f"import app.main took {total_ms:.0f}ms, over {IMPORT_TIME_TOLERANCE}x docs/importtime/app_main.txt ({budget_ms:.0f}ms)"